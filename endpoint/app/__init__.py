@@ -55,4 +55,12 @@ def create_app(config_name=None):
     with app.app_context():
         db.create_all()
     
+    # 入库任务服务（恢复重启前未完成的任务）
+    from services.ingestion_job_service import ingestion_job_service
+    ingestion_job_service.init_app(app)
+    
+    # 性能指标（后台定期刷新到数据库）
+    from services.metrics import metrics_registry
+    metrics_registry.init_app(app)
+    
     return app
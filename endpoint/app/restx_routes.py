@@ -5,13 +5,19 @@
 
 from flask import request
 from flask_restx import Resource
+import pandas as pd
 from models import db, User, Portfolio, Strategy, Trade, MarketData, RiskRule, Symbol, DataSource
 from utils.auth import token_required
 from utils.response import (
     success_response, error_response, business_error_response, system_error_response,
     ResponseCode, ResponseMessage
 )
-from services.market_data_service import MarketDataService
+from services.market_data_service import MarketDataService, RESPONSE_FORMATS, COLUMNAR_FIELDS
+from services.adjustment_factors import ADJUST_TYPES
+from services.bar_rollup import INTERVAL_MINUTES
+from services.bar_aggregates import AGGREGATE_INTERVALS
+from services.fast_reads import PRICE_COLUMNS, read_trade_columns
+from utils.wire_formats import wants_binary, binary_response
 from services.trading_service import TradingService
 from app.api_docs import (
     api, auth_ns, users_ns, portfolios_ns, trades_ns, strategies_ns, 
@@ -221,8 +227,9 @@ class PortfolioPositions(Resource):
 
 @trades_ns.route('')
 class TradeList(Resource):
-    @trades_ns.marshal_with(success_response_model, code=200, description='获取成功')
-    @trades_ns.marshal_with(error_response_model, code=401, description='未授权')
+    # 二进制格式（Accept协商）直接返回Response，不经过marshal_with
+    @trades_ns.response(200, '获取成功（Accept为application/vnd.apache.arrow.stream或application/msgpack时返回二进制列数据）', success_response_model)
+    @trades_ns.response(401, '未授权', error_response_model)
     @token_required
     def get(self, current_user_id):
         """获取交易记录"""
@@ -230,19 +237,23 @@ class TradeList(Resource):
         symbol = request.args.get('symbol')
         limit = request.args.get('limit', 100, type=int)
         
-        query = Trade.query
         if portfolio_id:
             # 验证投资组合属于当前用户
             portfolio = Portfolio.query.get(portfolio_id)
             if not portfolio or portfolio.user_id != current_user_id:
                 return business_error_response(ResponseCode.PORTFOLIO_NOT_FOUND)
-            query = query.filter_by(portfolio_id=portfolio_id)
+            portfolio_ids = [portfolio_id]
         else:
             # 如果没有指定投资组合，只返回当前用户的交易
             user_portfolios = Portfolio.query.filter_by(user_id=current_user_id).all()
             portfolio_ids = [p.id for p in user_portfolios]
-            query = query.filter(Trade.portfolio_id.in_(portfolio_ids))
         
+        if wants_binary():
+            # 二进制格式：按列读取，不构造ORM对象与字典
+            columns = read_trade_columns(portfolio_ids, symbol, limit)
+            return binary_response(columns, {'count': len(columns['id'])})
+        
+        query = Trade.query.filter(Trade.portfolio_id.in_(portfolio_ids))
         if symbol:
             query = query.filter_by(symbol=symbol)
         
@@ -360,10 +371,56 @@ class LatestMarketData(Resource):
         
         return success_response(data)
 
+@market_data_ns.route('/<symbol>/indicators')
+class TechnicalIndicators(Resource):
+    # 二进制格式（Accept协商）直接返回Response，不经过marshal_with
+    @market_data_ns.response(200, '获取成功（Accept为application/vnd.apache.arrow.stream或application/msgpack时返回二进制列数据）', success_response_model)
+    @market_data_ns.response(400, '参数错误', error_response_model)
+    @market_data_ns.response(500, '获取失败', error_response_model)
+    @token_required
+    def get(self, current_user_id, symbol):
+        """获取技术指标（最近period×2条日线上的均线、RSI、MACD与布林带，按时间升序）"""
+        try:
+            period = request.args.get('period', 20, type=int)
+            adjust = request.args.get('adjust', 'qfq')
+            if period <= 0:
+                return business_error_response(ResponseCode.BAD_REQUEST, f'无效的指标周期: {period}')
+            if adjust not in ADJUST_TYPES:
+                return business_error_response(ResponseCode.BAD_REQUEST, f'不支持的复权方式: {adjust}')
+            
+            from services.data_service import DataService, INDICATOR_COLUMNS
+            frame = DataService().get_technical_indicator_frame(symbol, period, adjust)
+            if frame is None:
+                return business_error_response(ResponseCode.NOT_FOUND, f'{symbol}的行情数据不足以计算技术指标')
+            
+            columns = ['timestamp'] + [c for c in PRICE_COLUMNS + INDICATOR_COLUMNS if c in frame.columns]
+            frame = frame[columns]
+            if wants_binary():
+                return binary_response(
+                    {column: frame[column] for column in columns},
+                    {'symbol': symbol, 'period': period, 'adjust': adjust, 'count': len(frame)}
+                )
+            
+            # JSON中时间为ISO字符串，指标窗口不足的位置为null
+            frame = frame.astype({column: object for column in columns[1:]}).where(frame.notna(), None)
+            frame['timestamp'] = [timestamp.isoformat() for timestamp in pd.to_datetime(frame['timestamp'])]
+            return success_response({
+                'symbol': symbol,
+                'period': period,
+                'adjust': adjust,
+                'data': frame.to_dict('records'),
+                'count': len(frame)
+            })
+            
+        except Exception as e:
+            return system_error_response(ResponseCode.GET_DATA_ERROR, f'获取技术指标失败: {str(e)}')
+
 @market_data_ns.route('/<symbol>')
 class MarketData(Resource):
-    @market_data_ns.marshal_with(success_response_model, code=200, description='获取成功')
-    @market_data_ns.marshal_with(error_response_model, code=500, description='获取失败')
+    # 二进制格式（Accept协商）直接返回Response，不经过marshal_with
+    @market_data_ns.response(200, '获取成功（Accept为application/vnd.apache.arrow.stream或application/msgpack时返回二进制列数据）', success_response_model)
+    @market_data_ns.response(400, '参数错误', error_response_model)
+    @market_data_ns.response(500, '获取失败', error_response_model)
     @token_required
     def get(self, current_user_id, symbol):
         """获取股票的市场数据"""
@@ -372,6 +429,16 @@ class MarketData(Resource):
             start_date = request.args.get('start_date')
             end_date = request.args.get('end_date')
             limit = request.args.get('limit', type=int)
+            adjust = request.args.get('adjust', 'qfq')
+            interval = request.args.get('interval', '1d')
+            response_format = request.args.get('format', 'records')
+            
+            if adjust not in ADJUST_TYPES:
+                return business_error_response(ResponseCode.BAD_REQUEST, f'不支持的复权方式: {adjust}')
+            if interval != '1d' and interval not in INTERVAL_MINUTES and interval not in AGGREGATE_INTERVALS:
+                return business_error_response(ResponseCode.BAD_REQUEST, f'不支持的数据周期: {interval}')
+            if response_format not in RESPONSE_FORMATS:
+                return business_error_response(ResponseCode.BAD_REQUEST, f'不支持的返回格式: {response_format}')
             
             # 转换日期格式
             if start_date:
@@ -384,13 +451,30 @@ class MarketData(Resource):
             # 初始化市场数据服务
             market_service = MarketDataService()
             
+            if wants_binary():
+                # 二进制格式：浮点读取路径的DataFrame按列编码（列名同format=columnar，按时间升序）
+                frame = market_service.get_market_data(
+                    symbol, start_date, end_date, limit, adjust=adjust, interval_type=interval, output='frame'
+                )
+                metadata = market_service.get_market_data_metadata(symbol, interval, adjust)
+                metadata['count'] = len(frame)
+                return binary_response(
+                    {COLUMNAR_FIELDS.get(column, column): frame[column] for column in frame.columns}, metadata
+                )
+            
             # 获取市场数据
-            data = market_service.get_market_data(symbol, start_date, end_date, limit)
+            data = market_service.get_market_data(
+                symbol, start_date, end_date, limit,
+                adjust=adjust,
+                interval_type=interval,
+                output=response_format
+            )
             
             return success_response({
                 'symbol': symbol,
+                'format': response_format,
                 'data': data,
-                'count': len(data)
+                'count': data['count'] if response_format == 'columnar' else len(data)
             })
             
         except Exception as e:
@@ -1,13 +1,24 @@
 from flask import Blueprint, request, jsonify
-from models import db, User, Portfolio, Strategy, Trade, MarketData, RiskRule, Symbol, DataSource
+from models import (
+    db, User, Portfolio, Strategy, Trade, MarketData, RiskRule, Symbol, DataSource,
+    IngestionJob, IngestionJobItem, LatestBar
+)
 # 延迟导入以避免循环导入
 from utils.auth import token_required
 from utils.response import (
     success_response, error_response, business_error_response, system_error_response,
     ResponseCode, ResponseMessage
 )
-from services.market_data_service import MarketDataService
+from services.market_data_service import MarketDataService, RESPONSE_FORMATS, COLUMNAR_FIELDS
+from services.ingestion_job_service import ingestion_job_service
+from services.adjustment_factors import ADJUST_TYPES
+from services.bar_rollup import INTERVAL_MINUTES
+from services.bar_aggregates import AGGREGATE_INTERVALS
+from services.metrics import metrics_registry
+from services.fast_reads import PRICE_COLUMNS, read_position_rows, portfolio_position_values, read_trade_columns
+from utils.wire_formats import wants_binary, binary_response
 import json
+import pandas as pd
 from datetime import datetime, date
 
 # API蓝图
@@ -174,19 +185,23 @@ def get_trades(current_user_id):
     symbol = request.args.get('symbol')
     limit = request.args.get('limit', 100, type=int)
     
-    query = Trade.query
     if portfolio_id:
         # 验证投资组合属于当前用户
         portfolio = Portfolio.query.get(portfolio_id)
         if not portfolio or portfolio.user_id != current_user_id:
             return business_error_response(ResponseCode.PORTFOLIO_NOT_FOUND)
-        query = query.filter_by(portfolio_id=portfolio_id)
+        portfolio_ids = [portfolio_id]
     else:
         # 如果没有指定投资组合，只返回当前用户的交易
         user_portfolios = Portfolio.query.filter_by(user_id=current_user_id).all()
         portfolio_ids = [p.id for p in user_portfolios]
-        query = query.filter(Trade.portfolio_id.in_(portfolio_ids))
     
+    if wants_binary():
+        # 二进制格式：按列读取，不构造ORM对象与字典
+        columns = read_trade_columns(portfolio_ids, symbol, limit)
+        return binary_response(columns, {'count': len(columns['id'])})
+    
+    query = Trade.query.filter(Trade.portfolio_id.in_(portfolio_ids))
     if symbol:
         query = query.filter_by(symbol=symbol)
     
@@ -345,10 +360,12 @@ def get_dashboard_stats(current_user_id):
     # 获取用户的所有投资组合
     portfolios = Portfolio.query.filter_by(user_id=current_user_id).all()
     
-    # 计算总资产价值
-    total_value = sum(p.get_total_value() for p in portfolios)
-    total_pnl = sum(p.get_total_pnl() for p in portfolios)
-    total_pnl_percentage = (total_pnl / sum(p.initial_capital for p in portfolios) * 100) if portfolios else 0
+    # 计算总资产价值（持仓市值一次查询汇总）
+    positions_values = portfolio_position_values([p.id for p in portfolios])
+    total_value = sum(float(p.cash_balance) + positions_values[p.id] for p in portfolios)
+    total_capital = sum(float(p.initial_capital) for p in portfolios)
+    total_pnl = total_value - total_capital
+    total_pnl_percentage = (total_pnl / total_capital * 100) if total_capital else 0
     
     # 获取交易统计
     total_trades = sum(len(p.trades) for p in portfolios)
@@ -422,21 +439,23 @@ def get_positions_summary(current_user_id):
     else:
         portfolios = Portfolio.query.filter_by(user_id=current_user_id).all()
     
+    # 浮点读取路径：不构造持仓对象与Decimal
+    names = {portfolio.id: portfolio.name for portfolio in portfolios}
     positions_summary = []
-    for portfolio in portfolios:
-        positions = portfolio.positions.all()
-        for position in positions:
-            positions_summary.append({
-                'portfolio_id': portfolio.id,
-                'portfolio_name': portfolio.name,
-                'symbol': position.symbol,
-                'quantity': float(position.quantity),
-                'average_price': float(position.average_price),
-                'current_price': float(position.current_price),
-                'value': position.get_value(),
-                'unrealized_pnl': position.get_unrealized_pnl(),
-                'unrealized_pnl_percentage': (position.get_unrealized_pnl() / (float(position.quantity) * float(position.average_price)) * 100) if position.quantity > 0 else 0
-            })
+    for portfolio_id, symbol, quantity, average_price, current_price in read_position_rows(list(names)):
+        value = quantity * current_price
+        cost_basis = quantity * average_price
+        positions_summary.append({
+            'portfolio_id': portfolio_id,
+            'portfolio_name': names[portfolio_id],
+            'symbol': symbol,
+            'quantity': quantity,
+            'average_price': average_price,
+            'current_price': current_price,
+            'value': value,
+            'unrealized_pnl': value - cost_basis,
+            'unrealized_pnl_percentage': ((value - cost_basis) / cost_basis * 100) if quantity > 0 and cost_basis else 0
+        })
     
     return success_response(positions_summary)
 
@@ -698,16 +717,18 @@ def get_data_source_statistics(current_user_id, data_source_id):
         if not data_source:
             return business_error_response(ResponseCode.NOT_FOUND, '数据来源不存在')
         
+        hours = request.args.get('hours', 24, type=int)
+        
         # 统计关联的symbols和market_data
         symbol_count = Symbol.query.filter_by(data_source_id=data_source_id).count()
         market_data_count = MarketData.query.filter_by(data_source_id=data_source_id).count()
         
-        # 获取最新的市场数据时间
-        latest_data = MarketData.query.filter_by(data_source_id=data_source_id)\
-            .order_by(MarketData.timestamp.desc()).first()
-        
-        # 获取数据来源性能统计
+        # 获取数据来源数据量统计
         from sqlalchemy import func
+        
+        # 获取最新的市场数据时间（最新K线表每个标的、周期一行）
+        latest_data_time = db.session.query(func.max(LatestBar.timestamp))\
+            .filter(LatestBar.data_source_id == data_source_id).scalar()
         stats = db.session.query(
             func.count(MarketData.id).label('total_records'),
             func.count(func.distinct(MarketData.symbol_id)).label('unique_symbols'),
@@ -719,18 +740,42 @@ def get_data_source_statistics(current_user_id, data_source_id):
             'data_source': data_source.to_dict(),
             'symbol_count': symbol_count,
             'market_data_count': market_data_count,
-            'latest_data_time': latest_data.timestamp.isoformat() if latest_data else None,
+            'latest_data_time': latest_data_time.isoformat() if latest_data_time else None,
             'statistics': {
                 'total_records': stats.total_records or 0,
                 'unique_symbols': stats.unique_symbols or 0,
                 'earliest_data': stats.earliest_data.isoformat() if stats.earliest_data else None,
                 'latest_data': stats.latest_data.isoformat() if stats.latest_data else None
+            },
+            # 请求性能：live为进程启动以来的累计值，history为最近hours小时已刷新到数据库的窗口汇总
+            'performance': {
+                'live': metrics_registry.snapshot(data_source.provider_type).get(data_source.provider_type, {}),
+                'history': metrics_registry.get_history(data_source.provider_type, hours).get(data_source.provider_type, {}),
+                'hours': hours
             }
         })
         
     except Exception as e:
         return system_error_response(ResponseCode.GET_STATS_ERROR, f'获取数据来源统计失败: {str(e)}')
 
+@api_bp.route('/data-sources/metrics', methods=['GET'])
+@token_required
+def get_data_source_metrics(current_user_id):
+    """获取所有数据源及入库管道各阶段的性能指标"""
+    try:
+        hours = request.args.get('hours', 24, type=int)
+        
+        return success_response({
+            'started_at': metrics_registry.started_at.isoformat(),
+            'flush_interval': metrics_registry.flush_interval,
+            'live': metrics_registry.snapshot(),
+            'history': metrics_registry.get_history(hours=hours),
+            'hours': hours
+        })
+        
+    except Exception as e:
+        return system_error_response(ResponseCode.GET_STATS_ERROR, f'获取性能指标失败: {str(e)}')
+
 @api_bp.route('/data-sources/test/<int:data_source_id>', methods=['POST'])
 @token_required
 def test_data_source(current_user_id, data_source_id):
@@ -873,10 +918,14 @@ def sync_symbols(current_user_id):
             return system_error_response(ResponseCode.DATA_SOURCE_INIT_ERROR)
         
         # 同步股票列表
-        synced_count = market_service.sync_symbols(market)
+        stats = market_service.sync_symbols(market)
         
         return success_response({
-            'synced_count': synced_count,
+            'synced_count': stats['total'],
+            'inserted': stats['inserted'],
+            'updated': stats['updated'],
+            'unchanged': stats['unchanged'],
+            'deactivated': stats['deactivated'],
             'market': market,
             'data_source': data_source
         }, f'股票列表同步完成')
@@ -904,10 +953,13 @@ def sync_index_components(current_user_id):
             return system_error_response(ResponseCode.DATA_SOURCE_INIT_ERROR)
         
         # 同步指数成分股
-        synced_count = market_service.sync_index_components(index_code)
+        stats = market_service.sync_index_components(index_code)
         
         return success_response({
-            'synced_count': synced_count,
+            'synced_count': stats['total'],
+            'inserted': stats['inserted'],
+            'updated': stats['updated'],
+            'unchanged': stats['unchanged'],
             'index_code': index_code,
             'data_source': data_source
         }, f'{index_code}成分股同步完成')
@@ -918,7 +970,7 @@ def sync_index_components(current_user_id):
 @api_bp.route('/market-data/fetch/latest', methods=['POST'])
 @token_required
 def fetch_latest_data(current_user_id):
-    """手动获取最新行情数据"""
+    """手动获取最新行情数据（创建后台入库任务，立即返回任务ID）"""
     try:
         data = request.get_json() or {}
         symbols = data.get('symbols', [])
@@ -932,33 +984,107 @@ def fetch_latest_data(current_user_id):
         if not symbols:
             return business_error_response(ResponseCode.NO_SYMBOLS)
         
+        # 一次查询确定各股票的增量区间
+        market_service = MarketDataService(data_source)
+        tasks = market_service.plan_latest_tasks(symbols)
+        
+        job = ingestion_job_service.create_job(
+            'latest', tasks, data_source,
+            params={'symbols': len(symbols)},
+            created_by=current_user_id
+        )
+        
+        return success_response({
+            'job_id': job.id,
+            'status': job.status,
+            'total_symbols': len(symbols),
+            'total_items': job.total_items,
+            'data_source': data_source
+        }, '最新行情数据获取任务已创建')
+        
+    except Exception as e:
+        return system_error_response(ResponseCode.FETCH_ERROR, f'获取最新行情数据失败: {str(e)}')
+
+@api_bp.route('/market-data/fetch/snapshot', methods=['POST'])
+@token_required
+def fetch_daily_snapshot(current_user_id):
+    """用一次全市场快照生成当日日线"""
+    try:
+        data = request.get_json() or {}
+        trade_date = data.get('trade_date')
+        force_update = data.get('force_update', True)
+        data_source = data.get('data_source', 'akshare')
+        
+        if trade_date:
+            trade_date = datetime.strptime(trade_date, '%Y-%m-%d').date()
+        
         # 初始化市场数据服务
         market_service = MarketDataService(data_source)
         
         if not market_service.initialize_data_source():
             return system_error_response(ResponseCode.DATA_SOURCE_INIT_ERROR)
         
-        # 批量获取最新数据
-        results = market_service.batch_fetch_latest_data(symbols)
+        stats = market_service.ingest_daily_snapshot(trade_date, force_update, created_by=current_user_id)
+        stats['data_source'] = data_source
+        
+        return success_response(stats, '收盘快照入库完成')
+        
+    except Exception as e:
+        return system_error_response(ResponseCode.FETCH_ERROR, f'收盘快照入库失败: {str(e)}')
+
+@api_bp.route('/market-data/fetch/intraday', methods=['POST'])
+@token_required
+def fetch_intraday_data(current_user_id):
+    """获取分钟K线（创建后台入库任务，写入后增量汇总到更高周期）"""
+    try:
+        data = request.get_json() or {}
+        symbols = data.get('symbols', [])
+        interval = data.get('interval', '5m')
+        start_date = data.get('start_date')
+        end_date = data.get('end_date')
+        force_update = data.get('force_update', False)
+        data_source = data.get('data_source', 'akshare')
         
-        total_updated = sum(results.values())
-        successful_symbols = len([k for k, v in results.items() if v > 0])
+        if interval not in INTERVAL_MINUTES:
+            return business_error_response(ResponseCode.BAD_REQUEST, f'不支持的分钟周期: {interval}')
+        
+        if start_date:
+            start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
+        if end_date:
+            end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
+        
+        if not symbols:
+            active_symbols = Symbol.query.filter_by(is_active=True).all()
+            symbols = [s.symbol for s in active_symbols]
+        
+        if not symbols:
+            return business_error_response(ResponseCode.NO_SYMBOLS)
+        
+        market_service = MarketDataService(data_source)
+        tasks = market_service.plan_intraday_tasks(symbols, interval, start_date, end_date)
+        
+        job = ingestion_job_service.create_job(
+            'intraday', tasks, data_source,
+            params={'symbols': len(symbols), 'interval_type': interval, 'force_update': force_update},
+            created_by=current_user_id
+        )
         
         return success_response({
+            'job_id': job.id,
+            'status': job.status,
+            'interval': interval,
             'total_symbols': len(symbols),
-            'successful_symbols': successful_symbols,
-            'total_records': total_updated,
-            'results': results,
+            'total_items': job.total_items,
             'data_source': data_source
-        }, '最新行情数据获取完成')
+        }, f'{interval}分钟数据获取任务已创建')
         
     except Exception as e:
-        return system_error_response(ResponseCode.FETCH_ERROR, f'获取最新行情数据失败: {str(e)}')
+        return system_error_response(ResponseCode.FETCH_ERROR, f'获取分钟数据失败: {str(e)}')
 
 @api_bp.route('/market-data/fetch/historical', methods=['POST'])
 @token_required
 def fetch_historical_data(current_user_id):
-    """获取指定股票的历史数据"""
+    """获取指定股票的历史数据（创建后台入库任务，立即返回任务ID）"""
     try:
         data = request.get_json()
         
@@ -977,29 +1103,231 @@ def fetch_historical_data(current_user_id):
         if end_date:
             end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
         
-        # 初始化市场数据服务
         market_service = MarketDataService(data_source)
+        end_date = end_date or date.today()
+        if not start_date:
+            start_date = market_service._resolve_start_date(market_service.get_last_trading_date(symbol))
         
-        if not market_service.initialize_data_source():
-            return system_error_response(ResponseCode.DATA_SOURCE_INIT_ERROR)
+        tasks = [(symbol, start_date, end_date)] if start_date <= end_date else []
         
-        # 获取历史数据
-        count = market_service.fetch_historical_data(
-            symbol, start_date, end_date, force_update
+        job = ingestion_job_service.create_job(
+            'historical', tasks, data_source,
+            params={'symbol': symbol, 'force_update': force_update},
+            created_by=current_user_id
         )
         
         return success_response({
+            'job_id': job.id,
+            'status': job.status,
             'symbol': symbol,
-            'records_added': count,
-            'start_date': start_date.isoformat() if start_date else None,
-            'end_date': end_date.isoformat() if end_date else None,
+            'start_date': start_date.isoformat(),
+            'end_date': end_date.isoformat(),
             'force_update': force_update,
             'data_source': data_source
-        }, f'{symbol}历史数据获取完成')
+        }, f'{symbol}历史数据获取任务已创建')
         
     except Exception as e:
         return system_error_response(ResponseCode.FETCH_ERROR, f'获取历史数据失败: {str(e)}')
 
+@api_bp.route('/market-data/backfill', methods=['POST'])
+@token_required
+def backfill_market_data(current_user_id):
+    """按交易日历补齐历史数据缺口（默认只生成规模报告）"""
+    try:
+        data = request.get_json() or {}
+        symbols = data.get('symbols') or None
+        start_date = data.get('start_date')
+        end_date = data.get('end_date')
+        dry_run = data.get('dry_run', True)
+        bridge_days = int(data.get('bridge_days', 0))
+        limit = int(data.get('limit', 100))
+        data_source = data.get('data_source', 'akshare')
+        
+        # 转换日期格式
+        if start_date:
+            start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
+        if end_date:
+            end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
+        
+        market_service = MarketDataService(data_source)
+        work_items, report = market_service.plan_backfill(start_date, end_date, symbols, bridge_days, limit)
+        report['dry_run'] = dry_run
+        report['data_source'] = data_source
+        
+        if dry_run:
+            return success_response(report, '补齐规划完成')
+        
+        # 按规划的优先级顺序创建后台入库任务
+        job = ingestion_job_service.create_job(
+            'backfill', 
+            [(item['symbol'], item['start_date'], item['end_date']) for item in work_items], 
+            data_source,
+            params={'start_date': report['start_date'], 'end_date': report['end_date'], 'bridge_days': bridge_days},
+            created_by=current_user_id
+        )
+        report['job_id'] = job.id
+        report['status'] = job.status
+        
+        return success_response(report, '历史数据补齐任务已创建')
+        
+    except Exception as e:
+        return system_error_response(ResponseCode.FETCH_ERROR, f'补齐历史数据失败: {str(e)}')
+
+@api_bp.route('/market-data/adjustment-factors/sync', methods=['POST'])
+@token_required
+def sync_adjustment_factors(current_user_id):
+    """从数据源同步复权因子（创建后台任务，逐只写入变化的因子，立即返回任务ID）"""
+    try:
+        data = request.get_json() or {}
+        symbols = data.get('symbols') or None
+        data_source = data.get('data_source', 'akshare')
+        
+        market_service = MarketDataService(data_source)
+        stats = market_service.update_adjustment_factors(symbols, created_by=current_user_id)
+        if stats['job_id'] is None:
+            return business_error_response(ResponseCode.NO_SYMBOLS)
+        stats['data_source'] = data_source
+        
+        return success_response(stats, '复权因子同步任务已创建')
+        
+    except Exception as e:
+        return system_error_response(ResponseCode.SYNC_ERROR, f'同步复权因子失败: {str(e)}')
+
+@api_bp.route('/market-data/jobs', methods=['GET'])
+@token_required
+def list_ingestion_jobs(current_user_id):
+    """获取入库任务列表"""
+    try:
+        status = request.args.get('status')
+        limit = request.args.get('limit', 20, type=int)
+        
+        query = IngestionJob.query
+        if status:
+            query = query.filter_by(status=status)
+        jobs = query.order_by(IngestionJob.created_at.desc()).limit(limit).all()
+        
+        return success_response([
+            job.to_dict(ingestion_job_service.get_progress(job.id)) for job in jobs
+        ])
+        
+    except Exception as e:
+        return system_error_response(ResponseCode.GET_DATA_ERROR, f'获取入库任务失败: {str(e)}')
+
+@api_bp.route('/market-data/jobs/<int:job_id>', methods=['GET'])
+@token_required
+def get_ingestion_job(current_user_id, job_id):
+    """获取入库任务状态（进度、吞吐量、预计剩余时间）"""
+    try:
+        job_status = ingestion_job_service.get_job_status(job_id)
+        
+        if job_status is None:
+            return business_error_response(ResponseCode.NOT_FOUND, '入库任务不存在')
+        
+        if request.args.get('include_items', 'false').lower() == 'true':
+            items = IngestionJobItem.query.filter(
+                IngestionJobItem.job_id == job_id, 
+                IngestionJobItem.status != 'done'
+            ).order_by(IngestionJobItem.id).limit(request.args.get('limit', 100, type=int)).all()
+            job_status['items'] = [item.to_dict() for item in items]
+        
+        return success_response(job_status)
+        
+    except Exception as e:
+        return system_error_response(ResponseCode.GET_DATA_ERROR, f'获取入库任务失败: {str(e)}')
+
+@api_bp.route('/market-data/jobs/<int:job_id>/resume', methods=['POST'])
+@token_required
+def resume_ingestion_job(current_user_id, job_id):
+    """从检查点恢复入库任务（失败的工作项重新执行）"""
+    try:
+        if db.session.get(IngestionJob, job_id) is None:
+            return business_error_response(ResponseCode.NOT_FOUND, '入库任务不存在')
+        
+        if not ingestion_job_service.resume(job_id):
+            return business_error_response(ResponseCode.JOB_RUNNING, '入库任务正在运行')
+        
+        return success_response(ingestion_job_service.get_job_status(job_id), '入库任务已恢复')
+        
+    except Exception as e:
+        return system_error_response(ResponseCode.FETCH_ERROR, f'恢复入库任务失败: {str(e)}')
+
+@api_bp.route('/market-data/jobs/<int:job_id>/cancel', methods=['POST'])
+@token_required
+def cancel_ingestion_job(current_user_id, job_id):
+    """取消入库任务"""
+    try:
+        if not ingestion_job_service.cancel(job_id):
+            return business_error_response(ResponseCode.BAD_REQUEST, '入库任务不存在或已结束')
+        
+        return success_response(ingestion_job_service.get_job_status(job_id), '入库任务已取消')
+        
+    except Exception as e:
+        return system_error_response(ResponseCode.UPDATE_ERROR, f'取消入库任务失败: {str(e)}')
+
+@api_bp.route('/market-data/latest-bars', methods=['GET'])
+@token_required
+def get_latest_bars(current_user_id):
+    """批量获取最新K线（读取最新K线表，不指定股票时返回该周期的全市场最新K线）"""
+    try:
+        symbols = request.args.get('symbols')
+        interval = request.args.get('interval', '1d')
+        
+        if interval != '1d' and interval not in INTERVAL_MINUTES:
+            return business_error_response(ResponseCode.BAD_REQUEST, f'不支持的数据周期: {interval}')
+        
+        symbols = [s.strip() for s in symbols.split(',') if s.strip()] if symbols else None
+        
+        market_service = MarketDataService()
+        bars = market_service.get_latest_bars(symbols, interval)
+        
+        return success_response({
+            'interval': interval,
+            'data': list(bars.values()),
+            'count': len(bars)
+        })
+        
+    except Exception as e:
+        return system_error_response(ResponseCode.GET_DATA_ERROR, f'获取最新K线失败: {str(e)}')
+
+@api_bp.route('/market-data/<symbol>/indicators', methods=['GET'])
+@token_required
+def get_technical_indicators(current_user_id, symbol):
+    """获取技术指标（最近period×2条日线上的均线、RSI、MACD与布林带，按时间升序）"""
+    try:
+        period = request.args.get('period', 20, type=int)
+        adjust = request.args.get('adjust', 'qfq')
+        if period <= 0:
+            return business_error_response(ResponseCode.BAD_REQUEST, f'无效的指标周期: {period}')
+        if adjust not in ADJUST_TYPES:
+            return business_error_response(ResponseCode.BAD_REQUEST, f'不支持的复权方式: {adjust}')
+        
+        from services.data_service import DataService, INDICATOR_COLUMNS
+        frame = DataService().get_technical_indicator_frame(symbol, period, adjust)
+        if frame is None:
+            return business_error_response(ResponseCode.NOT_FOUND, f'{symbol}的行情数据不足以计算技术指标')
+        
+        columns = ['timestamp'] + [c for c in PRICE_COLUMNS + INDICATOR_COLUMNS if c in frame.columns]
+        frame = frame[columns]
+        if wants_binary():
+            return binary_response(
+                {column: frame[column] for column in columns},
+                {'symbol': symbol, 'period': period, 'adjust': adjust, 'count': len(frame)}
+            )
+        
+        # JSON中时间为ISO字符串，指标窗口不足的位置为null
+        frame = frame.astype({column: object for column in columns[1:]}).where(frame.notna(), None)
+        frame['timestamp'] = [timestamp.isoformat() for timestamp in pd.to_datetime(frame['timestamp'])]
+        return success_response({
+            'symbol': symbol,
+            'period': period,
+            'adjust': adjust,
+            'data': frame.to_dict('records'),
+            'count': len(frame)
+        })
+        
+    except Exception as e:
+        return system_error_response(ResponseCode.GET_DATA_ERROR, f'获取技术指标失败: {str(e)}')
+
 @api_bp.route('/market-data/<symbol>', methods=['GET'])
 @token_required
 def get_market_data(current_user_id, symbol):
@@ -1009,6 +1337,16 @@ def get_market_data(current_user_id, symbol):
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
         limit = request.args.get('limit', type=int)
+        adjust = request.args.get('adjust', 'qfq')
+        interval = request.args.get('interval', '1d')
+        response_format = request.args.get('format', 'records')
+        
+        if adjust not in ADJUST_TYPES:
+            return business_error_response(ResponseCode.BAD_REQUEST, f'不支持的复权方式: {adjust}')
+        if interval != '1d' and interval not in INTERVAL_MINUTES and interval not in AGGREGATE_INTERVALS:
+            return business_error_response(ResponseCode.BAD_REQUEST, f'不支持的数据周期: {interval}')
+        if response_format not in RESPONSE_FORMATS:
+            return business_error_response(ResponseCode.BAD_REQUEST, f'不支持的返回格式: {response_format}')
         
         # 转换日期格式
         if start_date:
@@ -1019,13 +1357,29 @@ def get_market_data(current_user_id, symbol):
         # 初始化市场数据服务
         market_service = MarketDataService()
         
-        # 获取市场数据
-        data = market_service.get_market_data(symbol, start_date, end_date, limit)
+        if wants_binary():
+            # 二进制格式：浮点读取路径的DataFrame按列编码（列名同format=columnar，按时间升序）
+            frame = market_service.get_market_data(
+                symbol, start_date, end_date, limit, adjust=adjust, interval_type=interval, output='frame'
+            )
+            metadata = market_service.get_market_data_metadata(symbol, interval, adjust)
+            metadata['count'] = len(frame)
+            return binary_response(
+                {COLUMNAR_FIELDS.get(column, column): frame[column] for column in frame.columns}, metadata
+            )
+        
+        # 获取市场数据（读取时按复权因子复权）
+        data = market_service.get_market_data(
+            symbol, start_date, end_date, limit, adjust=adjust, interval_type=interval, output=response_format
+        )
         
         return success_response({
             'symbol': symbol,
+            'adjust': adjust,
+            'interval': interval,
+            'format': response_format,
             'data': data,
-            'count': len(data)
+            'count': data['count'] if response_format == 'columnar' else len(data)
         })
         
     except Exception as e:
@@ -1097,7 +1451,7 @@ def get_market_data_statistics(current_user_id):
 def market_data_health_check(current_user_id):
     """市场数据服务健康检查"""
     try:
-        market_service = MarketDataService()
+        market_service = MarketDataService(request.args.get('data_source', 'akshare'))
         health_info = market_service.health_check()
         
         return success_response(health_info)
@@ -23,6 +23,16 @@ class Config:
     # 调度器配置
     SCHEDULER_API_ENABLED = True
     
+    # 入库任务配置
+    INGESTION_JOB_WORKERS = int(os.environ.get('INGESTION_JOB_WORKERS', '1'))
+    INGESTION_JOB_BATCH_SIZE = int(os.environ.get('INGESTION_JOB_BATCH_SIZE', '50'))
+    INGESTION_JOB_AUTO_RESUME = os.environ.get('INGESTION_JOB_AUTO_RESUME', 'True').lower() == 'true'
+    # 任务租约（秒）：运行中的任务超过该时长没有心跳才会被其他进程恢复
+    INGESTION_JOB_LEASE_SECONDS = int(os.environ.get('INGESTION_JOB_LEASE_SECONDS', '300'))
+    
+    # 性能指标刷新到data_source_metrics表的间隔（秒），0表示不刷新
+    METRICS_FLUSH_INTERVAL = int(os.environ.get('METRICS_FLUSH_INTERVAL', '60'))
+    
     # 日志配置
     LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
     LOG_FILE = os.environ.get('LOG_FILE', 'logs/trading.log')
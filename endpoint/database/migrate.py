@@ -12,6 +12,10 @@
     python migrate.py downgrade v1.0.0         # 回滚到指定版本
     python migrate.py init                      # 初始化数据库结构
     python migrate.py validate                 # 验证数据库完整性
+    python migrate.py partitions               # 查看market_data分区
+    python migrate.py partitions-maintain      # 预建未来的按月分区（默认3个月，--months-ahead）
+    python migrate.py partitions-archive --before 2015-01-01        # 历史分区交换到归档表后移除
+    python migrate.py partitions-drop --before 2015-01-01 --yes     # 直接删除历史分区（不可恢复）
 """
 
 import os
@@ -19,7 +23,7 @@ import sys
 import argparse
 import hashlib
 import re
-from datetime import datetime
+from datetime import datetime, date
 from pathlib import Path
 import pymysql
 from dotenv import load_dotenv
@@ -28,6 +32,9 @@ from dotenv import load_dotenv
 project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 endpoint_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(project_root)
+sys.path.append(endpoint_dir)
+
+from services.market_data_partitions import MarketDataPartitionManager, DEFAULT_MONTHS_AHEAD
 
 # 尝试从多个位置加载环境变量
 env_files = [
@@ -189,6 +196,8 @@ class DatabaseMigrator:
                         'file_path': file_path,
                         'filename': file_path.name
                     })
+        # 按版本号排序（文件名排序时v1.10.0会排在v1.2.0之前）
+        migration_files.sort(key=lambda m: self.version_to_tuple(m['version']))
         return migration_files
     
     def version_to_tuple(self, version):
@@ -449,11 +458,69 @@ class DatabaseMigrator:
             print(f"✗ 数据库验证失败: {e}")
             return False
 
+    def show_partitions(self):
+        """显示market_data分区"""
+        partitions = MarketDataPartitionManager(self.execute_sql).list_partitions()
+        if not partitions:
+            print("market_data未分区（请先升级到v1.8.0）")
+            return False
+        
+        print(f"market_data分区数: {len(partitions)}")
+        for partition in partitions:
+            bound = partition['less_than'].date().isoformat() if partition['less_than'] else 'MAXVALUE'
+            print(f"  {partition['name']:<14} < {bound:<10}  约{partition['rows']:>12,}行  {partition['bytes'] / 1024 / 1024:>10.1f}MB")
+        return True
+    
+    def maintain_partitions(self, months_ahead=DEFAULT_MONTHS_AHEAD):
+        """预建未来的按月分区"""
+        manager = MarketDataPartitionManager(self.execute_sql)
+        if not manager.is_partitioned():
+            print("✗ market_data未分区（请先升级到v1.8.0）")
+            return False
+        
+        try:
+            created = manager.ensure_future_partitions(months_ahead)
+        except Exception as e:
+            print(f"✗ 分区维护失败: {e}")
+            return False
+        
+        if created:
+            print(f"✓ 新增分区: {', '.join(created)}")
+        else:
+            print("✓ 未来分区已存在，无需新增")
+        return True
+    
+    def archive_partitions(self, before, drop=False):
+        """移除早于before的历史分区（归档到独立表或直接删除）"""
+        manager = MarketDataPartitionManager(self.execute_sql)
+        expired = manager.expired_partitions(before)
+        if not expired:
+            print(f"没有早于{before}的分区")
+            return True
+        
+        print(f"{'删除' if drop else '归档'}分区: {', '.join(p['name'] for p in expired)}")
+        try:
+            results = manager.archive_partitions(before, drop)
+        except Exception as e:
+            print(f"✗ 分区{'删除' if drop else '归档'}失败: {e}")
+            return False
+        
+        for result in results:
+            target = f" -> {result['archive_table']}" if result['archive_table'] else ''
+            print(f"  ✓ {result['partition']}（约{result['rows']:,}行）{target}")
+        return len(results) == len(expired)
+
 def main():
     parser = argparse.ArgumentParser(description='数据库迁移管理工具')
-    parser.add_argument('command', choices=['init', 'status', 'list', 'upgrade', 'rollback', 'validate'],
+    parser.add_argument('command', choices=['init', 'status', 'list', 'upgrade', 'rollback', 'validate',
+                                            'partitions', 'partitions-maintain', 'partitions-archive', 'partitions-drop'],
                        help='要执行的命令')
     parser.add_argument('version', nargs='?', help='目标版本号 (用于upgrade/rollback命令)')
+    parser.add_argument('--months-ahead', type=int, default=DEFAULT_MONTHS_AHEAD,
+                       help='预建的月份数 (用于partitions-maintain命令)')
+    parser.add_argument('--before', type=date.fromisoformat,
+                       help='截止日期YYYY-MM-DD，移除全部数据早于该日期的分区 (用于partitions-archive/drop命令)')
+    parser.add_argument('--yes', action='store_true', help='确认删除分区数据 (用于partitions-drop命令)')
     
     args = parser.parse_args()
     
@@ -481,6 +548,20 @@ def main():
                 success = migrator.rollback_version(args.version)
         elif args.command == 'validate':
             success = migrator.validate_database()
+        elif args.command == 'partitions':
+            success = migrator.show_partitions()
+        elif args.command == 'partitions-maintain':
+            success = migrator.maintain_partitions(args.months_ahead)
+        elif args.command in ('partitions-archive', 'partitions-drop'):
+            drop = args.command == 'partitions-drop'
+            if not args.before:
+                print("分区归档/删除命令需要指定 --before")
+                success = False
+            elif drop and not args.yes:
+                print("删除分区数据不可恢复，请加 --yes 确认（或使用partitions-archive归档）")
+                success = False
+            else:
+                success = migrator.archive_partitions(args.before, drop)
         else:
             print(f"未知命令: {args.command}")
             success = False
@@ -0,0 +1,71 @@
+-- =====================================================
+-- 版本: v1.10.0
+-- 描述: 添加最新K线表
+-- 创建时间: 2026-10-17
+-- 作者: AI量化交易系统
+-- 升级说明: 每个标的、周期保存一行最新K线，由批量写入器在写入market_data的同一事务内维护；
+--           最新价格、最后交易日与全市场最新行情按(symbol_id, interval_type)键直接读取，
+--           不再对market_data逐只执行ORDER BY timestamp DESC LIMIT 1。
+--           本脚本从已有行情回填；回填期间有入库任务写入时，升级后执行
+--           python scripts/rebuild_latest_bars.py 重新生成
+-- =====================================================
+
+-- 检查当前版本
+SELECT version FROM schema_versions ORDER BY applied_at DESC LIMIT 1;
+
+-- =====================================================
+-- 1. 创建最新K线表
+-- =====================================================
+CREATE TABLE IF NOT EXISTS `market_data_latest` (
+    `id` INT NOT NULL AUTO_INCREMENT COMMENT '最新K线ID',
+    `symbol_id` INT NOT NULL COMMENT '标的ID',
+    `interval_type` VARCHAR(10) NOT NULL COMMENT '时间间隔',
+    `data_source_id` INT NULL COMMENT '数据来源ID',
+    `timestamp` DATETIME NOT NULL COMMENT '最新一根K线的时间',
+    `open_price` DECIMAL(15,8) NOT NULL COMMENT '开盘价（不复权）',
+    `high_price` DECIMAL(15,8) NOT NULL COMMENT '最高价（不复权）',
+    `low_price` DECIMAL(15,8) NOT NULL COMMENT '最低价（不复权）',
+    `close_price` DECIMAL(15,8) NOT NULL COMMENT '收盘价（不复权）',
+    `volume` DECIMAL(20,8) NOT NULL DEFAULT 0 COMMENT '成交量',
+    `updated_at` DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
+    PRIMARY KEY (`id`),
+    UNIQUE KEY `uk_latest_symbol_interval` (`symbol_id`, `interval_type`),
+    INDEX `idx_latest_interval_symbol` (`interval_type`, `symbol_id`),
+    FOREIGN KEY (`symbol_id`) REFERENCES `symbols`(`id`) ON DELETE CASCADE,
+    FOREIGN KEY (`data_source_id`) REFERENCES `data_sources`(`id`) ON DELETE SET NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='最新K线表';
+
+-- =====================================================
+-- 2. 从已有行情回填（每个标的、周期取时间最大的一行）
+-- =====================================================
+INSERT INTO `market_data_latest`
+    (`symbol_id`, `interval_type`, `data_source_id`, `timestamp`,
+     `open_price`, `high_price`, `low_price`, `close_price`, `volume`)
+SELECT md.`symbol_id`, md.`interval_type`, md.`data_source_id`, md.`timestamp`,
+       md.`open_price`, md.`high_price`, md.`low_price`, md.`close_price`, md.`volume`
+FROM `market_data` md
+JOIN (
+    SELECT `symbol_id`, `interval_type`, MAX(`timestamp`) AS `timestamp`
+    FROM `market_data`
+    GROUP BY `symbol_id`, `interval_type`
+) last ON last.`symbol_id` = md.`symbol_id`
+      AND last.`interval_type` = md.`interval_type`
+      AND last.`timestamp` = md.`timestamp`
+ON DUPLICATE KEY UPDATE
+    `data_source_id` = VALUES(`data_source_id`),
+    `timestamp` = VALUES(`timestamp`),
+    `open_price` = VALUES(`open_price`),
+    `high_price` = VALUES(`high_price`),
+    `low_price` = VALUES(`low_price`),
+    `close_price` = VALUES(`close_price`),
+    `volume` = VALUES(`volume`);
+
+-- =====================================================
+-- 3. 记录版本更新
+-- =====================================================
+INSERT INTO `schema_versions` (`version`, `description`)
+VALUES ('v1.10.0', '添加最新K线表，与行情写入在同一事务内维护');
+
+-- =====================================================
+-- 升级完成
+-- =====================================================
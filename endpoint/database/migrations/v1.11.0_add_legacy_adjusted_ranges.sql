@@ -0,0 +1,50 @@
+-- =====================================================
+-- 版本: v1.11.0
+-- 描述: 记录升级到不复权存储前以前复权价格入库的行情区间
+-- 创建时间: 2026-10-17
+-- 作者: AI量化交易系统
+-- 升级说明: v1.6.0起行情表保存不复权价格，读取时按复权因子复权；v1.6.0之前入库的行情为前复权价格，
+--           再次复权会重复调整。本脚本把v1.6.0应用之前写入的行情按(标的, 周期)登记到legacy_adjusted_ranges，
+--           登记的标的在读取时不再复权（按保存的价格返回），快照入库也不用其收盘价推算除权除息。
+--           升级后执行 python scripts/reingest_legacy_adjusted.py 以不复权价格重新获取这些区间并同步复权因子，
+--           每个区间完成后删除其登记行，标的恢复按复权因子复权；失败的区间保留，重新执行即可继续。
+--           已移出market_data的归档区间不会重新获取，请在重新获取完成后再配置MARKET_DATA_ARCHIVE_DIR；
+--           配置了MMAP_STORE_DIR或列式存储时，完成后重新执行对应的rebuild脚本
+-- =====================================================
+
+-- 检查当前版本
+SELECT version FROM schema_versions ORDER BY applied_at DESC LIMIT 1;
+
+-- =====================================================
+-- 1. 创建前复权行情区间表
+-- =====================================================
+CREATE TABLE IF NOT EXISTS `legacy_adjusted_ranges` (
+    `id` INT NOT NULL AUTO_INCREMENT COMMENT '区间ID',
+    `symbol_id` INT NOT NULL COMMENT '标的ID',
+    `interval_type` VARCHAR(10) NOT NULL COMMENT '时间间隔',
+    `start_date` DATE NOT NULL COMMENT '前复权行情的第一个交易日',
+    `end_date` DATE NOT NULL COMMENT '前复权行情的最后一个交易日',
+    `created_at` DATETIME DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
+    PRIMARY KEY (`id`),
+    UNIQUE KEY `uk_legacy_symbol_interval` (`symbol_id`, `interval_type`),
+    FOREIGN KEY (`symbol_id`) REFERENCES `symbols`(`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='前复权行情区间表（待以不复权价格重新获取）';
+
+-- =====================================================
+-- 2. 登记v1.6.0应用之前写入的行情（全新安装的库没有这类行情，不登记任何区间）
+-- =====================================================
+INSERT IGNORE INTO `legacy_adjusted_ranges` (`symbol_id`, `interval_type`, `start_date`, `end_date`)
+SELECT `symbol_id`, `interval_type`, DATE(MIN(`timestamp`)), DATE(MAX(`timestamp`))
+FROM `market_data`
+WHERE `created_at` < (SELECT `applied_at` FROM `schema_versions` WHERE `version` = 'v1.6.0')
+GROUP BY `symbol_id`, `interval_type`;
+
+-- =====================================================
+-- 3. 记录版本更新
+-- =====================================================
+INSERT INTO `schema_versions` (`version`, `description`)
+VALUES ('v1.11.0', '登记升级前以前复权价格入库的行情区间，重新获取前不再复权');
+
+-- =====================================================
+-- 升级完成
+-- =====================================================
@@ -0,0 +1,61 @@
+-- =====================================================
+-- 版本: v1.4.0
+-- 描述: 为market_data添加(symbol_id, timestamp, interval_type)唯一键
+-- 创建时间: 2026-10-17
+-- 作者: AI量化交易系统
+-- 升级说明: 批量写入使用 INSERT ... ON DUPLICATE KEY UPDATE 实现upsert，
+--           需要唯一键保证同一标的同一时间同一周期只有一条记录
+-- =====================================================
+
+-- 检查当前版本
+SELECT version FROM schema_versions ORDER BY applied_at DESC LIMIT 1;
+
+-- =====================================================
+-- 1. 清理重复数据（保留每组中ID最大的记录）
+-- =====================================================
+DELETE md1 FROM `market_data` md1
+INNER JOIN `market_data` md2
+    ON md1.symbol_id = md2.symbol_id
+   AND md1.timestamp = md2.timestamp
+   AND md1.interval_type = md2.interval_type
+   AND md1.id < md2.id;
+
+-- =====================================================
+-- 2. 添加唯一键
+-- =====================================================
+SET @sql = (SELECT IF(
+    (SELECT COUNT(*) FROM INFORMATION_SCHEMA.STATISTICS
+     WHERE TABLE_SCHEMA = DATABASE()
+       AND TABLE_NAME = 'market_data'
+       AND INDEX_NAME = 'uk_symbol_timestamp_interval') = 0,
+    'ALTER TABLE `market_data` ADD UNIQUE KEY `uk_symbol_timestamp_interval` (`symbol_id`, `timestamp`, `interval_type`)',
+    'SELECT ''Unique key uk_symbol_timestamp_interval already exists in market_data'' AS message'
+));
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- =====================================================
+-- 3. 删除被唯一键覆盖的普通联合索引
+-- =====================================================
+SET @sql = (SELECT IF(
+    (SELECT COUNT(*) FROM INFORMATION_SCHEMA.STATISTICS
+     WHERE TABLE_SCHEMA = DATABASE()
+       AND TABLE_NAME = 'market_data'
+       AND INDEX_NAME = 'idx_symbol_timestamp_interval') > 0,
+    'ALTER TABLE `market_data` DROP INDEX `idx_symbol_timestamp_interval`',
+    'SELECT ''Index idx_symbol_timestamp_interval does not exist'' AS message'
+));
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- =====================================================
+-- 4. 记录版本更新
+-- =====================================================
+INSERT INTO `schema_versions` (`version`, `description`)
+VALUES ('v1.4.0', '为market_data添加(symbol_id, timestamp, interval_type)唯一键，支持批量upsert');
+
+-- =====================================================
+-- 升级完成
+-- =====================================================
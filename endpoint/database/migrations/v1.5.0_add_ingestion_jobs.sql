@@ -0,0 +1,67 @@
+-- =====================================================
+-- 版本: v1.5.0
+-- 描述: 添加行情数据入库任务表与工作项检查点表
+-- 创建时间: 2026-10-17
+-- 作者: AI量化交易系统
+-- 升级说明: 获取最新/历史数据与补齐接口改为创建后台任务并立即返回任务ID，
+--           每个工作项记录已写入的最后交易日，进程重启后从检查点恢复
+-- =====================================================
+
+-- 检查当前版本
+SELECT version FROM schema_versions ORDER BY applied_at DESC LIMIT 1;
+
+-- =====================================================
+-- 1. 创建入库任务表
+-- =====================================================
+CREATE TABLE IF NOT EXISTS `ingestion_jobs` (
+    `id` INT NOT NULL AUTO_INCREMENT COMMENT '任务ID',
+    `job_type` VARCHAR(20) NOT NULL COMMENT '任务类型(latest/historical/backfill)',
+    `status` VARCHAR(20) NOT NULL DEFAULT 'pending' COMMENT '状态(pending/running/completed/failed/cancelled)',
+    `data_source` VARCHAR(50) NOT NULL DEFAULT 'akshare' COMMENT '数据源名称',
+    `params` TEXT COMMENT 'JSON格式的任务参数',
+    `total_items` INT NOT NULL DEFAULT 0 COMMENT '工作项总数',
+    `created_by` INT NULL COMMENT '创建用户ID',
+    `error` TEXT COMMENT '任务级错误信息',
+    `started_at` DATETIME NULL COMMENT '首次开始时间',
+    `resumed_at` DATETIME NULL COMMENT '最近一次开始/恢复运行的时间',
+    `resume_done_items` INT NOT NULL DEFAULT 0 COMMENT '最近一次运行开始时已完成的工作项数',
+    `resume_rows_written` INT NOT NULL DEFAULT 0 COMMENT '最近一次运行开始时已写入的行数',
+    `heartbeat_at` DATETIME NULL COMMENT '最近一次检查点时间',
+    `finished_at` DATETIME NULL COMMENT '结束时间',
+    `created_at` DATETIME DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
+    `updated_at` DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
+    PRIMARY KEY (`id`),
+    INDEX `idx_ingestion_jobs_status` (`status`),
+    INDEX `idx_ingestion_jobs_created_at` (`created_at`),
+    FOREIGN KEY (`created_by`) REFERENCES `users`(`id`) ON DELETE SET NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='行情数据入库任务表';
+
+-- =====================================================
+-- 2. 创建入库任务工作项表
+-- =====================================================
+CREATE TABLE IF NOT EXISTS `ingestion_job_items` (
+    `id` INT NOT NULL AUTO_INCREMENT COMMENT '工作项ID',
+    `job_id` INT NOT NULL COMMENT '任务ID',
+    `symbol` VARCHAR(20) NOT NULL COMMENT '股票代码',
+    `start_date` DATE NOT NULL COMMENT '开始日期',
+    `end_date` DATE NOT NULL COMMENT '结束日期',
+    `status` VARCHAR(20) NOT NULL DEFAULT 'pending' COMMENT '状态(pending/done/failed)',
+    `last_timestamp` DATETIME NULL COMMENT '已完成写入的最后交易日（检查点）',
+    `rows_written` INT NOT NULL DEFAULT 0 COMMENT '已写入行数',
+    `attempts` INT NOT NULL DEFAULT 0 COMMENT '执行次数',
+    `error` TEXT COMMENT '错误信息',
+    `updated_at` DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
+    PRIMARY KEY (`id`),
+    INDEX `idx_ingestion_job_items_job_status` (`job_id`, `status`),
+    FOREIGN KEY (`job_id`) REFERENCES `ingestion_jobs`(`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='行情数据入库任务工作项表';
+
+-- =====================================================
+-- 3. 记录版本更新
+-- =====================================================
+INSERT INTO `schema_versions` (`version`, `description`)
+VALUES ('v1.5.0', '添加行情数据入库任务表与工作项检查点表，支持后台任务与断点恢复');
+
+-- =====================================================
+-- 升级完成
+-- =====================================================
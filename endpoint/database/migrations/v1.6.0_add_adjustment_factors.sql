@@ -0,0 +1,39 @@
+-- =====================================================
+-- 版本: v1.6.0
+-- 描述: 添加复权因子表，行情表改为保存不复权价格
+-- 创建时间: 2026-10-17
+-- 作者: AI量化交易系统
+-- 升级说明: 数据源默认获取不复权价格，复权在读取时按后复权累计因子计算；
+--           除权除息只需新增一行因子，不再需要force_update重新获取全部历史。
+--           升级前入库的数据为前复权价格，升级后需同步复权因子，
+--           并以force_update重新获取历史数据一次（POST /api/market-data/fetch/historical）
+-- =====================================================
+
+-- 检查当前版本
+SELECT version FROM schema_versions ORDER BY applied_at DESC LIMIT 1;
+
+-- =====================================================
+-- 1. 创建复权因子表
+-- =====================================================
+CREATE TABLE IF NOT EXISTS `adjustment_factors` (
+    `id` INT NOT NULL AUTO_INCREMENT COMMENT '复权因子ID',
+    `symbol_id` INT NOT NULL COMMENT '标的ID',
+    `ex_date` DATE NOT NULL COMMENT '除权除息日（自该日起生效）',
+    `factor` DOUBLE NOT NULL COMMENT '后复权累计因子（后复权价 = 不复权价 × 因子）',
+    `source` VARCHAR(20) NOT NULL DEFAULT 'data_source' COMMENT '来源(data_source: 数据源同步, snapshot: 快照昨收推算)',
+    `created_at` DATETIME DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
+    `updated_at` DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
+    PRIMARY KEY (`id`),
+    UNIQUE KEY `uk_adjustment_symbol_ex_date` (`symbol_id`, `ex_date`),
+    FOREIGN KEY (`symbol_id`) REFERENCES `symbols`(`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='复权因子表';
+
+-- =====================================================
+-- 2. 记录版本更新
+-- =====================================================
+INSERT INTO `schema_versions` (`version`, `description`)
+VALUES ('v1.6.0', '添加复权因子表，行情数据保存不复权价格并在读取时复权');
+
+-- =====================================================
+-- 升级完成
+-- =====================================================
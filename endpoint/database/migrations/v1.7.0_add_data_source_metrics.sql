@@ -0,0 +1,51 @@
+-- =====================================================
+-- 版本: v1.7.0
+-- 描述: 添加数据源性能指标表
+-- 创建时间: 2026-10-17
+-- 作者: AI量化交易系统
+-- 升级说明: 数据源请求与入库管道各阶段的耗时直方图、行数、字节数、重试次数与限流等待时间
+--           在内存中累计，按METRICS_FLUSH_INTERVAL秒为窗口写入本表；
+--           data_source_performance视图统计的是数据量，本表记录的是请求性能
+-- =====================================================
+
+-- 检查当前版本
+SELECT version FROM schema_versions ORDER BY applied_at DESC LIMIT 1;
+
+-- =====================================================
+-- 1. 创建数据源性能指标表
+-- =====================================================
+CREATE TABLE IF NOT EXISTS `data_source_metrics` (
+    `id` INT NOT NULL AUTO_INCREMENT COMMENT '指标ID',
+    `data_source` VARCHAR(50) NOT NULL COMMENT '数据源名称（入库管道阶段为pipeline）',
+    `operation` VARCHAR(50) NOT NULL COMMENT '操作名称',
+    `window_start` DATETIME NOT NULL COMMENT '窗口开始时间',
+    `window_end` DATETIME NOT NULL COMMENT '窗口结束时间',
+    `requests` INT NOT NULL DEFAULT 0 COMMENT '请求数',
+    `errors` INT NOT NULL DEFAULT 0 COMMENT '重试后仍失败的请求数',
+    `retries` INT NOT NULL DEFAULT 0 COMMENT '重试次数',
+    `rows` BIGINT NOT NULL DEFAULT 0 COMMENT '返回或写入的行数',
+    `bytes` BIGINT NOT NULL DEFAULT 0 COMMENT '返回数据的内存大小（字节）',
+    `throttled` INT NOT NULL DEFAULT 0 COMMENT '被限流器阻塞的请求数',
+    `latency_sum_ms` DOUBLE NOT NULL DEFAULT 0 COMMENT '耗时合计（毫秒，不含限流等待）',
+    `latency_max_ms` DOUBLE NOT NULL DEFAULT 0 COMMENT '最大耗时（毫秒）',
+    `latency_p50_ms` DOUBLE NULL COMMENT '耗时P50（毫秒）',
+    `latency_p95_ms` DOUBLE NULL COMMENT '耗时P95（毫秒）',
+    `latency_p99_ms` DOUBLE NULL COMMENT '耗时P99（毫秒）',
+    `latency_buckets` TEXT COMMENT 'JSON格式的耗时直方图桶计数',
+    `limiter_wait_sum_ms` DOUBLE NOT NULL DEFAULT 0 COMMENT '限流等待合计（毫秒）',
+    `limiter_wait_buckets` TEXT COMMENT 'JSON格式的限流等待直方图桶计数',
+    `created_at` DATETIME DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
+    PRIMARY KEY (`id`),
+    INDEX `idx_data_source_metrics_source_window` (`data_source`, `window_end`),
+    INDEX `idx_data_source_metrics_window` (`window_end`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='数据源性能指标表';
+
+-- =====================================================
+-- 2. 记录版本更新
+-- =====================================================
+INSERT INTO `schema_versions` (`version`, `description`)
+VALUES ('v1.7.0', '添加数据源性能指标表，记录请求耗时直方图、重试与限流等待');
+
+-- =====================================================
+-- 升级完成
+-- =====================================================
@@ -0,0 +1,124 @@
+-- =====================================================
+-- 版本: v1.8.0
+-- 描述: market_data按时间范围分区
+-- 创建时间: 2026-10-17
+-- 作者: AI量化交易系统
+-- 升级说明: market_data改为按timestamp的RANGE COLUMNS分区：2010年以前一个分区，2010-2025年按年分区，
+--           2026年起按月分区，p_future(MAXVALUE)接收尚未建分区的数据。带时间条件的查询只扫描相关分区。
+--           MySQL分区表要求所有唯一键包含分区列、且不支持外键，因此：
+--             1. 删除market_data上的外键（标的、数据来源的关联由应用保证）
+--             2. 主键由(id)改为(id, timestamp)
+--             3. 删除被唯一键uk_symbol_timestamp_interval覆盖的idx_symbol_id与低选择性的idx_interval_type
+--           分区转换会重建整张表，大表请在维护窗口执行或使用在线DDL工具。
+--           之后的月度分区维护：python database/migrate.py partitions-maintain（建议每月定时执行）
+--           历史分区归档/删除：python database/migrate.py partitions-archive --before 2015-01-01
+-- =====================================================
+
+-- 检查当前版本
+SELECT version FROM schema_versions ORDER BY applied_at DESC LIMIT 1;
+
+-- =====================================================
+-- 1. 删除外键（分区表不支持外键）
+-- =====================================================
+SET @fk = (SELECT CONSTRAINT_NAME FROM INFORMATION_SCHEMA.REFERENTIAL_CONSTRAINTS
+           WHERE CONSTRAINT_SCHEMA = DATABASE()
+             AND TABLE_NAME = 'market_data'
+             AND REFERENCED_TABLE_NAME = 'data_sources'
+           LIMIT 1);
+SET @sql = IF(@fk IS NULL,
+    'SELECT ''No foreign key to data_sources on market_data'' AS message',
+    CONCAT('ALTER TABLE `market_data` DROP FOREIGN KEY `', @fk, '`'));
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+SET @fk = (SELECT CONSTRAINT_NAME FROM INFORMATION_SCHEMA.REFERENTIAL_CONSTRAINTS
+           WHERE CONSTRAINT_SCHEMA = DATABASE()
+             AND TABLE_NAME = 'market_data'
+             AND REFERENCED_TABLE_NAME = 'symbols'
+           LIMIT 1);
+SET @sql = IF(@fk IS NULL,
+    'SELECT ''No foreign key to symbols on market_data'' AS message',
+    CONCAT('ALTER TABLE `market_data` DROP FOREIGN KEY `', @fk, '`'));
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- =====================================================
+-- 2. 删除冗余的单列索引
+-- =====================================================
+SET @sql = (SELECT IF(
+    (SELECT COUNT(*) FROM INFORMATION_SCHEMA.STATISTICS
+     WHERE TABLE_SCHEMA = DATABASE()
+       AND TABLE_NAME = 'market_data'
+       AND INDEX_NAME = 'idx_symbol_id') > 0,
+    'ALTER TABLE `market_data` DROP INDEX `idx_symbol_id`',
+    'SELECT ''Index idx_symbol_id does not exist'' AS message'
+));
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+SET @sql = (SELECT IF(
+    (SELECT COUNT(*) FROM INFORMATION_SCHEMA.STATISTICS
+     WHERE TABLE_SCHEMA = DATABASE()
+       AND TABLE_NAME = 'market_data'
+       AND INDEX_NAME = 'idx_interval_type') > 0,
+    'ALTER TABLE `market_data` DROP INDEX `idx_interval_type`',
+    'SELECT ''Index idx_interval_type does not exist'' AS message'
+));
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- =====================================================
+-- 3. 主键包含分区列
+-- =====================================================
+ALTER TABLE `market_data` DROP PRIMARY KEY, ADD PRIMARY KEY (`id`, `timestamp`);
+
+-- =====================================================
+-- 4. 按时间范围分区
+-- =====================================================
+ALTER TABLE `market_data`
+PARTITION BY RANGE COLUMNS(`timestamp`) (
+    PARTITION `p_before_2010` VALUES LESS THAN ('2010-01-01'),
+    PARTITION `p2010` VALUES LESS THAN ('2011-01-01'),
+    PARTITION `p2011` VALUES LESS THAN ('2012-01-01'),
+    PARTITION `p2012` VALUES LESS THAN ('2013-01-01'),
+    PARTITION `p2013` VALUES LESS THAN ('2014-01-01'),
+    PARTITION `p2014` VALUES LESS THAN ('2015-01-01'),
+    PARTITION `p2015` VALUES LESS THAN ('2016-01-01'),
+    PARTITION `p2016` VALUES LESS THAN ('2017-01-01'),
+    PARTITION `p2017` VALUES LESS THAN ('2018-01-01'),
+    PARTITION `p2018` VALUES LESS THAN ('2019-01-01'),
+    PARTITION `p2019` VALUES LESS THAN ('2020-01-01'),
+    PARTITION `p2020` VALUES LESS THAN ('2021-01-01'),
+    PARTITION `p2021` VALUES LESS THAN ('2022-01-01'),
+    PARTITION `p2022` VALUES LESS THAN ('2023-01-01'),
+    PARTITION `p2023` VALUES LESS THAN ('2024-01-01'),
+    PARTITION `p2024` VALUES LESS THAN ('2025-01-01'),
+    PARTITION `p2025` VALUES LESS THAN ('2026-01-01'),
+    PARTITION `p202601` VALUES LESS THAN ('2026-02-01'),
+    PARTITION `p202602` VALUES LESS THAN ('2026-03-01'),
+    PARTITION `p202603` VALUES LESS THAN ('2026-04-01'),
+    PARTITION `p202604` VALUES LESS THAN ('2026-05-01'),
+    PARTITION `p202605` VALUES LESS THAN ('2026-06-01'),
+    PARTITION `p202606` VALUES LESS THAN ('2026-07-01'),
+    PARTITION `p202607` VALUES LESS THAN ('2026-08-01'),
+    PARTITION `p202608` VALUES LESS THAN ('2026-09-01'),
+    PARTITION `p202609` VALUES LESS THAN ('2026-10-01'),
+    PARTITION `p202610` VALUES LESS THAN ('2026-11-01'),
+    PARTITION `p202611` VALUES LESS THAN ('2026-12-01'),
+    PARTITION `p202612` VALUES LESS THAN ('2027-01-01'),
+    PARTITION `p_future` VALUES LESS THAN (MAXVALUE)
+);
+
+-- =====================================================
+-- 5. 记录版本更新
+-- =====================================================
+INSERT INTO `schema_versions` (`version`, `description`)
+VALUES ('v1.8.0', 'market_data按timestamp进行RANGE COLUMNS分区（历史按年、2026年起按月）');
+
+-- =====================================================
+-- 升级完成
+-- =====================================================
@@ -0,0 +1,44 @@
+-- =====================================================
+-- 版本: v1.9.0
+-- 描述: 添加周线/月线汇总表
+-- 创建时间: 2026-10-17
+-- 作者: AI量化交易系统
+-- 升级说明: 日线写入后只重新汇总受影响的周、月时间桶并写入本表，读取1w/1M周期时直接查询本表；
+--           周期标识1M与分钟周期1m在默认排序规则下相同，因此不写入market_data。
+--           升级后执行 python scripts/rebuild_bar_aggregates.py 从已有日线生成全部汇总结果
+-- =====================================================
+
+-- 检查当前版本
+SELECT version FROM schema_versions ORDER BY applied_at DESC LIMIT 1;
+
+-- =====================================================
+-- 1. 创建周线/月线汇总表
+-- =====================================================
+CREATE TABLE IF NOT EXISTS `market_data_aggregates` (
+    `id` INT NOT NULL AUTO_INCREMENT COMMENT '汇总K线ID',
+    `symbol_id` INT NOT NULL COMMENT '标的ID',
+    `interval_type` VARCHAR(10) NOT NULL COMMENT '汇总周期(1w: 周线, 1M: 月线)',
+    `timestamp` DATETIME NOT NULL COMMENT '时间桶开始（周一/每月1日零点）',
+    `open_price` DECIMAL(15,8) NOT NULL COMMENT '开盘价（不复权）',
+    `high_price` DECIMAL(15,8) NOT NULL COMMENT '最高价（不复权）',
+    `low_price` DECIMAL(15,8) NOT NULL COMMENT '最低价（不复权）',
+    `close_price` DECIMAL(15,8) NOT NULL COMMENT '收盘价（不复权）',
+    `volume` DECIMAL(20,8) NOT NULL DEFAULT 0 COMMENT '成交量',
+    `bar_count` INT NOT NULL DEFAULT 0 COMMENT '汇总的日线条数',
+    `first_timestamp` DATETIME NOT NULL COMMENT '桶内第一条日线时间',
+    `last_timestamp` DATETIME NOT NULL COMMENT '桶内最后一条日线时间',
+    `updated_at` DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
+    PRIMARY KEY (`id`),
+    UNIQUE KEY `uk_aggregate_symbol_interval_timestamp` (`symbol_id`, `interval_type`, `timestamp`),
+    FOREIGN KEY (`symbol_id`) REFERENCES `symbols`(`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='周线/月线汇总表';
+
+-- =====================================================
+-- 2. 记录版本更新
+-- =====================================================
+INSERT INTO `schema_versions` (`version`, `description`)
+VALUES ('v1.9.0', '添加周线/月线汇总表，由日线增量维护');
+
+-- =====================================================
+-- 升级完成
+-- =====================================================
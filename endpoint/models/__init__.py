@@ -8,11 +8,13 @@ from .user import User
 from .portfolio import Portfolio, Position
 from .strategy import Strategy, StrategyExecution
 from .trade import Trade, Order
-from .market_data import MarketData, Symbol
+from .market_data import MarketData, Symbol, AdjustmentFactor, LegacyAdjustedRange, AggregateBar, LatestBar
 from .risk_management import RiskRule, RiskAlert
-from .data_source import DataSource
+from .data_source import DataSource, DataSourceMetric
+from .ingestion_job import IngestionJob, IngestionJobItem
 
 __all__ = [
     'db', 'User', 'Portfolio', 'Position', 'Strategy', 'StrategyExecution',
-    'Trade', 'Order', 'MarketData', 'Symbol', 'RiskRule', 'RiskAlert', 'DataSource'
+    'Trade', 'Order', 'MarketData', 'Symbol', 'AdjustmentFactor', 'LegacyAdjustedRange', 'AggregateBar', 'LatestBar', 'RiskRule', 'RiskAlert', 'DataSource',
+    'DataSourceMetric', 'IngestionJob', 'IngestionJobItem'
 ]
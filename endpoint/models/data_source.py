@@ -54,3 +54,59 @@ class DataSource(db.Model):
     
     def __repr__(self):
         return f'<DataSource {self.name}>'
+
+
+class DataSourceMetric(db.Model):
+    """数据源性能指标窗口（每个刷新窗口每个数据源/操作一行）"""
+    __tablename__ = 'data_source_metrics'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    data_source = db.Column(db.String(50), nullable=False)  # 数据源名称，入库管道阶段为pipeline
+    operation = db.Column(db.String(50), nullable=False)  # 操作：get_historical_data、write等
+    window_start = db.Column(db.DateTime, nullable=False)
+    window_end = db.Column(db.DateTime, nullable=False)
+    requests = db.Column(db.Integer, nullable=False, default=0)
+    errors = db.Column(db.Integer, nullable=False, default=0)
+    retries = db.Column(db.Integer, nullable=False, default=0)
+    rows = db.Column(db.BigInteger, nullable=False, default=0)
+    bytes = db.Column(db.BigInteger, nullable=False, default=0)
+    throttled = db.Column(db.Integer, nullable=False, default=0)  # 被限流器阻塞的请求数
+    latency_sum_ms = db.Column(db.Float, nullable=False, default=0)
+    latency_max_ms = db.Column(db.Float, nullable=False, default=0)
+    latency_p50_ms = db.Column(db.Float)
+    latency_p95_ms = db.Column(db.Float)
+    latency_p99_ms = db.Column(db.Float)
+    latency_buckets = db.Column(db.Text)  # JSON格式的耗时直方图桶计数
+    limiter_wait_sum_ms = db.Column(db.Float, nullable=False, default=0)
+    limiter_wait_buckets = db.Column(db.Text)  # JSON格式的限流等待直方图桶计数
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('idx_data_source_metrics_source_window', 'data_source', 'window_end'),
+        db.Index('idx_data_source_metrics_window', 'window_end'),
+    )
+    
+    def to_dict(self):
+        """转换为字典"""
+        return {
+            'id': self.id,
+            'data_source': self.data_source,
+            'operation': self.operation,
+            'window_start': self.window_start.isoformat(),
+            'window_end': self.window_end.isoformat(),
+            'requests': self.requests,
+            'errors': self.errors,
+            'retries': self.retries,
+            'rows': self.rows,
+            'bytes': self.bytes,
+            'throttled': self.throttled,
+            'latency_avg_ms': self.latency_sum_ms / self.requests if self.requests else None,
+            'latency_p50_ms': self.latency_p50_ms,
+            'latency_p95_ms': self.latency_p95_ms,
+            'latency_p99_ms': self.latency_p99_ms,
+            'latency_max_ms': self.latency_max_ms,
+            'limiter_wait_sum_ms': self.limiter_wait_sum_ms
+        }
+    
+    def __repr__(self):
+        return f'<DataSourceMetric {self.data_source}.{self.operation} {self.window_end}>'
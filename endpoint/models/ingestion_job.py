@@ -0,0 +1,138 @@
+from . import db
+from datetime import datetime
+
+class IngestionJob(db.Model):
+    """行情数据入库任务模型"""
+    __tablename__ = 'ingestion_jobs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    job_type = db.Column(db.String(20), nullable=False)  # latest, historical, backfill, intraday, adjustment_factors
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, running, completed, failed, cancelled
+    data_source = db.Column(db.String(50), nullable=False, default='akshare')  # 数据源名称
+    params = db.Column(db.Text)  # JSON格式的任务参数
+    total_items = db.Column(db.Integer, nullable=False, default=0)  # 工作项总数
+    created_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)  # 创建用户
+    error = db.Column(db.Text)  # 任务级错误信息
+    started_at = db.Column(db.DateTime)  # 首次开始时间
+    resumed_at = db.Column(db.DateTime)  # 最近一次开始/恢复运行的时间
+    resume_done_items = db.Column(db.Integer, nullable=False, default=0)  # 最近一次运行开始时已完成的工作项数
+    resume_rows_written = db.Column(db.Integer, nullable=False, default=0)  # 最近一次运行开始时已写入的行数
+    heartbeat_at = db.Column(db.DateTime)  # 最近一次检查点时间
+    finished_at = db.Column(db.DateTime)  # 结束时间
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # 关联关系
+    items = db.relationship('IngestionJobItem', backref='job', lazy='dynamic', cascade='all, delete-orphan')
+
+    # 索引
+    __table_args__ = (
+        db.Index('idx_ingestion_jobs_status', 'status'),
+        db.Index('idx_ingestion_jobs_created_at', 'created_at'),
+    )
+
+    def get_params(self):
+        """获取任务参数"""
+        import json
+        if self.params:
+            return json.loads(self.params)
+        return {}
+
+    def set_params(self, params_dict):
+        """设置任务参数"""
+        import json
+        self.params = json.dumps(params_dict, default=str)
+
+    def to_dict(self, progress=None):
+        """
+        转换为字典
+
+        Args:
+            progress: 工作项统计 {'done', 'failed', 'pending', 'rows_written'}，
+                      提供时计算进度、吞吐量与预计剩余时间
+        """
+        result = {
+            'id': self.id,
+            'job_type': self.job_type,
+            'status': self.status,
+            'data_source': self.data_source,
+            'params': self.get_params(),
+            'total_items': self.total_items,
+            'created_by': self.created_by,
+            'error': self.error,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'resumed_at': self.resumed_at.isoformat() if self.resumed_at else None,
+            'heartbeat_at': self.heartbeat_at.isoformat() if self.heartbeat_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+        if progress is not None:
+            finished = progress['done'] + progress['failed']
+
+            # 吞吐量按最近一次运行计算，避免包含停机时间
+            end_time = self.finished_at or datetime.utcnow()
+            elapsed = (end_time - self.resumed_at).total_seconds() if self.resumed_at else 0
+            done_since_resume = max(0, progress['done'] - (self.resume_done_items or 0))
+            rows_since_resume = max(0, progress['rows_written'] - (self.resume_rows_written or 0))
+            items_per_second = done_since_resume / elapsed if elapsed > 0 else 0
+            rows_per_second = rows_since_resume / elapsed if elapsed > 0 else 0
+
+            result.update({
+                'done_items': progress['done'],
+                'failed_items': progress['failed'],
+                'pending_items': progress['pending'],
+                'rows_written': progress['rows_written'],
+                'progress': round(finished / self.total_items * 100, 2) if self.total_items else 100.0,
+                'elapsed_seconds': round(elapsed, 1),
+                'symbols_per_second': round(items_per_second, 3),
+                'rows_per_second': round(rows_per_second, 1),
+                'eta_seconds': round(progress['pending'] / items_per_second, 1)
+                if items_per_second > 0 and self.status == 'running' else None
+            })
+
+        return result
+
+    def __repr__(self):
+        return f'<IngestionJob {self.id} {self.job_type} {self.status}>'
+
+class IngestionJobItem(db.Model):
+    """入库任务工作项（每只股票一个区间的检查点）"""
+    __tablename__ = 'ingestion_job_items'
+
+    id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.Integer, db.ForeignKey('ingestion_jobs.id'), nullable=False)
+    symbol = db.Column(db.String(20), nullable=False)
+    start_date = db.Column(db.Date, nullable=False)
+    end_date = db.Column(db.Date, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, done, failed
+    last_timestamp = db.Column(db.DateTime)  # 已完成写入的最后交易日（检查点）
+    rows_written = db.Column(db.Integer, nullable=False, default=0)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # 索引
+    __table_args__ = (
+        db.Index('idx_ingestion_job_items_job_status', 'job_id', 'status'),
+    )
+
+    def to_dict(self):
+        """转换为字典"""
+        return {
+            'id': self.id,
+            'job_id': self.job_id,
+            'symbol': self.symbol,
+            'start_date': self.start_date.isoformat(),
+            'end_date': self.end_date.isoformat(),
+            'status': self.status,
+            'last_timestamp': self.last_timestamp.isoformat() if self.last_timestamp else None,
+            'rows_written': self.rows_written,
+            'attempts': self.attempts,
+            'error': self.error,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+    def __repr__(self):
+        return f'<IngestionJobItem {self.job_id} {self.symbol} {self.status}>'
@@ -57,12 +57,11 @@ class MarketData(db.Model):
     symbol = db.relationship('Symbol', backref='market_data', lazy='select')
     data_source = db.relationship('DataSource', backref='market_data', lazy='select')
     
-    # 索引
+    # 索引（MySQL上按timestamp分区，见迁移v1.8.0：主键为(id, timestamp)且不建外键约束；
+    # 按标的查询由唯一键的symbol_id前缀覆盖）
     __table_args__ = (
-        db.Index('idx_symbol_timestamp_interval', 'symbol_id', 'timestamp', 'interval_type'),
-        db.Index('idx_symbol_id', 'symbol_id'),
+        db.UniqueConstraint('symbol_id', 'timestamp', 'interval_type', name='uk_symbol_timestamp_interval'),
         db.Index('idx_timestamp', 'timestamp'),
-        db.Index('idx_interval_type', 'interval_type'),
     )
     
     def get_price_change(self):
@@ -104,3 +103,147 @@ class MarketData(db.Model):
     def __repr__(self):
         symbol_code = self.symbol.symbol if self.symbol else f'symbol_id:{self.symbol_id}'
         return f'<MarketData {symbol_code} {self.timestamp}>'
+
+class AdjustmentFactor(db.Model):
+    """复权因子模型（后复权累计因子，按除权除息日分段生效）"""
+    __tablename__ = 'adjustment_factors'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    symbol_id = db.Column(db.Integer, db.ForeignKey('symbols.id'), nullable=False)  # 标的ID外键
+    ex_date = db.Column(db.Date, nullable=False)  # 除权除息日（自该日起生效）
+    factor = db.Column(db.Float, nullable=False)  # 后复权累计因子：后复权价 = 不复权价 × 因子
+    source = db.Column(db.String(20), nullable=False, default='data_source')  # data_source: 数据源同步, snapshot: 快照昨收推算
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # 关联关系
+    symbol = db.relationship('Symbol', backref='adjustment_factors', lazy='select')
+    
+    # 索引
+    __table_args__ = (
+        db.UniqueConstraint('symbol_id', 'ex_date', name='uk_adjustment_symbol_ex_date'),
+    )
+    
+    def to_dict(self):
+        """转换为字典"""
+        return {
+            'id': self.id,
+            'symbol_id': self.symbol_id,
+            'ex_date': self.ex_date.isoformat(),
+            'factor': self.factor,
+            'source': self.source,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+    
+    def __repr__(self):
+        return f'<AdjustmentFactor symbol_id:{self.symbol_id} {self.ex_date} {self.factor}>'
+
+class LegacyAdjustedRange(db.Model):
+    """升级到不复权存储（v1.6.0）前以前复权价格入库、尚未重新获取的行情区间"""
+    __tablename__ = 'legacy_adjusted_ranges'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    symbol_id = db.Column(db.Integer, db.ForeignKey('symbols.id'), nullable=False)  # 标的ID外键
+    interval_type = db.Column(db.String(10), nullable=False)  # 时间间隔
+    start_date = db.Column(db.Date, nullable=False)  # 前复权行情的第一个交易日
+    end_date = db.Column(db.Date, nullable=False)  # 前复权行情的最后一个交易日
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # 索引
+    __table_args__ = (
+        db.UniqueConstraint('symbol_id', 'interval_type', name='uk_legacy_symbol_interval'),
+    )
+    
+    def __repr__(self):
+        return f'<LegacyAdjustedRange symbol_id:{self.symbol_id} {self.interval_type} {self.start_date}~{self.end_date}>'
+
+class AggregateBar(db.Model):
+    """周线/月线汇总模型（由日线增量维护，保存不复权价格）"""
+    __tablename__ = 'market_data_aggregates'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    symbol_id = db.Column(db.Integer, db.ForeignKey('symbols.id'), nullable=False)  # 标的ID外键
+    interval_type = db.Column(db.String(10), nullable=False)  # 1w: 周线, 1M: 月线
+    timestamp = db.Column(db.DateTime, nullable=False)  # 时间桶开始（周一/每月1日零点）
+    open_price = db.Column(db.Numeric(15, 8), nullable=False)
+    high_price = db.Column(db.Numeric(15, 8), nullable=False)
+    low_price = db.Column(db.Numeric(15, 8), nullable=False)
+    close_price = db.Column(db.Numeric(15, 8), nullable=False)
+    volume = db.Column(db.Numeric(20, 8), nullable=False, default=0)
+    bar_count = db.Column(db.Integer, nullable=False, default=0)  # 汇总的日线条数
+    first_timestamp = db.Column(db.DateTime, nullable=False)  # 桶内第一条日线
+    last_timestamp = db.Column(db.DateTime, nullable=False)  # 桶内最后一条日线（当前未结束的桶随新日线更新）
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # 关联关系
+    symbol = db.relationship('Symbol', backref='aggregate_bars', lazy='select')
+    
+    # 索引
+    __table_args__ = (
+        db.UniqueConstraint('symbol_id', 'interval_type', 'timestamp', name='uk_aggregate_symbol_interval_timestamp'),
+    )
+    
+    def to_dict(self):
+        """转换为字典"""
+        return {
+            'id': self.id,
+            'symbol_id': self.symbol_id,
+            'interval_type': self.interval_type,
+            'timestamp': self.timestamp.isoformat(),
+            'open_price': float(self.open_price),
+            'high_price': float(self.high_price),
+            'low_price': float(self.low_price),
+            'close_price': float(self.close_price),
+            'volume': float(self.volume),
+            'bar_count': self.bar_count,
+            'first_timestamp': self.first_timestamp.isoformat(),
+            'last_timestamp': self.last_timestamp.isoformat(),
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+    
+    def __repr__(self):
+        return f'<AggregateBar symbol_id:{self.symbol_id} {self.interval_type} {self.timestamp}>'
+
+class LatestBar(db.Model):
+    """最新K线模型（每个标的、周期一行，与行情表在同一事务内维护）"""
+    __tablename__ = 'market_data_latest'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    symbol_id = db.Column(db.Integer, db.ForeignKey('symbols.id'), nullable=False)  # 标的ID外键
+    interval_type = db.Column(db.String(10), nullable=False)  # 时间间隔
+    data_source_id = db.Column(db.Integer, db.ForeignKey('data_sources.id'), nullable=True)  # 数据来源ID
+    timestamp = db.Column(db.DateTime, nullable=False)  # 最新一根K线的时间
+    open_price = db.Column(db.Numeric(15, 8), nullable=False)
+    high_price = db.Column(db.Numeric(15, 8), nullable=False)
+    low_price = db.Column(db.Numeric(15, 8), nullable=False)
+    close_price = db.Column(db.Numeric(15, 8), nullable=False)
+    volume = db.Column(db.Numeric(20, 8), nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # 关联关系
+    symbol = db.relationship('Symbol', backref='latest_bars', lazy='select')
+    
+    # 索引（按周期批量读取全市场最新K线时使用idx_latest_interval_symbol）
+    __table_args__ = (
+        db.UniqueConstraint('symbol_id', 'interval_type', name='uk_latest_symbol_interval'),
+        db.Index('idx_latest_interval_symbol', 'interval_type', 'symbol_id'),
+    )
+    
+    def to_dict(self):
+        """转换为字典"""
+        return {
+            'id': self.id,
+            'symbol_id': self.symbol_id,
+            'interval_type': self.interval_type,
+            'data_source_id': self.data_source_id,
+            'timestamp': self.timestamp.isoformat(),
+            'open_price': float(self.open_price),
+            'high_price': float(self.high_price),
+            'low_price': float(self.low_price),
+            'close_price': float(self.close_price),
+            'volume': float(self.volume),
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+    
+    def __repr__(self):
+        return f'<LatestBar symbol_id:{self.symbol_id} {self.interval_type} {self.timestamp}>'
@@ -2,6 +2,13 @@ from . import db
 from datetime import datetime
 from decimal import Decimal
 
+
+def _to_decimal(value):
+    """转换为Decimal（float经字符串转换，避免二进制误差）"""
+    if isinstance(value, Decimal):
+        return value
+    return Decimal(str(value or 0))
+
 class Portfolio(db.Model):
     """投资组合模型"""
     __tablename__ = 'portfolios'
@@ -22,9 +29,12 @@ class Portfolio(db.Model):
     trades = db.relationship('Trade', backref='portfolio', lazy='dynamic')
     
     def get_total_value(self):
-        """获取总价值"""
-        positions_value = sum(pos.get_value() for pos in self.positions)
-        return float(self.cash_balance) + positions_value
+        """获取总价值（持仓市值在数据库中按浮点汇总，不加载持仓对象）"""
+        positions_value = db.session.execute(
+            db.select(db.func.sum(db.cast(Position.quantity, db.Double) * db.cast(Position.current_price, db.Double)))
+            .where(Position.portfolio_id == self.id)
+        ).scalar()
+        return float(self.cash_balance) + float(positions_value or 0)
     
     def get_total_pnl(self):
         """获取总盈亏"""
@@ -87,24 +97,29 @@ class Position(db.Model):
         self.unrealized_pnl = self.get_unrealized_pnl()
     
     def add_quantity(self, quantity, price):
-        """增加持仓数量"""
-        if self.quantity == 0:
+        """增加持仓数量（按Decimal计算，与Numeric字段类型一致，后续与Decimal运算不会混用float）"""
+        quantity = _to_decimal(quantity)
+        price = _to_decimal(price)
+        current_quantity = _to_decimal(self.quantity)
+        if current_quantity == 0:
             self.average_price = price
             self.quantity = quantity
         else:
             # 计算新的平均价格
-            total_cost = float(self.quantity) * float(self.average_price) + float(quantity) * float(price)
-            total_quantity = float(self.quantity) + float(quantity)
+            total_cost = current_quantity * _to_decimal(self.average_price) + quantity * price
+            total_quantity = current_quantity + quantity
             self.average_price = total_cost / total_quantity
             self.quantity = total_quantity
     
     def reduce_quantity(self, quantity):
         """减少持仓数量"""
-        if quantity >= self.quantity:
-            self.quantity = 0
-            self.average_price = 0
+        quantity = _to_decimal(quantity)
+        current_quantity = _to_decimal(self.quantity)
+        if quantity >= current_quantity:
+            self.quantity = Decimal('0')
+            self.average_price = Decimal('0')
         else:
-            self.quantity -= quantity
+            self.quantity = current_quantity - quantity
     
     def to_dict(self):
         """转换为字典"""
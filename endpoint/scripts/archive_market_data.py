@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+行情冷数据归档（MARKET_DATA_ARCHIVE_DIR）
+把早于归档期限的K线写入压缩Parquet归档文件，更新清单后分块从market_data删除；
+MarketDataService读取早于截止时间的区间时自动从归档文件读取
+
+使用方法:
+    python scripts/archive_market_data.py                                  # 按MARKET_DATA_ARCHIVE_HORIZON_DAYS归档日线
+    python scripts/archive_market_data.py --before 2019-01-01 --intervals 1d 60m
+    python scripts/archive_market_data.py --horizon-days 30 --intervals 1m 5m --pause 0.2
+    python scripts/archive_market_data.py --status                         # 只查看清单
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from datetime import date, datetime
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+load_dotenv()
+
+from flask import Flask
+from config import config
+from models import db, Symbol
+from services.market_data_archive import MarketDataArchive, archive_horizon_cutoff
+
+
+def create_archive_app(database_url):
+    """创建只初始化数据库的Flask应用（不启动调度器与后台任务）"""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
+
+
+def main():
+    default_url = config[os.environ.get('FLASK_ENV', 'development')].SQLALCHEMY_DATABASE_URI
+
+    parser = argparse.ArgumentParser(description='行情冷数据归档')
+    parser.add_argument('--archive-dir', default=os.environ.get('MARKET_DATA_ARCHIVE_DIR'),
+                        help='归档目录（默认MARKET_DATA_ARCHIVE_DIR）')
+    parser.add_argument('--database-url', default=default_url, help='数据库连接串')
+    parser.add_argument('--intervals', nargs='+', default=['1d'], help='要归档的周期')
+    parser.add_argument('--before', type=date.fromisoformat, default=None, help='归档早于该日期的K线（YYYY-MM-DD）')
+    parser.add_argument('--horizon-days', type=int, default=None,
+                        help='归档早于该天数的K线（默认MARKET_DATA_ARCHIVE_HORIZON_DAYS），与--before二选一')
+    parser.add_argument('--symbols', nargs='+', default=None, help='只归档这些股票代码')
+    parser.add_argument('--batch-size', type=int, default=50, help='每次加载的股票数')
+    parser.add_argument('--delete-chunk', type=int, default=5000, help='每个删除事务的行数')
+    parser.add_argument('--pause', type=float, default=0.0, help='每个删除事务之后的停顿（秒）')
+    parser.add_argument('--status', action='store_true', help='只输出归档清单概况')
+    args = parser.parse_args()
+
+    if not args.archive_dir:
+        parser.error('请通过--archive-dir或环境变量MARKET_DATA_ARCHIVE_DIR指定归档目录')
+    if args.before and args.horizon_days is not None:
+        parser.error('--before与--horizon-days只能指定一个')
+
+    archive = MarketDataArchive(args.archive_dir)
+    if args.status:
+        print(json.dumps(archive.summary(), ensure_ascii=False, indent=2))
+        return 0
+
+    before = datetime.combine(args.before, datetime.min.time()) if args.before else archive_horizon_cutoff(args.horizon_days)
+    app = create_archive_app(args.database_url)
+
+    with app.app_context():
+        symbol_ids = None
+        if args.symbols:
+            symbol_ids = [s.id for s in Symbol.query.filter(Symbol.symbol.in_(args.symbols)).order_by(Symbol.id)]
+
+        print(f"归档截止: {before.isoformat()}  周期: {', '.join(args.intervals)}")
+        started = time.perf_counter()
+        results = archive.archive(before, args.intervals, symbol_ids, args.batch_size, args.delete_chunk, args.pause)
+        elapsed = time.perf_counter() - started
+
+    for interval_type, stats in results.items():
+        print(f"{interval_type}: 股票数 {stats['symbols']}  归档 {stats['archived']}  删除 {stats['deleted']}  "
+              f"核对失败 {stats['failed']}")
+    print(f"耗时: {elapsed:.1f}s")
+    return 1 if any(stats['failed'] for stats in results.values()) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
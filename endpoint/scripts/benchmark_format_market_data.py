@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+行情数据格式化性能基准
+对比逐行iterrows格式化与向量化列式格式化的耗时
+
+使用方法:
+    python scripts/benchmark_format_market_data.py
+    python scripts/benchmark_format_market_data.py --sizes 10000 100000 1000000
+"""
+
+import sys
+import time
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from services.data_sources.base_data_source import BaseDataSource
+
+
+class BenchDataSource(BaseDataSource):
+    """仅用于基准测试的数据源（不访问网络）"""
+
+    def connect(self):
+        return True
+
+    def disconnect(self):
+        pass
+
+    def get_stock_list(self, market='A股'):
+        return []
+
+    def get_index_components(self, index_code):
+        return []
+
+    def get_historical_data(self, symbol, start_date, end_date, period='1d'):
+        return pd.DataFrame()
+
+    def get_latest_data(self, symbols):
+        return {}
+
+
+def legacy_format_market_data(raw_data, symbol):
+    """原有的逐行格式化实现（iterrows + 每个单元格中英文列名回退）"""
+    formatted_data = []
+    for index, row in raw_data.iterrows():
+        try:
+            data_point = {
+                'symbol': symbol,
+                'timestamp': pd.to_datetime(index) if isinstance(index, str) else index,
+                'open_price': float(row.get('open', row.get('开盘', 0))),
+                'high_price': float(row.get('high', row.get('最高', 0))),
+                'low_price': float(row.get('low', row.get('最低', 0))),
+                'close_price': float(row.get('close', row.get('收盘', 0))),
+                'volume': float(row.get('volume', row.get('成交量', 0))),
+                'interval_type': '1d'
+            }
+            if all(data_point[key] >= 0 for key in ['open_price', 'high_price', 'low_price', 'close_price']):
+                formatted_data.append(data_point)
+        except (ValueError, TypeError):
+            continue
+    return formatted_data
+
+
+def generate_frame(rows, seed=7):
+    """生成与AKShare标准化后结构一致的日线数据"""
+    rng = np.random.default_rng(seed)
+    close = 10 * np.exp(np.cumsum(rng.normal(0, 0.01, rows)))
+    index = pd.date_range('1990-01-01', periods=rows, freq='min')
+    return pd.DataFrame({
+        'open': close * 0.99,
+        'close': close,
+        'high': close * 1.01,
+        'low': close * 0.98,
+        'volume': rng.integers(100, 100000, rows).astype(float),
+        'amount': close * 1000,
+    }, index=index)
+
+
+def timed(func, *args):
+    """执行并返回(结果, 耗时)"""
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='行情数据格式化性能基准')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000], help='测试的行数')
+    parser.add_argument('--skip-legacy-above', type=int, default=1000000,
+                        help='超过该行数时跳过逐行实现（避免过长等待）')
+    args = parser.parse_args()
+
+    source = BenchDataSource('bench')
+
+    print(f"{'行数':>10} {'iterrows(s)':>12} {'columnar(s)':>12} {'tuples(s)':>12} {'dicts(s)':>12} {'columnar加速':>12}")
+    for rows in args.sizes:
+        df = generate_frame(rows)
+
+        if rows <= args.skip_legacy_above:
+            legacy, legacy_time = timed(legacy_format_market_data, df, 'BENCH')
+        else:
+            legacy, legacy_time = None, float('nan')
+
+        batch, columnar_time = timed(source.format_market_data_columnar, df, 'BENCH')
+        _, tuples_time = timed(source.format_market_data_tuples, df, 'BENCH')
+        records, dicts_time = timed(source.format_market_data, df, 'BENCH')
+
+        if legacy is not None:
+            assert len(legacy) == len(records) == len(batch['timestamp'])
+
+        print(f"{rows:>10} {legacy_time:>12.3f} {columnar_time:>12.4f} {tuples_time:>12.3f} "
+              f"{dicts_time:>12.3f} {legacy_time / columnar_time:>11.0f}x")
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
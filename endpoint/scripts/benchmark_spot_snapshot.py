@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+实时行情快照处理性能基准
+对比逐行iterrows实现与向量化实现的 get_stock_list / get_latest_data 耗时
+
+使用方法:
+    python scripts/benchmark_spot_snapshot.py                                  # 使用生成的5000行快照
+    python scripts/benchmark_spot_snapshot.py --record snapshot.csv.gz         # 录制一份真实快照（需要网络）
+    python scripts/benchmark_spot_snapshot.py --fixture snapshot.csv.gz        # 在录制的快照上回放
+"""
+
+import sys
+import time
+import argparse
+from datetime import datetime
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from services.data_sources import akshare_data_source
+from services.data_sources.akshare_data_source import AKShareDataSource
+
+
+def generate_snapshot(rows=5000, seed=11):
+    """生成与 ak.stock_zh_a_spot_em() 结构一致的快照"""
+    rng = np.random.default_rng(seed)
+    codes = [f'{600000 + i:06d}' if i % 2 else f'{i:06d}' for i in range(rows)]
+    price = rng.uniform(2, 200, rows).round(2)
+    df = pd.DataFrame({
+        '序号': np.arange(1, rows + 1),
+        '代码': codes,
+        '名称': [f'股票{i}' for i in range(rows)],
+        '最新价': price,
+        '涨跌幅': rng.normal(0, 2, rows).round(2),
+        '涨跌额': rng.normal(0, 1, rows).round(2),
+        '成交量': rng.integers(0, 10 ** 7, rows).astype(float),
+        '成交额': rng.uniform(0, 10 ** 9, rows).round(2),
+        '振幅': rng.uniform(0, 10, rows).round(2),
+        '最高': (price * 1.02).round(2),
+        '最低': (price * 0.98).round(2),
+        '今开': (price * 1.001).round(2),
+        '昨收': (price * 0.999).round(2),
+        '量比': rng.uniform(0, 3, rows).round(2),
+        '换手率': rng.uniform(0, 20, rows).round(2),
+        '市盈率-动态': rng.uniform(-50, 200, rows).round(2),
+        '市净率': rng.uniform(0, 20, rows).round(2),
+        '总市值': rng.uniform(10 ** 9, 10 ** 12, rows).round(0),
+        '流通市值': rng.uniform(10 ** 9, 10 ** 12, rows).round(0),
+    })
+    # 模拟停牌股票的缺失价格
+    df.loc[df.sample(frac=0.02, random_state=seed).index, ['最新价', '今开', '最高', '最低']] = np.nan
+    return df
+
+
+def legacy_get_stock_list(df):
+    """原有的逐行实现"""
+    stock_list = []
+    for _, row in df.iterrows():
+        try:
+            stock_list.append({
+                'symbol': str(row['代码']),
+                'name': str(row['名称']),
+                'exchange': 'SH' if str(row['代码']).startswith('6') else 'SZ',
+                'asset_type': 'stock',
+                'is_active': True,
+                'latest_price': float(row.get('最新价', 0)),
+                'change_pct': float(row.get('涨跌幅', 0)),
+                'volume': float(row.get('成交量', 0)),
+                'market_cap': float(row.get('总市值', 0)) if '总市值' in row else None
+            })
+        except (ValueError, KeyError):
+            continue
+    return stock_list
+
+
+def legacy_get_latest_data(df, symbols):
+    """原有的逐行实现"""
+    df_filtered = df[df['代码'].isin(symbols)]
+    latest_data = {}
+    for _, row in df_filtered.iterrows():
+        try:
+            symbol = str(row['代码'])
+            latest_data[symbol] = {
+                'symbol': symbol,
+                'name': str(row['名称']),
+                'latest_price': float(row['最新价']),
+                'open_price': float(row['今开']),
+                'high_price': float(row['最高']),
+                'low_price': float(row['最低']),
+                'close_price': float(row['昨收']),
+                'volume': float(row['成交量']),
+                'amount': float(row['成交额']),
+                'change_amount': float(row['涨跌额']),
+                'change_pct': float(row['涨跌幅']),
+                'timestamp': datetime.now(),
+                'market_cap': float(row.get('总市值', 0)) if '总市值' in row else None
+            }
+        except (ValueError, KeyError):
+            continue
+    return latest_data
+
+
+def best_of(func, repeat):
+    """多次执行取最短耗时"""
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='实时行情快照处理性能基准')
+    parser.add_argument('--fixture', help='录制的快照文件（CSV，可gzip压缩）')
+    parser.add_argument('--record', help='录制一份真实快照到指定文件后退出')
+    parser.add_argument('--repeat', type=int, default=5, help='每项测试重复次数')
+    args = parser.parse_args()
+
+    if args.record:
+        import akshare as ak
+        ak.stock_zh_a_spot_em().to_csv(args.record, index=False)
+        print(f"快照已录制到: {args.record}")
+        return 0
+
+    if args.fixture:
+        fixture = pd.read_csv(args.fixture, dtype={'代码': str})
+    else:
+        fixture = generate_snapshot()
+
+    symbols = fixture['代码'].sample(frac=0.1, random_state=1).tolist()
+    source = AKShareDataSource()
+
+    with mock.patch.object(akshare_data_source.ak, 'stock_zh_a_spot_em', return_value=fixture):
+        results = [
+            ('get_stock_list', lambda: legacy_get_stock_list(fixture), lambda: source.get_stock_list()),
+            ('get_latest_data', lambda: legacy_get_latest_data(fixture, symbols),
+             lambda: source.get_latest_data(symbols)),
+            ('get_latest_data(as_frame)', lambda: legacy_get_latest_data(fixture, symbols),
+             lambda: source.get_latest_data(symbols, as_frame=True)),
+        ]
+
+        print(f"快照行数: {len(fixture)}  查询股票数: {len(symbols)}")
+        print(f"{'方法':<28} {'iterrows(ms)':>14} {'vectorized(ms)':>16} {'加速':>8}")
+        for name, legacy, vectorized in results:
+            legacy_result, legacy_time = best_of(legacy, args.repeat)
+            new_result, new_time = best_of(vectorized, args.repeat)
+            assert len(legacy_result) == len(new_result)
+            print(f"{name:<28} {legacy_time * 1000:>14.1f} {new_time * 1000:>16.1f} {legacy_time / new_time:>7.1f}x")
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+流式入库内存基准
+对比整段下载写入与按交易日分块流式写入的耗时与峰值RSS（每种模式在独立子进程中运行）
+
+使用方法:
+    python scripts/benchmark_streaming_ingest.py                                # 500只股票 × 10年
+    python scripts/benchmark_streaming_ingest.py --symbols 50 --years 3
+    python scripts/benchmark_streaming_ingest.py --modes full_range streaming legacy_orm
+    python scripts/benchmark_streaming_ingest.py --latency-ms 50 --error-rate 0.01    # 模拟网络延迟与失败
+
+数据来自本地数据源（local）的合成数据，相同参数的每次运行数据完全相同
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import subprocess
+import tempfile
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from flask import Flask
+from models import db, MarketData, Symbol
+
+MODES = ['full_range', 'streaming', 'legacy_orm']
+
+
+def peak_rss_mb():
+    """当前进程的峰值RSS（MB）"""
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux以KB为单位，macOS以字节为单位
+    return usage / 1024 / 1024 if sys.platform == 'darwin' else usage / 1024
+
+
+def run_mode(mode, database_url, symbols, years, chunk_days, source_config):
+    """在当前进程中执行一种模式，返回统计结果"""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+
+        from services.market_data_service import MarketDataService
+        service = MarketDataService('local', source_config)
+
+        codes = [f'{i:06d}' for i in range(symbols)]
+        db.session.add_all([Symbol(symbol=code, name=code, exchange='BENCH') for code in codes])
+        db.session.commit()
+
+        end_date = service.data_source.synthetic_end
+        start_date = service.data_source.synthetic_start
+        tasks = [(code, start_date, end_date) for code in codes]
+        baseline_rss = peak_rss_mb()
+
+        started = time.perf_counter()
+        if mode == 'legacy_orm':
+            # 原有路径：整段下载 → 字典列表 → 会话中的ORM对象 → 提交
+            rows = 0
+            symbol_ids = dict(db.session.query(Symbol.symbol, Symbol.id).all())
+            for code, start, end in tasks:
+                df = service.data_source.get_historical_data(code, start, end)
+                for record in service.data_source.format_market_data(df, code):
+                    db.session.add(MarketData(
+                        symbol_id=symbol_ids[code],
+                        timestamp=record['timestamp'],
+                        open_price=record['open_price'],
+                        high_price=record['high_price'],
+                        low_price=record['low_price'],
+                        close_price=record['close_price'],
+                        volume=record['volume'],
+                        interval_type='1d'
+                    ))
+                    rows += 1
+                db.session.commit()
+        else:
+            stats = service.stream_ingest(tasks, chunk_days=0 if mode == 'full_range' else chunk_days)
+            rows = stats['inserted']
+        elapsed = time.perf_counter() - started
+
+        result = {
+            'mode': mode,
+            'rows': rows,
+            'elapsed': elapsed,
+            'baseline_rss_mb': baseline_rss,
+            'peak_rss_mb': peak_rss_mb()
+        }
+        db.drop_all()
+
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='流式入库内存基准')
+    parser.add_argument('--database-url', default=os.environ.get('BENCH_DATABASE_URL'),
+                        help='数据库连接串（默认临时SQLite文件）')
+    parser.add_argument('--symbols', type=int, default=500, help='股票数量')
+    parser.add_argument('--years', type=int, default=10, help='每只股票的年数')
+    parser.add_argument('--chunk-days', type=int, default=250, help='流式模式每块的交易日数')
+    parser.add_argument('--latency-ms', type=float, default=0, help='每次数据源请求注入的平均延迟（毫秒）')
+    parser.add_argument('--error-rate', type=float, default=0, help='数据源请求失败的概率（0-1）')
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=['full_range', 'streaming'],
+                        help='要测试的模式')
+    parser.add_argument('--mode', choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        # 子进程：执行单一模式并输出JSON
+        source_config = {
+            'synthetic': {'symbols': args.symbols, 'years': args.years, 'end_date': '2024-12-31'},
+            'latency_ms': args.latency_ms,
+            'error_rate': args.error_rate,
+            'seed': 0
+        }
+        print(json.dumps(run_mode(args.mode, args.database_url, args.symbols, args.years, args.chunk_days, source_config)))
+        return 0
+
+    print(f"股票数: {args.symbols}  年数: {args.years}  分块交易日数: {args.chunk_days}")
+    print(f"{'模式':<12} {'行数':>10} {'耗时(s)':>10} {'行/秒':>10} {'基线RSS(MB)':>12} {'峰值RSS(MB)':>12}")
+
+    for mode in args.modes:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            database_url = args.database_url or f"sqlite:///{Path(tmp_dir) / 'bench_stream.db'}"
+            output = subprocess.run(
+                [sys.executable, __file__, '--mode', mode, '--database-url', database_url,
+                 '--symbols', str(args.symbols), '--years', str(args.years), '--chunk-days', str(args.chunk_days),
+                 '--latency-ms', str(args.latency_ms), '--error-rate', str(args.error_rate)],
+                capture_output=True, text=True, check=True,
+                # 合成数据的交易日历写入临时目录，不覆盖正式的日历文件
+                env=dict(os.environ, TRADING_CALENDAR_PATH=str(Path(tmp_dir) / 'trading_calendar.json'))
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+
+        print(f"{result['mode']:<12} {result['rows']:>10} {result['elapsed']:>10.1f} "
+              f"{result['rows'] / result['elapsed']:>10.0f} {result['baseline_rss_mb']:>12.1f} {result['peak_rss_mb']:>12.1f}")
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
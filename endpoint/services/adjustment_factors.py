@@ -0,0 +1,276 @@
+"""
+复权因子存储
+行情表保存不复权价格，除权除息只需要增量更新复权因子，读取时按因子向量化计算前/后复权价格
+"""
+
+import logging
+from datetime import date, datetime
+from typing import List, Dict, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select, insert, update, delete, bindparam
+
+from models import db, AdjustmentFactor, LegacyAdjustedRange
+
+logger = logging.getLogger(__name__)
+
+# 支持的复权方式
+ADJUST_TYPES = ('qfq', 'hfq', 'none')
+
+# 快照昨收与已存收盘价相差超过半个最小价位时视为发生除权除息
+PRICE_TOLERANCE = 0.005
+
+
+class AdjustmentFactorStore:
+    """
+    复权因子存储
+
+    因子为后复权累计因子，自除权除息日起生效：后复权价 = 不复权价 × 因子，
+    前复权价 = 不复权价 × 因子 / 最新因子。因此每次除权除息只新增一行因子，历史行情无需改写。
+    """
+
+    def __init__(self):
+        self.table = AdjustmentFactor.__table__
+
+    def load(self, symbol_ids: List[int]) -> Dict[int, Tuple[np.ndarray, np.ndarray]]:
+        """
+        批量加载复权因子
+
+        Args:
+            symbol_ids: 标的ID列表
+
+        Returns:
+            Dict[int, Tuple[np.ndarray, np.ndarray]]: 标的ID -> (除权除息日数组datetime64[D], 因子数组)，按日期升序
+        """
+        rows_by_symbol = {}
+        for i in range(0, len(symbol_ids), 1000):
+            rows = db.session.execute(
+                select(self.table.c.symbol_id, self.table.c.ex_date, self.table.c.factor)
+                .where(self.table.c.symbol_id.in_(symbol_ids[i:i + 1000]))
+                .order_by(self.table.c.symbol_id, self.table.c.ex_date)
+            ).all()
+            for symbol_id, ex_date, factor in rows:
+                rows_by_symbol.setdefault(symbol_id, []).append((ex_date, factor))
+
+        return {
+            symbol_id: (
+                np.array([ex_date for ex_date, _ in rows], dtype='datetime64[D]'),
+                np.array([factor for _, factor in rows], dtype=float)
+            )
+            for symbol_id, rows in rows_by_symbol.items()
+        }
+
+    def multipliers(self, symbol_id: int, timestamps: np.ndarray, adjust: str = 'qfq') -> Optional[np.ndarray]:
+        """
+        计算一组时间戳对应的价格乘数
+
+        Args:
+            symbol_id: 标的ID
+            timestamps: 行情时间戳数组
+            adjust: 复权方式 qfq/hfq/none
+
+        Returns:
+            Optional[np.ndarray]: 乘数数组；不需要调整时返回None
+        """
+        if adjust not in ADJUST_TYPES:
+            raise ValueError(f"不支持的复权方式: {adjust}")
+        if adjust == 'none' or len(timestamps) == 0:
+            return None
+        # 升级前以前复权价格入库的行情在重新获取之前按保存的价格返回，避免重复复权
+        if self.legacy_symbol_ids([symbol_id]):
+            return None
+
+        factors = self.load([symbol_id]).get(symbol_id)
+        if factors is None:
+            return None
+        return compute_multipliers(factors[0], factors[1], timestamps, adjust)
+
+    def legacy_symbol_ids(self, symbol_ids: List[int]) -> Set[int]:
+        """
+        查询仍有前复权行情（升级前入库、尚未重新获取）的标的
+
+        Args:
+            symbol_ids: 标的ID列表
+
+        Returns:
+            Set[int]: 仍有前复权行情的标的ID
+        """
+        table = LegacyAdjustedRange.__table__
+        result = set()
+        for i in range(0, len(symbol_ids), 1000):
+            result.update(db.session.execute(
+                select(table.c.symbol_id).where(table.c.symbol_id.in_(symbol_ids[i:i + 1000]))
+            ).scalars())
+        return result
+
+    def sync_symbol(self, symbol_id: int, frame: pd.DataFrame) -> Dict[str, int]:
+        """
+        以数据源的完整因子序列为准同步一只股票的复权因子（只写入变化的行）
+
+        Args:
+            symbol_id: 标的ID
+            frame: 数据源返回的因子，列为 ex_date 与 factor
+
+        Returns:
+            Dict[str, int]: {'inserted', 'updated', 'deleted', 'unchanged'}
+        """
+        incoming = {
+            row.ex_date: float(row.factor)
+            for row in frame.itertuples(index=False)
+        }
+        return self._apply(symbol_id, incoming, source='data_source', delete_missing=bool(incoming))
+
+    def record_ex_dates(self, factors: Dict[int, Tuple[date, float]]) -> Dict[str, int]:
+        """
+        记录由快照推算的除权除息因子
+
+        Args:
+            factors: 标的ID -> (除权除息日, 因子)
+
+        Returns:
+            Dict[str, int]: {'inserted', 'updated', 'deleted', 'unchanged'}
+        """
+        stats = {'inserted': 0, 'updated': 0, 'deleted': 0, 'unchanged': 0}
+        for symbol_id, (ex_date, factor) in factors.items():
+            for key, value in self._apply(symbol_id, {ex_date: factor}, source='snapshot', commit=False).items():
+                stats[key] += value
+        db.session.commit()
+        return stats
+
+    def infer_from_snapshot(
+        self,
+        pre_close: Dict[int, float],
+        previous_close: Dict[int, float],
+        trade_date: date
+    ) -> Dict[int, Tuple[date, float]]:
+        """
+        根据快照昨收推算当日的除权除息因子
+
+        交易所在除权除息日把昨收设为除权参考价，与前一交易日的实际收盘价不同；
+        新因子 = 上一因子 × 实际收盘价 / 除权参考价（与数据源后复权因子的定义一致）
+
+        Args:
+            pre_close: 标的ID -> 快照昨收（除权参考价）
+            previous_close: 标的ID -> 前一交易日已入库的不复权收盘价
+            trade_date: 交易日期（除权除息日）
+
+        Returns:
+            Dict[int, Tuple[date, float]]: 标的ID -> (除权除息日, 新因子)
+        """
+        symbol_ids = [
+            symbol_id for symbol_id, close in previous_close.items()
+            if symbol_id in pre_close and pre_close[symbol_id] > 0 and close > 0
+        ]
+        # 已存收盘价为前复权价格的标的无法与昨收比较
+        legacy = self.legacy_symbol_ids(symbol_ids)
+        symbol_ids = [symbol_id for symbol_id in symbol_ids if symbol_id not in legacy]
+        if not symbol_ids:
+            return {}
+
+        closes = np.array([previous_close[symbol_id] for symbol_id in symbol_ids], dtype=float)
+        references = np.array([pre_close[symbol_id] for symbol_id in symbol_ids], dtype=float)
+        changed = np.abs(closes - references) > PRICE_TOLERANCE
+        if not changed.any():
+            return {}
+
+        changed_ids = [symbol_id for symbol_id, flag in zip(symbol_ids, changed) if flag]
+        stored = self.load(changed_ids)
+        trade_day = np.datetime64(trade_date, 'D')
+
+        result = {}
+        for symbol_id, close, reference in zip(changed_ids, closes[changed], references[changed]):
+            last_factor = 1.0
+            if symbol_id in stored:
+                ex_dates, factors = stored[symbol_id]
+                prior = np.searchsorted(ex_dates, trade_day, side='left') - 1
+                if prior >= 0:
+                    last_factor = float(factors[prior])
+            result[symbol_id] = (trade_date, float(last_factor * close / reference))
+
+        return result
+
+    def _apply(
+        self,
+        symbol_id: int,
+        incoming: Dict[date, float],
+        source: str,
+        delete_missing: bool = False,
+        commit: bool = True
+    ) -> Dict[str, int]:
+        """与已存因子对比后批量新增、更新（及删除）"""
+        stats = {'inserted': 0, 'updated': 0, 'deleted': 0, 'unchanged': 0}
+        existing = dict(
+            (ex_date, (row_id, factor))
+            for row_id, ex_date, factor in db.session.execute(
+                select(self.table.c.id, self.table.c.ex_date, self.table.c.factor)
+                .where(self.table.c.symbol_id == symbol_id)
+            ).all()
+        )
+
+        now = datetime.utcnow()
+        inserts, updates = [], []
+        for ex_date, factor in incoming.items():
+            if ex_date not in existing:
+                inserts.append({
+                    'symbol_id': symbol_id, 'ex_date': ex_date, 'factor': factor,
+                    'source': source, 'created_at': now, 'updated_at': now
+                })
+            elif not np.isclose(existing[ex_date][1], factor, rtol=1e-9, atol=0):
+                updates.append({'b_id': existing[ex_date][0], 'b_factor': factor, 'b_source': source, 'b_updated_at': now})
+            else:
+                stats['unchanged'] += 1
+
+        stale_ids = []
+        if delete_missing:
+            # 数据源尚未收录的最新快照推算因子保留，等待下次同步确认
+            latest = max(incoming)
+            stale_ids = [
+                row_id for ex_date, (row_id, _) in existing.items()
+                if ex_date not in incoming and ex_date <= latest
+            ]
+
+        if inserts:
+            db.session.execute(insert(self.table), inserts)
+        if updates:
+            db.session.execute(
+                update(self.table)
+                .where(self.table.c.id == bindparam('b_id'))
+                .values(factor=bindparam('b_factor'), source=bindparam('b_source'), updated_at=bindparam('b_updated_at')),
+                updates
+            )
+        if stale_ids:
+            db.session.execute(delete(self.table).where(self.table.c.id.in_(stale_ids)))
+        if commit:
+            db.session.commit()
+
+        stats.update(inserted=len(inserts), updated=len(updates), deleted=len(stale_ids))
+        return stats
+
+
+def compute_multipliers(
+    ex_dates: np.ndarray,
+    factors: np.ndarray,
+    timestamps: np.ndarray,
+    adjust: str = 'qfq'
+) -> np.ndarray:
+    """
+    向量化计算价格乘数：按时间戳所在的除权区间取因子
+
+    Args:
+        ex_dates: 除权除息日数组（datetime64[D]，升序）
+        factors: 对应的后复权累计因子
+        timestamps: 行情时间戳数组
+        adjust: qfq（除以最新因子）或 hfq
+
+    Returns:
+        np.ndarray: 与timestamps等长的乘数数组
+    """
+    days = np.asarray(timestamps, dtype='datetime64[ns]').astype('datetime64[D]')
+    index = np.searchsorted(ex_dates, days, side='right') - 1
+    # 首个因子之前的行情没有除权记录，因子为1
+    multipliers = np.where(index >= 0, factors[np.maximum(index, 0)], 1.0)
+
+    if adjust == 'qfq':
+        multipliers = multipliers / factors[-1]
+    return multipliers
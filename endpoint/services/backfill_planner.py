@@ -0,0 +1,286 @@
+"""
+历史数据补齐规划
+对照交易日历找出每只股票缺失的交易日，合并为最少的连续获取区间并排出优先级
+"""
+
+import logging
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, time, timedelta
+from typing import List, Dict, Optional
+
+import numpy as np
+from sqlalchemy import func
+
+from models import db, MarketData, Symbol
+from services.trading_calendar import TradingCalendar
+from services.market_data_archive import MarketDataArchive
+
+logger = logging.getLogger(__name__)
+
+
+class BackfillPlanner:
+    """
+    历史数据补齐规划器
+
+    一次聚合查询取得每只股票的首/末时间戳与行数：行数与日历交易日数一致的股票没有内部缺口，
+    只需补齐首尾；行数不足的股票再批量加载时间戳，与日历做差集定位内部缺口。
+    停牌期间同样表现为缺失交易日，数据源对这些区间返回空数据，不影响结果。
+    启用冷数据归档时，早于标的归档截止时间的交易日视为已覆盖（这些K线在归档文件中，不在热表中）。
+    """
+
+    # 工作项类型及优先级（数值越小越优先）：最新数据最重要，其次修复中间缺口，最后补更早的历史
+    PRIORITY = {'trailing': 0, 'interior': 1, 'missing': 2, 'leading': 3}
+
+    def __init__(
+        self,
+        calendar: TradingCalendar,
+        interval_type: str = '1d',
+        bridge_days: int = 0,
+        max_request_days: Optional[int] = None,
+        archive: Optional[MarketDataArchive] = None
+    ):
+        """
+        初始化补齐规划器
+
+        Args:
+            calendar: 交易日历
+            interval_type: 时间间隔
+            bridge_days: 两个缺口之间已有数据不超过该交易日数时合并为一个区间（以少量重复下载换取更少请求）
+            max_request_days: 单次请求最多包含的交易日数，超出时拆分为多个请求
+            archive: 冷数据归档，早于标的截止时间的交易日视为已覆盖
+        """
+        self.calendar = calendar
+        self.interval_type = interval_type
+        self.bridge_days = max(0, bridge_days)
+        self.max_request_days = max_request_days
+        self.archive = archive
+
+    def plan(
+        self,
+        start_date: date,
+        end_date: date,
+        symbols: Optional[List[str]] = None
+    ) -> List[Dict]:
+        """
+        生成按优先级排序的补齐工作列表
+
+        Args:
+            start_date: 需要覆盖的开始日期
+            end_date: 需要覆盖的结束日期
+            symbols: 股票代码列表，默认全部活跃股票
+
+        Returns:
+            List[Dict]: 工作项列表，每项包含 symbol、symbol_id、start_date、end_date、missing_days、kind
+        """
+        trading_days = self.calendar.trading_days_between(start_date, end_date)
+        if not trading_days:
+            return []
+
+        symbol_ids = self._load_symbols(symbols)
+        if not symbol_ids:
+            return []
+
+        day_index = {day: i for i, day in enumerate(trading_days)}
+        coverage = self._load_coverage(list(symbol_ids.values()), trading_days[0], trading_days[-1])
+
+        # 行数少于首末之间交易日数的股票存在内部缺口
+        holed = [
+            symbol_id for symbol_id, (first_day, last_day, count) in coverage.items()
+            if count < self.calendar.count_trading_days(first_day, last_day)
+        ]
+        existing_days = self._load_existing_days(holed, trading_days[0], trading_days[-1])
+        archived_days = self._load_archived_days(list(symbol_ids.values()), trading_days)
+
+        work_items = []
+        for symbol, symbol_id in symbol_ids.items():
+            archived = archived_days.get(symbol_id, 0)
+            if archived == len(trading_days):
+                continue
+
+            if symbol_id not in coverage:
+                missing = np.arange(len(trading_days))
+            elif symbol_id in existing_days:
+                present = [day_index[d] for d in existing_days[symbol_id] if d in day_index]
+                missing = np.setdiff1d(np.arange(len(trading_days)), present)
+            else:
+                first_day, last_day, _ = coverage[symbol_id]
+                first = bisect_left(trading_days, first_day)
+                last = bisect_right(trading_days, last_day)
+                missing = np.concatenate([np.arange(0, first), np.arange(last, len(trading_days))])
+
+            # 前archived个交易日在归档文件中
+            missing = missing[missing >= archived]
+            has_data = symbol_id in coverage or archived > 0
+
+            for run_start, run_end in self._coalesce(missing):
+                kind = self._classify(has_data, run_start, run_end, len(trading_days))
+                work_items.extend(self._split(symbol, symbol_id, trading_days, run_start, run_end, kind, missing))
+
+        work_items.sort(key=lambda item: (self.PRIORITY[item['kind']], -item['end_date'].toordinal(), item['symbol']))
+        return work_items
+
+    def dry_run(
+        self,
+        start_date: date,
+        end_date: date,
+        symbols: Optional[List[str]] = None,
+        limit: int = 100
+    ) -> Dict:
+        """
+        生成补齐规模报告（不下载任何数据）
+
+        Args:
+            start_date: 需要覆盖的开始日期
+            end_date: 需要覆盖的结束日期
+            symbols: 股票代码列表，默认全部活跃股票
+            limit: 报告中列出的工作项数量上限
+
+        Returns:
+            Dict: 规模报告
+        """
+        work_items = self.plan(start_date, end_date, symbols)
+        return self.summarize(work_items, start_date, end_date, limit)
+
+    def summarize(self, work_items: List[Dict], start_date: date, end_date: date, limit: int = 100) -> Dict:
+        """汇总工作列表为规模报告"""
+        by_kind = {}
+        for item in work_items:
+            kind_stats = by_kind.setdefault(item['kind'], {'requests': 0, 'missing_days': 0})
+            kind_stats['requests'] += 1
+            kind_stats['missing_days'] += item['missing_days']
+
+        return {
+            'start_date': start_date.isoformat(),
+            'end_date': end_date.isoformat(),
+            'trading_days': self.calendar.count_trading_days(start_date, end_date),
+            'symbols': len({item['symbol'] for item in work_items}),
+            'missing_days': sum(item['missing_days'] for item in work_items),
+            'estimated_requests': len(work_items),
+            'by_kind': by_kind,
+            'work_items': [self._item_to_dict(item) for item in work_items[:limit]]
+        }
+
+    def _load_symbols(self, symbols: Optional[List[str]]) -> Dict[str, int]:
+        """加载股票代码到ID的映射"""
+        query = db.session.query(Symbol.symbol, Symbol.id)
+        if symbols is None:
+            return dict(query.filter(Symbol.is_active == True).all())
+
+        symbol_ids = {}
+        for i in range(0, len(symbols), 1000):
+            symbol_ids.update(query.filter(Symbol.symbol.in_(symbols[i:i + 1000])).all())
+        return symbol_ids
+
+    def _load_coverage(self, symbol_ids: List[int], start_date: date, end_date: date) -> Dict[int, tuple]:
+        """一次聚合查询获取区间内每只股票的首/末交易日与行数"""
+        coverage = {}
+        start_ts = datetime.combine(start_date, time.min)
+        end_ts = datetime.combine(end_date, time.max)
+
+        for i in range(0, len(symbol_ids), 1000):
+            rows = db.session.query(
+                MarketData.symbol_id,
+                func.min(MarketData.timestamp),
+                func.max(MarketData.timestamp),
+                func.count(MarketData.id)
+            ).filter(
+                MarketData.symbol_id.in_(symbol_ids[i:i + 1000]),
+                MarketData.interval_type == self.interval_type,
+                MarketData.timestamp >= start_ts,
+                MarketData.timestamp <= end_ts
+            ).group_by(MarketData.symbol_id).all()
+
+            for symbol_id, first_ts, last_ts, count in rows:
+                coverage[symbol_id] = (first_ts.date(), last_ts.date(), count)
+
+        return coverage
+
+    def _load_existing_days(self, symbol_ids: List[int], start_date: date, end_date: date) -> Dict[int, List[date]]:
+        """批量加载存在内部缺口的股票在区间内已有的交易日"""
+        existing = {}
+        start_ts = datetime.combine(start_date, time.min)
+        end_ts = datetime.combine(end_date, time.max)
+
+        for i in range(0, len(symbol_ids), 200):
+            rows = db.session.query(MarketData.symbol_id, MarketData.timestamp).filter(
+                MarketData.symbol_id.in_(symbol_ids[i:i + 200]),
+                MarketData.interval_type == self.interval_type,
+                MarketData.timestamp >= start_ts,
+                MarketData.timestamp <= end_ts
+            ).all()
+
+            for symbol_id, timestamp in rows:
+                existing.setdefault(symbol_id, []).append(timestamp.date())
+
+        return existing
+
+    def _load_archived_days(self, symbol_ids: List[int], trading_days: List[date]) -> Dict[int, int]:
+        """
+        按归档清单计算每只股票区间开头已归档的交易日数
+
+        Returns:
+            Dict[int, int]: 标的ID -> 区间内早于归档截止时间的交易日数（未归档的标的不包含在内）
+        """
+        if self.archive is None:
+            return {}
+
+        archived = {}
+        for symbol_id in symbol_ids:
+            cutoff = self.archive.cutoff(self.interval_type, symbol_id)
+            if cutoff is None:
+                continue
+            # 当日K线时间（零点）早于截止时间即已归档
+            count = bisect_right(trading_days, (cutoff - timedelta(microseconds=1)).date())
+            if count:
+                archived[symbol_id] = count
+        return archived
+
+    def _coalesce(self, missing: np.ndarray) -> List[tuple]:
+        """将缺失交易日的序号合并为连续区间（按日历序号相邻判断，跳过周末与节假日）"""
+        if len(missing) == 0:
+            return []
+
+        breaks = np.nonzero(np.diff(missing) > self.bridge_days + 1)[0]
+        starts = np.concatenate([[missing[0]], missing[breaks + 1]])
+        ends = np.concatenate([missing[breaks], [missing[-1]]])
+        return list(zip(starts.tolist(), ends.tolist()))
+
+    def _classify(self, has_data: bool, run_start: int, run_end: int, total: int) -> str:
+        """判断区间类型"""
+        if not has_data:
+            return 'missing'
+        if run_end == total - 1:
+            return 'trailing'
+        if run_start == 0:
+            return 'leading'
+        return 'interior'
+
+    def _split(
+        self,
+        symbol: str,
+        symbol_id: int,
+        trading_days: List[date],
+        run_start: int,
+        run_end: int,
+        kind: str,
+        missing: np.ndarray
+    ) -> List[Dict]:
+        """按单次请求的最大交易日数拆分区间"""
+        step = self.max_request_days or (run_end - run_start + 1)
+        items = []
+        for chunk_start in range(run_start, run_end + 1, step):
+            chunk_end = min(chunk_start + step - 1, run_end)
+            missing_days = int(np.count_nonzero((missing >= chunk_start) & (missing <= chunk_end)))
+            items.append({
+                'symbol': symbol,
+                'symbol_id': symbol_id,
+                'start_date': trading_days[chunk_start],
+                'end_date': trading_days[chunk_end],
+                'missing_days': missing_days,
+                'kind': kind
+            })
+        return items
+
+    def _item_to_dict(self, item: Dict) -> Dict:
+        """工作项转换为可序列化字典"""
+        return dict(item, start_date=item['start_date'].isoformat(), end_date=item['end_date'].isoformat())
@@ -0,0 +1,313 @@
+"""
+周线/月线汇总表
+日线写入后只重新汇总受影响的周、月时间桶（通常只有当前未结束的一个桶），结果保存在market_data_aggregates表，
+读取周线/月线时直接查询汇总表，不再每次加载多年日线重新采样
+"""
+
+import logging
+from datetime import datetime
+from typing import List, Dict, Optional, Iterable
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select, delete, insert
+
+from models import db, MarketData, AggregateBar
+from services.metrics import metrics_registry
+from services.fast_reads import PRICE_COLUMNS, as_float, select_bars, rows_to_arrays
+from services.market_data_archive import get_market_data_archive
+
+logger = logging.getLogger(__name__)
+
+# 汇总周期：1w周线（周一开始）、1M月线（每月1日开始）
+AGGREGATE_INTERVALS = ('1w', '1M')
+
+# 汇总的来源周期
+SOURCE_INTERVAL = '1d'
+
+# 汇总表除价格/成交量外保存的字段
+AGGREGATE_COLUMNS = ('bar_count', 'first_timestamp', 'last_timestamp')
+
+
+def bucket_starts(timestamps: np.ndarray, interval_type: str) -> np.ndarray:
+    """
+    向量化计算日线所属的周/月时间桶（以桶开始日零点标记）
+
+    Args:
+        timestamps: 日线时间戳（datetime64）
+        interval_type: 1w或1M
+
+    Returns:
+        np.ndarray: 与输入等长的时间桶（datetime64[ns]）
+    """
+    days = np.asarray(timestamps, dtype='datetime64[ns]').astype('datetime64[D]')
+
+    if interval_type == '1w':
+        # 1970-01-01为周四，(天数 + 3) % 7 为距周一的天数
+        weekday = (days.astype(np.int64) + 3) % 7
+        return (days - weekday.astype('timedelta64[D]')).astype('datetime64[ns]')
+    if interval_type == '1M':
+        return days.astype('datetime64[M]').astype('datetime64[ns]')
+    raise ValueError(f"不支持的汇总周期: {interval_type}")
+
+
+def bucket_end(start: np.datetime64, interval_type: str) -> datetime:
+    """时间桶的结束时间（不包含）"""
+    start = np.datetime64(start, 'D')
+    if interval_type == '1w':
+        end = start + np.timedelta64(7, 'D')
+    else:
+        end = (start.astype('datetime64[M]') + 1).astype('datetime64[D]')
+    return pd.Timestamp(end).to_pydatetime()
+
+
+def aggregate_bars(frame: pd.DataFrame, interval_type: str) -> pd.DataFrame:
+    """
+    把日线汇总为周线/月线（开盘取首、最高取max、最低取min、收盘取末、成交量求和）
+
+    Args:
+        frame: 列为symbol_id、timestamp与PRICE_COLUMNS的日线
+        interval_type: 1w或1M
+
+    Returns:
+        pd.DataFrame: 列为symbol_id、timestamp（桶开始）、PRICE_COLUMNS与AGGREGATE_COLUMNS
+    """
+    frame = frame.sort_values(['symbol_id', 'timestamp'])
+    frame = frame.assign(bucket=bucket_starts(frame['timestamp'].to_numpy(), interval_type))
+    return frame.groupby(['symbol_id', 'bucket'], sort=False).agg(
+        open_price=('open_price', 'first'),
+        high_price=('high_price', 'max'),
+        low_price=('low_price', 'min'),
+        close_price=('close_price', 'last'),
+        volume=('volume', 'sum'),
+        bar_count=('open_price', 'size'),
+        first_timestamp=('timestamp', 'min'),
+        last_timestamp=('timestamp', 'max')
+    ).reset_index().rename(columns={'bucket': 'timestamp'})
+
+
+class AggregateBarStore:
+    """
+    周线/月线汇总表
+
+    作为MarketDataWriter的写入监听器：日线写入后，计算受影响的周、月时间桶，
+    加载这些桶内的全部日线重新汇总并upsert到market_data_aggregates。
+    周期标识1M与分钟周期1m只有大小写不同，MySQL默认排序规则不区分大小写，因此单独建表而不写入market_data。
+    """
+
+    def __init__(self, intervals: Iterable[str] = AGGREGATE_INTERVALS, chunk_size: int = 500):
+        """
+        初始化汇总表
+
+        Args:
+            intervals: 维护的汇总周期
+            chunk_size: 每次查询的标的数与每条upsert语句的行数
+        """
+        self.intervals = tuple(intervals)
+        self.chunk_size = chunk_size
+        self.table = AggregateBar.__table__
+
+    # ============================================
+    # 增量维护
+    # ============================================
+
+    def on_write(self, interval_type: str, written: Dict[int, List[datetime]]) -> None:
+        """写入监听器：日线写入后汇总受影响的时间桶"""
+        if interval_type != SOURCE_INTERVAL:
+            return
+        for target in self.intervals:
+            with metrics_registry.timer('pipeline', f'aggregate_{target}') as timer:
+                timer.rows = self.refresh(target, written)
+
+    def refresh(self, interval_type: str, written: Dict[int, List[datetime]]) -> int:
+        """
+        重新汇总受影响的时间桶
+
+        Args:
+            interval_type: 汇总周期
+            written: 标的ID -> 新写入的日线时间戳
+
+        Returns:
+            int: 写入的时间桶数
+        """
+        affected = pd.concat([
+            pd.DataFrame({
+                'symbol_id': symbol_id,
+                'timestamp': bucket_starts(np.array(timestamps, dtype='datetime64[ns]'), interval_type)
+            })
+            for symbol_id, timestamps in written.items() if timestamps
+        ]).drop_duplicates()
+        if affected.empty:
+            return 0
+
+        start = pd.Timestamp(affected['timestamp'].min()).to_pydatetime()
+        end = bucket_end(affected['timestamp'].max(), interval_type)
+
+        symbol_ids = sorted(int(symbol_id) for symbol_id in affected['symbol_id'].unique())
+        frames = []
+        for i in range(0, len(symbol_ids), self.chunk_size):
+            rows = db.session.execute(
+                select_bars(SOURCE_INTERVAL, symbol_ids[i:i + self.chunk_size], start, end)
+            ).all()
+            if rows:
+                frames.append(pd.DataFrame(rows_to_arrays(rows, ('symbol_id', 'timestamp') + PRICE_COLUMNS)))
+        if not frames:
+            return 0
+
+        bars = aggregate_bars(pd.concat(frames, ignore_index=True), interval_type)
+        bars = bars.merge(affected, on=['symbol_id', 'timestamp'])
+        self._upsert(bars, interval_type)
+        db.session.commit()
+
+        logger.debug(f"日线汇总到{interval_type}: {len(bars)}个时间桶")
+        return len(bars)
+
+    def _upsert(self, bars: pd.DataFrame, interval_type: str) -> None:
+        """按唯一键(symbol_id, interval_type, timestamp)写入或覆盖汇总结果"""
+        rows = self._to_rows(bars, interval_type)
+        if not rows:
+            return
+
+        update_columns = list(PRICE_COLUMNS + AGGREGATE_COLUMNS) + ['updated_at']
+        if db.engine.dialect.name == 'mysql':
+            from sqlalchemy.dialects.mysql import insert as mysql_insert
+            stmt = mysql_insert(self.table)
+            stmt = stmt.on_duplicate_key_update({column: stmt.inserted[column] for column in update_columns})
+        else:
+            from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+            stmt = sqlite_insert(self.table)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['symbol_id', 'interval_type', 'timestamp'],
+                set_={column: stmt.excluded[column] for column in update_columns}
+            )
+
+        for i in range(0, len(rows), self.chunk_size):
+            db.session.execute(stmt, rows[i:i + self.chunk_size])
+
+    @staticmethod
+    def _to_rows(bars: pd.DataFrame, interval_type: str) -> List[Dict]:
+        """汇总结果转换为表行"""
+        now = datetime.utcnow()
+        return [
+            {
+                'symbol_id': int(row.symbol_id),
+                'interval_type': interval_type,
+                'timestamp': row.timestamp.to_pydatetime(),
+                'open_price': float(row.open_price),
+                'high_price': float(row.high_price),
+                'low_price': float(row.low_price),
+                'close_price': float(row.close_price),
+                'volume': float(row.volume),
+                'bar_count': int(row.bar_count),
+                'first_timestamp': row.first_timestamp.to_pydatetime(),
+                'last_timestamp': row.last_timestamp.to_pydatetime(),
+                'updated_at': now
+            }
+            for row in bars.itertuples(index=False)
+        ]
+
+    # ============================================
+    # 读取
+    # ============================================
+
+    def read(
+        self,
+        symbol_id: int,
+        interval_type: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        limit: Optional[int] = None
+    ) -> pd.DataFrame:
+        """
+        读取一个标的的周线/月线
+
+        Args:
+            symbol_id: 标的ID
+            interval_type: 汇总周期
+            start: 开始时间，返回包含该时间之后日线的时间桶
+            end: 结束时间（不包含），返回在该时间之前开始的时间桶
+            limit: 只取最近的limit条
+
+        Returns:
+            pd.DataFrame: 列为timestamp、PRICE_COLUMNS与AGGREGATE_COLUMNS，按时间升序（不复权价格）
+        """
+        t = self.table
+        stmt = select(
+            t.c.timestamp, *[as_float(t.c[column]) for column in PRICE_COLUMNS], *[t.c[column] for column in AGGREGATE_COLUMNS]
+        ).where(t.c.symbol_id == symbol_id, t.c.interval_type == interval_type)
+        if start is not None:
+            stmt = stmt.where(t.c.last_timestamp >= start)
+        if end is not None:
+            stmt = stmt.where(t.c.timestamp < end)
+
+        with metrics_registry.timer('aggregate_bars', 'read') as timer:
+            rows = db.session.execute(stmt.order_by(t.c.timestamp.desc()).limit(limit)).all()
+            timer.rows = len(rows)
+        return pd.DataFrame(rows_to_arrays(rows[::-1], ('timestamp',) + PRICE_COLUMNS + AGGREGATE_COLUMNS))
+
+    # ============================================
+    # 重建
+    # ============================================
+
+    def rebuild(self, symbol_ids: Optional[List[int]] = None, batch_size: int = 200) -> Dict[str, Dict[str, int]]:
+        """
+        从日线重新生成汇总表（修复用）
+
+        按标的分批，每批在一个事务内删除这些标的的汇总结果后重新写入；启用冷数据归档时包含已归档的日线。
+
+        Args:
+            symbol_ids: 只重建这些标的，默认全部有日线的标的
+            batch_size: 每批的标的数
+
+        Returns:
+            Dict[str, Dict[str, int]]: 汇总周期 -> {'symbols', 'buckets'}
+        """
+        ids = symbol_ids if symbol_ids is not None else self._symbol_ids()
+        results = {interval_type: {'symbols': 0, 'buckets': 0} for interval_type in self.intervals}
+        t = self.table
+
+        for i in range(0, len(ids), batch_size):
+            batch = ids[i:i + batch_size]
+            db.session.execute(delete(t).where(t.c.symbol_id.in_(batch), t.c.interval_type.in_(self.intervals)))
+
+            rows = db.session.execute(select_bars(SOURCE_INTERVAL, batch)).all()
+            daily = self._with_archived(pd.DataFrame(rows_to_arrays(rows, ('symbol_id', 'timestamp') + PRICE_COLUMNS)), batch)
+            if len(daily):
+                for interval_type in self.intervals:
+                    bars = aggregate_bars(daily, interval_type)
+                    table_rows = self._to_rows(bars, interval_type)
+                    for j in range(0, len(table_rows), self.chunk_size):
+                        db.session.execute(insert(t), table_rows[j:j + self.chunk_size])
+                    results[interval_type]['symbols'] += int(bars['symbol_id'].nunique())
+                    results[interval_type]['buckets'] += len(bars)
+            db.session.commit()
+            logger.info(f"汇总表重建进度: {min(i + batch_size, len(ids))}/{len(ids)}")
+
+        logger.info(f"汇总表重建完成: {results}")
+        return results
+
+    @staticmethod
+    def _with_archived(daily: pd.DataFrame, symbol_ids: List[int]) -> pd.DataFrame:
+        """加入已归档的日线（归档截止时间之前以归档文件为准）"""
+        archive = get_market_data_archive()
+        if archive is None:
+            return daily
+
+        frames = []
+        for symbol_id in symbol_ids:
+            cutoff = archive.cutoff(SOURCE_INTERVAL, symbol_id)
+            if cutoff is None:
+                continue
+            daily = daily[(daily['symbol_id'] != symbol_id) | (daily['timestamp'] >= cutoff)]
+            frames.append(archive.read(SOURCE_INTERVAL, symbol_id, None, cutoff).assign(symbol_id=symbol_id))
+        if not frames:
+            return daily
+        return pd.concat(frames + [daily], ignore_index=True)
+
+    @staticmethod
+    def _symbol_ids() -> List[int]:
+        """有日线的标的"""
+        t = MarketData.__table__
+        return list(db.session.execute(
+            select(t.c.symbol_id).where(t.c.interval_type == SOURCE_INTERVAL).distinct().order_by(t.c.symbol_id)
+        ).scalars())
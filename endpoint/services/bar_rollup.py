@@ -0,0 +1,185 @@
+"""
+K线周期汇总
+新的低周期K线写入后，只重新汇总受影响的高周期时间桶（开盘取首、最高取max、最低取min、收盘取末、成交量求和）
+"""
+
+import logging
+from datetime import datetime, time, timedelta
+from typing import List, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from models import db, MarketData
+from services.metrics import metrics_registry
+from services.fast_reads import select_bars, rows_to_arrays, PRICE_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+# 分钟周期的长度（分钟）
+INTERVAL_MINUTES = {'1m': 1, '5m': 5, '15m': 15, '30m': 30, '60m': 60}
+
+# A股连续竞价时段（自零点起的分钟数）：上午09:30-11:30，下午13:00-15:00
+SESSIONS = ((9 * 60 + 30, 11 * 60 + 30), (13 * 60, 15 * 60))
+
+# 每个交易日连续竞价的总分钟数
+SESSION_MINUTES = sum(end - start for start, end in SESSIONS)
+
+# 默认汇总规则：目标周期 -> 来源周期。逐级汇总，每级写入后由写入监听器触发下一级
+DEFAULT_RULES = {'5m': '1m', '15m': '5m', '60m': '15m', '1d': '60m'}
+
+# 只有完整的时间桶才覆盖已有K线的目标周期（日线可能来自数据源的正式日线，不被盘中部分数据覆盖）
+PROTECTED_TARGETS = ('1d',)
+
+
+def bucket_timestamps(timestamps: np.ndarray, interval_type: str) -> np.ndarray:
+    """
+    向量化计算K线所属的目标周期时间桶
+
+    分钟K线以结束时间标记（如09:31为09:30-09:31的1分钟K线），时间桶同样以结束时间标记，
+    且不跨越午休：60分钟桶为10:30、11:30、14:00、15:00。开盘集合竞价（09:30）归入第一个桶，
+    盘后时间归入最后一个桶。日线桶为当日零点。
+
+    Args:
+        timestamps: 来源K线时间戳（datetime64）
+        interval_type: 目标周期
+
+    Returns:
+        np.ndarray: 与输入等长的时间桶（datetime64[ns]）
+    """
+    timestamps = np.asarray(timestamps, dtype='datetime64[ns]')
+    days = timestamps.astype('datetime64[D]')
+
+    if interval_type == '1d':
+        return days.astype('datetime64[ns]')
+
+    size = INTERVAL_MINUTES[interval_type]
+    minutes = (timestamps - days).astype('timedelta64[m]').astype(np.int64)
+
+    (morning_start, morning_end), (afternoon_start, afternoon_end) = SESSIONS
+    in_afternoon = minutes > morning_end
+    session_start = np.where(in_afternoon, afternoon_start, morning_start)
+    session_end = np.where(in_afternoon, afternoon_end, morning_end)
+
+    offset = np.clip(minutes - session_start, 1, None)
+    bucket_end = np.minimum(session_start + -(-offset // size) * size, session_end)
+
+    return days.astype('datetime64[ns]') + bucket_end.astype('timedelta64[m]')
+
+
+class BarRollupEngine:
+    """
+    K线周期汇总引擎
+
+    作为MarketDataWriter的写入监听器：来源周期的K线写入后，计算受影响的时间桶，
+    加载这些桶所在交易日的来源K线重新汇总，并通过同一个写入器写回（继而触发下一级汇总）。
+    """
+
+    def __init__(self, writer, rules: Optional[Dict[str, str]] = None):
+        """
+        初始化汇总引擎
+
+        Args:
+            writer: MarketDataWriter实例（汇总结果经它写入）
+            rules: 目标周期 -> 来源周期，默认DEFAULT_RULES
+        """
+        self.writer = writer
+        self.rules = dict(rules if rules is not None else DEFAULT_RULES)
+        self.table = MarketData.__table__
+
+    def on_write(self, interval_type: str, written: Dict[int, List[datetime]]) -> None:
+        """写入监听器：汇总以该周期为来源的所有目标周期"""
+        for target, source in self.rules.items():
+            if source == interval_type:
+                # 耗时包含写入汇总结果（及其触发的下一级汇总）
+                with metrics_registry.timer('pipeline', f'rollup_{target}') as timer:
+                    timer.rows = self.rollup(source, target, written)['buckets']
+
+    def rollup(self, source: str, target: str, written: Dict[int, List[datetime]]) -> Dict[str, int]:
+        """
+        重新汇总受影响的时间桶
+
+        Args:
+            source: 来源周期
+            target: 目标周期
+            written: 标的ID -> 新写入的来源K线时间戳
+
+        Returns:
+            Dict[str, int]: 写入统计 {'buckets', 'inserted', 'updated', 'skipped'}
+        """
+        stats = {'buckets': 0, 'inserted': 0, 'updated': 0, 'skipped': 0}
+
+        affected = pd.concat([
+            pd.DataFrame({
+                'symbol_id': symbol_id,
+                'bucket': bucket_timestamps(np.array(timestamps, dtype='datetime64[ns]'), target)
+            })
+            for symbol_id, timestamps in written.items()
+        ]).drop_duplicates()
+
+        # 时间桶不跨交易日，按受影响的交易日加载来源K线
+        all_timestamps = pd.DatetimeIndex([ts for timestamps in written.values() for ts in timestamps])
+        start = datetime.combine(all_timestamps.min().date(), time.min)
+        end = datetime.combine(all_timestamps.max().date(), time.min) + timedelta(days=1)
+
+        frame = self._load_source_bars(list(written.keys()), source, start, end)
+        if frame.empty:
+            return stats
+
+        frame['bucket'] = bucket_timestamps(frame['timestamp'].to_numpy(), target)
+        frame = frame.merge(affected, on=['symbol_id', 'bucket'])
+        if frame.empty:
+            return stats
+
+        bars = frame.sort_values(['symbol_id', 'timestamp']).groupby(['symbol_id', 'bucket'], sort=False).agg(
+            open_price=('open_price', 'first'),
+            high_price=('high_price', 'max'),
+            low_price=('low_price', 'min'),
+            close_price=('close_price', 'last'),
+            volume=('volume', 'sum'),
+            bars=('open_price', 'size')
+        ).reset_index()
+        stats['buckets'] = len(bars)
+
+        if target in PROTECTED_TARGETS:
+            # 完整的交易日覆盖已有日线，盘中不完整的只在没有日线时写入
+            complete = bars['bars'].to_numpy() >= SESSION_MINUTES // INTERVAL_MINUTES[source]
+            parts = [(bars[complete], True), (bars[~complete], False)]
+        else:
+            parts = [(bars, True)]
+
+        for part, force_update in parts:
+            if part.empty:
+                continue
+            part_stats = self.writer.write_batch(None, self._to_batch(part, target), force_update)
+            for key in ('inserted', 'updated', 'skipped'):
+                stats[key] += part_stats[key]
+
+        logger.debug(f"{source}汇总到{target}: {stats}")
+        return stats
+
+    def _load_source_bars(self, symbol_ids: List[int], source: str, start: datetime, end: datetime) -> pd.DataFrame:
+        """加载受影响交易日内的来源K线"""
+        frames = []
+        for i in range(0, len(symbol_ids), 500):
+            rows = db.session.execute(select_bars(source, symbol_ids[i:i + 500], start, end)).all()
+            if rows:
+                frames.append(pd.DataFrame(rows_to_arrays(rows, ('symbol_id', 'timestamp') + PRICE_COLUMNS)))
+
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, ignore_index=True)
+
+    @staticmethod
+    def _to_batch(bars: pd.DataFrame, target: str) -> Dict:
+        """汇总结果转换为多标的列式批次"""
+        return {
+            'interval_type': target,
+            'symbol_id': bars['symbol_id'].to_numpy(dtype=np.int64),
+            'timestamp': bars['bucket'].to_numpy(dtype='datetime64[ns]'),
+            'open_price': bars['open_price'].to_numpy(dtype=float),
+            'high_price': bars['high_price'].to_numpy(dtype=float),
+            'low_price': bars['low_price'].to_numpy(dtype=float),
+            'close_price': bars['close_price'].to_numpy(dtype=float),
+            'volume': bars['volume'].to_numpy(dtype=float)
+        }
@@ -0,0 +1,326 @@
+"""
+列式行情存储
+与MySQL并行维护的只读层：按 周期/标的/年份 分区的Parquet文件，保存不复权的float64价格，
+长区间读取直接得到NumPy数组，不经过ORM对象与Numeric转换
+"""
+
+import os
+import json
+import shutil
+import threading
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import List, Dict, Optional, Iterable
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import select
+
+from models import db, MarketData
+from services.metrics import metrics_registry
+from services.fast_reads import PRICE_COLUMNS, select_bars, rows_to_arrays
+
+logger = logging.getLogger(__name__)
+
+# 分区文件的Arrow结构
+SCHEMA = pa.schema([('timestamp', pa.timestamp('ns'))] + [(column, pa.float64()) for column in PRICE_COLUMNS])
+
+# 周期目录中标记"已从数据库完整重建"的文件，没有该文件的周期不提供读取也不追加
+READY_FILE = '_READY.json'
+
+
+class ColumnarBarStore:
+    """
+    列式行情存储
+
+    目录结构为 <root>/<周期>/<标的ID>/<年份>.parquet，每个文件按时间升序、时间戳唯一。
+    重建命令从数据库生成某个周期的全部分区后写入_READY.json；此后MarketDataWriter每次提交
+    都通过写入监听器把受影响的行合并进对应的年份分区（先写临时文件再原子替换，读取方不会看到半个文件）。
+    """
+
+    def __init__(self, root: str, compression: str = 'zstd', metrics_source: str = 'columnar_store'):
+        """
+        初始化列式存储
+
+        Args:
+            root: 存储根目录
+            compression: Parquet压缩算法
+            metrics_source: 读取与追加耗时记录到的性能指标数据源
+        """
+        self.root = Path(root)
+        self.compression = compression
+        self.metrics_source = metrics_source
+        self.table = MarketData.__table__
+        self._lock = threading.Lock()
+
+    # ============================================
+    # 读取
+    # ============================================
+
+    def is_ready(self, interval_type: str) -> bool:
+        """该周期是否已完整重建（可以代替数据库提供读取）"""
+        return (self.root / interval_type / READY_FILE).exists()
+
+    def has_symbol(self, interval_type: str, symbol_id: int) -> bool:
+        """该周期下是否有标的的分区"""
+        return (self.root / interval_type / str(symbol_id)).is_dir()
+
+    def read(
+        self,
+        interval_type: str,
+        symbol_id: int,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None
+    ) -> pd.DataFrame:
+        """
+        读取一个标的的时间区间
+
+        Args:
+            interval_type: 数据周期
+            symbol_id: 标的ID
+            start: 开始时间（包含）
+            end: 结束时间（不包含）
+
+        Returns:
+            pd.DataFrame: 列为timestamp与PRICE_COLUMNS，按时间升序
+        """
+        with metrics_registry.timer(self.metrics_source, 'read') as timer:
+            frames = [
+                pq.read_table(path, schema=SCHEMA).to_pandas()
+                for path in self._partitions(interval_type, symbol_id, start, end)
+            ]
+            if not frames:
+                return self._empty_frame()
+
+            frame = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+            timestamps = frame['timestamp'].to_numpy()
+            lo = np.searchsorted(timestamps, np.datetime64(start, 'ns')) if start is not None else 0
+            hi = np.searchsorted(timestamps, np.datetime64(end, 'ns')) if end is not None else len(frame)
+            frame = frame.iloc[lo:hi].reset_index(drop=True)
+            timer.rows = len(frame)
+            return frame
+
+    def _partitions(
+        self,
+        interval_type: str,
+        symbol_id: int,
+        start: Optional[datetime],
+        end: Optional[datetime]
+    ) -> List[Path]:
+        """与时间区间相交的年份分区（按年份升序）"""
+        directory = self.root / interval_type / str(symbol_id)
+        if not directory.is_dir():
+            return []
+
+        paths = []
+        for path in directory.glob('*.parquet'):
+            year = int(path.stem)
+            if start is not None and year < start.year:
+                continue
+            if end is not None and year > end.year:
+                continue
+            paths.append(path)
+        return sorted(paths, key=lambda path: int(path.stem))
+
+    # ============================================
+    # 写入
+    # ============================================
+
+    def on_write(self, interval_type: str, written: Dict[int, List[datetime]]) -> None:
+        """
+        写入监听器：从数据库读回受影响区间的已提交行，合并进对应分区
+
+        读回而不是直接使用写入批次，保证与数据库中按upsert/跳过规则落地的结果一致
+        """
+        if not self.is_ready(interval_type):
+            return
+
+        with metrics_registry.timer(self.metrics_source, 'append') as timer:
+            ranges = {
+                symbol_id: (min(timestamps), max(timestamps))
+                for symbol_id, timestamps in written.items() if timestamps
+            }
+            for symbol_id, frame in load_bar_frames(interval_type, ranges):
+                self.write(interval_type, symbol_id, frame)
+                timer.rows += len(frame)
+
+    def write(self, interval_type: str, symbol_id: int, frame: pd.DataFrame) -> int:
+        """
+        把行情合并进标的的年份分区（同一时间戳以新数据为准）
+
+        Args:
+            interval_type: 数据周期
+            symbol_id: 标的ID
+            frame: 列为timestamp与PRICE_COLUMNS的数据
+
+        Returns:
+            int: 写入的分区文件数
+        """
+        if frame.empty:
+            return 0
+
+        directory = self.root / interval_type / str(symbol_id)
+        years = pd.DatetimeIndex(frame['timestamp']).year
+        files = 0
+
+        with self._lock:
+            directory.mkdir(parents=True, exist_ok=True)
+            for year, part in frame.groupby(years, sort=True):
+                path = directory / f'{year}.parquet'
+                if path.exists():
+                    part = pd.concat([pq.read_table(path, schema=SCHEMA).to_pandas(), part], ignore_index=True)
+                self._write_partition(path, part)
+                files += 1
+        return files
+
+    def _write_partition(self, path: Path, frame: pd.DataFrame) -> None:
+        """排序去重后写临时文件并原子替换"""
+        frame = frame.drop_duplicates('timestamp', keep='last').sort_values('timestamp')
+        table = pa.Table.from_pandas(
+            pd.DataFrame({
+                'timestamp': frame['timestamp'].to_numpy(dtype='datetime64[ns]'),
+                **{column: frame[column].to_numpy(dtype=float) for column in PRICE_COLUMNS}
+            }),
+            schema=SCHEMA,
+            preserve_index=False
+        )
+        tmp_path = path.with_suffix('.parquet.tmp')
+        pq.write_table(table, tmp_path, compression=self.compression)
+        os.replace(tmp_path, path)
+
+    # ============================================
+    # 重建
+    # ============================================
+
+    def rebuild(
+        self,
+        interval_types: Iterable[str] = ('1d',),
+        symbol_ids: Optional[List[int]] = None,
+        batch_size: int = 200
+    ) -> Dict[str, Dict[str, int]]:
+        """
+        从数据库重新生成周期的全部分区
+
+        先在临时目录生成再替换，重建期间旧分区继续提供读取。重建周期的全部标的时替换整个周期目录并写入
+        _READY.json；只重建指定标的时逐个替换这些标的的目录，不改变周期是否可读。
+
+        Args:
+            interval_types: 要重建的周期
+            symbol_ids: 只重建这些标的，默认数据库中该周期的全部标的
+            batch_size: 每次查询的标的数
+
+        Returns:
+            Dict[str, Dict[str, int]]: 周期 -> {'symbols', 'rows', 'files'}
+        """
+        results = {}
+        for interval_type in interval_types:
+            target = self.root / interval_type
+            staging = ColumnarBarStore(str(self.root / f'.{interval_type}.rebuild'), self.compression)
+            shutil.rmtree(staging.root, ignore_errors=True)
+
+            ids = symbol_ids if symbol_ids is not None else self._symbol_ids(interval_type)
+            stats = {'symbols': 0, 'rows': 0, 'files': 0}
+            for i in range(0, len(ids), batch_size):
+                ranges = {symbol_id: (None, None) for symbol_id in ids[i:i + batch_size]}
+                for symbol_id, frame in load_bar_frames(interval_type, ranges):
+                    stats['files'] += staging.write(interval_type, symbol_id, frame)
+                    stats['symbols'] += 1
+                    stats['rows'] += len(frame)
+
+            built = staging.root / interval_type
+            built.mkdir(parents=True, exist_ok=True)
+
+            with self._lock:
+                if symbol_ids is None:
+                    (built / READY_FILE).write_text(json.dumps(
+                        dict(stats, built_at=datetime.utcnow().isoformat()), ensure_ascii=False
+                    ))
+                    shutil.rmtree(target, ignore_errors=True)
+                    target.parent.mkdir(parents=True, exist_ok=True)
+                    os.replace(built, target)
+                else:
+                    target.mkdir(parents=True, exist_ok=True)
+                    for symbol_id in ids:
+                        shutil.rmtree(target / str(symbol_id), ignore_errors=True)
+                        if (built / str(symbol_id)).is_dir():
+                            os.replace(built / str(symbol_id), target / str(symbol_id))
+            shutil.rmtree(staging.root, ignore_errors=True)
+
+            logger.info(f"列式存储{interval_type}重建完成: {stats}")
+            results[interval_type] = stats
+        return results
+
+    def _symbol_ids(self, interval_type: str) -> List[int]:
+        """数据库中有该周期行情的标的"""
+        t = self.table
+        return list(db.session.execute(
+            select(t.c.symbol_id).where(t.c.interval_type == interval_type).distinct().order_by(t.c.symbol_id)
+        ).scalars())
+
+    @staticmethod
+    def _empty_frame() -> pd.DataFrame:
+        return pd.DataFrame({
+            'timestamp': np.array([], dtype='datetime64[ns]'),
+            **{column: np.array([], dtype=float) for column in PRICE_COLUMNS}
+        })
+
+
+def load_bar_frames(interval_type: str, ranges: Dict[int, tuple]) -> Iterable[tuple]:
+    """
+    按标的读取数据库中的行情（浮点读取路径，见services.fast_reads）
+
+    Args:
+        interval_type: 数据周期
+        ranges: 标的ID -> (开始时间, 结束时间)，均包含；为None表示不限
+
+    Yields:
+        (symbol_id, pd.DataFrame)
+    """
+    if not ranges:
+        return
+
+    t = MarketData.__table__
+    starts = [start for start, _ in ranges.values()]
+    ends = [end for _, end in ranges.values()]
+    stmt = select_bars(interval_type, sorted(ranges), None if None in starts else min(starts))
+    if None not in ends:
+        stmt = stmt.where(t.c.timestamp <= max(ends))
+
+    rows = db.session.execute(stmt).all()
+    if not rows:
+        return
+
+    frame = pd.DataFrame(rows_to_arrays(rows, ('symbol_id', 'timestamp') + PRICE_COLUMNS))
+
+    for symbol_id, part in frame.groupby('symbol_id', sort=False):
+        start, end = ranges[symbol_id]
+        if start is not None:
+            part = part[(part['timestamp'] >= start) & (part['timestamp'] <= end)]
+        if not part.empty:
+            yield int(symbol_id), part.drop(columns='symbol_id').reset_index(drop=True)
+
+
+_columnar_store: Optional[ColumnarBarStore] = None
+_store_lock = threading.Lock()
+
+
+def get_columnar_store() -> Optional[ColumnarBarStore]:
+    """
+    获取共享的列式存储，根目录由环境变量COLUMNAR_STORE_DIR指定
+
+    Returns:
+        Optional[ColumnarBarStore]: 未配置时返回None（所有读取走数据库）
+    """
+    global _columnar_store
+
+    root = os.environ.get('COLUMNAR_STORE_DIR')
+    if not root:
+        return None
+
+    with _store_lock:
+        if _columnar_store is None or _columnar_store.root != Path(root):
+            _columnar_store = ColumnarBarStore(root)
+        return _columnar_store
@@ -1,12 +1,24 @@
 import yfinance as yf
+import numpy as np
 import pandas as pd
 import ccxt
 from models import db, MarketData, Symbol
+from services.adjustment_factors import AdjustmentFactorStore, ADJUST_TYPES
+from services.mmap_store import get_mmap_store, window_to_frame
+from services.latest_bars import LatestBarStore
 from datetime import datetime, timedelta
 import logging
 
 logger = logging.getLogger(__name__)
 
+# get_technical_indicator_frame计算的指标列
+INDICATOR_COLUMNS = (
+    'sma_20', 'sma_50', 'rsi', 'macd', 'macd_signal', 'macd_histogram', 'bb_upper', 'bb_middle', 'bb_lower'
+)
+
+# 按复权因子调整的价格字段（成交量不调整）
+ADJUSTED_PRICE_FIELDS = ('open_price', 'high_price', 'low_price', 'close_price')
+
 class DataService:
     """数据服务类"""
     
@@ -15,9 +27,13 @@ class DataService:
             'binance': ccxt.binance(),
             'okx': ccxt.okx(),
         }
+        # 行情表保存不复权价格，读取时按复权因子复权（与MarketDataService相同）
+        self.adjustments = AdjustmentFactorStore()
     
-    def get_market_data(self, symbol, start_date=None, end_date=None, limit=1000):
-        """获取市场数据"""
+    def get_market_data(self, symbol, start_date=None, end_date=None, limit=1000, adjust='qfq'):
+        """获取市场数据（数据库中的K线按adjust复权，默认前复权）"""
+        if adjust not in ADJUST_TYPES:
+            raise ValueError(f"不支持的复权方式: {adjust}")
         try:
             # 首先尝试从数据库获取
             symbol_obj = Symbol.query.filter_by(symbol=symbol).first()
@@ -25,8 +41,8 @@ class DataService:
                 # 如果数据库中没有，尝试从Yahoo Finance获取
                 return self._get_yahoo_data(symbol, start_date, end_date, limit)
             
-            # 从数据库查询
-            query = MarketData.query.filter_by(symbol_id=symbol_obj.id)
+            # 从数据库查询日线（同一张表中还保存分钟K线）
+            query = MarketData.query.filter_by(symbol_id=symbol_obj.id, interval_type='1d')
             
             if start_date:
                 query = query.filter(MarketData.timestamp >= start_date)
@@ -39,7 +55,18 @@ class DataService:
                 # 如果数据库中没有数据，从外部API获取
                 return self._fetch_and_store_data(symbol, start_date, end_date, limit)
             
-            return [d.to_dict() for d in data]
+            records = [d.to_dict() for d in data]
+            multipliers = self.adjustments.multipliers(
+                symbol_obj.id, np.array([d.timestamp for d in data], dtype='datetime64[ns]'), adjust
+            )
+            if multipliers is not None:
+                for record, multiplier in zip(records, multipliers.tolist()):
+                    for field in ADJUSTED_PRICE_FIELDS:
+                        record[field] *= multiplier
+                    # 涨跌幅为比值，复权后不变
+                    record['price_change'] *= multiplier
+                    record['high_low_spread'] *= multiplier
+            return records
             
         except Exception as e:
             logger.error(f"获取市场数据失败: {e}")
@@ -51,13 +78,13 @@ class DataService:
             # 尝试从数据库获取最新价格
             symbol_obj = Symbol.query.filter_by(symbol=symbol).first()
             if symbol_obj:
-                latest_data = MarketData.query.filter_by(symbol_id=symbol_obj.id)\
-                    .order_by(MarketData.timestamp.desc()).first()
-                if latest_data:
+                # 最新K线表每个周期一行，取各周期中时间最新的一行
+                latest_bar = LatestBarStore().latest_for_symbol(symbol_obj.id)
+                if latest_bar:
                     return {
                         'symbol': symbol,
-                        'price': float(latest_data.close_price),
-                        'timestamp': latest_data.timestamp.isoformat()
+                        'price': latest_bar['close_price'],
+                        'timestamp': latest_bar['timestamp'].isoformat()
                     }
             
             # 从外部API获取最新价格
@@ -166,6 +193,12 @@ class DataService:
                 )
                 db.session.add(market_data)
             
+            LatestBarStore().upsert([{
+                'symbol_id': symbol_obj.id, 'interval_type': '1d',
+                'timestamp': datetime.fromisoformat(item['timestamp'].replace('Z', '+00:00')),
+                'open_price': item['open_price'], 'high_price': item['high_price'],
+                'low_price': item['low_price'], 'close_price': item['close_price'], 'volume': item['volume']
+            } for item in data])
             db.session.commit()
             
             return data
@@ -197,16 +230,40 @@ class DataService:
             logger.error(f"更新市场数据失败: {e}")
             return False
     
-    def get_technical_indicators(self, symbol, period=20):
+    def get_technical_indicators(self, symbol, period=20, adjust='qfq'):
         """获取技术指标"""
+        df = self.get_technical_indicator_frame(symbol, period, adjust)
+        return df.to_dict('records') if df is not None else None
+    
+    def get_technical_indicator_frame(self, symbol, period=20, adjust='qfq'):
+        """获取技术指标（DataFrame，按时间升序，二进制返回格式直接按列编码；价格按adjust复权，默认前复权）"""
+        if adjust not in ADJUST_TYPES:
+            raise ValueError(f"不支持的复权方式: {adjust}")
         try:
-            data = self.get_market_data(symbol, limit=period * 2)
-            if len(data) < period:
-                return None
-            
-            df = pd.DataFrame(data)
-            df['timestamp'] = pd.to_datetime(df['timestamp'])
-            df = df.sort_values('timestamp')
+            # 优先从内存映射存储切取最近的日线窗口（多进程共享页缓存，不查询数据库）
+            store = get_mmap_store()
+            window = store.get_window(symbol, count=period * 2) if store is not None else None
+            
+            if window is not None:
+                if len(window) < period:
+                    return None
+                df = window_to_frame(window)
+                # 映射文件保存不复权价格，与数据库路径一样按复权因子调整
+                symbol_obj = Symbol.query.filter_by(symbol=symbol).first()
+                multipliers = self.adjustments.multipliers(
+                    symbol_obj.id, df['timestamp'].to_numpy(), adjust
+                ) if symbol_obj else None
+                if multipliers is not None:
+                    for field in ADJUSTED_PRICE_FIELDS:
+                        df[field] = df[field].to_numpy() * multipliers
+            else:
+                data = self.get_market_data(symbol, limit=period * 2, adjust=adjust)
+                if len(data) < period:
+                    return None
+                
+                df = pd.DataFrame(data)
+                df['timestamp'] = pd.to_datetime(df['timestamp'])
+                df = df.sort_values('timestamp')
             
             # 计算移动平均线
             df['sma_20'] = df['close_price'].rolling(window=period).mean()
@@ -227,7 +284,7 @@ class DataService:
             df['bb_middle'] = bb_data['middle']
             df['bb_lower'] = bb_data['lower']
             
-            return df.to_dict('records')
+            return df
             
         except Exception as e:
             logger.error(f"计算技术指标失败: {e}")
@@ -3,18 +3,28 @@
 提供统一的股票数据获取接口
 """
 
-from .base_data_source import BaseDataSource
+import os
+
+from .base_data_source import BaseDataSource, batch_to_records
 from .akshare_data_source import AKShareDataSource
+from .cached_data_source import CachedDataSource
+from .composite_data_source import CompositeDataSource, get_source_health
+from .local_file_data_source import LocalFileDataSource, InjectedSourceError
 
 # 数据源注册表
 DATA_SOURCES = {
     'akshare': AKShareDataSource,
+    'composite': CompositeDataSource,
+    'local': LocalFileDataSource,
 }
 
 def create_data_source(source_name: str, config: dict = None):
     """
     创建数据源实例
     
+    配置中包含cache或设置了环境变量DATA_SOURCE_CACHE_DIR时，
+    返回带磁盘缓存的包装数据源
+    
     Args:
         source_name: 数据源名称
         config: 配置参数
@@ -25,7 +35,15 @@ def create_data_source(source_name: str, config: dict = None):
     if source_name not in DATA_SOURCES:
         raise ValueError(f"不支持的数据源: {source_name}")
     
-    return DATA_SOURCES[source_name](config)
+    data_source = DATA_SOURCES[source_name](config)
+    
+    cache_config = (config or {}).get('cache')
+    if cache_config is None and os.environ.get('DATA_SOURCE_CACHE_DIR'):
+        cache_config = {}
+    if cache_config is not None and cache_config is not False:
+        data_source = CachedDataSource(data_source, cache_config if isinstance(cache_config, dict) else {})
+    
+    return data_source
 
 def list_available_sources():
     """获取可用的数据源列表"""
@@ -33,7 +51,13 @@ def list_available_sources():
 
 __all__ = [
     'BaseDataSource',
+    'batch_to_records',
     'AKShareDataSource', 
+    'CachedDataSource',
+    'CompositeDataSource',
+    'get_source_health',
+    'LocalFileDataSource',
+    'InjectedSourceError',
     'DATA_SOURCES',
     'create_data_source',
     'list_available_sources'
@@ -4,16 +4,17 @@ AKShare数据源实现
 """
 
 import akshare as ak
+import numpy as np
 import pandas as pd
 from datetime import datetime, date, timedelta
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Union
 import logging
-import time
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
-from .base_data_source import BaseDataSource
+from services.trading_calendar import get_trading_calendar
+from .base_data_source import BaseDataSource, frame_to_records
 
 logger = logging.getLogger(__name__)
 
@@ -28,7 +29,12 @@ class AKShareDataSource(BaseDataSource):
             config: 配置参数，可包含:
                 - timeout: 请求超时时间
                 - retry_times: 重试次数
-                - delay: 请求间隔
+                - delay: 请求间隔（兼容旧配置，等价于每秒1/delay次请求）
+                - rate_limit: 限流配置 {requests_per_second, burst, max_in_flight}
+                - adjust: 复权方式，''不复权（默认，复权在读取时按复权因子计算）、'qfq'前复权、'hfq'后复权
+                - raise_errors: 获取失败时抛出异常而不是返回空数据（供故障转移判断）
+                - request_retries: 单次请求失败后的重试次数（默认2，指数退避）
+                - retry_backoff: 首次重试前的等待秒数（默认1）
                 - base_url: 基础URL（如果需要）
         """
         super().__init__("AKShare", config)
@@ -36,7 +42,9 @@ class AKShareDataSource(BaseDataSource):
         # 默认配置
         self.timeout = self.config.get('timeout', 30)
         self.retry_times = self.config.get('retry_times', 3)
-        self.delay = self.config.get('delay', 1)  # 请求间隔，避免频率限制
+        self.delay = self.config.get('delay')  # 请求间隔，避免频率限制
+        self.adjust = self.config.get('adjust', '')  # 复权方式，默认入库不复权价格
+        self.raise_errors = self.config.get('raise_errors', False)  # 失败时抛出异常
         
         # 设置requests会话
         self.session = requests.Session()
@@ -62,6 +70,19 @@ class AKShareDataSource(BaseDataSource):
             '000852': '000852'
         }
     
+    # 东方财富接口偶发断开连接，默认重试两次
+    DEFAULT_REQUEST_RETRIES = 2
+    
+    def get_rate_limit_config(self) -> Dict:
+        """获取AKShare限流配置"""
+        rate_limit = {
+            'requests_per_second': 1.0 / self.delay if self.delay else 5.0,
+            'burst': 5,
+            'max_in_flight': 4
+        }
+        rate_limit.update(self.config.get('rate_limit', {}))
+        return rate_limit
+    
     def connect(self) -> bool:
         """连接数据源（测试akshare可用性）"""
         try:
@@ -86,51 +107,52 @@ class AKShareDataSource(BaseDataSource):
         self.is_connected = False
         logger.info("AKShare数据源已断开连接")
     
-    def get_stock_list(self, market: str = 'A股') -> List[Dict]:
+    def get_stock_list(self, market: str = 'A股', as_frame: bool = False) -> Union[List[Dict], pd.DataFrame]:
         """
         获取A股股票列表
         
         Args:
             market: 市场类型，目前支持'A股'
+            as_frame: 是否返回以股票代码为索引的DataFrame（便于O(1)查找）
             
         Returns:
-            List[Dict]: 股票列表
+            Union[List[Dict], pd.DataFrame]: 股票列表
         """
         try:
             logger.info(f"获取{market}股票列表...")
             
             # 获取A股实时数据（包含所有股票信息）
-            df = ak.stock_zh_a_spot_em()
+            snapshot = self.get_spot_snapshot()
             
-            if df.empty:
+            if snapshot.empty:
                 logger.warning("获取股票列表为空")
-                return []
+                return pd.DataFrame() if as_frame else []
             
-            stock_list = []
-            for _, row in df.iterrows():
-                try:
-                    stock_info = {
-                        'symbol': str(row['代码']),
-                        'name': str(row['名称']),
-                        'exchange': 'SH' if str(row['代码']).startswith('6') else 'SZ',
-                        'asset_type': 'stock',
-                        'is_active': True,
-                        'latest_price': float(row.get('最新价', 0)),
-                        'change_pct': float(row.get('涨跌幅', 0)),
-                        'volume': float(row.get('成交量', 0)),
-                        'market_cap': float(row.get('总市值', 0)) if '总市值' in row else None
-                    }
-                    stock_list.append(stock_info)
-                except (ValueError, KeyError) as e:
-                    logger.warning(f"处理股票数据时出错: {e}, 跳过股票: {row.get('代码', 'Unknown')}")
-                    continue
+            symbols = snapshot.index.to_series()
+            frame = pd.DataFrame({
+                'name': snapshot['name'],
+                'exchange': np.where(symbols.str.startswith('6'), 'SH', 'SZ'),
+                'asset_type': 'stock',
+                'is_active': True,
+                'latest_price': snapshot['latest_price'].fillna(0),
+                'change_pct': snapshot['change_pct'].fillna(0),
+                'volume': snapshot['volume'].fillna(0),
+                'market_cap': snapshot['market_cap'] if 'market_cap' in snapshot.columns else None
+            }, index=snapshot.index)
+            
+            logger.info(f"成功获取{len(frame)}只股票信息")
             
-            logger.info(f"成功获取{len(stock_list)}只股票信息")
-            return stock_list
+            if as_frame:
+                return frame
+            
+            frame['market_cap'] = frame['market_cap'].astype(object).where(frame['market_cap'].notna(), None)
+            return frame_to_records(frame.reset_index())
             
         except Exception as e:
             logger.error(f"获取股票列表失败: {e}")
-            return []
+            if self.raise_errors:
+                raise
+            return pd.DataFrame() if as_frame else []
     
     def get_index_components(self, index_code: str) -> List[Dict]:
         """
@@ -147,16 +169,8 @@ class AKShareDataSource(BaseDataSource):
             standard_code = self.index_mapping.get(index_code, index_code)
             logger.info(f"获取指数{index_code}({standard_code})的成分股...")
             
-            # 获取指数成分股
-            if standard_code == '000905':  # 上证500
-                df = ak.index_stock_cons(symbol=standard_code)
-            elif standard_code == '000300':  # 沪深300
-                df = ak.index_stock_cons(symbol=standard_code)
-            elif standard_code == '000852':  # 中证1000
-                df = ak.index_stock_cons(symbol=standard_code)
-            else:
-                # 尝试通用方法
-                df = ak.index_stock_cons(symbol=standard_code)
+            # 获取指数成分股（上证500、沪深300、中证1000及其他指数使用同一接口）
+            df = self.call('get_index_components', ak.index_stock_cons, symbol=standard_code)
             
             if df.empty:
                 logger.warning(f"指数{index_code}成分股为空")
@@ -183,6 +197,8 @@ class AKShareDataSource(BaseDataSource):
             
         except Exception as e:
             logger.error(f"获取指数{index_code}成分股失败: {e}")
+            if self.raise_errors:
+                raise
             return []
     
     def get_historical_data(
@@ -199,35 +215,31 @@ class AKShareDataSource(BaseDataSource):
             symbol: 股票代码
             start_date: 开始日期
             end_date: 结束日期
-            period: 数据周期，目前支持'1d'
+            period: 数据周期，支持'1d'及分钟周期'1m'/'5m'/'15m'/'30m'/'60m'
             
         Returns:
             pd.DataFrame: 历史数据
         """
+        if period in self.MINUTE_PERIODS:
+            return self._get_minute_data(symbol, start_date, end_date, period)
+        
         try:
             logger.info(f"获取{symbol}从{start_date}到{end_date}的历史数据...")
             
-            # 添加请求延迟，避免频率限制
-            if hasattr(self, '_last_request_time'):
-                elapsed = time.time() - self._last_request_time
-                if elapsed < self.delay:
-                    time.sleep(self.delay - elapsed)
-            
             # 格式化日期
             start_str = start_date.strftime('%Y%m%d')
             end_str = end_date.strftime('%Y%m%d')
             
-            # 获取股票历史数据
-            df = ak.stock_zh_a_hist(
+            # 获取股票历史数据（经进程级限流器，避免频率限制）
+            df = self.call(
+                'get_historical_data', ak.stock_zh_a_hist,
                 symbol=symbol,
                 period='daily',
                 start_date=start_str,
                 end_date=end_str,
-                adjust='qfq'  # 前复权
+                adjust=self.adjust
             )
             
-            self._last_request_time = time.time()
-            
             if df.empty:
                 logger.warning(f"股票{symbol}的历史数据为空")
                 return pd.DataFrame()
@@ -265,89 +277,240 @@ class AKShareDataSource(BaseDataSource):
             
         except Exception as e:
             logger.error(f"获取{symbol}历史数据失败: {e}")
+            if self.raise_errors:
+                raise
             return pd.DataFrame()
     
-    def get_latest_data(self, symbols: List[str]) -> Dict[str, Dict]:
+    # 分钟周期 -> 东方财富分钟行情接口的period参数
+    MINUTE_PERIODS = {'1m': '1', '5m': '5', '15m': '15', '30m': '30', '60m': '60'}
+    
+    def _get_minute_data(self, symbol: str, start_date: date, end_date: date, period: str) -> pd.DataFrame:
+        """
+        获取分钟K线（时间为K线结束时间；1分钟K线只提供最近数个交易日）
+        
+        Args:
+            symbol: 股票代码
+            start_date: 开始日期
+            end_date: 结束日期
+            period: 分钟周期
+            
+        Returns:
+            pd.DataFrame: 以时间为索引的分钟数据
+        """
+        try:
+            logger.info(f"获取{symbol}从{start_date}到{end_date}的{period}分钟数据...")
+            
+            df = self.call(
+                f'get_historical_data_{period}', ak.stock_zh_a_hist_min_em,
+                symbol=symbol,
+                start_date=f"{start_date.strftime('%Y-%m-%d')} 09:00:00",
+                end_date=f"{end_date.strftime('%Y-%m-%d')} 15:30:00",
+                period=self.MINUTE_PERIODS[period],
+                adjust=self.adjust
+            )
+            
+            if df is None or df.empty:
+                logger.warning(f"股票{symbol}的{period}分钟数据为空")
+                return pd.DataFrame()
+            
+            df = df.rename(columns={
+                '时间': 'date',
+                '开盘': 'open',
+                '收盘': 'close',
+                '最高': 'high',
+                '最低': 'low',
+                '成交量': 'volume',
+                '成交额': 'amount'
+            })
+            df['date'] = pd.to_datetime(df['date'])
+            df.set_index('date', inplace=True)
+            
+            for col in ['open', 'close', 'high', 'low', 'volume', 'amount']:
+                if col in df.columns:
+                    df[col] = pd.to_numeric(df[col], errors='coerce')
+            
+            logger.info(f"成功获取{symbol}的{len(df)}条{period}分钟数据")
+            return df
+            
+        except Exception as e:
+            logger.error(f"获取{symbol}的{period}分钟数据失败: {e}")
+            if self.raise_errors:
+                raise
+            return pd.DataFrame()
+    
+    # 实时行情列名 -> 统一列名
+    SPOT_COLUMN_MAPPING = {
+        '代码': 'symbol',
+        '名称': 'name',
+        '最新价': 'latest_price',
+        '今开': 'open',
+        '最高': 'high',
+        '最低': 'low',
+        '昨收': 'pre_close',
+        '成交量': 'volume',
+        '成交额': 'amount',
+        '涨跌额': 'change_amount',
+        '涨跌幅': 'change_pct',
+        '总市值': 'market_cap'
+    }
+    
+    def get_spot_snapshot(self) -> pd.DataFrame:
+        """
+        获取全市场实时行情快照（一次请求）
+        
+        Returns:
+            pd.DataFrame: 以股票代码为索引的快照，列为统一列名，数值列已转换为float
+        """
+        try:
+            df = self.call('get_spot_snapshot', ak.stock_zh_a_spot_em)
+            
+            if df is None or df.empty:
+                logger.warning("获取实时行情快照为空")
+                return pd.DataFrame()
+            
+            df = df[[c for c in self.SPOT_COLUMN_MAPPING if c in df.columns]]\
+                .rename(columns=self.SPOT_COLUMN_MAPPING)
+            
+            numeric_columns = [c for c in df.columns if c not in ('symbol', 'name')]
+            df[numeric_columns] = df[numeric_columns].apply(pd.to_numeric, errors='coerce')
+            df['symbol'] = df['symbol'].astype(str)
+            df['name'] = df['name'].astype(str)
+            
+            return df.set_index('symbol')
+            
+        except Exception as e:
+            logger.error(f"获取实时行情快照失败: {e}")
+            if self.raise_errors:
+                raise
+            return pd.DataFrame()
+    
+    # 快照统一列名 -> 最新行情字段名
+    LATEST_DATA_COLUMNS = {
+        'name': 'name',
+        'latest_price': 'latest_price',
+        'open': 'open_price',
+        'high': 'high_price',
+        'low': 'low_price',
+        'pre_close': 'close_price',  # 昨收作为前一交易日收盘价
+        'volume': 'volume',
+        'amount': 'amount',
+        'change_amount': 'change_amount',
+        'change_pct': 'change_pct',
+        'market_cap': 'market_cap'
+    }
+    
+    def get_latest_data(
+        self, 
+        symbols: List[str], 
+        as_frame: bool = False
+    ) -> Union[Dict[str, Dict], pd.DataFrame]:
         """
         获取最新行情数据
         
         Args:
             symbols: 股票代码列表
+            as_frame: 是否返回以股票代码为索引的DataFrame（便于O(1)查找）
             
         Returns:
-            Dict[str, Dict]: 最新数据字典
+            Union[Dict[str, Dict], pd.DataFrame]: 最新数据
         """
         try:
             logger.info(f"获取{len(symbols)}只股票的最新行情数据...")
             
             # 获取实时行情数据
-            df = ak.stock_zh_a_spot_em()
+            snapshot = self.get_spot_snapshot()
             
-            if df.empty:
+            if snapshot.empty:
                 logger.warning("获取实时行情数据为空")
-                return {}
+                return pd.DataFrame() if as_frame else {}
             
-            # 筛选指定股票
-            df_filtered = df[df['代码'].isin(symbols)]
+            # 筛选指定股票并统一字段名
+            columns = {k: v for k, v in self.LATEST_DATA_COLUMNS.items() if k in snapshot.columns}
+            frame = snapshot.loc[snapshot.index.isin(symbols), list(columns)].rename(columns=columns)
+            if 'market_cap' not in frame.columns:
+                frame['market_cap'] = None
+            frame.insert(0, 'symbol', frame.index)
+            frame['timestamp'] = datetime.now()
             
-            latest_data = {}
-            for _, row in df_filtered.iterrows():
-                try:
-                    symbol = str(row['代码'])
-                    latest_data[symbol] = {
-                        'symbol': symbol,
-                        'name': str(row['名称']),
-                        'latest_price': float(row['最新价']),
-                        'open_price': float(row['今开']),
-                        'high_price': float(row['最高']),
-                        'low_price': float(row['最低']),
-                        'close_price': float(row['昨收']),  # 昨收作为前一交易日收盘价
-                        'volume': float(row['成交量']),
-                        'amount': float(row['成交额']),
-                        'change_amount': float(row['涨跌额']),
-                        'change_pct': float(row['涨跌幅']),
-                        'timestamp': datetime.now(),
-                        'market_cap': float(row.get('总市值', 0)) if '总市值' in row else None
-                    }
-                except (ValueError, KeyError) as e:
-                    logger.warning(f"处理股票{row.get('代码', 'Unknown')}最新数据时出错: {e}")
-                    continue
+            logger.info(f"成功获取{len(frame)}只股票的最新数据")
+            
+            if as_frame:
+                return frame
             
-            logger.info(f"成功获取{len(latest_data)}只股票的最新数据")
-            return latest_data
+            return dict(zip(frame.index, frame_to_records(frame)))
             
         except Exception as e:
             logger.error(f"获取最新行情数据失败: {e}")
-            return {}
+            if self.raise_errors:
+                raise
+            return pd.DataFrame() if as_frame else {}
     
-    def get_trading_dates(self, start_date: date, end_date: date) -> List[date]:
+    def get_adjustment_factors(self, symbol: str) -> pd.DataFrame:
         """
-        获取交易日历
+        获取后复权累计因子（新浪复权因子接口）
         
         Args:
-            start_date: 开始日期
-            end_date: 结束日期
+            symbol: 股票代码
             
         Returns:
-            List[date]: 交易日期列表
+            pd.DataFrame: 列为 ex_date 与 factor，按ex_date升序
         """
         try:
-            start_str = start_date.strftime('%Y%m%d')
-            end_str = end_date.strftime('%Y%m%d')
+            code = self.standardize_symbol(symbol)
+            df = self.call(
+                'get_adjustment_factors', ak.stock_zh_a_daily,
+                symbol=f"{self._exchange_prefix(code)}{code}", adjust='hfq-factor'
+            )
             
-            df = ak.stock_zh_a_trade_date()
-            df['trade_date'] = pd.to_datetime(df['trade_date'])
+            if df is None or df.empty:
+                return pd.DataFrame(columns=['ex_date', 'factor'])
             
-            # 筛选日期范围
-            mask = (df['trade_date'] >= pd.to_datetime(start_date)) & \
-                   (df['trade_date'] <= pd.to_datetime(end_date))
+            factor_column = next(c for c in df.columns if 'factor' in str(c))
+            factors = pd.DataFrame({
+                'ex_date': pd.to_datetime(df['date']).dt.date,
+                'factor': pd.to_numeric(df[factor_column], errors='coerce')
+            }).dropna()
             
-            trading_dates = df.loc[mask, 'trade_date'].dt.date.tolist()
-            return trading_dates
+            return factors.sort_values('ex_date').reset_index(drop=True)
             
         except Exception as e:
-            logger.error(f"获取交易日历失败: {e}")
-            return []
+            logger.error(f"获取{symbol}复权因子失败: {e}")
+            if self.raise_errors:
+                raise
+            return pd.DataFrame(columns=['ex_date', 'factor'])
+    
+    @staticmethod
+    def _exchange_prefix(code: str) -> str:
+        """新浪接口的交易所前缀"""
+        if code.startswith(('6', '9')):
+            return 'sh'
+        if code.startswith(('4', '8')):
+            return 'bj'
+        return 'sz'
+    
+    def fetch_trading_calendar(self) -> List[date]:
+        """
+        下载完整的交易日历（网络请求，由TradingCalendar加载/刷新时调用）
+        
+        Returns:
+            List[date]: 全部交易日期
+        """
+        df = self.call('fetch_trading_calendar', ak.stock_zh_a_trade_date)
+        
+        return pd.to_datetime(df['trade_date']).dt.date.tolist()
+    
+    def get_trading_dates(self, start_date: date, end_date: date) -> List[date]:
+        """
+        获取交易日历
+        
+        Args:
+            start_date: 开始日期
+            end_date: 结束日期
+            
+        Returns:
+            List[date]: 交易日期列表
+        """
+        return get_trading_calendar(self).trading_days_between(start_date, end_date)
     
     def is_trading_day(self, check_date: date) -> bool:
         """
@@ -359,12 +522,7 @@ class AKShareDataSource(BaseDataSource):
         Returns:
             bool: 是否为交易日
         """
-        try:
-            trading_dates = self.get_trading_dates(check_date, check_date)
-            return check_date in trading_dates
-        except Exception:
-            # 简单判断：周一到周五且不是节假日（简化版）
-            return check_date.weekday() < 5
+        return get_trading_calendar(self).is_trading_day(check_date)
     
     def standardize_symbol(self, symbol: str) -> str:
         """
@@ -4,11 +4,16 @@
 """
 
 from abc import ABC, abstractmethod
-from typing import List, Dict, Optional, Tuple
+from typing import List, Dict, Optional, Tuple, Callable
 from datetime import datetime, date
+import time
+import numpy as np
 import pandas as pd
 import logging
 
+from services.rate_limiter import get_rate_limiter, TokenBucketRateLimiter
+from services.metrics import metrics_registry, result_size
+
 logger = logging.getLogger(__name__)
 
 class BaseDataSource(ABC):
@@ -102,6 +107,99 @@ class BaseDataSource(ABC):
         """
         pass
     
+    def get_rate_limit_config(self) -> Dict:
+        """
+        获取限流配置（子类可以重写默认值）
+        
+        Returns:
+            Dict: requests_per_second / burst / max_in_flight
+        """
+        return self.config.get('rate_limit', {})
+    
+    @property
+    def rate_limiter(self) -> TokenBucketRateLimiter:
+        """进程级共享限流器，同名数据源的所有实例共用"""
+        return get_rate_limiter(self.name.lower(), self.get_rate_limit_config())
+    
+    # 请求失败时的默认重试次数（配置项request_retries覆盖）
+    DEFAULT_REQUEST_RETRIES = 0
+    
+    def call(self, operation: str, func: Callable, *args, **kwargs):
+        """
+        经限流器执行一次上游请求：失败时按指数退避重试，并把耗时、行数、字节数、
+        重试次数与限流等待时间记录到指标注册表（退避等待期间不占用并发许可）
+        
+        Args:
+            operation: 操作名称（如get_historical_data）
+            func: 实际发起请求的函数
+            *args, **kwargs: 传给func的参数
+            
+        Returns:
+            func的返回值；重试耗尽后抛出最后一次的异常
+        """
+        retries = int(self.config.get('request_retries', self.DEFAULT_REQUEST_RETRIES))
+        backoff = float(self.config.get('retry_backoff', 1.0))
+        limiter = self.rate_limiter
+        source = self.name.lower()
+        
+        waited = elapsed = 0.0
+        attempt = 0
+        while True:
+            waited += limiter.acquire()
+            started = time.perf_counter()
+            error = None
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                error = e
+            finally:
+                elapsed += time.perf_counter() - started
+                limiter.release()
+            
+            if error is None:
+                rows, size = result_size(result)
+                metrics_registry.record(source, operation, elapsed, rows, size, False, attempt, waited)
+                return result
+            
+            if attempt >= retries:
+                metrics_registry.record(source, operation, elapsed, 0, 0, True, attempt, waited)
+                raise error
+            
+            attempt += 1
+            logger.warning(f"{self.name}请求{operation}失败，第{attempt}次重试: {error}")
+            time.sleep(backoff * 2 ** (attempt - 1))
+    
+    def get_spot_snapshot(self) -> pd.DataFrame:
+        """
+        获取全市场实时行情快照（子类可以重写）
+        
+        Returns:
+            pd.DataFrame: 以股票代码为索引，包含 open/high/low/latest_price/volume 等列；
+                          不支持时返回空DataFrame
+        """
+        return pd.DataFrame()
+    
+    def fetch_trading_calendar(self) -> List[date]:
+        """
+        下载完整的交易日历，默认不提供（交易日历按工作日近似）
+        
+        Returns:
+            List[date]: 全部交易日期
+        """
+        return []
+    
+    def get_adjustment_factors(self, symbol: str) -> pd.DataFrame:
+        """
+        获取后复权累计因子（子类可以重写），默认不提供（视为没有除权除息）
+        
+        Args:
+            symbol: 股票代码
+            
+        Returns:
+            pd.DataFrame: 列为 ex_date（date）与 factor（float），按ex_date升序
+        """
+        return pd.DataFrame(columns=['ex_date', 'factor'])
+    
     def validate_symbol(self, symbol: str) -> bool:
         """
         验证股票代码格式
@@ -126,13 +224,116 @@ class BaseDataSource(ABC):
         """
         return symbol.upper().strip()
     
-    def format_market_data(self, raw_data: pd.DataFrame, symbol: str) -> List[Dict]:
+    # 统一字段 -> 原始列名候选（英文列名优先，其次中文列名）
+    MARKET_DATA_COLUMNS = {
+        'open_price': ('open', '开盘'),
+        'high_price': ('high', '最高'),
+        'low_price': ('low', '最低'),
+        'close_price': ('close', '收盘'),
+        'volume': ('volume', '成交量'),
+    }
+    PRICE_COLUMNS = ['open_price', 'high_price', 'low_price', 'close_price']
+    
+    def format_market_data_columnar(
+        self, 
+        raw_data: pd.DataFrame, 
+        symbol: str, 
+        interval_type: str = '1d'
+    ) -> Dict:
         """
-        格式化市场数据为统一格式
+        向量化格式化市场数据为列式批次
+        
+        列名映射只解析一次，价格有效性用数组掩码校验（负价格及无法解析的价格被过滤）
+        
+        Args:
+            raw_data: 原始数据（索引或date/日期列为时间）
+            symbol: 股票代码
+            interval_type: 数据周期
+            
+        Returns:
+            Dict: 列式批次，包含 symbol、interval_type 标量以及
+                  timestamp(datetime64[ns])、open_price/high_price/low_price/close_price/volume(float64) 数组
+        """
+        length = len(raw_data)
+        columns = {}
+        available = set(raw_data.columns)
+        
+        for field, candidates in self.MARKET_DATA_COLUMNS.items():
+            source_column = next((c for c in candidates if c in available), None)
+            if source_column is None:
+                columns[field] = np.zeros(length, dtype=np.float64)
+            else:
+                columns[field] = pd.to_numeric(raw_data[source_column], errors='coerce')\
+                    .to_numpy(dtype=np.float64, na_value=np.nan)
+        
+        timestamps = self._resolve_timestamps(raw_data)
+        
+        # 价格均为非负数才保留（NaN比较结果为False，同样被过滤）
+        mask = np.ones(length, dtype=bool)
+        for field in self.PRICE_COLUMNS:
+            mask &= columns[field] >= 0
+        mask &= ~np.isnat(timestamps)
+        
+        batch = {
+            'symbol': symbol,
+            'interval_type': interval_type,
+            'timestamp': timestamps[mask]
+        }
+        for field, values in columns.items():
+            batch[field] = values[mask]
+        batch['volume'] = np.nan_to_num(batch['volume'], nan=0.0)
+        
+        dropped = length - int(mask.sum())
+        if dropped:
+            logger.warning(f"格式化{symbol}数据时过滤{dropped}行无效数据")
+        
+        return batch
+    
+    def _resolve_timestamps(self, raw_data: pd.DataFrame) -> np.ndarray:
+        """解析时间列：优先使用时间索引，否则使用date/日期列"""
+        index = raw_data.index
+        if not isinstance(index, pd.DatetimeIndex):
+            for column in ('date', '日期'):
+                if column in raw_data.columns:
+                    index = raw_data[column]
+                    break
+        
+        timestamps = pd.to_datetime(index, errors='coerce')
+        return np.asarray(timestamps, dtype='datetime64[ns]')
+    
+    def format_market_data_tuples(
+        self, 
+        raw_data: pd.DataFrame, 
+        symbol: str, 
+        interval_type: str = '1d'
+    ) -> List[Tuple]:
+        """
+        格式化市场数据为元组列表，可直接用于批量插入
+        
+        Returns:
+            List[Tuple]: (timestamp, open_price, high_price, low_price, close_price, volume, interval_type)
+        """
+        batch = self.format_market_data_columnar(raw_data, symbol, interval_type)
+        timestamps = pd.DatetimeIndex(batch['timestamp']).to_pydatetime()
+        
+        return list(zip(
+            timestamps,
+            batch['open_price'].tolist(),
+            batch['high_price'].tolist(),
+            batch['low_price'].tolist(),
+            batch['close_price'].tolist(),
+            batch['volume'].tolist(),
+            [interval_type] * len(timestamps)
+        ))
+    
+    def format_market_data(self, raw_data: pd.DataFrame, symbol: str, interval_type: str = '1d') -> List[Dict]:
+        """
+        格式化市场数据为统一格式（基于列式批次的兼容包装）
         
         Args:
             raw_data: 原始数据
             symbol: 股票代码
+            interval_type: 数据周期
             
         Returns:
             List[Dict]: 格式化后的数据
@@ -140,30 +341,7 @@ class BaseDataSource(ABC):
         if raw_data.empty:
             return []
         
-        formatted_data = []
-        
-        for index, row in raw_data.iterrows():
-            try:
-                data_point = {
-                    'symbol': symbol,
-                    'timestamp': pd.to_datetime(index) if isinstance(index, str) else index,
-                    'open_price': float(row.get('open', row.get('开盘', 0))),
-                    'high_price': float(row.get('high', row.get('最高', 0))),
-                    'low_price': float(row.get('low', row.get('最低', 0))),
-                    'close_price': float(row.get('close', row.get('收盘', 0))),
-                    'volume': float(row.get('volume', row.get('成交量', 0))),
-                    'interval_type': '1d'
-                }
-                
-                # 确保价格数据有效
-                if all(data_point[key] >= 0 for key in ['open_price', 'high_price', 'low_price', 'close_price']):
-                    formatted_data.append(data_point)
-                    
-            except (ValueError, TypeError) as e:
-                logger.warning(f"格式化数据时出错: {e}, 跳过该行数据")
-                continue
-        
-        return formatted_data
+        return batch_to_records(self.format_market_data_columnar(raw_data, symbol, interval_type))
     
     def get_data_range(self, symbol: str) -> Tuple[Optional[date], Optional[date]]:
         """
@@ -202,9 +380,9 @@ class BaseDataSource(ABC):
                 description=self.get_data_source_description(),
                 provider_type=self.name.lower(),
                 is_active=True,
-                priority=self.get_data_source_priority(),
-                config=self.config
+                priority=self.get_data_source_priority()
             )
+            data_source.set_config(self.config)
             
             db.session.add(data_source)
             db.session.commit()
@@ -214,6 +392,7 @@ class BaseDataSource(ABC):
             
         except Exception as e:
             logger.error(f"创建数据来源记录失败: {e}")
+            db.session.rollback()
             return None
     
     def get_data_source_uri(self) -> str:
@@ -315,6 +494,7 @@ class BaseDataSource(ABC):
         return {
             'name': self.name,
             'is_connected': self.is_connected,
+            'rate_limit': self.rate_limiter.to_dict(),
             'config': {k: '***' if 'key' in k.lower() or 'secret' in k.lower() else v 
                       for k, v in self.config.items()},
             'last_check': datetime.now().isoformat()
@@ -325,3 +505,44 @@ class BaseDataSource(ABC):
     
     def __repr__(self):
         return self.__str__()
+
+
+def batch_to_records(batch: Dict) -> List[Dict]:
+    """
+    将列式批次转换为字典列表
+    
+    Args:
+        batch: format_market_data_columnar的输出
+        
+    Returns:
+        List[Dict]: 每行一个字典
+    """
+    timestamps = pd.DatetimeIndex(batch['timestamp'])
+    fields = list(BaseDataSource.MARKET_DATA_COLUMNS.keys())
+    columns = [batch[field].tolist() for field in fields]
+    symbol = batch['symbol']
+    interval_type = batch['interval_type']
+    
+    records = []
+    for timestamp, values in zip(timestamps, zip(*columns)):
+        record = {'symbol': symbol, 'timestamp': timestamp}
+        record.update(zip(fields, values))
+        record['interval_type'] = interval_type
+        records.append(record)
+    
+    return records
+
+
+def frame_to_records(frame: pd.DataFrame) -> List[Dict]:
+    """
+    按列导出DataFrame为字典列表（比 to_dict('records') 的逐单元格装箱更快）
+    
+    Args:
+        frame: 数据框，索引不会被导出
+        
+    Returns:
+        List[Dict]: 每行一个字典，数值为Python原生类型
+    """
+    columns = list(frame.columns)
+    values = [frame[column].tolist() for column in columns]
+    return [dict(zip(columns, row)) for row in zip(*values)]
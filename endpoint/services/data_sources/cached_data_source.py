@@ -0,0 +1,336 @@
+"""
+磁盘缓存数据源
+包装任意BaseDataSource，将历史行情以压缩Parquet分段缓存到本地磁盘
+"""
+
+import json
+import os
+import threading
+import time
+import logging
+from datetime import date, timedelta
+from pathlib import Path
+from typing import List, Dict, Optional, Tuple
+
+import pandas as pd
+
+from .base_data_source import BaseDataSource
+
+logger = logging.getLogger(__name__)
+
+
+class CachedDataSource(BaseDataSource):
+    """
+    带磁盘缓存的数据源包装器
+
+    缓存键为 (数据源, 股票代码, 周期, 复权方式)，每个键下保存若干按日期区间划分的分段文件。
+    请求区间中已缓存的部分直接从磁盘读取，只向上游请求缺失的边缘区间；
+    最近若干天（仍可能变化）的分段超过TTL后失效重新获取；总大小超过上限时按LRU淘汰。
+    """
+
+    MANIFEST_FILE = 'manifest.json'
+
+    def __init__(self, source: BaseDataSource, config: Optional[Dict] = None):
+        """
+        初始化缓存数据源
+
+        Args:
+            source: 被包装的上游数据源
+            config: 缓存配置，可包含:
+                - cache_dir: 缓存目录
+                - max_size_mb: 缓存总大小上限（MB）
+                - mutable_days: 最近多少天的数据视为仍可能变化
+                - ttl_seconds: 可变分段的有效期（秒）
+                - offline: 离线模式，只读缓存不访问上游
+        """
+        super().__init__(source.name, source.config)
+        self.source = source
+
+        cache_config = config or {}
+        self.cache_dir = Path(cache_config.get('cache_dir') or os.environ.get('DATA_SOURCE_CACHE_DIR', 'cache/data_sources'))
+        self.max_size_bytes = int(float(cache_config.get('max_size_mb', 1024)) * 1024 * 1024)
+        self.mutable_days = int(cache_config.get('mutable_days', 3))
+        self.ttl_seconds = float(cache_config.get('ttl_seconds', 6 * 3600))
+        self.offline = bool(cache_config.get('offline', False))
+
+        self._lock = threading.RLock()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._manifest = self._load_manifest()
+
+    # ============================================
+    # 委托给上游数据源的接口
+    # ============================================
+
+    def connect(self) -> bool:
+        """连接数据源（离线模式下无需连接上游）"""
+        if self.offline:
+            self.is_connected = True
+            return True
+        self.is_connected = self.source.connect()
+        return self.is_connected
+
+    def disconnect(self) -> None:
+        """断开连接"""
+        if not self.offline:
+            self.source.disconnect()
+        self.is_connected = False
+
+    def get_stock_list(self, market: str = 'A股', **kwargs):
+        return self.source.get_stock_list(market, **kwargs)
+
+    def get_index_components(self, index_code: str) -> List[Dict]:
+        return self.source.get_index_components(index_code)
+
+    def get_latest_data(self, symbols: List[str], **kwargs):
+        return self.source.get_latest_data(symbols, **kwargs)
+
+    def get_spot_snapshot(self) -> pd.DataFrame:
+        return self.source.get_spot_snapshot()
+
+    def fetch_trading_calendar(self) -> List[date]:
+        return self.source.fetch_trading_calendar()
+
+    def get_adjustment_factors(self, symbol: str) -> pd.DataFrame:
+        # 复权因子随除权除息变化，不缓存
+        return self.source.get_adjustment_factors(symbol)
+
+    def get_rate_limit_config(self) -> Dict:
+        return self.source.get_rate_limit_config()
+
+    def get_data_source_uri(self) -> str:
+        return self.source.get_data_source_uri()
+
+    def get_data_source_description(self) -> str:
+        return self.source.get_data_source_description()
+
+    def get_data_source_priority(self) -> int:
+        return self.source.get_data_source_priority()
+
+    def standardize_symbol(self, symbol: str) -> str:
+        return self.source.standardize_symbol(symbol)
+
+    def __getattr__(self, item):
+        # 其余上游特有的方法（如交易日历）直接委托
+        source = self.__dict__.get('source')
+        if source is None:
+            raise AttributeError(item)
+        return getattr(source, item)
+
+    # ============================================
+    # 带缓存的历史数据
+    # ============================================
+
+    def get_historical_data(
+        self,
+        symbol: str,
+        start_date: date,
+        end_date: date,
+        period: str = '1d'
+    ) -> pd.DataFrame:
+        """
+        获取历史行情数据，优先读取缓存，只向上游请求缺失的区间
+
+        Args:
+            symbol: 股票代码
+            start_date: 开始日期
+            end_date: 结束日期
+            period: 数据周期
+
+        Returns:
+            pd.DataFrame: 历史数据
+        """
+        key = self._cache_key(symbol, period)
+
+        with self._lock:
+            self._expire_mutable_segments(key)
+            missing = self._missing_ranges(key, start_date, end_date)
+
+        if missing and not self.offline:
+            for missing_start, missing_end in missing:
+                df = self.source.get_historical_data(symbol, missing_start, missing_end, period)
+                if df is not None and not df.empty:
+                    with self._lock:
+                        self._store_segment(key, df, missing_start, missing_end)
+        elif missing:
+            logger.info(f"离线模式: {symbol}有{len(missing)}个区间未缓存，仅返回已缓存数据")
+
+        with self._lock:
+            result = self._read_range(key, start_date, end_date)
+            self._evict()
+
+        return result
+
+    def _cache_key(self, symbol: str, period: str) -> str:
+        """缓存键：数据源/股票代码/周期_复权方式"""
+        adjust = getattr(self.source, 'adjust', None) or 'none'
+        return f"{self.source.name.lower()}/{symbol}/{period}_{adjust}"
+
+    def _segments(self, key: str) -> List[Dict]:
+        return self._manifest['entries'].setdefault(key, [])
+
+    def _missing_ranges(self, key: str, start_date: date, end_date: date) -> List[Tuple[date, date]]:
+        """计算请求区间中未被缓存分段覆盖的子区间"""
+        covered = sorted(
+            (date.fromisoformat(s['start']), date.fromisoformat(s['end'])) for s in self._segments(key)
+        )
+
+        missing = []
+        cursor = start_date
+        for seg_start, seg_end in covered:
+            if seg_end < cursor:
+                continue
+            if seg_start > end_date:
+                break
+            if seg_start > cursor:
+                missing.append((cursor, seg_start - timedelta(days=1)))
+            cursor = max(cursor, seg_end + timedelta(days=1))
+            if cursor > end_date:
+                break
+
+        if cursor <= end_date:
+            missing.append((cursor, end_date))
+
+        return missing
+
+    def _expire_mutable_segments(self, key: str) -> None:
+        """覆盖最近可变交易日且已超过TTL的分段失效（离线模式下保留）"""
+        if self.offline:
+            return
+
+        cutoff = date.today() - timedelta(days=self.mutable_days)
+        now = time.time()
+        segments = self._segments(key)
+
+        expired = [
+            s for s in segments
+            if date.fromisoformat(s['end']) >= cutoff and now - s['fetched_at'] > self.ttl_seconds
+        ]
+        for segment in expired:
+            self._remove_segment(key, segment)
+
+        if expired:
+            self._save_manifest()
+
+    def _store_segment(self, key: str, df: pd.DataFrame, start_date: date, end_date: date) -> None:
+        """保存新分段，并与相邻/重叠分段合并为一个文件"""
+        segments = self._segments(key)
+        merge = [
+            s for s in segments
+            if date.fromisoformat(s['start']) <= end_date + timedelta(days=1)
+            and date.fromisoformat(s['end']) >= start_date - timedelta(days=1)
+        ]
+
+        frames = [self._read_segment(s) for s in merge] + [df]
+        merged = pd.concat([f for f in frames if f is not None and not f.empty])
+        merged = merged[~merged.index.duplicated(keep='last')].sort_index()
+
+        new_start = min([start_date] + [date.fromisoformat(s['start']) for s in merge])
+        new_end = max([end_date] + [date.fromisoformat(s['end']) for s in merge])
+
+        for segment in merge:
+            self._remove_segment(key, segment)
+
+        relative_path = f"{key}/{new_start:%Y%m%d}_{new_end:%Y%m%d}.parquet"
+        path = self.cache_dir / relative_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        merged.to_parquet(path, compression='zstd')
+
+        segments.append({
+            'file': relative_path,
+            'start': new_start.isoformat(),
+            'end': new_end.isoformat(),
+            'rows': len(merged),
+            'size': path.stat().st_size,
+            'fetched_at': time.time(),
+            'last_access': time.time()
+        })
+        self._save_manifest()
+
+    def _read_segment(self, segment: Dict) -> Optional[pd.DataFrame]:
+        """读取单个分段文件"""
+        path = self.cache_dir / segment['file']
+        if not path.exists():
+            return None
+        segment['last_access'] = time.time()
+        return pd.read_parquet(path)
+
+    def _read_range(self, key: str, start_date: date, end_date: date) -> pd.DataFrame:
+        """从缓存读取请求区间的数据"""
+        frames = []
+        for segment in self._segments(key):
+            if date.fromisoformat(segment['end']) < start_date or date.fromisoformat(segment['start']) > end_date:
+                continue
+            df = self._read_segment(segment)
+            if df is not None and not df.empty:
+                frames.append(df)
+
+        if not frames:
+            return pd.DataFrame()
+
+        result = pd.concat(frames).sort_index()
+        result = result[~result.index.duplicated(keep='last')]
+        return result.loc[pd.Timestamp(start_date):pd.Timestamp(end_date) + pd.Timedelta(days=1) - pd.Timedelta(1)]
+
+    def _remove_segment(self, key: str, segment: Dict) -> None:
+        """删除分段文件及其清单记录"""
+        path = self.cache_dir / segment['file']
+        if path.exists():
+            path.unlink()
+        self._segments(key).remove(segment)
+
+    def _evict(self) -> None:
+        """按最近访问时间淘汰分段，直到总大小低于上限"""
+        all_segments = [(key, s) for key, segments in self._manifest['entries'].items() for s in segments]
+        total_size = sum(s['size'] for _, s in all_segments)
+
+        if total_size <= self.max_size_bytes:
+            self._save_manifest()
+            return
+
+        for key, segment in sorted(all_segments, key=lambda item: item[1]['last_access']):
+            if total_size <= self.max_size_bytes:
+                break
+            total_size -= segment['size']
+            self._remove_segment(key, segment)
+            logger.info(f"缓存淘汰: {segment['file']}")
+
+        self._save_manifest()
+
+    def _load_manifest(self) -> Dict:
+        """加载缓存清单"""
+        path = self.cache_dir / self.MANIFEST_FILE
+        if path.exists():
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"缓存清单损坏，重新创建: {e}")
+        return {'entries': {}}
+
+    def _save_manifest(self) -> None:
+        """原子写入缓存清单"""
+        path = self.cache_dir / self.MANIFEST_FILE
+        tmp_path = path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._manifest, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def get_cache_stats(self) -> Dict:
+        """获取缓存统计信息"""
+        with self._lock:
+            entries = self._manifest['entries']
+            return {
+                'cache_dir': str(self.cache_dir),
+                'keys': sum(1 for s in entries.values() if s),
+                'segments': sum(len(s) for s in entries.values()),
+                'rows': sum(seg['rows'] for s in entries.values() for seg in s),
+                'size_bytes': sum(seg['size'] for s in entries.values() for seg in s),
+                'max_size_bytes': self.max_size_bytes,
+                'offline': self.offline
+            }
+
+    def health_check(self) -> Dict[str, any]:
+        """健康检查"""
+        health = self.source.health_check() if not self.offline else super().health_check()
+        health['cache'] = self.get_cache_stats()
+        return health
@@ -0,0 +1,519 @@
+"""
+组合数据源
+按优先级在多个数据源之间故障转移，跟踪各数据源的延迟与错误率，
+对持续失败的数据源熔断，并在主数据源响应过慢时向下一个数据源发出对冲请求
+"""
+
+import threading
+import time
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import date
+from typing import List, Dict, Optional, Callable, Any
+
+import numpy as np
+import pandas as pd
+
+from .base_data_source import BaseDataSource
+
+logger = logging.getLogger(__name__)
+
+
+class SourceHealth:
+    """
+    单个数据源的健康统计（线程安全）
+
+    记录延迟与错误率的指数加权移动平均（EWMA）以及最近的延迟样本；
+    连续失败次数或错误率EWMA超过阈值时熔断（open），冷却期过后放行一次探测请求（half_open），
+    探测成功则恢复（closed），失败则重新熔断。
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(
+        self,
+        name: str,
+        alpha: float = 0.2,
+        window: int = 200,
+        failure_threshold: int = 5,
+        error_rate_threshold: float = 0.5,
+        min_samples: int = 10,
+        cooldown_seconds: float = 30.0
+    ):
+        """
+        初始化健康统计
+
+        Args:
+            name: 数据源名称
+            alpha: EWMA平滑系数
+            window: 保留的最近延迟样本数（用于计算分位数）
+            failure_threshold: 连续失败多少次后熔断
+            error_rate_threshold: 错误率EWMA超过该值（且样本数足够）时熔断
+            min_samples: 按错误率熔断所需的最少请求数
+            cooldown_seconds: 熔断后的冷却时间（秒）
+        """
+        self.name = name
+        self.alpha = alpha
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.error_rate_threshold = error_rate_threshold
+        self.min_samples = min_samples
+        self.cooldown_seconds = cooldown_seconds
+
+        self.latency_ewma = None
+        self.error_ewma = 0.0
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.state = self.CLOSED
+        self.opened_at = None
+        self._probe_in_flight = False
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        """
+        判断是否允许发出请求（熔断冷却期过后只放行一个探测请求）
+
+        Returns:
+            bool: 是否允许
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.cooldown_seconds:
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+
+            if self.state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+
+            return False
+
+    def record_success(self, latency: float) -> None:
+        """记录一次成功请求"""
+        with self._lock:
+            self.requests += 1
+            self._update_latency(latency)
+            self.error_ewma *= (1 - self.alpha)
+            self.consecutive_failures = 0
+
+            if self.state != self.CLOSED:
+                logger.info(f"数据源{self.name}探测成功，恢复正常")
+            self.state = self.CLOSED
+            self._probe_in_flight = False
+
+    def record_failure(self, latency: float) -> None:
+        """记录一次失败请求"""
+        with self._lock:
+            self.requests += 1
+            self.failures += 1
+            self._update_latency(latency)
+            self.error_ewma = self.alpha + (1 - self.alpha) * self.error_ewma
+            self.consecutive_failures += 1
+
+            tripped = (
+                self.state == self.HALF_OPEN
+                or self.consecutive_failures >= self.failure_threshold
+                or (self.requests >= self.min_samples and self.error_ewma >= self.error_rate_threshold)
+            )
+            if tripped:
+                if self.state != self.OPEN:
+                    logger.warning(f"数据源{self.name}熔断: 连续失败{self.consecutive_failures}次，"
+                                   f"错误率{self.error_ewma:.2f}")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+    def latency_percentile(self, percentile: float, min_samples: int = 1) -> Optional[float]:
+        """
+        最近延迟样本的分位数
+
+        Args:
+            percentile: 分位数（0-100）
+            min_samples: 样本数不足时返回None
+
+        Returns:
+            Optional[float]: 延迟（秒）
+        """
+        with self._lock:
+            if len(self._latencies) < max(1, min_samples):
+                return None
+            samples = np.fromiter(self._latencies, dtype=float)
+        return float(np.percentile(samples, percentile))
+
+    def _update_latency(self, latency: float) -> None:
+        """更新延迟统计（调用方需持有锁）"""
+        self._latencies.append(latency)
+        if self.latency_ewma is None:
+            self.latency_ewma = latency
+        else:
+            self.latency_ewma = self.alpha * latency + (1 - self.alpha) * self.latency_ewma
+
+    def to_dict(self) -> Dict:
+        """转换为字典"""
+        p95 = self.latency_percentile(95)
+        with self._lock:
+            return {
+                'name': self.name,
+                'state': self.state,
+                'requests': self.requests,
+                'failures': self.failures,
+                'consecutive_failures': self.consecutive_failures,
+                'error_rate_ewma': round(self.error_ewma, 4),
+                'latency_ewma_ms': round(self.latency_ewma * 1000, 1) if self.latency_ewma is not None else None,
+                'latency_p95_ms': round(p95 * 1000, 1) if p95 is not None else None
+            }
+
+
+# 进程级健康统计注册表，同名数据源的所有组合实例共享熔断状态与延迟统计
+_source_health: Dict[str, SourceHealth] = {}
+_health_lock = threading.Lock()
+
+# 组合数据源共用的请求线程池（对冲请求需要与主请求并行）
+_executor = None
+
+
+def get_source_health(source_name: str, config: Optional[Dict] = None) -> SourceHealth:
+    """
+    获取数据源的共享健康统计，首次调用时按配置创建
+
+    Args:
+        source_name: 数据源名称
+        config: 熔断配置，可包含 failure_threshold / error_rate_threshold / min_samples / cooldown_seconds
+
+    Returns:
+        SourceHealth: 健康统计实例
+    """
+    with _health_lock:
+        health = _source_health.get(source_name)
+        if health is None:
+            health = SourceHealth(source_name, **(config or {}))
+            _source_health[source_name] = health
+        return health
+
+
+def _get_executor(max_workers: int) -> ThreadPoolExecutor:
+    global _executor
+    with _health_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='composite-fetch')
+        return _executor
+
+
+class CompositeDataSource(BaseDataSource):
+    """
+    组合数据源
+
+    每次请求按优先级选择第一个未熔断的数据源；请求失败或返回空数据时转移到下一个数据源。
+    启用对冲时，如果主数据源在其延迟分位数（默认P95）内没有返回，
+    则同时向下一个数据源发出请求，采用先返回的有效结果，未被采用的请求仍计入健康统计。
+    """
+
+    def __init__(self, config: Optional[Dict] = None):
+        """
+        初始化组合数据源
+
+        Args:
+            config: 配置参数，可包含:
+                - sources: 子数据源列表，元素为名称或 {name, priority, config}；
+                           默认取data_sources表中已激活的数据源（按priority排序）
+                - hedge: 是否启用对冲请求（默认True）
+                - hedge_percentile: 触发对冲的主数据源延迟分位数（默认95）
+                - hedge_min_samples: 启用对冲所需的最少延迟样本数（默认20）
+                - hedge_min_delay: 对冲等待时间下限（秒，默认0.2）
+                - failover_on_empty: 返回空数据时是否尝试下一个数据源（默认True）
+                - circuit_breaker: 熔断配置 {failure_threshold, error_rate_threshold, min_samples, cooldown_seconds}
+                - max_workers: 请求线程池大小（默认16）
+        """
+        super().__init__("Composite", config)
+
+        self.hedge = self.config.get('hedge', True)
+        self.hedge_percentile = float(self.config.get('hedge_percentile', 95))
+        self.hedge_min_samples = int(self.config.get('hedge_min_samples', 20))
+        self.hedge_min_delay = float(self.config.get('hedge_min_delay', 0.2))
+        self.failover_on_empty = self.config.get('failover_on_empty', True)
+        self.breaker_config = self.config.get('circuit_breaker', {})
+        self.max_workers = int(self.config.get('max_workers', 16))
+
+        self.sources = self._build_sources(self.config.get('sources'))
+        if not self.sources:
+            raise ValueError("组合数据源没有可用的子数据源")
+
+        self.stats = {'requests': 0, 'failovers': 0, 'hedged': 0, 'hedge_wins': 0, 'exhausted': 0}
+        self._stats_lock = threading.Lock()
+
+        logger.info(f"组合数据源: {' > '.join(entry['name'] for entry in self.sources)}")
+
+    def _build_sources(self, source_specs: Optional[List]) -> List[Dict]:
+        """按优先级创建子数据源"""
+        # 延迟导入避免循环导入
+        from . import DATA_SOURCES, create_data_source
+
+        if source_specs is None:
+            source_specs = self._load_source_specs()
+
+        entries = []
+        for i, spec in enumerate(source_specs):
+            if isinstance(spec, str):
+                spec = {'name': spec}
+
+            name = spec['name']
+            if name == 'composite' or name not in DATA_SOURCES:
+                logger.warning(f"组合数据源跳过不支持的子数据源: {name}")
+                continue
+
+            # 子数据源失败时抛出异常，才能区分故障与真实的空数据；默认不在子数据源内重试，由故障转移代替
+            source_config = {'request_retries': 0, **(spec.get('config') or {}), 'raise_errors': True}
+            entries.append({
+                'name': name,
+                'priority': spec.get('priority', i + 1),
+                'source': create_data_source(name, source_config),
+                'health': get_source_health(name, self.breaker_config)
+            })
+
+        entries.sort(key=lambda entry: entry['priority'])
+        return entries
+
+    def _load_source_specs(self) -> List[Dict]:
+        """从data_sources表加载已激活的数据源（无应用上下文时使用全部已注册数据源）"""
+        from . import DATA_SOURCES
+
+        try:
+            from models import DataSource
+            rows = DataSource.query.filter_by(is_active=True).order_by(DataSource.priority).all()
+            specs = [
+                {'name': row.provider_type, 'priority': row.priority, 'config': row.get_config()}
+                for row in rows if row.provider_type in DATA_SOURCES and row.provider_type != 'composite'
+            ]
+            if specs:
+                return specs
+        except Exception as e:
+            logger.warning(f"读取数据来源配置失败，使用全部已注册数据源: {e}")
+
+        return [name for name in DATA_SOURCES if name != 'composite']
+
+    # ============================================
+    # 故障转移与对冲
+    # ============================================
+
+    def _execute(self, operation: str, call: Callable[[BaseDataSource], Any], hedge: bool = False) -> Any:
+        """
+        按优先级执行请求，失败或空结果时转移，必要时发出对冲请求
+
+        Args:
+            operation: 操作描述（用于日志）
+            call: 以子数据源为参数的请求函数
+            hedge: 是否允许对冲
+
+        Returns:
+            Any: 第一个有效结果；全部为空时返回最后一个空结果
+        """
+        executor = _get_executor(self.max_workers)
+        pending = {}
+        next_index = 0
+        empty_result = None
+        last_error = None
+        primary = None
+
+        def launch() -> bool:
+            nonlocal next_index, primary
+            while next_index < len(self.sources):
+                entry = self.sources[next_index]
+                next_index += 1
+                # 熔断检查在发出请求时进行，避免占用半开状态的探测名额却不发请求
+                if entry['health'].allow_request():
+                    pending[executor.submit(self._timed_call, entry, call)] = entry
+                    primary = entry
+                    return True
+            return False
+
+        self._count('requests')
+        if not launch():
+            self._count('exhausted')
+            raise RuntimeError(f"{operation}失败: 所有数据源均处于熔断状态")
+
+        while pending:
+            timeout = None
+            if hedge and self.hedge and len(pending) == 1 and next_index < len(self.sources):
+                timeout = self._hedge_delay(primary)
+
+            done, _ = wait(list(pending), timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                # 主数据源超过延迟分位数仍未返回，向下一个数据源发出对冲请求
+                if launch():
+                    self._count('hedged')
+                    logger.debug(f"{operation}: {primary['name']}延迟过高，发出对冲请求")
+                continue
+
+            for future in done:
+                entry = pending.pop(future)
+                ok, result = future.result()
+                if ok and not (self.failover_on_empty and self._is_empty(result)):
+                    if pending and entry is primary:
+                        # 对冲请求先于主请求返回
+                        self._count('hedge_wins')
+                    return result
+                if ok:
+                    empty_result = result
+                else:
+                    last_error = result
+
+            if not pending and launch():
+                self._count('failovers')
+                logger.info(f"{operation}: 转移到数据源{primary['name']}")
+
+        self._count('exhausted')
+        if empty_result is not None:
+            return empty_result
+        raise RuntimeError(f"{operation}失败: {last_error}")
+
+    @staticmethod
+    def _timed_call(entry: Dict, call: Callable[[BaseDataSource], Any]):
+        """执行请求并记录延迟与结果，返回 (是否成功, 结果或错误)"""
+        started = time.monotonic()
+        try:
+            result = call(entry['source'])
+        except Exception as e:
+            entry['health'].record_failure(time.monotonic() - started)
+            logger.warning(f"数据源{entry['name']}请求失败: {e}")
+            return False, e
+        entry['health'].record_success(time.monotonic() - started)
+        return True, result
+
+    def _hedge_delay(self, entry: Dict) -> Optional[float]:
+        """对冲等待时间：主数据源最近延迟的分位数，样本不足时不对冲"""
+        percentile = entry['health'].latency_percentile(self.hedge_percentile, self.hedge_min_samples)
+        if percentile is None:
+            return None
+        return max(self.hedge_min_delay, percentile)
+
+    @staticmethod
+    def _is_empty(result: Any) -> bool:
+        if result is None:
+            return True
+        if isinstance(result, pd.DataFrame):
+            return result.empty
+        return len(result) == 0
+
+    def _count(self, key: str) -> None:
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    # ============================================
+    # 数据源接口
+    # ============================================
+
+    def connect(self) -> bool:
+        """连接所有子数据源，至少一个成功即视为连接成功"""
+        results = [entry['source'].connect() for entry in self.sources]
+        self.is_connected = any(results)
+        return self.is_connected
+
+    def disconnect(self) -> None:
+        """断开所有子数据源"""
+        for entry in self.sources:
+            try:
+                entry['source'].disconnect()
+            except Exception as e:
+                logger.warning(f"断开数据源{entry['name']}失败: {e}")
+        self.is_connected = False
+
+    def get_stock_list(self, market: str = 'A股', **kwargs):
+        return self._execute('获取股票列表', lambda source: source.get_stock_list(market, **kwargs))
+
+    def get_index_components(self, index_code: str) -> List[Dict]:
+        return self._execute(f'获取指数{index_code}成分股', lambda source: source.get_index_components(index_code))
+
+    def get_historical_data(
+        self,
+        symbol: str,
+        start_date: date,
+        end_date: date,
+        period: str = '1d'
+    ) -> pd.DataFrame:
+        """
+        获取历史行情数据（故障转移 + 对冲）
+
+        Args:
+            symbol: 股票代码
+            start_date: 开始日期
+            end_date: 结束日期
+            period: 数据周期
+
+        Returns:
+            pd.DataFrame: 历史数据，全部数据源失败时返回空DataFrame（raise_errors时抛出异常）
+        """
+        try:
+            return self._execute(
+                f'获取{symbol}历史数据',
+                lambda source: source.get_historical_data(symbol, start_date, end_date, period),
+                hedge=True
+            )
+        except Exception as e:
+            logger.error(f"获取{symbol}历史数据失败: {e}")
+            if self.config.get('raise_errors'):
+                raise
+            return pd.DataFrame()
+
+    def get_latest_data(self, symbols: List[str], **kwargs):
+        try:
+            return self._execute('获取最新行情数据', lambda source: source.get_latest_data(symbols, **kwargs))
+        except Exception as e:
+            logger.error(f"获取最新行情数据失败: {e}")
+            if self.config.get('raise_errors'):
+                raise
+            return pd.DataFrame() if kwargs.get('as_frame') else {}
+
+    def get_spot_snapshot(self) -> pd.DataFrame:
+        try:
+            return self._execute('获取实时行情快照', lambda source: source.get_spot_snapshot())
+        except Exception as e:
+            logger.error(f"获取实时行情快照失败: {e}")
+            return pd.DataFrame()
+
+    def fetch_trading_calendar(self) -> List[date]:
+        try:
+            return self._execute('获取交易日历', lambda source: source.fetch_trading_calendar())
+        except Exception as e:
+            logger.error(f"获取交易日历失败: {e}")
+            return []
+
+    def get_adjustment_factors(self, symbol: str) -> pd.DataFrame:
+        try:
+            return self._execute(f'获取{symbol}复权因子', lambda source: source.get_adjustment_factors(symbol))
+        except Exception as e:
+            logger.error(f"获取{symbol}复权因子失败: {e}")
+            if self.config.get('raise_errors'):
+                raise
+            return pd.DataFrame(columns=['ex_date', 'factor'])
+
+    def get_rate_limit_config(self) -> Dict:
+        """组合数据源自身不限流（由各子数据源的限流器约束），并发数为各子数据源之和"""
+        limits = [entry['source'].rate_limiter for entry in self.sources]
+        return {
+            'requests_per_second': sum(limiter.requests_per_second for limiter in limits),
+            'burst': sum(limiter.burst for limiter in limits),
+            'max_in_flight': sum(limiter.max_in_flight for limiter in limits)
+        }
+
+    def standardize_symbol(self, symbol: str) -> str:
+        return self.sources[0]['source'].standardize_symbol(symbol)
+
+    def get_data_source_description(self) -> str:
+        return f"按优先级组合的数据源: {', '.join(entry['name'] for entry in self.sources)}"
+
+    def health_check(self) -> Dict[str, any]:
+        """健康检查（各子数据源的熔断状态与延迟统计，不发出额外请求）"""
+        health = super().health_check()
+        with self._stats_lock:
+            health['composite_stats'] = dict(self.stats)
+        health['sources'] = [
+            dict(entry['health'].to_dict(), priority=entry['priority'])
+            for entry in self.sources
+        ]
+        return health
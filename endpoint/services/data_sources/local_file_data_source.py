@@ -0,0 +1,625 @@
+"""
+本地文件数据源实现
+从CSV/Parquet文件目录（或确定性的合成数据）提供行情数据，用于离线回放、CI与吞吐量基准；
+可配置注入延迟与错误率，模拟网络数据源的行为
+"""
+
+import os
+import random
+import threading
+import time
+import logging
+from collections import OrderedDict
+from datetime import datetime, date
+from pathlib import Path
+from typing import List, Dict, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from .base_data_source import BaseDataSource, frame_to_records
+
+logger = logging.getLogger(__name__)
+
+
+class InjectedSourceError(ConnectionError):
+    """按配置的错误率注入的数据源错误"""
+
+
+class LocalFileDataSource(BaseDataSource):
+    """
+    本地文件数据源
+
+    目录结构（CSV与Parquet均可，同名时优先Parquet）:
+        symbols.csv                      股票列表：symbol, name, exchange[, market_cap]
+        trading_calendar.csv             交易日历：trade_date
+        index_components/<指数代码>.csv   成分股：symbol, name[, weight]
+        bars/<股票代码>.csv               日线：date, open, high, low, close, volume[, amount]
+        bars/<周期>/<股票代码>.csv         分钟线（如 bars/5m/000001.csv），date为K线结束时间
+        adjustment_factors/<股票代码>.csv  复权因子：ex_date, factor
+
+    未配置目录时使用合成数据：N只股票 × M年的几何布朗运动日线，分钟线由日线按交易时段插值生成；
+    相同的seed与end_date总是生成相同的数据。
+    """
+
+    # 合成数据的指数成分股数量
+    SYNTHETIC_INDICES = {'000300': 300, '000905': 500, '000852': 1000}
+
+    def __init__(self, config: Optional[Dict] = None):
+        """
+        初始化本地文件数据源
+
+        Args:
+            config: 配置参数，可包含:
+                - data_dir: 数据目录，默认环境变量LOCAL_DATA_SOURCE_DIR；都未设置时使用合成数据
+                - synthetic: 合成数据配置 {symbols, years, end_date, volatility, drift, start_price, seed}
+                - latency_ms: 每次请求注入的平均延迟（毫秒）
+                - latency_jitter_ms: 延迟的标准差（毫秒）
+                - error_rate: 每次请求失败的概率（0-1）
+                - seed: 延迟与错误注入的随机种子
+                - cache_size: 内存中缓存的行情文件数
+                - raise_errors: 获取失败时抛出异常而不是返回空数据（供故障转移判断）
+                - request_retries: 单次请求失败后的重试次数（默认0）
+                - retry_backoff: 首次重试前的等待秒数
+                - rate_limit: 限流配置 {requests_per_second, burst, max_in_flight}
+        """
+        super().__init__("Local", config)
+
+        data_dir = self.config.get('data_dir') or os.environ.get('LOCAL_DATA_SOURCE_DIR')
+        self.data_dir = Path(data_dir) if data_dir else None
+
+        synthetic = dict(self.config.get('synthetic') or {})
+        self.synthetic_symbols = int(synthetic.get('symbols', 100))
+        self.synthetic_years = int(synthetic.get('years', 5))
+        end_date = synthetic.get('end_date') or date.today()
+        self.synthetic_end = date.fromisoformat(end_date) if isinstance(end_date, str) else end_date
+        self.synthetic_start = date(self.synthetic_end.year - self.synthetic_years + 1, 1, 1)
+        self.volatility = float(synthetic.get('volatility', 0.3))  # 年化波动率
+        self.drift = float(synthetic.get('drift', 0.05))  # 年化漂移
+        self.start_price = float(synthetic.get('start_price', 10.0))
+        self.synthetic_seed = int(synthetic.get('seed', 42))
+
+        self.latency_ms = float(self.config.get('latency_ms', 0))
+        self.latency_jitter_ms = float(self.config.get('latency_jitter_ms', 0))
+        self.error_rate = float(self.config.get('error_rate', 0))
+        self.raise_errors = self.config.get('raise_errors', False)
+
+        self._random = random.Random(self.config.get('seed'))
+        self._random_lock = threading.Lock()
+
+        self.cache_size = int(self.config.get('cache_size', 256))
+        self._frames = OrderedDict()
+        self._frames_lock = threading.Lock()
+
+        self.adjust = ''
+
+    @property
+    def is_synthetic(self) -> bool:
+        return self.data_dir is None
+
+    def get_rate_limit_config(self) -> Dict:
+        """本地数据源默认不限流，延迟由latency_ms模拟"""
+        rate_limit = {'requests_per_second': 10000, 'burst': 10000, 'max_in_flight': 8}
+        rate_limit.update(self.config.get('rate_limit', {}))
+        return rate_limit
+
+    def connect(self) -> bool:
+        """连接数据源（检查数据目录）"""
+        if not self.is_synthetic and not self.data_dir.is_dir():
+            logger.error(f"本地数据目录不存在: {self.data_dir}")
+            self.is_connected = False
+            return False
+
+        self.is_connected = True
+        logger.info(f"本地数据源连接成功: {self.get_data_source_uri()}")
+        return True
+
+    def disconnect(self) -> None:
+        """断开连接（清空内存缓存）"""
+        with self._frames_lock:
+            self._frames.clear()
+        self.is_connected = False
+
+    # ============================================
+    # 数据接口
+    # ============================================
+
+    def get_stock_list(self, market: str = 'A股', as_frame: bool = False) -> Union[List[Dict], pd.DataFrame]:
+        """
+        获取股票列表
+
+        Args:
+            market: 市场类型（本地数据源忽略）
+            as_frame: 是否返回以股票代码为索引的DataFrame
+
+        Returns:
+            Union[List[Dict], pd.DataFrame]: 股票列表
+        """
+        try:
+            frame = self._request('get_stock_list', self._symbols_frame)
+
+            if as_frame:
+                return frame.set_index('symbol')
+            return frame_to_records(frame)
+
+        except Exception as e:
+            logger.error(f"获取股票列表失败: {e}")
+            if self.raise_errors:
+                raise
+            return pd.DataFrame() if as_frame else []
+
+    def get_index_components(self, index_code: str) -> List[Dict]:
+        """
+        获取指数成分股
+
+        Args:
+            index_code: 指数代码
+
+        Returns:
+            List[Dict]: 成分股列表
+        """
+        try:
+            return self._request('get_index_components', self._index_components, index_code)
+
+        except Exception as e:
+            logger.error(f"获取指数{index_code}成分股失败: {e}")
+            if self.raise_errors:
+                raise
+            return []
+
+    def get_historical_data(
+        self,
+        symbol: str,
+        start_date: date,
+        end_date: date,
+        period: str = '1d'
+    ) -> pd.DataFrame:
+        """
+        获取历史行情数据
+
+        Args:
+            symbol: 股票代码
+            start_date: 开始日期
+            end_date: 结束日期
+            period: 数据周期，'1d'或分钟周期'1m'/'5m'/'15m'/'30m'/'60m'
+
+        Returns:
+            pd.DataFrame: 以时间为索引的行情数据
+        """
+        try:
+            operation = 'get_historical_data' if period == '1d' else f'get_historical_data_{period}'
+            return self._request(operation, self._historical, symbol, start_date, end_date, period)
+
+        except Exception as e:
+            logger.error(f"获取{symbol}历史数据失败: {e}")
+            if self.raise_errors:
+                raise
+            return pd.DataFrame()
+
+    def get_spot_snapshot(self) -> pd.DataFrame:
+        """
+        全市场行情快照：每只股票最后一根日线（不晚于今天）
+
+        Returns:
+            pd.DataFrame: 以股票代码为索引，列与AKShare快照的统一列名一致
+        """
+        try:
+            return self._request('get_spot_snapshot', self._build_snapshot)
+
+        except Exception as e:
+            logger.error(f"获取实时行情快照失败: {e}")
+            if self.raise_errors:
+                raise
+            return pd.DataFrame()
+
+    def get_latest_data(
+        self,
+        symbols: List[str],
+        as_frame: bool = False
+    ) -> Union[Dict[str, Dict], pd.DataFrame]:
+        """
+        获取最新行情数据
+
+        Args:
+            symbols: 股票代码列表
+            as_frame: 是否返回以股票代码为索引的DataFrame
+
+        Returns:
+            Union[Dict[str, Dict], pd.DataFrame]: 最新数据
+        """
+        try:
+            snapshot = self._request('get_latest_data', self._build_snapshot, symbols)
+
+            if snapshot.empty:
+                return pd.DataFrame() if as_frame else {}
+
+            frame = snapshot.rename(columns={
+                'open': 'open_price',
+                'high': 'high_price',
+                'low': 'low_price',
+                'pre_close': 'close_price'
+            })
+            frame.insert(0, 'symbol', frame.index)
+            frame['timestamp'] = datetime.now()
+
+            if as_frame:
+                return frame
+            return dict(zip(frame.index, frame_to_records(frame)))
+
+        except Exception as e:
+            logger.error(f"获取最新行情数据失败: {e}")
+            if self.raise_errors:
+                raise
+            return pd.DataFrame() if as_frame else {}
+
+    def fetch_trading_calendar(self) -> List[date]:
+        """
+        交易日历：合成数据为区间内的工作日，文件数据读取trading_calendar文件
+
+        Returns:
+            List[date]: 全部交易日期
+        """
+        return self._request('fetch_trading_calendar', self._trading_calendar)
+
+    def get_adjustment_factors(self, symbol: str) -> pd.DataFrame:
+        """
+        获取复权因子（合成数据没有除权除息）
+
+        Args:
+            symbol: 股票代码
+
+        Returns:
+            pd.DataFrame: 列为 ex_date 与 factor，按ex_date升序
+        """
+        try:
+            return self._request('get_adjustment_factors', self._adjustment_factors, symbol)
+
+        except Exception as e:
+            logger.error(f"获取{symbol}复权因子失败: {e}")
+            if self.raise_errors:
+                raise
+            return pd.DataFrame(columns=['ex_date', 'factor'])
+
+    def get_data_range(self, symbol: str):
+        """获取某股票的数据范围"""
+        frame = self._daily_frame(symbol)
+        if frame is None or frame.empty:
+            return None, None
+        return frame.index[0].date(), frame.index[-1].date()
+
+    def get_data_source_uri(self) -> str:
+        if self.is_synthetic:
+            return f"synthetic://{self.synthetic_symbols}x{self.synthetic_years}y?seed={self.synthetic_seed}"
+        return self.data_dir.resolve().as_uri()
+
+    def get_data_source_description(self) -> str:
+        return "基于本地CSV/Parquet文件或合成数据的离线数据源"
+
+    def get_data_source_priority(self) -> int:
+        return 100
+
+    def health_check(self) -> Dict[str, any]:
+        """健康检查"""
+        base_health = super().health_check()
+        base_health.update({
+            'uri': self.get_data_source_uri(),
+            'synthetic': self.is_synthetic,
+            'latency_ms': self.latency_ms,
+            'error_rate': self.error_rate,
+            'cached_frames': len(self._frames)
+        })
+        return base_health
+
+    # ============================================
+    # 导出
+    # ============================================
+
+    def export(self, directory: Union[str, Path], file_format: str = 'parquet', intervals: Optional[List[str]] = None) -> Dict[str, int]:
+        """
+        将当前数据（通常为合成数据）导出为本地数据目录，可作为另一个LocalFileDataSource的data_dir
+
+        Args:
+            directory: 目标目录
+            file_format: 'parquet' 或 'csv'
+            intervals: 额外导出的分钟周期（如['5m']），分钟数据量大，默认不导出
+
+        Returns:
+            Dict[str, int]: {'symbols', 'bars', 'files'}
+        """
+        if file_format not in ('parquet', 'csv'):
+            raise ValueError(f"不支持的文件格式: {file_format}")
+
+        directory = Path(directory)
+        stats = {'symbols': 0, 'bars': 0, 'files': 0}
+
+        def write(frame: pd.DataFrame, relative: Path, index: bool = False) -> None:
+            path = directory / relative.with_suffix(f'.{file_format}')
+            path.parent.mkdir(parents=True, exist_ok=True)
+            if file_format == 'parquet':
+                frame.to_parquet(path, index=index)
+            else:
+                frame.to_csv(path, index=index)
+            stats['files'] += 1
+
+        symbols = self._symbols_frame()
+        write(symbols, Path('symbols'))
+        write(pd.DataFrame({'trade_date': self.fetch_trading_calendar()}), Path('trading_calendar'))
+
+        for index_code in self.SYNTHETIC_INDICES:
+            components = self.get_index_components(index_code)
+            if components:
+                write(pd.DataFrame(components)[['symbol', 'name', 'weight']], Path('index_components') / index_code)
+
+        for symbol in symbols['symbol']:
+            daily = self._daily_frame(symbol)
+            write(daily, Path('bars') / symbol, index=True)
+            stats['symbols'] += 1
+            stats['bars'] += len(daily)
+
+            for interval in intervals or []:
+                minutes = self.get_historical_data(symbol, daily.index[0].date(), daily.index[-1].date(), interval)
+                write(minutes, Path('bars') / interval / symbol, index=True)
+                stats['bars'] += len(minutes)
+
+        logger.info(f"本地数据导出完成: {directory}，{stats['symbols']}只股票，{stats['bars']}条K线")
+        return stats
+
+    # ============================================
+    # 内部方法
+    # ============================================
+
+    def _request(self, operation: str, loader, *args):
+        """模拟一次网络请求：经限流器、重试与指标记录（BaseDataSource.call），注入延迟与错误后调用loader"""
+        return self.call(operation, self._simulated, loader, *args)
+
+    def _simulated(self, loader, *args):
+        with self._random_lock:
+            delay = max(0.0, self._random.gauss(self.latency_ms, self.latency_jitter_ms)) if self.latency_ms else 0.0
+            failed = self.error_rate > 0 and self._random.random() < self.error_rate
+        if delay:
+            time.sleep(delay / 1000.0)
+        if failed:
+            raise InjectedSourceError(f"注入错误（错误率{self.error_rate:.0%}）")
+        return loader(*args)
+
+    def _historical(self, symbol: str, start_date: date, end_date: date, period: str) -> pd.DataFrame:
+        if period == '1d':
+            frame = self._daily_frame(symbol)
+        elif self.is_synthetic:
+            return self._synthetic_minutes(symbol, start_date, end_date, period)
+        else:
+            frame = self._load_bars(symbol, period)
+
+        if frame is None or frame.empty:
+            return pd.DataFrame()
+
+        return frame.loc[pd.Timestamp(start_date):pd.Timestamp(end_date) + pd.Timedelta(days=1) - pd.Timedelta(1)].copy()
+
+    def _index_components(self, index_code: str) -> List[Dict]:
+        if self.is_synthetic:
+            size = self.SYNTHETIC_INDICES.get(index_code)
+            if size is None:
+                return []
+            frame = self._symbols_frame().head(size)[['symbol', 'name', 'exchange']].copy()
+            frame['weight'] = 100.0 / len(frame) if len(frame) else None
+        else:
+            frame = self._read_table(Path('index_components') / index_code)
+            if frame is None or frame.empty:
+                logger.warning(f"指数{index_code}成分股为空")
+                return []
+            frame['symbol'] = frame['symbol'].astype(str).str.zfill(6)
+            if 'exchange' not in frame.columns:
+                frame['exchange'] = np.where(frame['symbol'].str.startswith('6'), 'SH', 'SZ')
+            if 'weight' not in frame.columns:
+                frame['weight'] = None
+
+        frame['index_code'] = index_code
+        frame['index_name'] = index_code
+        return frame_to_records(frame[['symbol', 'name', 'exchange', 'weight', 'index_code', 'index_name']])
+
+    def _trading_calendar(self) -> List[date]:
+        if self.is_synthetic:
+            return self._synthetic_days().date.tolist()
+
+        frame = self._read_table(Path('trading_calendar'))
+        if frame is None or frame.empty:
+            return []
+        column = 'trade_date' if 'trade_date' in frame.columns else frame.columns[0]
+        return pd.to_datetime(frame[column]).dt.date.tolist()
+
+    def _adjustment_factors(self, symbol: str) -> pd.DataFrame:
+        frame = None if self.is_synthetic else self._read_table(Path('adjustment_factors') / symbol)
+        if frame is None or frame.empty:
+            return pd.DataFrame(columns=['ex_date', 'factor'])
+
+        return pd.DataFrame({
+            'ex_date': pd.to_datetime(frame['ex_date']).dt.date,
+            'factor': pd.to_numeric(frame['factor'], errors='coerce')
+        }).dropna().sort_values('ex_date').reset_index(drop=True)
+
+    def _symbols_frame(self) -> pd.DataFrame:
+        """股票列表DataFrame（symbol, name, exchange, asset_type, is_active）"""
+        if self.is_synthetic:
+            # 沪市与深市代码交替，保证任意前N只股票两个交易所都有
+            codes = [
+                f'{600000 + i // 2:06d}' if i % 2 == 0 else f'{1 + i // 2:06d}'
+                for i in range(self.synthetic_symbols)
+            ]
+            frame = pd.DataFrame({'symbol': codes, 'name': [f'合成{code}' for code in codes]})
+        else:
+            frame = self._read_table(Path('symbols'))
+            if frame is None:
+                frame = pd.DataFrame({'symbol': self._symbols_from_bars()})
+            frame['symbol'] = frame['symbol'].astype(str).str.zfill(6)
+            if 'name' not in frame.columns:
+                frame['name'] = frame['symbol']
+
+        if 'exchange' not in frame.columns:
+            frame['exchange'] = np.where(frame['symbol'].str.startswith('6'), 'SH', 'SZ')
+        frame['asset_type'] = 'stock'
+        frame['is_active'] = True
+        return frame
+
+    def _symbols_from_bars(self) -> List[str]:
+        """没有symbols文件时以日线文件名作为股票列表"""
+        bars_dir = self.data_dir / 'bars'
+        if not bars_dir.is_dir():
+            return []
+        return sorted({path.stem for path in bars_dir.iterdir() if path.suffix in ('.csv', '.parquet')})
+
+    def _build_snapshot(self, symbols: Optional[List[str]] = None) -> pd.DataFrame:
+        """由各股票最后两根日线构造快照"""
+        names = self._symbols_frame().set_index('symbol')['name']
+        today = pd.Timestamp(date.today())
+
+        rows = []
+        for symbol in (symbols if symbols is not None else names.index):
+            frame = self._daily_frame(symbol)
+            if frame is None or frame.empty:
+                continue
+            frame = frame.loc[:today]
+            if frame.empty:
+                continue
+
+            last = frame.iloc[-1]
+            pre_close = float(frame['close'].iloc[-2]) if len(frame) > 1 else float(last['open'])
+            rows.append({
+                'symbol': symbol,
+                'name': names.get(symbol, symbol),
+                'latest_price': float(last['close']),
+                'open': float(last['open']),
+                'high': float(last['high']),
+                'low': float(last['low']),
+                'pre_close': pre_close,
+                'volume': float(last['volume']),
+                'amount': float(last.get('amount', last['close'] * last['volume'])),
+                'change_amount': float(last['close']) - pre_close,
+                'change_pct': (float(last['close']) / pre_close - 1) * 100 if pre_close else 0.0,
+                'market_cap': None
+            })
+
+        if not rows:
+            return pd.DataFrame()
+        return pd.DataFrame(rows).set_index('symbol')
+
+    def _daily_frame(self, symbol: str) -> Optional[pd.DataFrame]:
+        if self.is_synthetic:
+            return self._cached(('1d', symbol), lambda: self._synthetic_daily(symbol))
+        return self._load_bars(symbol, '1d')
+
+    def _load_bars(self, symbol: str, period: str) -> Optional[pd.DataFrame]:
+        """读取行情文件（LRU缓存），以时间为索引"""
+        def load():
+            relative = Path('bars') / symbol if period == '1d' else Path('bars') / period / symbol
+            frame = self._read_table(relative)
+            if frame is None or frame.empty:
+                return None
+            column = next((c for c in ('date', '日期', 'timestamp', '时间') if c in frame.columns), frame.columns[0])
+            frame.index = pd.to_datetime(frame.pop(column))
+            frame.index.name = 'date'
+            return frame.sort_index()
+
+        return self._cached((period, symbol), load)
+
+    def _cached(self, key, loader):
+        with self._frames_lock:
+            if key in self._frames:
+                self._frames.move_to_end(key)
+                return self._frames[key]
+
+        frame = loader()
+        with self._frames_lock:
+            self._frames[key] = frame
+            while len(self._frames) > self.cache_size:
+                self._frames.popitem(last=False)
+        return frame
+
+    def _read_table(self, relative: Path) -> Optional[pd.DataFrame]:
+        """读取目录中的Parquet或CSV文件，不存在时返回None"""
+        parquet_path = self.data_dir / relative.with_suffix('.parquet')
+        if parquet_path.exists():
+            return pd.read_parquet(parquet_path)
+
+        csv_path = self.data_dir / relative.with_suffix('.csv')
+        if csv_path.exists():
+            return pd.read_csv(csv_path, dtype={'symbol': str, '代码': str})
+
+        return None
+
+    def _synthetic_days(self) -> pd.DatetimeIndex:
+        return pd.bdate_range(self.synthetic_start, self.synthetic_end, name='date')
+
+    def _symbol_rng(self, symbol: str, *salt: int) -> np.random.Generator:
+        """每只股票独立且确定的随机数生成器（与请求区间无关）"""
+        return np.random.default_rng([self.synthetic_seed, int(symbol) if symbol.isdigit() else hash(symbol) & 0xffffffff, *salt])
+
+    def _synthetic_daily(self, symbol: str) -> pd.DataFrame:
+        """按几何布朗运动生成完整区间的日线"""
+        index = self._synthetic_days()
+        rng = self._symbol_rng(symbol)
+        sigma = self.volatility / np.sqrt(252)
+        mu = self.drift / 252 - sigma ** 2 / 2
+
+        close = self.start_price * np.exp(np.cumsum(rng.normal(mu, sigma, len(index))))
+        previous = np.concatenate(([self.start_price], close[:-1]))
+        open_ = previous * np.exp(rng.normal(0, sigma * 0.3, len(index)))
+        high = np.maximum(open_, close) * np.exp(np.abs(rng.normal(0, sigma * 0.5, len(index))))
+        low = np.minimum(open_, close) * np.exp(-np.abs(rng.normal(0, sigma * 0.5, len(index))))
+        volume = rng.lognormal(np.log(1e6), 0.5, len(index)).round()
+
+        return pd.DataFrame({
+            'open': open_.round(2),
+            'high': high.round(2),
+            'low': low.round(2),
+            'close': close.round(2),
+            'volume': volume,
+            'amount': (volume * close).round(2)
+        }, index=index)
+
+    def _synthetic_minutes(self, symbol: str, start_date: date, end_date: date, period: str) -> pd.DataFrame:
+        """由日线生成分钟线：1分钟价格路径从开盘价出发、在收盘价结束，再按交易时段汇总到目标周期"""
+        from services.bar_rollup import SESSIONS, INTERVAL_MINUTES, bucket_timestamps
+
+        if period not in INTERVAL_MINUTES:
+            raise ValueError(f"不支持的数据周期: {period}")
+
+        daily = self._daily_frame(symbol)
+        daily = daily.loc[pd.Timestamp(start_date):pd.Timestamp(end_date)]
+        if daily.empty:
+            return pd.DataFrame()
+
+        offsets = np.concatenate([np.arange(start + 1, end + 1) for start, end in SESSIONS]).astype('timedelta64[m]')
+        steps = len(offsets)
+        sigma = self.volatility / np.sqrt(252 * steps)
+
+        frames = []
+        for day, bar in daily.iterrows():
+            rng = self._symbol_rng(symbol, day.toordinal())
+            # 布朗桥：随机游走减去线性漂移，使终点落在收盘价
+            walk = np.cumsum(rng.normal(0, sigma, steps))
+            path = np.log(bar['open']) + walk - np.linspace(0, 1, steps) * (walk[-1] - np.log(bar['close'] / bar['open']))
+            close = np.exp(path)
+            open_ = np.concatenate(([bar['open']], close[:-1]))
+            noise = np.abs(rng.normal(0, sigma * 0.5, steps))
+            volume = rng.multinomial(int(bar['volume']), rng.dirichlet(np.ones(steps)))
+
+            frames.append(pd.DataFrame({
+                'timestamp': np.datetime64(day.date(), 'ns') + offsets,
+                'open': open_,
+                'high': np.maximum(open_, close) * np.exp(noise),
+                'low': np.minimum(open_, close) * np.exp(-noise),
+                'close': close,
+                'volume': volume.astype(float)
+            }))
+
+        minutes = pd.concat(frames, ignore_index=True)
+        if period != '1m':
+            minutes['timestamp'] = bucket_timestamps(minutes['timestamp'].to_numpy(), period)
+            minutes = minutes.groupby('timestamp', sort=True).agg(
+                open=('open', 'first'), high=('high', 'max'), low=('low', 'min'),
+                close=('close', 'last'), volume=('volume', 'sum')
+            ).reset_index()
+
+        minutes[['open', 'high', 'low', 'close']] = minutes[['open', 'high', 'low', 'close']].round(2)
+        minutes['amount'] = (minutes['volume'] * minutes['close']).round(2)
+        return minutes.set_index(pd.DatetimeIndex(minutes.pop('timestamp'), name='date'))
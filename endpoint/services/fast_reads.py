@@ -0,0 +1,197 @@
+"""
+浮点读取路径
+行情表与持仓表的价格字段是Numeric，ORM读取时每个值都先构造Decimal、再由to_dict转换为float。
+批量读取行情与计算持仓市值时改用Core查询，在SQL中把价格转换为浮点（驱动直接返回float），
+结果为NumPy数组或元组，不构造ORM对象与Decimal
+"""
+
+import logging
+from datetime import datetime
+from typing import List, Dict, Optional, Iterable, Tuple
+
+import numpy as np
+from sqlalchemy import Double, cast, func, select
+
+from models import db, MarketData, Position, Trade
+
+logger = logging.getLogger(__name__)
+
+# 行情的价格/成交量字段
+PRICE_COLUMNS = ('open_price', 'high_price', 'low_price', 'close_price', 'volume')
+
+# 转换为整数数组的字段
+INTEGER_COLUMNS = ('id', 'symbol_id', 'bar_count')
+
+
+def as_float(column):
+    """
+    把Numeric字段转换为浮点选择列
+
+    SQL中CAST为浮点类型（MySQL 8.0.17+为DOUBLE、SQLite为REAL），驱动直接返回float；
+    数据库不支持该CAST时SQLAlchemy省略CAST，仍由Double类型在结果处理时转换为float
+    """
+    return cast(column, Double(asdecimal=False)).label(column.key)
+
+
+def rows_to_arrays(rows: List[tuple], columns: Iterable[str]) -> Dict[str, np.ndarray]:
+    """
+    按列把查询结果转换为NumPy数组：以timestamp结尾的字段为datetime64[ns]，INTEGER_COLUMNS为int64，其余为float64
+
+    Args:
+        rows: 查询结果行
+        columns: 与行内顺序一致的字段名
+
+    Returns:
+        Dict[str, np.ndarray]: 字段名 -> 数组
+    """
+    columns = list(columns)
+    values = list(zip(*rows)) if rows else [()] * len(columns)
+    arrays = {}
+    for column, value in zip(columns, values):
+        if column.endswith('timestamp'):
+            arrays[column] = np.array(value, dtype='datetime64[ns]')
+        elif column in INTEGER_COLUMNS:
+            arrays[column] = np.array(value, dtype=np.int64)
+        else:
+            arrays[column] = np.array(value, dtype=float)
+    return arrays
+
+
+def select_bars(
+    interval_type: str,
+    symbol_ids: Optional[List[int]] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+):
+    """
+    行情浮点查询语句，按(标的, 时间)升序
+
+    Args:
+        interval_type: 数据周期
+        symbol_ids: 标的ID，None表示全部
+        start: 开始时间（包含）
+        end: 结束时间（不包含）
+
+    Returns:
+        Select: 选择列为symbol_id、timestamp与PRICE_COLUMNS
+    """
+    t = MarketData.__table__
+    stmt = select(t.c.symbol_id, t.c.timestamp, *[as_float(t.c[column]) for column in PRICE_COLUMNS]).where(t.c.interval_type == interval_type)
+    if symbol_ids is not None:
+        stmt = stmt.where(t.c.symbol_id.in_(symbol_ids))
+    if start is not None:
+        stmt = stmt.where(t.c.timestamp >= start)
+    if end is not None:
+        stmt = stmt.where(t.c.timestamp < end)
+    return stmt.order_by(t.c.symbol_id, t.c.timestamp)
+
+
+def read_bar_arrays(
+    interval_type: str,
+    symbol_ids: Optional[List[int]] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+) -> Dict[str, np.ndarray]:
+    """
+    批量读取行情为数组
+
+    Args:
+        interval_type: 数据周期
+        symbol_ids: 标的ID，None表示全部
+        start: 开始时间（包含）
+        end: 结束时间（不包含）
+
+    Returns:
+        Dict[str, np.ndarray]: symbol_id、timestamp与PRICE_COLUMNS，按(标的, 时间)升序
+    """
+    rows = db.session.execute(select_bars(interval_type, symbol_ids, start, end)).all()
+    return rows_to_arrays(rows, ('symbol_id', 'timestamp') + PRICE_COLUMNS)
+
+
+def read_position_rows(portfolio_ids: List[int]) -> List[Tuple]:
+    """
+    读取投资组合的持仓用于估值
+
+    Args:
+        portfolio_ids: 投资组合ID
+
+    Returns:
+        List[Tuple]: (portfolio_id, symbol, quantity, average_price, current_price)，数值均为float
+    """
+    if not portfolio_ids:
+        return []
+
+    t = Position.__table__
+    return [tuple(row) for row in db.session.execute(
+        select(t.c.portfolio_id, t.c.symbol, as_float(t.c.quantity),
+               as_float(t.c.average_price), as_float(t.c.current_price))
+        .where(t.c.portfolio_id.in_(portfolio_ids))
+        .order_by(t.c.portfolio_id, t.c.symbol)
+    )]
+
+
+def portfolio_position_values(portfolio_ids: List[int]) -> Dict[int, float]:
+    """
+    在数据库中汇总每个投资组合的持仓市值（数量 × 当前价格）
+
+    Args:
+        portfolio_ids: 投资组合ID
+
+    Returns:
+        Dict[int, float]: 投资组合ID -> 持仓市值，没有持仓的组合为0
+    """
+    values = {portfolio_id: 0.0 for portfolio_id in portfolio_ids}
+    if not portfolio_ids:
+        return values
+
+    t = Position.__table__
+    rows = db.session.execute(
+        select(t.c.portfolio_id, func.sum(as_float(t.c.quantity) * as_float(t.c.current_price)))
+        .where(t.c.portfolio_id.in_(portfolio_ids))
+        .group_by(t.c.portfolio_id)
+    )
+    for portfolio_id, value in rows:
+        values[portfolio_id] = float(value or 0)
+    return values
+
+
+def read_trade_columns(portfolio_ids: List[int], symbol: Optional[str] = None, limit: Optional[int] = 100) -> Dict[str, np.ndarray]:
+    """
+    按列读取交易记录（字段与Trade.to_dict相同，按成交时间倒序），用于二进制格式的交易历史
+
+    Args:
+        portfolio_ids: 投资组合ID
+        symbol: 只读取该标的的交易
+        limit: 最多返回的条数
+
+    Returns:
+        Dict[str, np.ndarray]: 数值字段为float64，ID为int64（strategy_execution_id可能为空，为object），
+        时间字段为datetime64[ns]，其余为object
+    """
+    t = Trade.__table__
+    numeric = ('quantity', 'price', 'amount', 'fee', 'pnl')
+    columns = ('id', 'portfolio_id', 'strategy_execution_id', 'symbol', 'side') + numeric + ('status', 'executed_at', 'created_at')
+
+    rows = []
+    if portfolio_ids:
+        stmt = select(
+            t.c.id, t.c.portfolio_id, t.c.strategy_execution_id, t.c.symbol, t.c.side,
+            *[as_float(t.c[column]) for column in numeric], t.c.status, t.c.executed_at, t.c.created_at
+        ).where(t.c.portfolio_id.in_(portfolio_ids))
+        if symbol:
+            stmt = stmt.where(t.c.symbol == symbol)
+        rows = db.session.execute(stmt.order_by(t.c.executed_at.desc()).limit(limit)).all()
+
+    values = list(zip(*rows)) if rows else [()] * len(columns)
+    arrays = {}
+    for column, value in zip(columns, values):
+        if column in numeric:
+            arrays[column] = np.array(value, dtype=float)
+        elif column in ('id', 'portfolio_id'):
+            arrays[column] = np.array(value, dtype=np.int64)
+        elif column.endswith('_at'):
+            arrays[column] = np.array(value, dtype='datetime64[ns]')
+        else:
+            arrays[column] = np.array(value, dtype=object)
+    arrays['net_amount'] = arrays['amount'] - arrays['fee']
+    return arrays
@@ -0,0 +1,526 @@
+"""
+入库任务服务
+将行情数据获取作为持久化任务在后台线程中执行，按工作项记录检查点，重启后从检查点继续
+"""
+
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, date, time, timedelta
+from typing import List, Dict, Optional, Tuple
+
+from sqlalchemy import func, update, insert, and_, or_
+
+from models import db, IngestionJob, IngestionJobItem
+
+logger = logging.getLogger(__name__)
+
+# 任务状态
+ACTIVE_STATUSES = ('pending', 'running')
+
+# 复权因子同步任务类型（工作项的日期区间不使用）
+ADJUSTMENT_JOB_TYPE = 'adjustment_factors'
+
+
+class IngestionJobService:
+    """入库任务服务（进程级单例，通过init_app绑定Flask应用）"""
+
+    def __init__(self, max_workers: int = 1, batch_size: int = 50, lease_seconds: int = 300):
+        """
+        初始化入库任务服务
+
+        Args:
+            max_workers: 同时运行的任务数
+            batch_size: 每批交给流式管道处理的工作项数
+            lease_seconds: 任务租约时长（秒），运行中的任务超过该时长没有心跳才可被其他进程接管
+        """
+        self.app = None
+        self.max_workers = max_workers
+        self.batch_size = batch_size
+        self.lease_seconds = lease_seconds
+        self._executor = None
+        self._running = set()
+        self._lock = threading.Lock()
+
+    def init_app(self, app) -> None:
+        """
+        绑定Flask应用，并按配置恢复未完成的任务
+
+        Args:
+            app: Flask应用
+        """
+        self.app = app
+        self.max_workers = app.config.get('INGESTION_JOB_WORKERS', self.max_workers)
+        self.batch_size = app.config.get('INGESTION_JOB_BATCH_SIZE', self.batch_size)
+        self.lease_seconds = app.config.get('INGESTION_JOB_LEASE_SECONDS', self.lease_seconds)
+
+        if app.config.get('INGESTION_JOB_AUTO_RESUME') and not app.config.get('TESTING'):
+            with app.app_context():
+                self.resume_incomplete_jobs()
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='ingestion-job')
+            return self._executor
+
+    # ============================================
+    # 任务管理
+    # ============================================
+
+    def create_job(
+        self,
+        job_type: str,
+        tasks: List[Tuple[str, date, date]],
+        data_source: str = 'akshare',
+        params: Optional[Dict] = None,
+        created_by: Optional[int] = None,
+        submit: bool = True
+    ) -> IngestionJob:
+        """
+        创建任务并批量写入工作项
+
+        Args:
+            job_type: 任务类型（latest/historical/backfill/intraday/adjustment_factors）
+            tasks: (股票代码, 开始日期, 结束日期) 列表，按列表顺序执行
+            data_source: 数据源名称
+            params: 任务参数（需包含force_update等执行选项）
+            created_by: 创建用户ID
+            submit: 是否立即提交到后台执行
+
+        Returns:
+            IngestionJob: 任务记录
+        """
+        job = IngestionJob(
+            job_type=job_type,
+            status='pending',
+            data_source=data_source,
+            total_items=len(tasks),
+            created_by=created_by
+        )
+        job.set_params(params or {})
+        db.session.add(job)
+        db.session.flush()
+
+        now = datetime.utcnow()
+        rows = [
+            {
+                'job_id': job.id,
+                'symbol': symbol,
+                'start_date': start_date,
+                'end_date': end_date,
+                'status': 'pending',
+                'rows_written': 0,
+                'attempts': 0,
+                'updated_at': now
+            }
+            for symbol, start_date, end_date in tasks
+        ]
+        for i in range(0, len(rows), 1000):
+            db.session.execute(insert(IngestionJobItem.__table__), rows[i:i + 1000])
+
+        db.session.commit()
+        logger.info(f"创建入库任务{job.id}: {job_type}，{len(tasks)}个工作项")
+
+        if submit:
+            self.submit(job.id)
+        return job
+
+    def submit(self, job_id: int) -> bool:
+        """
+        提交任务到后台执行（同一任务不会重复运行）
+
+        Args:
+            job_id: 任务ID
+
+        Returns:
+            bool: 是否提交成功
+        """
+        if not self._reserve(job_id):
+            return False
+
+        self.executor.submit(self._run_in_context, job_id)
+        return True
+
+    def resume(self, job_id: int, retry_failed: bool = True) -> bool:
+        """
+        恢复任务：失败的工作项重新置为待处理，从各自检查点继续
+
+        租约未过期的运行中任务不能恢复：运行中的循环只处理检查点之后的工作项，重新置为待处理的失败项不会被执行
+
+        Args:
+            job_id: 任务ID
+            retry_failed: 是否重试失败的工作项
+
+        Returns:
+            bool: 是否提交成功（任务不存在或正在运行时为False）
+        """
+        # 先占用运行标记，避免与并发的提交交错重置工作项
+        if not self._reserve(job_id):
+            return False
+
+        try:
+            # 条件更新：其他进程持有租约时不重置任务
+            now = datetime.utcnow()
+            result = db.session.execute(
+                update(IngestionJob.__table__)
+                .where(
+                    IngestionJob.id == job_id,
+                    or_(IngestionJob.status != 'running', self._lease_expired(now))
+                )
+                .values(status='pending', finished_at=None, error=None, updated_at=now)
+            )
+            if result.rowcount != 1:
+                db.session.rollback()
+                with self._lock:
+                    self._running.discard(job_id)
+                return False
+
+            if retry_failed:
+                db.session.execute(
+                    update(IngestionJobItem.__table__)
+                    .where(IngestionJobItem.job_id == job_id, IngestionJobItem.status == 'failed')
+                    .values(status='pending', updated_at=now)
+                )
+            db.session.commit()
+        except Exception:
+            with self._lock:
+                self._running.discard(job_id)
+            raise
+
+        self.executor.submit(self._run_in_context, job_id)
+        return True
+
+    def _lease_expired(self, now: datetime):
+        """运行中任务的租约已过期（超过lease_seconds没有心跳）的查询条件"""
+        cutoff = now - timedelta(seconds=self.lease_seconds)
+        return and_(
+            IngestionJob.status == 'running',
+            or_(IngestionJob.heartbeat_at.is_(None), IngestionJob.heartbeat_at < cutoff)
+        )
+
+    def _claim(self, job_id: int) -> bool:
+        """
+        认领任务：单条条件UPDATE把待处理或租约已过期的任务置为运行中
+
+        多个进程（gunicorn worker、重载器父子进程、命令行）同时恢复同一任务时只有一个UPDATE影响到行
+
+        Args:
+            job_id: 任务ID
+
+        Returns:
+            bool: 是否认领成功
+        """
+        now = datetime.utcnow()
+        result = db.session.execute(
+            update(IngestionJob.__table__)
+            .where(
+                IngestionJob.id == job_id,
+                or_(IngestionJob.status == 'pending', self._lease_expired(now))
+            )
+            .values(
+                status='running',
+                started_at=func.coalesce(IngestionJob.started_at, now),
+                resumed_at=now,
+                heartbeat_at=now,
+                updated_at=now
+            )
+        )
+        if result.rowcount != 1:
+            db.session.rollback()
+            return False
+        db.session.commit()
+        return True
+
+    def _reserve(self, job_id: int) -> bool:
+        """占用任务的运行标记（同一任务不会重复运行）"""
+        if self.app is None:
+            raise RuntimeError("IngestionJobService未绑定Flask应用")
+
+        with self._lock:
+            if job_id in self._running:
+                return False
+            self._running.add(job_id)
+        return True
+
+    def cancel(self, job_id: int) -> bool:
+        """
+        取消任务（运行中的任务在当前批次结束后停止）
+
+        Args:
+            job_id: 任务ID
+
+        Returns:
+            bool: 是否取消成功
+        """
+        job = db.session.get(IngestionJob, job_id)
+        if job is None or job.status not in ACTIVE_STATUSES:
+            return False
+
+        job.status = 'cancelled'
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+        logger.info(f"入库任务{job_id}已取消")
+        return True
+
+    def resume_incomplete_jobs(self) -> List[int]:
+        """
+        恢复未完成的任务：待处理的任务与租约已过期的运行中任务
+
+        每个进程启动时都会调用，其他进程仍在心跳的任务不会被提交；同时提交的进程由_claim保证只有一个执行
+
+        Returns:
+            List[int]: 已重新提交的任务ID
+        """
+        try:
+            job_ids = [
+                job_id for (job_id,) in
+                db.session.query(IngestionJob.id).filter(
+                    or_(IngestionJob.status == 'pending', self._lease_expired(datetime.utcnow()))
+                ).all()
+            ]
+        except Exception as e:
+            # 表尚未创建（未执行迁移）时不影响应用启动
+            logger.warning(f"查询未完成的入库任务失败: {e}")
+            db.session.rollback()
+            return []
+
+        # 租约过期的running任务已没有线程在执行（_run_job从待处理的工作项继续）
+        resumed = [job_id for job_id in job_ids if self.submit(job_id)]
+        if resumed:
+            logger.info(f"恢复未完成的入库任务: {resumed}")
+        return resumed
+
+    def get_progress(self, job_id: int) -> Dict[str, int]:
+        """一次聚合查询统计任务各状态的工作项数与已写入行数"""
+        progress = {'done': 0, 'failed': 0, 'pending': 0, 'rows_written': 0}
+
+        rows = db.session.query(
+            IngestionJobItem.status,
+            func.count(IngestionJobItem.id),
+            func.coalesce(func.sum(IngestionJobItem.rows_written), 0)
+        ).filter(IngestionJobItem.job_id == job_id).group_by(IngestionJobItem.status).all()
+
+        for status, count, rows_written in rows:
+            progress[status] = progress.get(status, 0) + count
+            progress['rows_written'] += int(rows_written)
+
+        return progress
+
+    def get_job_status(self, job_id: int) -> Optional[Dict]:
+        """
+        获取任务状态（进度、吞吐量与预计剩余时间）
+
+        Args:
+            job_id: 任务ID
+
+        Returns:
+            Optional[Dict]: 任务状态，任务不存在时返回None
+        """
+        # 任务由后台线程更新，重新加载避免读取会话中的旧状态
+        job = db.session.get(IngestionJob, job_id, populate_existing=True)
+        if job is None:
+            return None
+        return job.to_dict(self.get_progress(job_id))
+
+    # ============================================
+    # 任务执行
+    # ============================================
+
+    def _run_in_context(self, job_id: int) -> None:
+        """在应用上下文中执行任务"""
+        try:
+            with self.app.app_context():
+                try:
+                    self._run_job(job_id)
+                except Exception as e:
+                    logger.error(f"入库任务{job_id}执行失败: {e}")
+                    db.session.rollback()
+                    self._finish(job_id, 'failed', str(e))
+                finally:
+                    db.session.remove()
+        finally:
+            with self._lock:
+                self._running.discard(job_id)
+
+    def _run_job(self, job_id: int) -> None:
+        """认领任务后按批次处理待处理的工作项，每块写入后更新检查点与心跳"""
+        from services.market_data_service import MarketDataService
+
+        if not self._claim(job_id):
+            logger.info(f"入库任务{job_id}已结束或由其他进程运行，跳过")
+            return
+
+        job = db.session.get(IngestionJob, job_id, populate_existing=True)
+        progress = self.get_progress(job_id)
+        job.resume_done_items = progress['done']
+        job.resume_rows_written = progress['rows_written']
+        db.session.commit()
+
+        params = job.get_params()
+        force_update = bool(params.get('force_update', False))
+        interval_type = params.get('interval_type', '1d')
+
+        # 获取失败时数据源抛出异常（而不是返回空数据），失败的块才会记录到工作项上，恢复时重新执行
+        market_service = MarketDataService(job.data_source, {'raise_errors': True})
+        if not market_service.initialize_data_source():
+            raise Exception("数据源初始化失败")
+
+        logger.info(f"入库任务{job_id}开始运行，剩余{progress['pending']}个工作项")
+
+        last_item_id = 0
+        while True:
+            if self._is_cancelled(job_id):
+                logger.info(f"入库任务{job_id}已取消，停止运行")
+                return
+
+            items = IngestionJobItem.query.filter(
+                IngestionJobItem.job_id == job_id,
+                IngestionJobItem.status == 'pending',
+                IngestionJobItem.id > last_item_id
+            ).order_by(IngestionJobItem.id).limit(self.batch_size).all()
+
+            if not items:
+                break
+
+            last_item_id = items[-1].id
+            self._heartbeat(job_id)
+            if job.job_type == ADJUSTMENT_JOB_TYPE:
+                self._run_adjustment_batch(market_service, items)
+            else:
+                self._run_batch(market_service, items, force_update, interval_type)
+
+        # 有失败的工作项时任务以failed结束，恢复时重试失败项
+        failed = self.get_progress(job_id)['failed']
+        if failed:
+            self._finish(job_id, 'failed', f"{failed}个工作项失败")
+        else:
+            self._finish(job_id, 'completed')
+
+    def _run_batch(
+        self,
+        market_service,
+        items: List[IngestionJobItem],
+        force_update: bool,
+        interval_type: str = '1d'
+    ) -> None:
+        """处理一批工作项：从检查点之后开始流式入库，检查点只沿连续完成的块前移"""
+        calendar = market_service.calendar
+        states = {}
+        tasks = []
+
+        for item in items:
+            resume_from = item.last_timestamp.date() + timedelta(days=1) if item.last_timestamp else item.start_date
+            if resume_from > item.end_date or not calendar.has_trading_days(resume_from, item.end_date):
+                self._update_item(item.id, status='done')
+                continue
+
+            states[item.id] = {
+                'id': item.id,
+                'job_id': item.job_id,
+                'symbol': item.symbol,
+                'start_date': item.start_date,
+                'end_date': item.end_date,
+                'next_start': calendar.trading_days_between(resume_from, item.end_date)[0],
+                'completed': {},
+                'error': None
+            }
+            tasks.append((item.symbol, resume_from, item.end_date))
+
+        if not tasks:
+            return
+
+        def on_chunk(symbol, start_date, end_date, stats, error):
+            state = self._find_state(states, symbol, start_date)
+            if state is None:
+                return
+
+            rows = stats['inserted'] + stats['updated'] if stats else 0
+            if error:
+                state['error'] = error
+            else:
+                state['completed'][start_date] = end_date
+
+            # 块可能乱序完成，检查点只推进到连续完成的最后一块
+            checkpoint = None
+            while state['next_start'] in state['completed']:
+                checkpoint = state['completed'].pop(state['next_start'])
+                state['next_start'] = calendar.next_trading_day(checkpoint)
+
+            values = {'rows_written': IngestionJobItem.rows_written + rows}
+            if checkpoint is not None and state['error'] is None:
+                values['last_timestamp'] = datetime.combine(checkpoint, time.min)
+            self._update_item(state['id'], **values)
+            self._heartbeat(state['job_id'])
+
+        market_service.stream_ingest(tasks, force_update, on_chunk=on_chunk, interval_type=interval_type)
+
+        for item_id, state in states.items():
+            if state['error']:
+                self._update_item(item_id, status='failed', error=state['error'],
+                                  attempts=IngestionJobItem.attempts + 1)
+            else:
+                self._update_item(item_id, status='done', error=None, attempts=IngestionJobItem.attempts + 1)
+
+    def _run_adjustment_batch(self, market_service, items: List[IngestionJobItem]) -> None:
+        """逐只同步一批股票的复权因子，rows_written记录写入（新增、更新、删除）的因子数"""
+        symbol_map = market_service._load_symbol_map([item.symbol for item in items])
+
+        for item in items:
+            try:
+                symbol_obj = symbol_map.get(item.symbol)
+                if symbol_obj is None:
+                    raise ValueError(f"股票{item.symbol}不存在")
+
+                stats = market_service.sync_adjustment_factors(item.symbol, symbol_obj.id)
+                self._update_item(item.id, status='done', error=None,
+                                  rows_written=stats['inserted'] + stats['updated'] + stats['deleted'],
+                                  attempts=IngestionJobItem.attempts + 1)
+            except Exception as e:
+                logger.error(f"同步{item.symbol}复权因子失败: {e}")
+                db.session.rollback()
+                self._update_item(item.id, status='failed', error=str(e), attempts=IngestionJobItem.attempts + 1)
+            self._heartbeat(item.job_id)
+
+    @staticmethod
+    def _find_state(states: Dict, symbol: str, start_date: date) -> Optional[Dict]:
+        """按股票代码与块开始日期找到所属工作项"""
+        for state in states.values():
+            if state['symbol'] == symbol and state['start_date'] <= start_date <= state['end_date']:
+                return state
+        return None
+
+    def _update_item(self, item_id: int, **values) -> None:
+        """更新工作项并提交（检查点）"""
+        values['updated_at'] = datetime.utcnow()
+        db.session.execute(
+            update(IngestionJobItem.__table__).where(IngestionJobItem.id == item_id).values(**values)
+        )
+        db.session.commit()
+
+    def _heartbeat(self, job_id: int) -> None:
+        """更新任务心跳（续租）"""
+        db.session.execute(
+            update(IngestionJob.__table__).where(IngestionJob.id == job_id).values(heartbeat_at=datetime.utcnow())
+        )
+        db.session.commit()
+
+    def _is_cancelled(self, job_id: int) -> bool:
+        status = db.session.query(IngestionJob.status).filter(IngestionJob.id == job_id).scalar()
+        return status == 'cancelled'
+
+    def _finish(self, job_id: int, status: str, error: Optional[str] = None) -> None:
+        """结束任务（已取消的任务保持取消状态）"""
+        now = datetime.utcnow()
+        db.session.execute(
+            update(IngestionJob.__table__)
+            .where(IngestionJob.id == job_id, IngestionJob.status != 'cancelled')
+            .values(status=status, error=error, finished_at=now, heartbeat_at=now, updated_at=now)
+        )
+        db.session.commit()
+        logger.info(f"入库任务{job_id}结束: {status}")
+
+
+# 全局入库任务服务实例
+ingestion_job_service = IngestionJobService()
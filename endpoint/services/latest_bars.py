@@ -0,0 +1,224 @@
+"""
+最新K线表
+每个标的、周期在market_data_latest表中保存一行最新K线，由批量写入器在写入行情的同一事务内维护；
+查询最新价格、最后交易日与全市场最新行情时按(标的, 周期)键直接读取，不再对行情表逐只执行ORDER BY timestamp DESC LIMIT 1
+"""
+
+import logging
+from datetime import datetime
+from typing import List, Dict, Optional, Iterable
+
+from sqlalchemy import select, func
+
+from models import db, MarketData, LatestBar
+from services.metrics import metrics_registry
+from services.fast_reads import PRICE_COLUMNS, as_float
+
+logger = logging.getLogger(__name__)
+
+# 随最新K线覆盖的字段（timestamp单独处理，保证只前进不后退）
+LATEST_COLUMNS = PRICE_COLUMNS + ('data_source_id',)
+
+
+class LatestBarStore:
+    """最新K线表读写"""
+
+    def __init__(self, chunk_size: int = 1000):
+        """
+        初始化最新K线表
+
+        Args:
+            chunk_size: 每条upsert语句/IN条件包含的最大行数
+        """
+        self.chunk_size = chunk_size
+        self.table = LatestBar.__table__
+
+    def upsert(self, rows: Iterable[Dict]) -> int:
+        """
+        用写入行情表的行更新最新K线（不提交，由调用方与行情写入一起提交）
+
+        每个(标的, 周期)只取批内时间最新的一行；表中已有更新的K线时保持不变（补历史数据不会覆盖最新K线），
+        时间相同则覆盖（强制更新当日K线时同步最新价格）
+
+        Args:
+            rows: 行情表行，需包含symbol_id、interval_type、timestamp及价格字段
+
+        Returns:
+            int: 参与更新的(标的, 周期)数
+        """
+        latest = {}
+        for row in rows:
+            key = (row['symbol_id'], row['interval_type'])
+            current = latest.get(key)
+            if current is None or row['timestamp'] >= current['timestamp']:
+                latest[key] = row
+        if not latest:
+            return 0
+
+        now = datetime.utcnow()
+        values = [
+            dict({column: row.get(column) for column in LATEST_COLUMNS},
+                 symbol_id=row['symbol_id'], interval_type=row['interval_type'],
+                 timestamp=row['timestamp'], updated_at=now)
+            for row in latest.values()
+        ]
+
+        with metrics_registry.timer('latest_bars', 'upsert') as timer:
+            stmt = self._build_upsert(db.session.get_bind().dialect.name)
+            for i in range(0, len(values), self.chunk_size):
+                db.session.execute(stmt, values[i:i + self.chunk_size])
+            timer.rows = len(values)
+        return len(values)
+
+    def _build_upsert(self, dialect: str, newer_only: bool = True):
+        """
+        构造方言相关的upsert语句（依赖uk_latest_symbol_interval唯一键）
+
+        Args:
+            dialect: 数据库方言
+            newer_only: 只在新K线不早于已有K线时覆盖
+        """
+        t = self.table
+        update_columns = list(LATEST_COLUMNS) + ['updated_at']
+
+        if dialect == 'mysql':
+            from sqlalchemy.dialects.mysql import insert as mysql_insert
+            stmt = mysql_insert(t)
+            if not newer_only:
+                return stmt.on_duplicate_key_update(
+                    {column: stmt.inserted[column] for column in update_columns + ['timestamp']}
+                )
+            newer = stmt.inserted.timestamp >= t.c.timestamp
+            # ON DUPLICATE KEY UPDATE按顺序赋值，timestamp必须最后更新，前面的条件才比较的是原值
+            return stmt.on_duplicate_key_update(
+                [(column, func.if_(newer, stmt.inserted[column], t.c[column])) for column in update_columns]
+                + [('timestamp', func.greatest(t.c.timestamp, stmt.inserted.timestamp))]
+            )
+
+        from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+        stmt = sqlite_insert(t)
+        return stmt.on_conflict_do_update(
+            index_elements=['symbol_id', 'interval_type'],
+            set_={column: stmt.excluded[column] for column in update_columns + ['timestamp']},
+            where=(stmt.excluded.timestamp >= t.c.timestamp) if newer_only else None
+        )
+
+    def read(self, symbol_ids: Optional[List[int]], interval_type: str = '1d') -> Dict[int, Dict]:
+        """
+        批量读取最新K线（按唯一键索引读取，价格在SQL中转换为浮点）
+
+        Args:
+            symbol_ids: 标的ID，None表示该周期的全部标的
+            interval_type: 数据周期
+
+        Returns:
+            Dict[int, Dict]: 标的ID -> {'symbol_id', 'timestamp', 价格/成交量字段}
+        """
+        t = self.table
+        columns = ('symbol_id', 'timestamp') + PRICE_COLUMNS
+        stmt = select(t.c.symbol_id, t.c.timestamp, *[as_float(t.c[column]) for column in PRICE_COLUMNS])\
+            .where(t.c.interval_type == interval_type)
+
+        if symbol_ids is None:
+            chunks = [stmt]
+        else:
+            ids = sorted(set(symbol_ids))
+            chunks = [stmt.where(t.c.symbol_id.in_(ids[i:i + self.chunk_size]))
+                      for i in range(0, len(ids), self.chunk_size)]
+
+        bars = {}
+        with metrics_registry.timer('latest_bars', 'read') as timer:
+            for chunk in chunks:
+                for row in db.session.execute(chunk):
+                    bars[row[0]] = dict(zip(columns, row))
+            timer.rows = len(bars)
+        return bars
+
+    def last_timestamps(self, symbol_ids: List[int], interval_type: str = '1d') -> Dict[int, datetime]:
+        """
+        批量读取最后一根K线的时间
+
+        Args:
+            symbol_ids: 标的ID
+            interval_type: 数据周期
+
+        Returns:
+            Dict[int, datetime]: 标的ID -> 最新K线时间（表中没有的标的不包含在内）
+        """
+        t = self.table
+        ids = sorted(set(symbol_ids))
+        timestamps = {}
+        for i in range(0, len(ids), self.chunk_size):
+            rows = db.session.execute(
+                select(t.c.symbol_id, t.c.timestamp)
+                .where(t.c.symbol_id.in_(ids[i:i + self.chunk_size]), t.c.interval_type == interval_type)
+            )
+            timestamps.update(dict(rows.all()))
+        return timestamps
+
+    def latest_for_symbol(self, symbol_id: int) -> Optional[Dict]:
+        """
+        读取标的在所有周期中时间最新的一根K线
+
+        Args:
+            symbol_id: 标的ID
+
+        Returns:
+            Optional[Dict]: {'interval_type', 'timestamp', 'close_price'}，没有数据时为None
+        """
+        t = self.table
+        row = db.session.execute(
+            select(t.c.interval_type, t.c.timestamp, as_float(t.c.close_price))
+            .where(t.c.symbol_id == symbol_id)
+            .order_by(t.c.timestamp.desc())
+            .limit(1)
+        ).first()
+        return dict(zip(('interval_type', 'timestamp', 'close_price'), row)) if row else None
+
+    def rebuild(self, symbol_ids: Optional[List[int]] = None, batch_size: int = 1000) -> Dict[str, int]:
+        """
+        从行情表重新生成最新K线（修复用）
+
+        按标的分批，每批一次聚合查询取(标的, 周期)的最大时间后回表读取该行并覆盖写入；
+        行情表中已全部归档的(标的, 周期)保留表中原有的行
+
+        Args:
+            symbol_ids: 只重建这些标的，默认全部标的
+            batch_size: 每批的标的数
+
+        Returns:
+            Dict[str, int]: {'symbols', 'rows'}
+        """
+        t = MarketData.__table__
+        ids = symbol_ids if symbol_ids is not None else list(
+            db.session.execute(select(t.c.symbol_id).distinct().order_by(t.c.symbol_id)).scalars()
+        )
+        results = {'symbols': 0, 'rows': 0}
+        # 重建以行情表为准，不比较已有行的时间直接覆盖
+        stmt = self._build_upsert(db.engine.dialect.name, newer_only=False)
+
+        for i in range(0, len(ids), batch_size):
+            batch = ids[i:i + batch_size]
+            last = select(t.c.symbol_id, t.c.interval_type, func.max(t.c.timestamp).label('timestamp'))\
+                .where(t.c.symbol_id.in_(batch))\
+                .group_by(t.c.symbol_id, t.c.interval_type)\
+                .subquery()
+            rows = db.session.execute(
+                select(t.c.symbol_id, t.c.interval_type, t.c.timestamp, *[t.c[column] for column in LATEST_COLUMNS])
+                .join(last, (t.c.symbol_id == last.c.symbol_id) & (t.c.interval_type == last.c.interval_type)
+                      & (t.c.timestamp == last.c.timestamp))
+            ).mappings().all()
+
+            now = datetime.utcnow()
+            values = [dict(row, updated_at=now) for row in rows]
+            if values:
+                for j in range(0, len(values), self.chunk_size):
+                    db.session.execute(stmt, values[j:j + self.chunk_size])
+            db.session.commit()
+
+            results['symbols'] += len({row['symbol_id'] for row in rows})
+            results['rows'] += len(rows)
+            logger.info(f"最新K线表重建进度: {min(i + batch_size, len(ids))}/{len(ids)}")
+
+        logger.info(f"最新K线表重建完成: {results}")
+        return results
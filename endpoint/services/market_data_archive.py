@@ -0,0 +1,346 @@
+"""
+行情冷数据归档
+把早于归档期限的K线移出market_data，保存为按 周期/标的/年份 分区的压缩Parquet文件，
+清单文件记录每个标的的归档截止时间；MarketDataService读取时按截止时间把归档文件与热表拼接
+"""
+
+import os
+import json
+import time
+import threading
+import logging
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List, Dict, Optional, Iterable
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select, delete
+
+from models import db, MarketData
+from services.metrics import metrics_registry
+from services.columnar_store import ColumnarBarStore
+from services.fast_reads import PRICE_COLUMNS, as_float, rows_to_arrays
+
+logger = logging.getLogger(__name__)
+
+# 清单文件
+MANIFEST_FILE = 'manifest.json'
+
+# 默认归档期限（自然日）：早于该天数的K线移入归档
+DEFAULT_HORIZON_DAYS = 1825
+
+
+class MarketDataArchive:
+    """
+    行情冷数据归档
+
+    目录结构与列式存储相同（<root>/<周期>/<标的ID>/<年份>.parquet），另有manifest.json：
+    {"intervals": {周期: {"archived_before": 最近一次归档的截止时间,
+                          "symbols": {标的ID: {"cutoff", "rows", "first", "last"}}}}}
+    某个标的早于cutoff的K线全部由归档文件提供，热表中只保留cutoff之后的K线。
+
+    归档顺序保证任一时刻读取结果完整：先写归档文件并读回核对行数，再原子更新清单中的cutoff，
+    最后按主键分块删除热表中已归档的行（每块单独提交，不长时间持有锁）。
+    """
+
+    def __init__(self, root: str, compression: str = 'zstd'):
+        """
+        初始化归档
+
+        Args:
+            root: 归档根目录
+            compression: Parquet压缩算法
+        """
+        self.root = Path(root)
+        self.files = ColumnarBarStore(root, compression, metrics_source='market_data_archive')
+        self.manifest_path = self.root / MANIFEST_FILE
+        self._lock = threading.Lock()
+        self._manifest = None
+        self._manifest_mtime = None
+
+    # ============================================
+    # 清单
+    # ============================================
+
+    def manifest(self) -> Dict:
+        """读取清单（文件变化时重新加载，其他进程完成的归档立即可见）"""
+        try:
+            mtime = self.manifest_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return {'intervals': {}}
+
+        with self._lock:
+            if self._manifest is None or mtime != self._manifest_mtime:
+                self._manifest = json.loads(self.manifest_path.read_text(encoding='utf-8'))
+                self._manifest_mtime = mtime
+            return self._manifest
+
+    def _save_manifest(self, manifest: Dict) -> None:
+        """写临时文件后原子替换"""
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.manifest_path.with_suffix('.json.tmp')
+        tmp_path.write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding='utf-8')
+        os.replace(tmp_path, self.manifest_path)
+
+    def cutoff(self, interval_type: str, symbol_id: int) -> Optional[datetime]:
+        """
+        标的的归档截止时间
+
+        Returns:
+            Optional[datetime]: 早于该时间的K线在归档文件中；未归档时返回None
+        """
+        entry = self.manifest()['intervals'].get(interval_type, {}).get('symbols', {}).get(str(symbol_id))
+        return datetime.fromisoformat(entry['cutoff']) if entry else None
+
+    def last_timestamp(self, interval_type: str, symbol_id: int) -> Optional[datetime]:
+        """标的最后一条已归档K线的时间"""
+        entry = self.manifest()['intervals'].get(interval_type, {}).get('symbols', {}).get(str(symbol_id))
+        return datetime.fromisoformat(entry['last']) if entry and entry['last'] else None
+
+    def summary(self) -> Dict[str, Dict]:
+        """
+        归档概况
+
+        Returns:
+            Dict[str, Dict]: 周期 -> {'symbols', 'rows', 'archived_before', 'start', 'end'}
+        """
+        results = {}
+        for interval_type, info in self.manifest()['intervals'].items():
+            symbols = info.get('symbols', {})
+            results[interval_type] = {
+                'symbols': len(symbols),
+                'rows': sum(entry['rows'] for entry in symbols.values()),
+                'archived_before': info.get('archived_before'),
+                'start': min((entry['first'] for entry in symbols.values() if entry['first']), default=None),
+                'end': max((entry['last'] for entry in symbols.values() if entry['last']), default=None)
+            }
+        return results
+
+    # ============================================
+    # 读取
+    # ============================================
+
+    def read(
+        self,
+        interval_type: str,
+        symbol_id: int,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None
+    ) -> pd.DataFrame:
+        """
+        读取标的已归档的K线
+
+        Args:
+            interval_type: 数据周期
+            symbol_id: 标的ID
+            start: 开始时间（包含）
+            end: 结束时间（不包含）
+
+        Returns:
+            pd.DataFrame: 列为timestamp与PRICE_COLUMNS，按时间升序（不复权价格）
+        """
+        return self.files.read(interval_type, symbol_id, start, end)
+
+    # ============================================
+    # 归档
+    # ============================================
+
+    def archive(
+        self,
+        before: datetime,
+        interval_types: Iterable[str] = ('1d',),
+        symbol_ids: Optional[List[int]] = None,
+        batch_size: int = 50,
+        delete_chunk: int = 5000,
+        pause: float = 0.0
+    ) -> Dict[str, Dict[str, int]]:
+        """
+        把早于before的K线移入归档
+
+        Args:
+            before: 归档截止时间
+            interval_types: 要归档的周期
+            symbol_ids: 只归档这些标的，默认热表中有早于before的K线的全部标的
+            batch_size: 每次加载的标的数
+            delete_chunk: 每个删除事务的行数
+            pause: 每个删除事务之后的停顿（秒），给在线写入让出锁
+
+        Returns:
+            Dict[str, Dict[str, int]]: 周期 -> {'symbols', 'archived', 'deleted', 'failed'}
+        """
+        results = {}
+        for interval_type in interval_types:
+            stats = {'symbols': 0, 'archived': 0, 'deleted': 0, 'failed': 0}
+            ids = symbol_ids if symbol_ids is not None else self._symbols_before(interval_type, before)
+
+            with metrics_registry.timer('market_data_archive', f'archive_{interval_type}') as timer:
+                for i in range(0, len(ids), batch_size):
+                    batch = ids[i:i + batch_size]
+                    row_ids, frames = self._load_batch(interval_type, batch, before)
+
+                    archived = {}
+                    for symbol_id, frame in frames.items():
+                        self.files.write(interval_type, symbol_id, frame)
+                        entry = self._verify(interval_type, symbol_id, frame, before)
+                        if entry is None:
+                            stats['failed'] += 1
+                            continue
+                        archived[symbol_id] = entry
+                        stats['symbols'] += 1
+                        stats['archived'] += len(frame)
+
+                    self._update_manifest(interval_type, archived, before)
+
+                    deletable = [row_id for symbol_id in archived for row_id in row_ids[symbol_id]]
+                    stats['deleted'] += self._delete_rows(deletable, before, delete_chunk, pause)
+                    logger.info(f"{interval_type}归档进度: {min(i + batch_size, len(ids))}/{len(ids)}")
+                timer.rows = stats['archived']
+
+            logger.info(f"{interval_type}归档完成（截止{before.isoformat()}）: {stats}")
+            results[interval_type] = stats
+        return results
+
+    def _symbols_before(self, interval_type: str, before: datetime) -> List[int]:
+        """热表中有早于before的K线的标的"""
+        t = MarketData.__table__
+        return list(db.session.execute(
+            select(t.c.symbol_id)
+            .where(t.c.interval_type == interval_type, t.c.timestamp < before)
+            .distinct().order_by(t.c.symbol_id)
+        ).scalars())
+
+    def _load_batch(self, interval_type: str, symbol_ids: List[int], before: datetime):
+        """
+        加载一批标的早于before的K线
+
+        Returns:
+            (标的ID -> 行ID列表, 标的ID -> DataFrame)：只删除这里读到的行，归档期间新写入的行留在热表
+        """
+        t = MarketData.__table__
+        rows = db.session.execute(
+            select(t.c.id, t.c.symbol_id, t.c.timestamp, *[as_float(t.c[column]) for column in PRICE_COLUMNS])
+            .where(t.c.symbol_id.in_(symbol_ids), t.c.interval_type == interval_type, t.c.timestamp < before)
+            .order_by(t.c.symbol_id, t.c.timestamp)
+        ).all()
+        db.session.commit()
+        if not rows:
+            return {}, {}
+
+        arrays = rows_to_arrays(rows, ('id', 'symbol_id', 'timestamp') + PRICE_COLUMNS)
+        frame = pd.DataFrame(arrays)
+        row_ids, frames = {}, {}
+        for symbol_id, part in frame.groupby('symbol_id', sort=False):
+            row_ids[int(symbol_id)] = part['id'].astype(np.int64).tolist()
+            frames[int(symbol_id)] = part.drop(columns=['id', 'symbol_id']).reset_index(drop=True)
+        return row_ids, frames
+
+    def _verify(self, interval_type: str, symbol_id: int, frame: pd.DataFrame, before: datetime) -> Optional[Dict]:
+        """读回归档文件核对本批K线都已写入，返回清单条目；不一致时返回None（不删除热表）"""
+        archived = self.read(interval_type, symbol_id, None, before)
+        missing = ~np.isin(frame['timestamp'].to_numpy(), archived['timestamp'].to_numpy())
+        if missing.any():
+            logger.error(f"标的{symbol_id}的{interval_type}归档核对失败，{int(missing.sum())}条K线未写入归档文件")
+            return None
+        return {
+            'rows': len(archived),
+            'first': pd.Timestamp(archived['timestamp'].iloc[0]).isoformat() if len(archived) else None,
+            'last': pd.Timestamp(archived['timestamp'].iloc[-1]).isoformat() if len(archived) else None
+        }
+
+    def _update_manifest(self, interval_type: str, archived: Dict[int, Dict], before: datetime) -> None:
+        """把本批标的的截止时间写入清单（截止时间只前移不后退）"""
+        manifest = json.loads(json.dumps(self.manifest()))
+        info = manifest['intervals'].setdefault(interval_type, {'archived_before': None, 'symbols': {}})
+        for symbol_id, entry in archived.items():
+            previous = info['symbols'].get(str(symbol_id))
+            cutoff = before
+            if previous and datetime.fromisoformat(previous['cutoff']) > before:
+                cutoff = datetime.fromisoformat(previous['cutoff'])
+            info['symbols'][str(symbol_id)] = dict(entry, cutoff=cutoff.isoformat())
+        info['archived_before'] = before.isoformat()
+        info['updated_at'] = datetime.utcnow().isoformat()
+        self._save_manifest(manifest)
+
+    @staticmethod
+    def _delete_rows(row_ids: List[int], before: datetime, chunk: int, pause: float) -> int:
+        """按主键分块删除，每块单独提交（带时间条件，分区表只访问历史分区）"""
+        t = MarketData.__table__
+        deleted = 0
+        for i in range(0, len(row_ids), chunk):
+            result = db.session.execute(
+                delete(t).where(t.c.id.in_(row_ids[i:i + chunk]), t.c.timestamp < before)
+            )
+            db.session.commit()
+            deleted += result.rowcount or 0
+            if pause:
+                time.sleep(pause)
+        return deleted
+
+    # ============================================
+    # 写入监听
+    # ============================================
+
+    def on_write(self, interval_type: str, written: Dict[int, List[datetime]]) -> None:
+        """
+        写入监听器：早于标的归档截止时间的新K线（补历史数据）合并进归档文件
+
+        读取时早于截止时间的区间只读归档文件，这些行在热表中由下一次归档删除
+        """
+        if not self.manifest()['intervals'].get(interval_type):
+            return
+
+        t = MarketData.__table__
+        frames = []
+        for symbol_id, timestamps in written.items():
+            cutoff = self.cutoff(interval_type, symbol_id)
+            if cutoff is None or min(timestamps) >= cutoff:
+                continue
+            rows = db.session.execute(
+                select(t.c.timestamp, *[as_float(t.c[column]) for column in PRICE_COLUMNS])
+                .where(t.c.symbol_id == symbol_id, t.c.interval_type == interval_type,
+                       t.c.timestamp >= min(timestamps), t.c.timestamp < cutoff)
+            ).all()
+            if rows:
+                frames.append((symbol_id, pd.DataFrame(rows_to_arrays(rows, ('timestamp',) + PRICE_COLUMNS))))
+
+        for symbol_id, frame in frames:
+            self.files.write(interval_type, symbol_id, frame)
+            logger.info(f"标的{symbol_id}有{len(frame)}条早于归档截止时间的{interval_type}K线，已合并进归档文件")
+
+
+_archive: Optional[MarketDataArchive] = None
+_archive_lock = threading.Lock()
+
+
+def get_market_data_archive() -> Optional[MarketDataArchive]:
+    """
+    获取共享的行情归档，目录由环境变量MARKET_DATA_ARCHIVE_DIR指定
+
+    Returns:
+        Optional[MarketDataArchive]: 未配置时返回None（不归档，读取只查询热表）
+    """
+    global _archive
+
+    root = os.environ.get('MARKET_DATA_ARCHIVE_DIR')
+    if not root:
+        return None
+
+    with _archive_lock:
+        if _archive is None or _archive.root != Path(root):
+            _archive = MarketDataArchive(root)
+        return _archive
+
+
+def archive_horizon_cutoff(horizon_days: Optional[int] = None, today: Optional[datetime] = None) -> datetime:
+    """
+    按归档期限计算截止时间（当日零点向前horizon_days天）
+
+    Args:
+        horizon_days: 归档期限，默认环境变量MARKET_DATA_ARCHIVE_HORIZON_DAYS或DEFAULT_HORIZON_DAYS
+        today: 当前时间
+    """
+    if horizon_days is None:
+        horizon_days = int(os.environ.get('MARKET_DATA_ARCHIVE_HORIZON_DAYS', DEFAULT_HORIZON_DAYS))
+    today = today or datetime.now()
+    return datetime.combine(today.date(), datetime.min.time()) - timedelta(days=horizon_days)
@@ -0,0 +1,174 @@
+"""
+market_data分区维护
+按月预建未来分区、把历史分区交换到归档表或直接删除。只依赖传入的SQL执行函数，
+迁移工具（pymysql）与定时任务（SQLAlchemy）共用同一套逻辑
+"""
+
+import logging
+from datetime import date, datetime
+from typing import List, Dict, Optional, Callable, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 接收尚未建分区数据的MAXVALUE分区
+FUTURE_PARTITION = 'p_future'
+
+# 默认预建的月份数（不含当月）
+DEFAULT_MONTHS_AHEAD = 3
+
+
+def _add_month(value: date) -> date:
+    """下个月的1日"""
+    return date(value.year + value.month // 12, value.month % 12 + 1, 1)
+
+
+class MarketDataPartitionManager:
+    """
+    market_data分区管理（MySQL RANGE COLUMNS(timestamp)分区，见迁移v1.8.0）
+
+    分区按上界命名：按月分区为p<年月>（如p202701保存2027年1月的数据），历史按年分区为p<年份>。
+    """
+
+    def __init__(self, execute: Callable[[str], list], table: str = 'market_data'):
+        """
+        初始化分区管理
+
+        Args:
+            execute: 执行一条SQL并返回结果行的函数（DDL返回空列表）
+            table: 分区表名
+        """
+        self.execute = execute
+        self.table = table
+
+    def list_partitions(self) -> List[Dict]:
+        """
+        列出分区
+
+        Returns:
+            List[Dict]: 按顺序的分区 {'name', 'less_than'(datetime，MAXVALUE为None), 'rows'(估算), 'bytes'}
+        """
+        rows = self.execute(
+            "SELECT PARTITION_NAME, PARTITION_DESCRIPTION, TABLE_ROWS, DATA_LENGTH + INDEX_LENGTH "
+            "FROM INFORMATION_SCHEMA.PARTITIONS "
+            f"WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = '{self.table}' AND PARTITION_NAME IS NOT NULL "
+            "ORDER BY PARTITION_ORDINAL_POSITION"
+        )
+        partitions = []
+        for name, description, table_rows, size in rows:
+            bound = str(description).strip("'")
+            partitions.append({
+                'name': name,
+                'less_than': None if bound.upper() == 'MAXVALUE' else datetime.fromisoformat(bound),
+                'rows': int(table_rows or 0),
+                'bytes': int(size or 0)
+            })
+        return partitions
+
+    def is_partitioned(self) -> bool:
+        """表是否已分区"""
+        return bool(self.list_partitions())
+
+    @staticmethod
+    def plan_future_partitions(
+        partitions: List[Dict],
+        months_ahead: int = DEFAULT_MONTHS_AHEAD,
+        today: Optional[date] = None
+    ) -> List[Tuple[str, date]]:
+        """
+        计算需要新增的按月分区：保证当月及之后months_ahead个月都有独立分区
+
+        Args:
+            partitions: list_partitions()的结果
+            months_ahead: 预建的月份数
+            today: 当前日期
+
+        Returns:
+            List[Tuple[str, date]]: (分区名, 上界)
+        """
+        bounds = [p['less_than'].date() for p in partitions if p['less_than'] is not None]
+        if not bounds:
+            return []
+
+        today = today or date.today()
+        target = date(today.year, today.month, 1)
+        for _ in range(months_ahead + 1):
+            target = _add_month(target)
+
+        planned = []
+        lower = max(bounds)
+        while lower < target:
+            upper = _add_month(lower)
+            planned.append((f'p{lower:%Y%m}', upper))
+            lower = upper
+        return planned
+
+    def ensure_future_partitions(self, months_ahead: int = DEFAULT_MONTHS_AHEAD, today: Optional[date] = None) -> List[str]:
+        """
+        预建未来的按月分区（拆分MAXVALUE分区，p_future为空时只修改元数据）
+
+        Returns:
+            List[str]: 新增的分区名
+        """
+        partitions = self.list_partitions()
+        if not partitions:
+            logger.warning(f"{self.table}未分区，跳过分区维护")
+            return []
+
+        planned = self.plan_future_partitions(partitions, months_ahead, today)
+        if not planned:
+            return []
+
+        definitions = [f"PARTITION `{name}` VALUES LESS THAN ('{upper.isoformat()}')" for name, upper in planned]
+        if any(p['name'] == FUTURE_PARTITION for p in partitions):
+            definitions.append(f"PARTITION `{FUTURE_PARTITION}` VALUES LESS THAN (MAXVALUE)")
+            self.execute(
+                f"ALTER TABLE `{self.table}` REORGANIZE PARTITION `{FUTURE_PARTITION}` INTO ({', '.join(definitions)})"
+            )
+        else:
+            self.execute(f"ALTER TABLE `{self.table}` ADD PARTITION ({', '.join(definitions)})")
+
+        names = [name for name, _ in planned]
+        logger.info(f"{self.table}新增分区: {', '.join(names)}")
+        return names
+
+    def expired_partitions(self, before: date) -> List[Dict]:
+        """上界不晚于before的分区（分区内全部数据早于before）"""
+        cutoff = datetime.combine(before, datetime.min.time())
+        return [p for p in self.list_partitions() if p['less_than'] is not None and p['less_than'] <= cutoff]
+
+    def archive_partitions(self, before: date, drop: bool = False) -> List[Dict]:
+        """
+        移除早于before的历史分区
+
+        归档时把分区交换（EXCHANGE PARTITION，只交换表空间、不复制数据）到独立的归档表
+        market_data_archive_<分区名>，再删除已为空的分区；drop=True时直接删除分区及其数据。
+
+        Args:
+            before: 截止日期
+            drop: 是否直接删除（不可恢复）
+
+        Returns:
+            List[Dict]: 处理的分区 {'partition', 'rows', 'archive_table'}
+        """
+        results = []
+        for partition in self.expired_partitions(before):
+            name = partition['name']
+            archive_table = None
+
+            if not drop:
+                archive_table = f'{self.table}_archive_{name}'
+                self.execute(f"CREATE TABLE IF NOT EXISTS `{archive_table}` LIKE `{self.table}`")
+                if self.execute(f"SELECT COUNT(*) FROM `{archive_table}`")[0][0]:
+                    logger.error(f"归档表{archive_table}已有数据，跳过分区{name}")
+                    continue
+                if self.execute(
+                    "SELECT COUNT(*) FROM INFORMATION_SCHEMA.PARTITIONS "
+                    f"WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = '{archive_table}' AND PARTITION_NAME IS NOT NULL"
+                )[0][0]:
+                    self.execute(f"ALTER TABLE `{archive_table}` REMOVE PARTITIONING")
+                self.execute(f"ALTER TABLE `{self.table}` EXCHANGE PARTITION `{name}` WITH TABLE `{archive_table}`")
+
+            self.execute(f"ALTER TABLE `{self.table}` DROP PARTITION `{name}`")
+            logger.info(f"{self.table}分区{name}已{'删除' if drop else '归档到' + archive_table}")
+            results.append({'partition': name, 'rows': partition['rows'], 'archive_table': archive_table})
+        return results
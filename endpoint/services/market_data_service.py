@@ -5,15 +5,47 @@
 
 import logging
 from datetime import datetime, date, timedelta
-from typing import List, Dict, Optional, Tuple
+from typing import List, Dict, Optional, Tuple, Iterable, Callable
+import numpy as np
 import pandas as pd
-from sqlalchemy import and_, desc, func
+from sqlalchemy import and_, desc, func, select, insert, update, bindparam, text
 
 from models import db, MarketData, Symbol, DataSource
-from services.data_sources import create_data_source, AKShareDataSource
+from services.data_sources import create_data_source, AKShareDataSource, batch_to_records
+from services.market_data_writer import MarketDataWriter
+from services.trading_calendar import get_trading_calendar
+from services.backfill_planner import BackfillPlanner
+from services.ingestion_pipeline import StreamingIngestionPipeline
+from services.adjustment_factors import AdjustmentFactorStore, ADJUST_TYPES
+from services.bar_rollup import BarRollupEngine, INTERVAL_MINUTES, SESSION_MINUTES
+from services.columnar_store import get_columnar_store
+from services.fast_reads import PRICE_COLUMNS, as_float, rows_to_arrays
+from services.bar_aggregates import AggregateBarStore, AGGREGATE_INTERVALS, AGGREGATE_COLUMNS, aggregate_bars
+from services.mmap_store import get_mmap_store
+from services.market_data_archive import get_market_data_archive
 
 logger = logging.getLogger(__name__)
 
+# 分钟数据每块包含的交易日数（单次请求的数据量与日线250个交易日相当）
+INTRADAY_CHUNK_DAYS = {'1m': 1, '5m': 5, '15m': 15, '30m': 30, '60m': 60}
+
+# 没有分钟数据时向前回溯的自然日数（数据源只提供近期的分钟数据）
+INTRADAY_LOOKBACK_DAYS = {'1m': 7, '5m': 60, '15m': 120, '30m': 180, '60m': 365}
+
+# 查询最新数据时先在最近的时间窗口内查找（行情表按时间分区，带时间下界的查询只扫描最近的分区）
+RECENT_LOOKBACK_DAYS = 400
+
+# get_market_data支持的返回形式
+OUTPUT_TYPES = ('records', 'frame', 'arrays', 'columnar')
+
+# 行情接口可选的返回格式：records逐条K线（按时间倒序），columnar列式（元数据只出现一次，按时间升序）
+RESPONSE_FORMATS = ('records', 'columnar')
+
+# 列式返回形式的字段名（其余字段保持原名）
+COLUMNAR_FIELDS = {
+    'open_price': 'open', 'high_price': 'high', 'low_price': 'low', 'close_price': 'close', 'volume': 'volume'
+}
+
 class MarketDataService:
     """市场数据服务类"""
     
@@ -29,8 +61,50 @@ class MarketDataService:
         self.data_source = create_data_source(data_source_name, config)
         self.default_start_date = date(2024, 1, 1)
         
+        # 进程级共享的交易日历（内存二分查找，判断交易日不产生网络请求）
+        self.calendar = get_trading_calendar(self.data_source)
+        
         # 获取或创建数据来源记录
         self.data_source_record = self._get_or_create_data_source_record()
+        
+        # 批量写入器
+        self.writer = MarketDataWriter(
+            data_source_id=self.data_source_record.id if self.data_source_record else None,
+            chunk_size=(config or {}).get('bulk_chunk_size', 1000)
+        )
+        
+        # 复权因子（行情表保存不复权价格，读取时按因子复权）
+        self.adjustments = AdjustmentFactorStore()
+        
+        # 分钟K线写入后增量汇总到更高周期（只重算受影响的时间桶）
+        self.rollup = BarRollupEngine(self.writer, (config or {}).get('rollup_rules'))
+        self.writer.add_listener(self.rollup.on_write)
+        
+        # 最新K线表（由批量写入器在写入行情的同一事务内维护）
+        self.latest = self.writer.latest
+        
+        # 日线写入后增量维护周线/月线汇总表（只重算受影响的周、月）
+        self.aggregates = AggregateBarStore()
+        self.writer.add_listener(self.aggregates.on_write)
+        
+        # 列式只读层（配置COLUMNAR_STORE_DIR时启用），每次写入后增量追加
+        self.columnar_store = get_columnar_store()
+        if self.columnar_store is not None:
+            self.writer.add_listener(self.columnar_store.on_write)
+        
+        # 内存映射热数据存储（配置MMAP_STORE_DIR时启用），供多进程共享读取最近窗口
+        self.mmap_store = get_mmap_store()
+        if self.mmap_store is not None:
+            self.writer.add_listener(self.mmap_store.on_write)
+        
+        # 冷数据归档（配置MARKET_DATA_ARCHIVE_DIR时启用），早于归档截止时间的K线从归档文件读取
+        self.archive = get_market_data_archive()
+        if self.archive is not None:
+            self.writer.add_listener(self.archive.on_write)
+        
+        # 流式入库：长区间按交易日拆块，块之间经有界队列传递
+        self.stream_chunk_days = (config or {}).get('stream_chunk_days', 250)
+        self.stream_queue_size = (config or {}).get('stream_queue_size', 8)
     
     def _get_or_create_data_source_record(self) -> Optional[DataSource]:
         """获取或创建数据来源记录"""
@@ -74,15 +148,18 @@ class MarketDataService:
             logger.error(f"初始化数据源失败: {e}")
             return False
     
-    def sync_symbols(self, market: str = 'A股') -> int:
+    def sync_symbols(self, market: str = 'A股') -> Dict[str, int]:
         """
         同步股票列表到数据库
         
+        与数据库中的股票表整体对比，一个事务内批量新增、更新，
+        并停用同一交易所中已不在列表里的股票
+        
         Args:
             market: 市场类型
             
         Returns:
-            int: 同步的股票数量
+            Dict[str, int]: 同步统计 {'total', 'inserted', 'updated', 'unchanged', 'deactivated'}
         """
         try:
             logger.info(f"开始同步{market}股票列表...")
@@ -92,59 +169,19 @@ class MarketDataService:
             
             if not stock_list:
                 logger.warning("获取股票列表为空")
-                return 0
-            
-            synced_count = 0
-            
-            for stock_info in stock_list:
-                try:
-                    symbol_code = stock_info['symbol']
-                    
-                    # 查找或创建股票记录
-                    symbol = Symbol.query.filter_by(symbol=symbol_code).first()
-                    
-                    if symbol:
-                        # 更新现有记录
-                        symbol.name = stock_info['name']
-                        symbol.exchange = stock_info['exchange']
-                        symbol.is_active = stock_info.get('is_active', True)
-                        symbol.data_source_id = self.data_source_record.id if self.data_source_record else None
-                        symbol.updated_at = datetime.utcnow()
-                    else:
-                        # 创建新记录
-                        symbol = Symbol(
-                            symbol=symbol_code,
-                            name=stock_info['name'],
-                            exchange=stock_info['exchange'],
-                            asset_type=stock_info.get('asset_type', 'stock'),
-                            is_active=stock_info.get('is_active', True),
-                            data_source_id=self.data_source_record.id if self.data_source_record else None
-                        )
-                        db.session.add(symbol)
-                    
-                    synced_count += 1
-                    
-                    # 批量提交，提高性能
-                    if synced_count % 100 == 0:
-                        db.session.commit()
-                        logger.info(f"已同步{synced_count}只股票...")
-                        
-                except Exception as e:
-                    logger.error(f"同步股票{stock_info.get('symbol', 'Unknown')}失败: {e}")
-                    continue
+                return self._empty_sync_stats()
             
-            # 最终提交
-            db.session.commit()
+            stats = self._reconcile_symbols(stock_list, deactivate_missing=True)
             
-            logger.info(f"股票列表同步完成，共同步{synced_count}只股票")
-            return synced_count
+            logger.info(f"股票列表同步完成: {stats}")
+            return stats
             
         except Exception as e:
             logger.error(f"同步股票列表失败: {e}")
             db.session.rollback()
-            return 0
+            return self._empty_sync_stats()
     
-    def sync_index_components(self, index_code: str) -> int:
+    def sync_index_components(self, index_code: str) -> Dict[str, int]:
         """
         同步指数成分股
         
@@ -152,7 +189,7 @@ class MarketDataService:
             index_code: 指数代码（如'上证500'）
             
         Returns:
-            int: 同步的成分股数量
+            Dict[str, int]: 同步统计 {'total', 'inserted', 'updated', 'unchanged', 'deactivated'}
         """
         try:
             logger.info(f"开始同步{index_code}成分股...")
@@ -162,58 +199,123 @@ class MarketDataService:
             
             if not components:
                 logger.warning(f"获取{index_code}成分股为空")
-                return 0
-            
-            synced_count = 0
-            
-            for component in components:
-                try:
-                    symbol_code = component['symbol']
-                    
-                    # 查找或创建股票记录
-                    symbol = Symbol.query.filter_by(symbol=symbol_code).first()
-                    
-                    if symbol:
-                        # 更新现有记录
-                        symbol.name = component['name']
-                        symbol.exchange = component['exchange']
-                        symbol.is_active = True
-                        symbol.data_source_id = self.data_source_record.id if self.data_source_record else None
-                        symbol.updated_at = datetime.utcnow()
-                    else:
-                        # 创建新记录
-                        symbol = Symbol(
-                            symbol=symbol_code,
-                            name=component['name'],
-                            exchange=component['exchange'],
-                            asset_type='stock',
-                            is_active=True,
-                            data_source_id=self.data_source_record.id if self.data_source_record else None
-                        )
-                        db.session.add(symbol)
-                    
-                    synced_count += 1
-                    
-                except Exception as e:
-                    logger.error(f"同步成分股{component.get('symbol', 'Unknown')}失败: {e}")
-                    continue
+                return self._empty_sync_stats()
             
-            db.session.commit()
+            # 成分股只是全市场的子集，不停用列表外的股票
+            stats = self._reconcile_symbols(
+                [dict(component, asset_type='stock', is_active=True) for component in components],
+                deactivate_missing=False
+            )
             
-            logger.info(f"{index_code}成分股同步完成，共同步{synced_count}只股票")
-            return synced_count
+            logger.info(f"{index_code}成分股同步完成: {stats}")
+            return stats
             
         except Exception as e:
             logger.error(f"同步{index_code}成分股失败: {e}")
             db.session.rollback()
-            return 0
+            return self._empty_sync_stats()
+    
+    @staticmethod
+    def _empty_sync_stats() -> Dict[str, int]:
+        return {'total': 0, 'inserted': 0, 'updated': 0, 'unchanged': 0, 'deactivated': 0}
+    
+    def _reconcile_symbols(self, incoming: List[Dict], deactivate_missing: bool) -> Dict[str, int]:
+        """
+        将传入的股票列表与股票表做差集对比，并在一个事务内批量写入
+        
+        Args:
+            incoming: 股票信息列表，需包含symbol、name、exchange
+            deactivate_missing: 是否停用同一交易所中不在列表里的活跃股票
+            
+        Returns:
+            Dict[str, int]: 同步统计
+        """
+        stats = self._empty_sync_stats()
+        table = Symbol.__table__
+        data_source_id = self.data_source_record.id if self.data_source_record else None
+        now = datetime.utcnow()
+        
+        # 一次查询加载整张股票表
+        existing = {
+            row.symbol: row for row in db.session.execute(
+                select(table.c.id, table.c.symbol, table.c.name, table.c.exchange,
+                       table.c.asset_type, table.c.is_active, table.c.data_source_id)
+            )
+        }
+        
+        # 同一代码以最后一条为准
+        incoming_map = {}
+        for stock_info in incoming:
+            if stock_info.get('symbol'):
+                incoming_map[str(stock_info['symbol'])] = stock_info
+        stats['total'] = len(incoming_map)
+        
+        inserts = []
+        updates = []
+        for symbol_code, stock_info in incoming_map.items():
+            values = {
+                'name': stock_info['name'],
+                'exchange': stock_info['exchange'],
+                'is_active': bool(stock_info.get('is_active', True)),
+                'data_source_id': data_source_id
+            }
+            current = existing.get(symbol_code)
+            
+            if current is None:
+                inserts.append(dict(
+                    values, 
+                    symbol=symbol_code, 
+                    asset_type=stock_info.get('asset_type', 'stock'),
+                    created_at=now, 
+                    updated_at=now
+                ))
+            elif any(getattr(current, col) != value for col, value in values.items()):
+                updates.append(dict({f'b_{col}': value for col, value in values.items()}, b_id=current.id))
+            else:
+                stats['unchanged'] += 1
+        
+        deactivations = []
+        if deactivate_missing:
+            exchanges = {info['exchange'] for info in incoming_map.values()}
+            deactivations = [
+                {'b_id': row.id} for code, row in existing.items()
+                if code not in incoming_map and row.is_active 
+                and row.asset_type == 'stock' and row.exchange in exchanges
+            ]
+        
+        for i in range(0, len(inserts), 1000):
+            db.session.execute(insert(table), inserts[i:i + 1000])
+        
+        if updates:
+            stmt = update(table).where(table.c.id == bindparam('b_id')).values(
+                name=bindparam('b_name'),
+                exchange=bindparam('b_exchange'),
+                is_active=bindparam('b_is_active'),
+                data_source_id=bindparam('b_data_source_id'),
+                updated_at=now
+            )
+            for i in range(0, len(updates), 1000):
+                db.session.execute(stmt, updates[i:i + 1000])
+        
+        if deactivations:
+            stmt = update(table).where(table.c.id == bindparam('b_id')).values(is_active=False, updated_at=now)
+            for i in range(0, len(deactivations), 1000):
+                db.session.execute(stmt, deactivations[i:i + 1000])
+        
+        db.session.commit()
+        
+        stats['inserted'] = len(inserts)
+        stats['updated'] = len(updates)
+        stats['deactivated'] = len(deactivations)
+        return stats
     
-    def get_last_trading_date(self, symbol: str) -> Optional[date]:
+    def get_last_trading_date(self, symbol: str, interval_type: str = '1d') -> Optional[date]:
         """
         获取某股票在数据库中的最后交易日期
         
         Args:
             symbol: 股票代码
+            interval_type: 数据周期
             
         Returns:
             Optional[date]: 最后交易日期
@@ -224,14 +326,22 @@ class MarketDataService:
             if not symbol_obj:
                 return None
             
-            # 使用 symbol_id 查询最后交易日期
-            last_record = MarketData.query.filter_by(symbol_id=symbol_obj.id)\
-                .order_by(desc(MarketData.timestamp)).first()
-            
-            if last_record:
-                return last_record.timestamp.date()
+            # 先读最新K线表；表中没有时（升级前写入、尚未重建）在最近窗口内查找，再查全部历史
+            last_timestamp = self.latest.last_timestamps([symbol_obj.id], interval_type).get(symbol_obj.id)
+            stmt = select(func.max(MarketData.timestamp)).where(
+                MarketData.symbol_id == symbol_obj.id, MarketData.interval_type == interval_type
+            )
+            if last_timestamp is None:
+                last_timestamp = db.session.execute(
+                    stmt.where(MarketData.timestamp >= self._recent_start(interval_type))
+                ).scalar()
+            if last_timestamp is None:
+                last_timestamp = db.session.execute(stmt).scalar()
+            if last_timestamp is None and self.archive is not None:
+                # 热表中的K线已全部归档
+                last_timestamp = self.archive.last_timestamp(interval_type, symbol_obj.id)
             
-            return None
+            return last_timestamp.date() if last_timestamp else None
             
         except Exception as e:
             logger.error(f"获取{symbol}最后交易日期失败: {e}")
@@ -242,7 +352,8 @@ class MarketDataService:
         symbol: str, 
         start_date: Optional[date] = None,
         end_date: Optional[date] = None,
-        force_update: bool = False
+        force_update: bool = False,
+        bulk: bool = True
     ) -> int:
         """
         获取并存储历史数据
@@ -252,80 +363,201 @@ class MarketDataService:
             start_date: 开始日期，如果为None则使用数据库中的最后日期
             end_date: 结束日期，如果为None则使用今天
             force_update: 是否强制更新（覆盖已有数据）
+            bulk: 是否使用批量写入路径
+            
+        Returns:
+            int: 新增及更新的数据条数
+        """
+        stats = self.ingest_historical_data(symbol, start_date, end_date, force_update, bulk)
+        return stats['inserted'] + stats['updated']
+    
+    def ingest_historical_data(
+        self, 
+        symbol: str, 
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        force_update: bool = False,
+        bulk: bool = True
+    ) -> Dict[str, int]:
+        """
+        获取并存储历史数据，返回详细写入统计
+        
+        Args:
+            symbol: 股票代码
+            start_date: 开始日期，如果为None则使用数据库中的最后日期
+            end_date: 结束日期，如果为None则使用今天
+            force_update: 是否强制更新（已存在的数据按upsert语义覆盖）
+            bulk: 是否使用批量写入路径，False时使用逐行写入路径
             
         Returns:
-            int: 新增的数据条数
+            Dict[str, int]: 写入统计 {'inserted', 'updated', 'skipped'}
         """
+        stats = {'inserted': 0, 'updated': 0, 'skipped': 0}
+        
         try:
             if not end_date:
                 end_date = date.today()
             
             if not start_date:
-                last_date = self.get_last_trading_date(symbol)
-                if last_date:
-                    # 从最后日期的下一天开始
-                    start_date = last_date + timedelta(days=1)
-                else:
-                    # 如果没有历史数据，从默认开始日期开始
-                    start_date = self.default_start_date
+                start_date = self._resolve_start_date(self.get_last_trading_date(symbol))
+            elif not force_update:
+                # 早于归档截止时间的区间已在归档文件中，不重复下载
+                start_date = self._skip_archived(symbol, start_date)
             
-            # 如果开始日期大于等于结束日期，说明已经是最新数据
-            if start_date >= end_date:
+            # 开始日期不早于结束日期或区间内没有交易日，说明已经是最新数据
+            if start_date >= end_date or not self.calendar.has_trading_days(start_date, end_date):
                 logger.info(f"{symbol}数据已是最新，无需更新")
-                return 0
-            
-            logger.info(f"获取{symbol}从{start_date}到{end_date}的历史数据...")
-            
-            # 从数据源获取历史数据
-            df = self.data_source.get_historical_data(symbol, start_date, end_date)
-            
-            if df.empty:
-                logger.warning(f"{symbol}历史数据为空")
-                return 0
+                return stats
             
-            # 格式化数据
-            formatted_data = self.data_source.format_market_data(df, symbol)
+            if bulk:
+                # 流式分块获取并批量写入
+                result = self.stream_ingest([(symbol, start_date, end_date)], force_update)
+                stats = {key: result[key] for key in ('inserted', 'updated', 'skipped')}
+            else:
+                batch = self._download_formatted(symbol, start_date, end_date)
+                
+                if batch is None:
+                    return stats
+                
+                symbol_obj = self._get_or_create_symbol(symbol)
+                stats = self._store_market_data_row_by_row(symbol_obj.id, batch_to_records(batch), force_update)
             
-            if not formatted_data:
-                logger.warning(f"{symbol}格式化后数据为空")
-                return 0
+            logger.info(f"{symbol}历史数据获取完成，新增{stats['inserted']}条，"
+                        f"更新{stats['updated']}条，跳过{stats['skipped']}条")
+            return stats
             
-            # 查找或创建 Symbol 记录
-            symbol_obj = Symbol.query.filter_by(symbol=symbol).first()
-            if not symbol_obj:
-                # 创建新的 Symbol 记录
-                symbol_obj = Symbol(
-                    symbol=symbol,
-                    name=symbol,  # 默认使用symbol作为name
-                    exchange='Unknown',
-                    asset_type='stock',
-                    data_source_id=self.data_source_record.id if self.data_source_record else None
-                )
-                db.session.add(symbol_obj)
-                db.session.commit()
-                logger.info(f"创建新的Symbol记录: {symbol}")
+        except Exception as e:
+            logger.error(f"获取{symbol}历史数据失败: {e}")
+            db.session.rollback()
+            return {'inserted': 0, 'updated': 0, 'skipped': 0}
+    
+    def _skip_archived(self, symbol: str, start_date: date, interval_type: str = '1d') -> date:
+        """开始日期早于标的归档截止时间时，改为截止时间之后的第一天"""
+        if self.archive is None:
+            return start_date
+        symbol_obj = Symbol.query.filter_by(symbol=symbol).first()
+        cutoff = self._archive_cutoff(symbol_obj.id, interval_type) if symbol_obj else None
+        if cutoff is None:
+            return start_date
+        # 当日K线时间（零点）早于截止时间即已归档
+        return max(start_date, (cutoff - timedelta(microseconds=1)).date() + timedelta(days=1))
+    
+    def _resolve_start_date(self, last_date: Optional[date]) -> date:
+        """根据数据库中的最后交易日期确定增量获取的开始日期"""
+        if last_date:
+            # 从最后日期的下一天开始
+            return last_date + timedelta(days=1)
+        # 如果没有历史数据，从默认开始日期开始
+        return self.default_start_date
+    
+    def _download_formatted(self, symbol: str, start_date: date, end_date: date) -> Optional[Dict]:
+        """
+        从数据源下载并格式化历史数据（不访问数据库，可在工作线程中执行）
+        
+        Args:
+            symbol: 股票代码
+            start_date: 开始日期
+            end_date: 结束日期
             
-            # 存储到数据库
-            stored_count = 0
+        Returns:
+            Optional[Dict]: 列式批次，无数据时返回None
+        """
+        logger.info(f"获取{symbol}从{start_date}到{end_date}的历史数据...")
+        
+        # 从数据源获取历史数据
+        df = self.data_source.get_historical_data(symbol, start_date, end_date)
+        
+        if df.empty:
+            logger.warning(f"{symbol}历史数据为空")
+            return None
+        
+        # 向量化格式化为列式批次
+        batch = self.data_source.format_market_data_columnar(df, symbol)
+        
+        if len(batch['timestamp']) == 0:
+            logger.warning(f"{symbol}格式化后数据为空")
+            return None
+        
+        return batch
+    
+    def _get_or_create_symbol(self, symbol: str) -> Symbol:
+        """查找或创建 Symbol 记录"""
+        symbol_obj = Symbol.query.filter_by(symbol=symbol).first()
+        if not symbol_obj:
+            # 创建新的 Symbol 记录
+            symbol_obj = Symbol(
+                symbol=symbol,
+                name=symbol,  # 默认使用symbol作为name
+                exchange='Unknown',
+                asset_type='stock',
+                data_source_id=self.data_source_record.id if self.data_source_record else None
+            )
+            db.session.add(symbol_obj)
+            db.session.commit()
+            logger.info(f"创建新的Symbol记录: {symbol}")
+        return symbol_obj
+    
+    def store_market_data(
+        self, 
+        symbol_id: int, 
+        formatted_data: List[Dict], 
+        force_update: bool = False
+    ) -> Dict[str, int]:
+        """
+        批量存储格式化后的行情数据
+        
+        一次查询加载区间内已存在的时间戳，新数据按块多行插入；
+        force_update时按upsert语义覆盖已存在的数据
+        
+        Args:
+            symbol_id: 标的ID
+            formatted_data: format_market_data的输出
+            force_update: 是否覆盖已存在的数据
             
-            for data_point in formatted_data:
-                try:
-                    # 检查是否已存在（如果不是强制更新）
+        Returns:
+            Dict[str, int]: 写入统计 {'inserted', 'updated', 'skipped'}
+        """
+        records = [dict(data_point, symbol_id=symbol_id) for data_point in formatted_data]
+        return self.writer.write(records, force_update)
+    
+    def _store_market_data_row_by_row(
+        self, 
+        symbol_id: int, 
+        formatted_data: List[Dict], 
+        force_update: bool = False
+    ) -> Dict[str, int]:
+        """
+        逐行存储行情数据（每行一次存在性查询，保留用于对比基准）
+        """
+        stats = {'inserted': 0, 'updated': 0, 'skipped': 0}
+        written = []
+        
+        for data_point in formatted_data:
+            try:
+                existing = MarketData.query.filter(
+                    and_(
+                        MarketData.symbol_id == symbol_id,
+                        MarketData.timestamp == data_point['timestamp'],
+                        MarketData.interval_type == data_point['interval_type']
+                    )
+                ).first()
+                
+                if existing:
                     if not force_update:
-                        existing = MarketData.query.filter(
-                            and_(
-                                MarketData.symbol_id == symbol_obj.id,
-                                MarketData.timestamp == data_point['timestamp'],
-                                MarketData.interval_type == data_point['interval_type']
-                            )
-                        ).first()
-                        
-                        if existing:
-                            continue
+                        stats['skipped'] += 1
+                        continue
                     
+                    existing.open_price = data_point['open_price']
+                    existing.high_price = data_point['high_price']
+                    existing.low_price = data_point['low_price']
+                    existing.close_price = data_point['close_price']
+                    existing.volume = data_point['volume']
+                    stats['updated'] += 1
+                    written.append(dict(data_point, symbol_id=symbol_id, data_source_id=existing.data_source_id))
+                else:
                     # 创建新记录
                     market_data = MarketData(
-                        symbol_id=symbol_obj.id,
+                        symbol_id=symbol_id,
                         data_source_id=self.data_source_record.id if self.data_source_record else None,
                         timestamp=data_point['timestamp'],
                         open_price=data_point['open_price'],
@@ -335,35 +567,39 @@ class MarketDataService:
                         volume=data_point['volume'],
                         interval_type=data_point['interval_type']
                     )
-                    
                     db.session.add(market_data)
-                    stored_count += 1
+                    stats['inserted'] += 1
+                    written.append(dict(data_point, symbol_id=symbol_id, data_source_id=market_data.data_source_id))
+                
+                # 批量提交
+                if (stats['inserted'] + stats['updated']) % 100 == 0:
+                    self.latest.upsert(written)
+                    written = []
+                    db.session.commit()
                     
-                    # 批量提交
-                    if stored_count % 100 == 0:
-                        db.session.commit()
-                        
-                except Exception as e:
-                    logger.error(f"存储{symbol}数据点失败: {e}")
-                    continue
-            
-            # 最终提交
-            db.session.commit()
-            
-            logger.info(f"{symbol}历史数据获取完成，新增{stored_count}条记录")
-            return stored_count
-            
-        except Exception as e:
-            logger.error(f"获取{symbol}历史数据失败: {e}")
-            db.session.rollback()
-            return 0
+            except Exception as e:
+                logger.error(f"存储数据点失败: {e}")
+                continue
+        
+        # 最终提交
+        self.latest.upsert(written)
+        db.session.commit()
+        return stats
     
-    def batch_fetch_latest_data(self, symbols: List[str]) -> Dict[str, int]:
+    def batch_fetch_latest_data(
+        self, 
+        symbols: List[str], 
+        max_workers: Optional[int] = None
+    ) -> Dict[str, int]:
         """
         批量获取最新数据
         
+        各股票的网络请求在有界线程池中并发执行，并受数据源进程级令牌桶限流器约束；
+        数据库写入统一在调用线程中顺序完成（单一写入阶段）
+        
         Args:
             symbols: 股票代码列表
+            max_workers: 并发下载线程数，默认取限流器的最大并发请求数
             
         Returns:
             Dict[str, int]: 每只股票新增的数据条数
@@ -371,27 +607,14 @@ class MarketDataService:
         try:
             logger.info(f"批量获取{len(symbols)}只股票的最新数据...")
             
-            results = {}
+            results = {symbol: 0 for symbol in symbols}
+            tasks = self.plan_latest_tasks(symbols)
             
-            # 分批处理，避免一次性处理太多股票
-            batch_size = 50
-            for i in range(0, len(symbols), batch_size):
-                batch_symbols = symbols[i:i + batch_size]
-                
-                for symbol in batch_symbols:
-                    try:
-                        count = self.fetch_historical_data(symbol)
-                        results[symbol] = count
-                        
-                        # 添加小延迟，避免请求频率过高
-                        import time
-                        time.sleep(0.1)
-                        
-                    except Exception as e:
-                        logger.error(f"获取{symbol}数据失败: {e}")
-                        results[symbol] = 0
-                
-                logger.info(f"已处理{min(i + batch_size, len(symbols))}/{len(symbols)}只股票")
+            if not tasks:
+                logger.info("所有股票数据已是最新，无需更新")
+                return results
+            
+            results.update(self._fetch_ranges(tasks, max_workers))
             
             total_count = sum(results.values())
             logger.info(f"批量获取完成，共新增{total_count}条记录")
@@ -402,25 +625,576 @@ class MarketDataService:
             logger.error(f"批量获取最新数据失败: {e}")
             return {}
     
+    def plan_latest_tasks(self, symbols: List[str], end_date: Optional[date] = None) -> List[Tuple[str, date, date]]:
+        """
+        一次查询确定各股票的增量获取区间，跳过已是最新或区间内没有交易日的股票
+        
+        Args:
+            symbols: 股票代码列表
+            end_date: 结束日期，默认今天
+            
+        Returns:
+            List[Tuple[str, date, date]]: (股票代码, 开始日期, 结束日期) 列表
+        """
+        end_date = end_date or date.today()
+        last_dates = self.get_last_trading_dates(symbols)
+        
+        tasks = []
+        for symbol in symbols:
+            start_date = self._resolve_start_date(last_dates.get(symbol))
+            if start_date < end_date and self.calendar.has_trading_days(start_date, end_date):
+                tasks.append((symbol, start_date, end_date))
+        return tasks
+    
+    def plan_intraday_tasks(
+        self, 
+        symbols: List[str], 
+        interval_type: str = '5m',
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None
+    ) -> List[Tuple[str, date, date]]:
+        """
+        确定各股票分钟数据的增量获取区间
+        
+        分钟数据按交易日增量获取，最后一个已入库的交易日可能只有部分K线，因此从该日重新获取
+        （已存在的K线被跳过，只写入新K线）；没有分钟数据时向前回溯INTRADAY_LOOKBACK_DAYS
+        
+        Args:
+            symbols: 股票代码列表
+            interval_type: 分钟周期
+            start_date: 开始日期，指定时所有股票使用同一区间
+            end_date: 结束日期，默认今天
+            
+        Returns:
+            List[Tuple[str, date, date]]: (股票代码, 开始日期, 结束日期) 列表
+        """
+        if interval_type not in INTRADAY_CHUNK_DAYS:
+            raise ValueError(f"不支持的分钟周期: {interval_type}")
+        
+        end_date = end_date or date.today()
+        last_dates = {} if start_date else self.get_last_trading_dates(symbols, interval_type)
+        default_start = start_date or end_date - timedelta(days=INTRADAY_LOOKBACK_DAYS[interval_type])
+        
+        tasks = []
+        for symbol in symbols:
+            symbol_start = last_dates.get(symbol, default_start)
+            if symbol_start <= end_date and self.calendar.has_trading_days(symbol_start, end_date):
+                tasks.append((symbol, symbol_start, end_date))
+        return tasks
+    
+    def ingest_intraday(
+        self, 
+        symbols: List[str], 
+        interval_type: str = '5m',
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        force_update: bool = False
+    ) -> Dict:
+        """
+        获取并存储分钟K线，写入后由汇总引擎增量更新更高周期的K线
+        
+        Args:
+            symbols: 股票代码列表
+            interval_type: 分钟周期（1m/5m/15m/30m/60m）
+            start_date: 开始日期，默认从各股票最后一个已有分钟数据的交易日开始
+            end_date: 结束日期，默认今天
+            force_update: 是否覆盖已存在的K线
+            
+        Returns:
+            Dict: 统计信息 {'chunks', 'failed_chunks', 'inserted', 'updated', 'skipped', 'results'}
+        """
+        tasks = self.plan_intraday_tasks(symbols, interval_type, start_date, end_date)
+        result = self.stream_ingest(tasks, force_update, interval_type=interval_type)
+        
+        logger.info(f"{interval_type}分钟数据获取完成: {len(tasks)}只股票，新增{result['inserted']}条，"
+                    f"更新{result['updated']}条，跳过{result['skipped']}条")
+        return result
+    
+    def backfill(
+        self, 
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        symbols: Optional[List[str]] = None,
+        dry_run: bool = False,
+        max_workers: Optional[int] = None,
+        bridge_days: int = 0,
+        limit: int = 100
+    ) -> Dict:
+        """
+        补齐历史数据缺口（含中间缺口），按优先级顺序获取缺失的交易日区间
+        
+        Args:
+            start_date: 需要覆盖的开始日期，默认default_start_date
+            end_date: 需要覆盖的结束日期，默认今天
+            symbols: 股票代码列表，默认全部活跃股票
+            dry_run: 只生成规模报告，不下载数据
+            max_workers: 并发下载线程数
+            bridge_days: 缺口之间已有数据不超过该交易日数时合并请求
+            limit: 报告中列出的工作项数量上限
+            
+        Returns:
+            Dict: 规模报告；非dry_run时附带 records_added 与每只股票的写入条数
+        """
+        work_items, report = self.plan_backfill(start_date, end_date, symbols, bridge_days, limit)
+        report['dry_run'] = dry_run
+        
+        logger.info(f"补齐规划: {report['symbols']}只股票，缺失{report['missing_days']}个交易日，"
+                    f"预计{report['estimated_requests']}次请求")
+        
+        if dry_run or not work_items:
+            return report
+        
+        results = self._fetch_ranges(
+            [(item['symbol'], item['start_date'], item['end_date']) for item in work_items], 
+            max_workers
+        )
+        report['records_added'] = sum(results.values())
+        report['results'] = results
+        
+        return report
+    
+    def plan_backfill(
+        self, 
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        symbols: Optional[List[str]] = None,
+        bridge_days: int = 0,
+        limit: int = 100
+    ) -> Tuple[List[Dict], Dict]:
+        """
+        生成补齐工作列表与规模报告（不下载数据）
+        
+        Args:
+            start_date: 需要覆盖的开始日期，默认default_start_date
+            end_date: 需要覆盖的结束日期，默认今天
+            symbols: 股票代码列表，默认全部活跃股票
+            bridge_days: 缺口之间已有数据不超过该交易日数时合并请求
+            limit: 报告中列出的工作项数量上限
+            
+        Returns:
+            Tuple[List[Dict], Dict]: (按优先级排序的工作项列表, 规模报告)
+        """
+        start_date = start_date or self.default_start_date
+        end_date = end_date or date.today()
+        
+        planner = BackfillPlanner(self.calendar, bridge_days=bridge_days, archive=self.archive)
+        work_items = planner.plan(start_date, end_date, symbols)
+        return work_items, planner.summarize(work_items, start_date, end_date, limit)
+    
+    def stream_ingest(
+        self, 
+        tasks: Iterable[Tuple[str, date, date]], 
+        force_update: bool = False,
+        max_workers: Optional[int] = None,
+        chunk_days: Optional[int] = None,
+        on_chunk: Optional[Callable] = None,
+        interval_type: str = '1d'
+    ) -> Dict:
+        """
+        流式入库：按交易日拆块并发获取，逐块格式化、去重并批量写入，内存占用与区间长度无关
+        
+        Args:
+            tasks: (股票代码, 开始日期, 结束日期) 序列，按顺序处理
+            force_update: 是否覆盖已存在的数据
+            max_workers: 并发下载线程数，默认取限流器的最大并发请求数
+            chunk_days: 每块包含的交易日数，默认stream_chunk_days
+            on_chunk: 每块处理完成后的回调，见StreamingIngestionPipeline.run
+            interval_type: 数据周期，分钟周期默认按INTRADAY_CHUNK_DAYS拆块
+            
+        Returns:
+            Dict: 统计信息 {'chunks', 'failed_chunks', 'inserted', 'updated', 'skipped', 'results'}
+        """
+        if chunk_days is None:
+            chunk_days = INTRADAY_CHUNK_DAYS.get(interval_type, self.stream_chunk_days)
+        
+        pipeline = StreamingIngestionPipeline(
+            self,
+            chunk_days=chunk_days,
+            queue_size=self.stream_queue_size,
+            max_workers=max_workers,
+            interval_type=interval_type
+        )
+        return pipeline.run(tasks, force_update, on_chunk)
+    
+    def _fetch_ranges(
+        self, 
+        tasks: List[Tuple[str, date, date]], 
+        max_workers: Optional[int] = None
+    ) -> Dict[str, int]:
+        """
+        并发下载各区间并在调用线程中顺序写入
+        
+        Args:
+            tasks: (股票代码, 开始日期, 结束日期) 列表，按列表顺序提交
+            max_workers: 并发下载线程数，默认取限流器的最大并发请求数
+            
+        Returns:
+            Dict[str, int]: 每只股票新增/更新的数据条数
+        """
+        return self.stream_ingest(tasks, max_workers=max_workers)['results']
+    
+    def get_last_trading_dates(self, symbols: List[str], interval_type: str = '1d') -> Dict[str, date]:
+        """
+        一次聚合查询获取多只股票在数据库中的最后交易日期
+        
+        Args:
+            symbols: 股票代码列表
+            interval_type: 数据周期
+            
+        Returns:
+            Dict[str, date]: 股票代码到最后交易日期的映射（无数据的股票不包含在内）
+        """
+        last_dates = {}
+        
+        try:
+            # 先按唯一键读取最新K线表
+            symbol_map = self._load_symbol_map(symbols)
+            id_to_symbol = {symbol_obj.id: symbol for symbol, symbol_obj in symbol_map.items()}
+            for symbol_id, last_timestamp in self.latest.last_timestamps(list(id_to_symbol), interval_type).items():
+                last_dates[id_to_symbol[symbol_id]] = last_timestamp.date()
+            
+            # 表中没有的股票在最近窗口内聚合，窗口内没有数据的股票再查全部历史
+            for since in (self._recent_start(interval_type), None):
+                remaining = [symbol for symbol in symbols if symbol not in last_dates]
+                for i in range(0, len(remaining), 1000):
+                    query = db.session.query(Symbol.symbol, func.max(MarketData.timestamp))\
+                        .join(MarketData, MarketData.symbol_id == Symbol.id)\
+                        .filter(Symbol.symbol.in_(remaining[i:i + 1000]), MarketData.interval_type == interval_type)
+                    if since is not None:
+                        query = query.filter(MarketData.timestamp >= since)
+                    for symbol, last_timestamp in query.group_by(Symbol.symbol).all():
+                        if last_timestamp:
+                            last_dates[symbol] = last_timestamp.date()
+            
+            remaining = [symbol for symbol in symbols if symbol not in last_dates]
+            if remaining and self.archive is not None:
+                # 热表中的K线已全部归档的股票
+                for symbol in remaining:
+                    symbol_obj = symbol_map.get(symbol)
+                    if symbol_obj is None:
+                        continue
+                    last_timestamp = self.archive.last_timestamp(interval_type, symbol_obj.id)
+                    if last_timestamp:
+                        last_dates[symbol] = last_timestamp.date()
+        except Exception as e:
+            logger.error(f"批量获取最后交易日期失败: {e}")
+        
+        return last_dates
+    
+    def get_latest_bars(self, symbols: Optional[List[str]] = None, interval_type: str = '1d') -> Dict[str, Dict]:
+        """
+        批量获取最新K线（读取最新K线表，每1000只股票一次按唯一键的IN查询）
+        
+        最新K线保存不复权价格；前复权价格以最新K线为基准，与不复权价格相同
+        
+        Args:
+            symbols: 股票代码列表，None表示该周期有数据的全部股票
+            interval_type: 数据周期
+            
+        Returns:
+            Dict[str, Dict]: 股票代码 -> {'symbol', 'symbol_id', 'interval_type', 'timestamp', 价格/成交量字段}
+            （没有数据的股票不包含在内）
+        """
+        try:
+            if symbols is None:
+                bars = self.latest.read(None, interval_type)
+                id_to_symbol = {}
+                ids = list(bars)
+                for i in range(0, len(ids), 1000):
+                    rows = db.session.execute(select(Symbol.id, Symbol.symbol).where(Symbol.id.in_(ids[i:i + 1000])))
+                    id_to_symbol.update(dict(rows.all()))
+            else:
+                id_to_symbol = {symbol_obj.id: symbol for symbol, symbol_obj in self._load_symbol_map(symbols).items()}
+                bars = self.latest.read(list(id_to_symbol), interval_type)
+            
+            latest = {}
+            for symbol_id, bar in bars.items():
+                symbol = id_to_symbol.get(symbol_id)
+                if symbol is None:
+                    continue
+                latest[symbol] = dict(
+                    bar, symbol=symbol, interval_type=interval_type, timestamp=bar['timestamp'].isoformat()
+                )
+            return latest
+        except Exception as e:
+            logger.error(f"批量获取最新K线失败: {e}")
+            return {}
+    
+    def _load_symbol_map(self, symbols: List[str]) -> Dict[str, Symbol]:
+        """一次查询加载股票代码到Symbol记录的映射"""
+        symbol_map = {}
+        for i in range(0, len(symbols), 1000):
+            for symbol_obj in Symbol.query.filter(Symbol.symbol.in_(symbols[i:i + 1000])).all():
+                symbol_map[symbol_obj.symbol] = symbol_obj
+        return symbol_map
+    
+    def ingest_daily_snapshot(
+        self, 
+        trade_date: Optional[date] = None, 
+        force_update: bool = True,
+        created_by: Optional[int] = None
+    ) -> Dict[str, int]:
+        """
+        收盘快照入库：用一次全市场实时行情请求生成当日所有活跃股票的日线
+        
+        快照在一次向量化处理中转换为日线并批量写入；存在数据缺口
+        （最后交易日早于上一交易日）的股票不写入快照，而是创建后台入库任务补齐到当日
+        
+        Args:
+            trade_date: 交易日期，默认今天
+            force_update: 是否覆盖当日已存在的日线（收盘后重复执行时以最新快照为准）
+            created_by: 创建补齐任务的用户ID
+            
+        Returns:
+            Dict[str, int]: 统计信息（job_id为补齐任务ID，没有缺口时为None）
+        """
+        stats = {
+            'snapshot_symbols': 0,
+            'inserted': 0,
+            'updated': 0,
+            'skipped': 0,
+            'fallback_symbols': 0,
+            'job_id': None,
+            'ex_dividend_symbols': 0
+        }
+        
+        try:
+            trade_date = trade_date or date.today()
+            
+            if not self.calendar.is_trading_day(trade_date):
+                logger.info(f"{trade_date}不是交易日，跳过收盘快照入库")
+                return stats
+            
+            # 活跃股票及其最后交易日期（各一次查询）
+            active_symbols = dict(
+                db.session.query(Symbol.symbol, Symbol.id).filter(Symbol.is_active == True).all()
+            )
+            if not active_symbols:
+                logger.warning("没有找到活跃股票")
+                return stats
+            
+            last_dates = self.get_last_trading_dates(list(active_symbols.keys()))
+            previous_day = self.calendar.prev_trading_day(trade_date)
+            gap_symbols = [
+                symbol for symbol in active_symbols
+                if last_dates.get(symbol) is None or last_dates[symbol] < previous_day
+            ]
+            
+            snapshot = self.data_source.get_spot_snapshot()
+            if snapshot.empty:
+                logger.warning("实时行情快照为空，全部回退到后台入库任务")
+                gap_symbols = list(active_symbols.keys())
+            
+            # 存在缺口的股票由后台任务从各自的最后交易日补齐到当日（不写入快照，否则增量起点会越过缺口）
+            if gap_symbols:
+                tasks = self.plan_latest_tasks(gap_symbols, trade_date)
+                stats['fallback_symbols'] = len(tasks)
+                if tasks:
+                    from services.ingestion_job_service import ingestion_job_service
+                    job = ingestion_job_service.create_job(
+                        'latest', tasks, self.data_source_name,
+                        params={'symbols': len(tasks), 'trade_date': trade_date.isoformat()},
+                        created_by=created_by
+                    )
+                    stats['job_id'] = job.id
+                    logger.info(f"{len(tasks)}只股票存在数据缺口，已创建入库任务{job.id}")
+            
+            if not snapshot.empty:
+                stats['ex_dividend_symbols'] = self._record_ex_dates_from_snapshot(
+                    snapshot, active_symbols, previous_day, trade_date
+                )
+                
+                gap_set = set(gap_symbols)
+                snapshot_symbols = {
+                    symbol: symbol_id for symbol, symbol_id in active_symbols.items() if symbol not in gap_set
+                }
+                batch = self._snapshot_to_batch(snapshot, snapshot_symbols, trade_date)
+                stats['snapshot_symbols'] = len(batch['symbol_id'])
+                
+                if stats['snapshot_symbols']:
+                    stats.update(self.writer.write_batch(None, batch, force_update))
+            
+            logger.info(f"收盘快照入库完成: {stats}")
+            return stats
+            
+        except Exception as e:
+            logger.error(f"收盘快照入库失败: {e}")
+            db.session.rollback()
+            return stats
+    
+    def _record_ex_dates_from_snapshot(
+        self, 
+        snapshot: pd.DataFrame, 
+        symbol_ids: Dict[str, int], 
+        previous_day: date,
+        trade_date: date
+    ) -> int:
+        """
+        对比快照昨收与前一交易日已入库的收盘价，记录当日发生除权除息的股票的复权因子
+        
+        Returns:
+            int: 发生除权除息的股票数
+        """
+        if 'pre_close' not in snapshot.columns:
+            return 0
+        
+        frame = snapshot[snapshot.index.isin(list(symbol_ids.keys()))]
+        pre_close = {
+            symbol_ids[symbol]: value
+            for symbol, value in zip(frame.index, frame['pre_close'].to_numpy(dtype=float))
+            if value > 0
+        }
+        
+        previous_ts = datetime.combine(previous_day, datetime.min.time())
+        previous_close = {}
+        ids = list(pre_close.keys())
+        for i in range(0, len(ids), 1000):
+            previous_close.update(
+                (symbol_id, float(close)) for symbol_id, close in db.session.query(
+                    MarketData.symbol_id, MarketData.close_price
+                ).filter(
+                    MarketData.symbol_id.in_(ids[i:i + 1000]),
+                    MarketData.interval_type == '1d',
+                    MarketData.timestamp == previous_ts
+                ).all()
+            )
+        
+        factors = self.adjustments.infer_from_snapshot(pre_close, previous_close, trade_date)
+        if factors:
+            self.adjustments.record_ex_dates(factors)
+            logger.info(f"{trade_date}共{len(factors)}只股票除权除息，已更新复权因子")
+        return len(factors)
+    
+    def update_adjustment_factors(
+        self, 
+        symbols: Optional[List[str]] = None, 
+        created_by: Optional[int] = None
+    ) -> Dict:
+        """
+        创建复权因子同步任务（每只股票一个工作项，在后台逐只同步，失败记录在工作项上）
+        
+        Args:
+            symbols: 股票代码列表，默认全部活跃股票
+            created_by: 创建用户ID
+            
+        Returns:
+            Dict: {'symbols', 'job_id', 'status'}，没有需要同步的股票时job_id为None
+        """
+        query = db.session.query(Symbol.symbol)
+        if symbols:
+            query = query.filter(Symbol.symbol.in_(symbols))
+        else:
+            query = query.filter(Symbol.is_active == True)
+        symbol_list = [symbol for (symbol,) in query.all()]
+        
+        stats = {'symbols': len(symbol_list), 'job_id': None, 'status': None}
+        if not symbol_list:
+            return stats
+        
+        from services.ingestion_job_service import ingestion_job_service, ADJUSTMENT_JOB_TYPE
+        today = date.today()
+        job = ingestion_job_service.create_job(
+            ADJUSTMENT_JOB_TYPE, [(symbol, today, today) for symbol in symbol_list], self.data_source_name,
+            params={'symbols': len(symbol_list)},
+            created_by=created_by
+        )
+        stats.update(job_id=job.id, status=job.status)
+        logger.info(f"创建复权因子同步任务{job.id}: {len(symbol_list)}只股票")
+        return stats
+    
+    def sync_adjustment_factors(self, symbol: str, symbol_id: int) -> Dict[str, int]:
+        """
+        从数据源同步一只股票的复权因子（只写入变化的因子，行情数据不变）
+        
+        Args:
+            symbol: 股票代码
+            symbol_id: 标的ID
+            
+        Returns:
+            Dict[str, int]: {'inserted', 'updated', 'deleted', 'unchanged'}
+        """
+        factors = self.data_source.get_adjustment_factors(symbol)
+        return self.adjustments.sync_symbol(symbol_id, factors)
+    
+    def _snapshot_to_batch(
+        self, 
+        snapshot: pd.DataFrame, 
+        symbol_ids: Dict[str, int], 
+        trade_date: date
+    ) -> Dict:
+        """
+        将全市场快照向量化转换为多标的日线列式批次
+        
+        只保留活跃股票中价格有效且有成交的行（停牌股票没有当日日线）
+        """
+        frame = snapshot[snapshot.index.isin(list(symbol_ids.keys()))]
+        
+        close = frame['latest_price'].to_numpy(dtype=float)
+        open_price = frame['open'].to_numpy(dtype=float)
+        high = frame['high'].to_numpy(dtype=float)
+        low = frame['low'].to_numpy(dtype=float)
+        volume = frame['volume'].to_numpy(dtype=float)
+        
+        mask = (close > 0) & (open_price > 0) & (high > 0) & (low > 0) & (volume > 0)
+        frame_symbols = frame.index.to_numpy()[mask]
+        
+        return {
+            'interval_type': '1d',
+            'symbol_id': np.array([symbol_ids[s] for s in frame_symbols], dtype=np.int64),
+            'timestamp': np.full(len(frame_symbols), np.datetime64(trade_date, 'ns')),
+            'open_price': open_price[mask],
+            'high_price': high[mask],
+            'low_price': low[mask],
+            'close_price': close[mask],
+            'volume': volume[mask]
+        }
+    
     def get_market_data(
         self, 
         symbol: str, 
         start_date: Optional[date] = None,
         end_date: Optional[date] = None,
-        limit: Optional[int] = None
-    ) -> List[Dict]:
+        limit: Optional[int] = None,
+        adjust: str = 'qfq',
+        interval_type: str = '1d',
+        output: str = 'records'
+    ):
         """
         从数据库获取市场数据
         
         Args:
             symbol: 股票代码
             start_date: 开始日期
-            end_date: 结束日期
-            limit: 限制条数
+            end_date: 结束日期（包含当日的全部分钟K线）
+            limit: 限制条数（取最近的limit条）
+            adjust: 复权方式，qfq前复权（默认）、hfq后复权、none不复权
+            interval_type: 数据周期（1M/1w/1d/60m/30m/15m/5m/1m），周线/月线从汇总表读取
+            output: 返回形式，records为字典列表（按时间倒序）；frame为DataFrame、arrays为NumPy数组字典
+                    （按时间升序，列为timestamp与价格/成交量字段），优先从列式存储读取；
+                    columnar为可直接序列化的列式字典（元数据只出现一次，数组按时间升序）
             
         Returns:
-            List[Dict]: 市场数据列表
+            List[Dict] | pd.DataFrame | Dict[str, np.ndarray] | Dict: 市场数据
         """
+        if adjust not in ADJUST_TYPES:
+            raise ValueError(f"不支持的复权方式: {adjust}")
+        if interval_type != '1d' and interval_type not in INTERVAL_MINUTES and interval_type not in AGGREGATE_INTERVALS:
+            raise ValueError(f"不支持的数据周期: {interval_type}")
+        if output not in OUTPUT_TYPES:
+            raise ValueError(f"不支持的返回形式: {output}")
+        
+        if output == 'columnar':
+            return self._get_columnar(symbol, start_date, end_date, limit, adjust, interval_type)
+        
+        if interval_type in AGGREGATE_INTERVALS:
+            return self._get_aggregate_bars(symbol, start_date, end_date, limit, adjust, interval_type, output)
+        
+        if output != 'records':
+            frame = self._get_bar_frame(symbol, start_date, end_date, limit, adjust, interval_type)
+            if output == 'frame':
+                return frame
+            return {column: frame[column].to_numpy() for column in frame.columns}
+        
         try:
             # 首先查找对应的 Symbol 记录
             symbol_obj = Symbol.query.filter_by(symbol=symbol).first()
@@ -428,28 +1202,387 @@ class MarketDataService:
                 logger.warning(f"未找到股票代码 {symbol} 对应的记录")
                 return []
             
-            # 使用 symbol_id 查询市场数据
-            query = MarketData.query.filter_by(symbol_id=symbol_obj.id)
+            # 一次Core查询读取K线（不构造ORM对象，标的与数据来源不按行懒加载）
+            t = MarketData.__table__
+            stmt = select(
+                t.c.id, t.c.data_source_id, t.c.timestamp, *[as_float(t.c[column]) for column in PRICE_COLUMNS], t.c.created_at
+            ).where(t.c.symbol_id == symbol_obj.id, t.c.interval_type == interval_type)
             
-            if start_date:
-                query = query.filter(MarketData.timestamp >= start_date)
+            # 早于归档截止时间的K线由归档文件提供
+            cutoff = self._archive_cutoff(symbol_obj.id, interval_type)
+            if cutoff is not None:
+                stmt = stmt.where(t.c.timestamp >= cutoff)
             
             if end_date:
-                query = query.filter(MarketData.timestamp <= end_date)
+                if isinstance(end_date, datetime):
+                    stmt = stmt.where(t.c.timestamp <= end_date)
+                else:
+                    stmt = stmt.where(t.c.timestamp < end_date + timedelta(days=1))
             
-            query = query.order_by(desc(MarketData.timestamp))
+            stmt = stmt.order_by(desc(t.c.timestamp)).limit(limit)
             
-            if limit:
-                query = query.limit(limit)
+            if start_date:
+                rows = db.session.execute(stmt.where(t.c.timestamp >= start_date)).all()
+            elif limit:
+                # 只取最近limit条时按条数估算时间下界，窗口内不足limit条再放宽到全部历史
+                rows = db.session.execute(
+                    stmt.where(t.c.timestamp >= self._recent_start(interval_type, limit, end_date))
+                ).all()
+                if len(rows) < limit:
+                    rows = db.session.execute(stmt).all()
+            else:
+                rows = db.session.execute(stmt).all()
+            rows = [tuple(row) for row in rows]
             
-            records = query.all()
+            if cutoff is not None and not (limit and len(rows) >= limit):
+                start, end = self._time_bounds(start_date, end_date)
+                archived = self._read_archived(symbol_obj.id, interval_type, start, end, cutoff, limit and limit - len(rows))
+                # 归档K线没有行ID、数据来源与入库时间
+                rows.extend(
+                    (None, None, *values, None)
+                    for values in zip(*[archived[column].tolist()[::-1] for column in ('timestamp',) + PRICE_COLUMNS])
+                )
             
-            return [record.to_dict() for record in records]
+            return self._bar_records(symbol_obj, interval_type, rows, adjust)
             
         except Exception as e:
             logger.error(f"获取{symbol}市场数据失败: {e}")
             return []
     
+    def _bar_records(self, symbol_obj: Symbol, interval_type: str, rows: List[tuple], adjust: str) -> List[Dict]:
+        """
+        K线行转换为与MarketData.to_dict相同字段的字典（复权与派生字段按列向量化计算，数据来源每个只加载一次）
+        
+        Args:
+            symbol_obj: 标的
+            interval_type: 数据周期
+            rows: (id, data_source_id, timestamp, 价格/成交量字段..., created_at)，按时间倒序
+            adjust: 复权方式
+            
+        Returns:
+            List[Dict]: 行情记录
+        """
+        if not rows:
+            return []
+        
+        ids, source_ids, timestamps, *values, created_ats = zip(*rows)
+        columns = {column: np.array(value, dtype=float) for column, value in zip(PRICE_COLUMNS, values)}
+        
+        multipliers = self.adjustments.multipliers(symbol_obj.id, np.array(timestamps, dtype='datetime64[ns]'), adjust)
+        if multipliers is not None:
+            for column in ('open_price', 'high_price', 'low_price', 'close_price'):
+                columns[column] = columns[column] * multipliers
+        
+        change = columns['close_price'] - columns['open_price']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            change_pct = np.where(columns['open_price'] != 0, change / columns['open_price'] * 100, 0.0)
+        spread = columns['high_price'] - columns['low_price']
+        
+        source_ids_set = {source_id for source_id in source_ids if source_id is not None}
+        data_sources = {
+            source.id: source.to_dict()
+            for source in (DataSource.query.filter(DataSource.id.in_(source_ids_set)).all() if source_ids_set else [])
+        }
+        
+        records = []
+        for row_id, source_id, timestamp, open_price, high_price, low_price, close_price, volume, created_at, \
+                price_change, price_change_percentage, high_low_spread in zip(
+                    ids, source_ids, timestamps, *[columns[column].tolist() for column in PRICE_COLUMNS], created_ats,
+                    change.tolist(), change_pct.tolist(), spread.tolist()):
+            records.append({
+                'id': row_id,
+                'symbol_id': symbol_obj.id,
+                'symbol': symbol_obj.symbol,
+                'symbol_name': symbol_obj.name,
+                'data_source_id': source_id,
+                'data_source': data_sources.get(source_id),
+                'timestamp': timestamp.isoformat(),
+                'open_price': open_price,
+                'high_price': high_price,
+                'low_price': low_price,
+                'close_price': close_price,
+                'volume': volume,
+                'interval_type': interval_type,
+                'price_change': price_change,
+                'price_change_percentage': price_change_percentage,
+                'high_low_spread': high_low_spread,
+                'created_at': created_at.isoformat() if created_at else None
+            })
+        return records
+    
+    def get_market_data_metadata(self, symbol: str, interval_type: str = '1d', adjust: str = 'qfq') -> Dict:
+        """
+        行情的元数据（列式与二进制返回格式中只出现一次）
+        
+        Args:
+            symbol: 股票代码
+            interval_type: 数据周期
+            adjust: 复权方式
+            
+        Returns:
+            Dict: symbol、symbol_id、symbol_name、interval_type、adjust、data_source（标的的数据来源）
+        """
+        symbol_obj = Symbol.query.filter_by(symbol=symbol).first()
+        return {
+            'symbol': symbol,
+            'symbol_id': symbol_obj.id if symbol_obj else None,
+            'symbol_name': symbol_obj.name if symbol_obj else None,
+            'interval_type': interval_type,
+            'adjust': adjust,
+            'data_source': symbol_obj.data_source.to_dict() if symbol_obj and symbol_obj.data_source else None
+        }
+    
+    def _get_columnar(
+        self,
+        symbol: str,
+        start_date: Optional[date],
+        end_date: Optional[date],
+        limit: Optional[int],
+        adjust: str,
+        interval_type: str
+    ) -> Dict:
+        """
+        列式返回形式：标的、周期与数据来源信息只出现一次，K线按时间升序以列数组返回
+        
+        数组由浮点读取路径（或列式存储、汇总表）的DataFrame直接转换，不逐行构造字典
+        
+        Returns:
+            Dict: symbol、symbol_id、symbol_name、interval_type、adjust、data_source、count，
+                  以及timestamp、open、high、low、close、volume数组（周线/月线另有bar_count、first_timestamp、last_timestamp）
+        """
+        if interval_type in AGGREGATE_INTERVALS:
+            frame = self._get_aggregate_bars(symbol, start_date, end_date, limit, adjust, interval_type, 'frame')
+        else:
+            frame = self._get_bar_frame(symbol, start_date, end_date, limit, adjust, interval_type)
+        
+        result = self.get_market_data_metadata(symbol, interval_type, adjust)
+        result['count'] = len(frame)
+        for column in frame.columns:
+            values = frame[column].to_numpy()
+            if np.issubdtype(values.dtype, np.datetime64):
+                result[COLUMNAR_FIELDS.get(column, column)] = np.datetime_as_string(values, unit='s').tolist()
+            else:
+                result[COLUMNAR_FIELDS.get(column, column)] = values.tolist()
+        return result
+    
+    def _get_aggregate_bars(
+        self,
+        symbol: str,
+        start_date: Optional[date],
+        end_date: Optional[date],
+        limit: Optional[int],
+        adjust: str,
+        interval_type: str,
+        output: str
+    ):
+        """从汇总表读取周线/月线，返回形式同get_market_data（frame/arrays另含bar_count与桶内首末日线时间）"""
+        start, end = self._time_bounds(start_date, end_date)
+        
+        symbol_id = db.session.execute(select(Symbol.id).where(Symbol.symbol == symbol)).scalar()
+        if symbol_id is None:
+            logger.warning(f"未找到股票代码 {symbol} 对应的记录")
+            frame = pd.DataFrame(rows_to_arrays([], ('timestamp',) + PRICE_COLUMNS + AGGREGATE_COLUMNS))
+        else:
+            frame = self.aggregates.read(symbol_id, interval_type, start, end, limit)
+            self._adjust_aggregate_frame(symbol, symbol_id, frame, adjust, interval_type)
+        
+        if output == 'frame':
+            return frame
+        if output == 'arrays':
+            return {column: frame[column].to_numpy() for column in frame.columns}
+        return self._aggregate_records(symbol, symbol_id, frame, interval_type)
+    
+    def _adjust_aggregate_frame(
+        self,
+        symbol: str,
+        symbol_id: int,
+        frame: pd.DataFrame,
+        adjust: str,
+        interval_type: str
+    ) -> None:
+        """
+        复权汇总K线（原地修改）
+        
+        桶内没有除权除息时整根K线使用同一个乘数；桶内首末日线乘数不同的（少数），
+        从复权后的日线重新汇总这些桶
+        """
+        last = self.adjustments.multipliers(symbol_id, frame['last_timestamp'].to_numpy(), adjust)
+        if last is None:
+            return
+        first = self.adjustments.multipliers(symbol_id, frame['first_timestamp'].to_numpy(), adjust)
+        
+        price_columns = ['open_price', 'high_price', 'low_price', 'close_price']
+        for column in price_columns:
+            frame[column] = frame[column].to_numpy() * last
+        
+        split = np.flatnonzero(~np.isclose(first, last, rtol=1e-12, atol=0))
+        if len(split) == 0:
+            return
+        
+        daily = self._get_bar_frame(
+            symbol,
+            frame['first_timestamp'].iloc[split].min().to_pydatetime(),
+            frame['last_timestamp'].iloc[split].max().to_pydatetime(),
+            None, adjust, '1d'
+        )
+        bars = aggregate_bars(daily.assign(symbol_id=symbol_id), interval_type).set_index('timestamp')
+        for i in split:
+            bucket = frame['timestamp'].iloc[i]
+            if bucket in bars.index:
+                frame.loc[i, price_columns] = bars.loc[bucket, price_columns].to_numpy(dtype=float)
+    
+    @staticmethod
+    def _aggregate_records(symbol: str, symbol_id: Optional[int], frame: pd.DataFrame, interval_type: str) -> List[Dict]:
+        """汇总K线转换为字典列表（按时间倒序，字段与日线记录一致）"""
+        records = []
+        for row in frame.iloc[::-1].itertuples(index=False):
+            change = float(row.close_price - row.open_price)
+            records.append({
+                'symbol_id': symbol_id,
+                'symbol': symbol,
+                'interval_type': interval_type,
+                'timestamp': row.timestamp.isoformat(),
+                'open_price': float(row.open_price),
+                'high_price': float(row.high_price),
+                'low_price': float(row.low_price),
+                'close_price': float(row.close_price),
+                'volume': float(row.volume),
+                'bar_count': int(row.bar_count),
+                'first_timestamp': row.first_timestamp.isoformat(),
+                'last_timestamp': row.last_timestamp.isoformat(),
+                'price_change': change,
+                'price_change_percentage': (change / float(row.open_price) * 100) if row.open_price else 0,
+                'high_low_spread': float(row.high_price - row.low_price)
+            })
+        return records
+    
+    def _get_bar_frame(
+        self,
+        symbol: str,
+        start_date: Optional[date],
+        end_date: Optional[date],
+        limit: Optional[int],
+        adjust: str,
+        interval_type: str
+    ) -> pd.DataFrame:
+        """按时间升序读取一个标的的K线为DataFrame（列式存储已重建该周期时从存储读取，否则查询数据库）"""
+        start, end = self._time_bounds(start_date, end_date)
+        
+        symbol_id = db.session.execute(select(Symbol.id).where(Symbol.symbol == symbol)).scalar()
+        if symbol_id is None:
+            logger.warning(f"未找到股票代码 {symbol} 对应的记录")
+            frame = pd.DataFrame({'timestamp': np.array([], dtype='datetime64[ns]')})
+            for column in PRICE_COLUMNS:
+                frame[column] = np.array([], dtype=float)
+            return frame
+        
+        cutoff = self._archive_cutoff(symbol_id, interval_type)
+        store = self.columnar_store
+        if store is not None and store.is_ready(interval_type) and store.has_symbol(interval_type, symbol_id):
+            frame = store.read(interval_type, symbol_id, start if cutoff is None else max(start or cutoff, cutoff), end)
+        else:
+            frame = self._query_bar_frame(symbol_id, interval_type, start, end, limit, cutoff)
+        
+        if cutoff is not None and not (limit and len(frame) >= limit):
+            archived = self._read_archived(symbol_id, interval_type, start, end, cutoff, limit and limit - len(frame))
+            if len(archived):
+                frame = pd.concat([archived, frame], ignore_index=True)
+        
+        if limit and len(frame) > limit:
+            frame = frame.iloc[-limit:].reset_index(drop=True)
+        
+        multipliers = self.adjustments.multipliers(symbol_id, frame['timestamp'].to_numpy(), adjust)
+        if multipliers is not None:
+            for column in ('open_price', 'high_price', 'low_price', 'close_price'):
+                frame[column] = frame[column].to_numpy() * multipliers
+        return frame
+    
+    def _query_bar_frame(
+        self,
+        symbol_id: int,
+        interval_type: str,
+        start: Optional[datetime],
+        end: Optional[datetime],
+        limit: Optional[int],
+        floor: Optional[datetime] = None
+    ) -> pd.DataFrame:
+        """从数据库读取K线为DataFrame（浮点读取路径，不构造ORM对象与Decimal），floor为归档截止时间"""
+        t = MarketData.__table__
+        stmt = select(t.c.timestamp, *[as_float(t.c[column]) for column in PRICE_COLUMNS]).where(
+            t.c.symbol_id == symbol_id, t.c.interval_type == interval_type
+        )
+        if floor is not None:
+            stmt = stmt.where(t.c.timestamp >= floor)
+        if end is not None:
+            stmt = stmt.where(t.c.timestamp < end)
+        stmt = stmt.order_by(desc(t.c.timestamp)).limit(limit)
+        
+        if start is not None:
+            rows = db.session.execute(stmt.where(t.c.timestamp >= start)).all()
+        elif limit:
+            rows = db.session.execute(stmt.where(t.c.timestamp >= self._recent_start(interval_type, limit, end))).all()
+            if len(rows) < limit:
+                rows = db.session.execute(stmt).all()
+        else:
+            rows = db.session.execute(stmt).all()
+        return pd.DataFrame(rows_to_arrays(rows[::-1], ('timestamp',) + PRICE_COLUMNS))
+    
+    def _archive_cutoff(self, symbol_id: int, interval_type: str) -> Optional[datetime]:
+        """标的的归档截止时间（未启用归档或未归档时为None）"""
+        return self.archive.cutoff(interval_type, symbol_id) if self.archive is not None else None
+    
+    def _read_archived(
+        self,
+        symbol_id: int,
+        interval_type: str,
+        start: Optional[datetime],
+        end: Optional[datetime],
+        cutoff: datetime,
+        limit: Optional[int]
+    ) -> pd.DataFrame:
+        """读取归档部分[start, min(end, cutoff))，按时间升序；limit时只保留最近的limit条"""
+        if start is not None and start >= cutoff:
+            return pd.DataFrame(rows_to_arrays([], ('timestamp',) + PRICE_COLUMNS))
+        frame = self.archive.read(interval_type, symbol_id, start, cutoff if end is None else min(end, cutoff))
+        if limit:
+            frame = frame.iloc[-limit:].reset_index(drop=True)
+        return frame
+    
+    @staticmethod
+    def _recent_start(interval_type: str, limit: Optional[int] = None, end=None) -> datetime:
+        """
+        最近数据查询的时间下界，使查询只扫描最近的分区
+        
+        Args:
+            interval_type: 数据周期
+            limit: 需要的K线条数，按每日K线数与非交易日估算所需的自然日数；为None时使用RECENT_LOOKBACK_DAYS
+            end: 查询的结束日期/时间，默认今天
+        """
+        if limit:
+            bars_per_day = 1 if interval_type == '1d' else SESSION_MINUTES // INTERVAL_MINUTES[interval_type]
+            days = int(-(-limit // bars_per_day) * 1.5) + 15
+        else:
+            days = RECENT_LOOKBACK_DAYS
+        
+        if end is None:
+            end = date.today()
+        if not isinstance(end, datetime):
+            end = datetime.combine(end, datetime.min.time())
+        return end - timedelta(days=days)
+    
+    @staticmethod
+    def _time_bounds(start_date, end_date) -> Tuple[Optional[datetime], Optional[datetime]]:
+        """把日期参数转换为[开始, 结束)时间区间：结束为日期时包含当日全部K线，为时间时包含该时刻"""
+        start = end = None
+        if start_date:
+            start = start_date if isinstance(start_date, datetime) else datetime.combine(start_date, datetime.min.time())
+        if end_date:
+            if isinstance(end_date, datetime):
+                end = end_date + timedelta(microseconds=1)
+            else:
+                end = datetime.combine(end_date, datetime.min.time()) + timedelta(days=1)
+        return start, end
+    
     def get_data_statistics(self) -> Dict:
         """
         获取数据统计信息
@@ -460,11 +1593,21 @@ class MarketDataService:
         try:
             stats = {
                 'total_symbols': Symbol.query.filter_by(is_active=True).count(),
-                'total_records': MarketData.query.count(),
+                'total_records': 0,
                 'data_date_range': {},
                 'symbols_with_data': 0
             }
             
+            if db.engine.dialect.name == 'mysql':
+                # 分区表上COUNT(*)要扫描全部分区，改用各分区统计的行数（估算值）
+                stats['total_records'] = int(db.session.execute(text(
+                    "SELECT COALESCE(SUM(TABLE_ROWS), 0) FROM INFORMATION_SCHEMA.PARTITIONS "
+                    "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'market_data'"
+                )).scalar())
+                stats['total_records_estimated'] = True
+            else:
+                stats['total_records'] = MarketData.query.count()
+            
             # 获取数据日期范围
             date_range = db.session.query(
                 func.min(MarketData.timestamp).label('min_date'),
@@ -481,6 +1624,15 @@ class MarketDataService:
             stats['symbols_with_data'] = db.session.query(MarketData.symbol_id)\
                 .distinct().count()
             
+            # 已归档的K线（从清单汇总，不扫描归档文件）
+            if self.archive is not None:
+                archive = self.archive.summary()
+                stats['archive'] = archive
+                stats['archived_records'] = sum(info['rows'] for info in archive.values())
+                starts = [info['start'] for info in archive.values() if info['start']]
+                if starts and stats['data_date_range']:
+                    stats['data_date_range']['start'] = min(min(starts), stats['data_date_range']['start'])
+            
             return stats
             
         except Exception as e:
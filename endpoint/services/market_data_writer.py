@@ -0,0 +1,289 @@
+"""
+市场数据批量写入器
+基于集合操作写入行情数据：一次查询加载已有时间戳，按块多行插入/更新，
+并在同一事务内更新最新K线表（market_data_latest）
+"""
+
+import logging
+from datetime import datetime
+from typing import List, Dict, Optional, Iterable, Tuple, Callable
+
+import pandas as pd
+from sqlalchemy import select, update, bindparam, insert
+
+from models import db, MarketData
+from services.metrics import metrics_registry
+from services.latest_bars import LatestBarStore
+from services.market_data_archive import get_market_data_archive
+
+logger = logging.getLogger(__name__)
+
+# 写入的价格/成交量字段
+VALUE_COLUMNS = ['open_price', 'high_price', 'low_price', 'close_price', 'volume']
+
+
+class MarketDataWriter:
+    """市场数据批量写入器"""
+
+    def __init__(self, data_source_id: Optional[int] = None, chunk_size: int = 1000):
+        """
+        初始化批量写入器
+
+        Args:
+            data_source_id: 数据来源ID
+            chunk_size: 每条多行INSERT/UPDATE语句包含的最大行数
+        """
+        self.data_source_id = data_source_id
+        self.chunk_size = chunk_size
+        self.table = MarketData.__table__
+        self.listeners = []
+        self.latest = LatestBarStore(chunk_size)
+        # 冷数据归档（配置MARKET_DATA_ARCHIVE_DIR时启用），早于标的归档截止时间的K线已在归档文件中
+        self.archive = get_market_data_archive()
+
+    def add_listener(self, listener: Callable[[str, Dict[int, List[datetime]]], None]) -> None:
+        """
+        注册写入监听器，每次提交后按周期调用 listener(interval_type, {symbol_id: [timestamp, ...]})，
+        只包含新增或覆盖的行（跳过的行不通知）
+
+        Args:
+            listener: 监听函数
+        """
+        self.listeners.append(listener)
+
+    def write(self, records: List[Dict], force_update: bool = False) -> Dict[str, int]:
+        """
+        批量写入行情数据
+
+        Args:
+            records: 行情数据列表，每条需包含symbol_id、timestamp、interval_type及价格字段
+            force_update: 是否强制更新（已存在的行按upsert语义覆盖）
+
+        Returns:
+            Dict[str, int]: 写入统计 {'inserted', 'updated', 'skipped'}
+        """
+        return self._write_rows([self._to_row(record) for record in records], force_update)
+
+    def write_batch(
+        self,
+        symbol_id: Optional[int],
+        batch: Dict,
+        force_update: bool = False
+    ) -> Dict[str, int]:
+        """
+        批量写入列式批次（format_market_data_columnar的输出），不经过逐行字典格式化
+
+        Args:
+            symbol_id: 标的ID；为None时使用批次中的symbol_id数组（多标的批次）
+            batch: 列式批次
+            force_update: 是否强制更新
+
+        Returns:
+            Dict[str, int]: 写入统计 {'inserted', 'updated', 'skipped'}
+        """
+        timestamps = pd.DatetimeIndex(batch['timestamp']).to_pydatetime()
+        columns = [batch[col].tolist() for col in VALUE_COLUMNS]
+        interval_type = batch.get('interval_type', '1d')
+        created_at = datetime.utcnow()
+
+        if symbol_id is None:
+            symbol_ids = [int(i) for i in batch['symbol_id']]
+        else:
+            symbol_ids = [symbol_id] * len(timestamps)
+
+        rows = []
+        for timestamp, row_symbol_id, values in zip(timestamps, symbol_ids, zip(*columns)):
+            row = dict(zip(VALUE_COLUMNS, values))
+            row.update({
+                'symbol_id': row_symbol_id,
+                'data_source_id': self.data_source_id,
+                'timestamp': timestamp,
+                'interval_type': interval_type,
+                'created_at': created_at
+            })
+            rows.append(row)
+
+        return self._write_rows(rows, force_update)
+
+    def _write_rows(self, rows: List[Dict], force_update: bool) -> Dict[str, int]:
+        """对已转换为表行的数据执行去重、存在性检查与分块写入，提交后通知监听器"""
+        if not rows:
+            return {'inserted': 0, 'updated': 0, 'skipped': 0}
+
+        with metrics_registry.timer('pipeline', 'write') as timer:
+            stats, written = self._persist(rows, force_update)
+            timer.rows = len(written)
+
+        if self.listeners and written:
+            self._notify(written)
+        return stats
+
+    def _persist(self, rows: List[Dict], force_update: bool) -> Tuple[Dict[str, int], List[Dict]]:
+        """写入并提交，返回写入统计与新增/覆盖的行"""
+        stats = {'inserted': 0, 'updated': 0, 'skipped': 0}
+
+        # 批内去重，同一键以最后一条为准
+        unique_rows = {}
+        for row in rows:
+            unique_rows[(row['symbol_id'], row['timestamp'], row['interval_type'])] = row
+        stats['skipped'] += len(rows) - len(unique_rows)
+
+        if self.archive is not None and not force_update:
+            # 早于归档截止时间的K线已由归档文件提供，不再写回热表（强制更新时写入，提交后由归档监听器合并进归档文件）
+            archived = self._archived_keys(unique_rows.keys())
+            for key in archived:
+                del unique_rows[key]
+            stats['skipped'] += len(archived)
+
+        existing = self._load_existing_keys(unique_rows.keys())
+
+        new_rows = []
+        existing_rows = []
+        for key, row in unique_rows.items():
+            if key in existing:
+                if force_update:
+                    row['b_id'] = existing[key]
+                    existing_rows.append(row)
+                else:
+                    stats['skipped'] += 1
+            else:
+                new_rows.append(row)
+
+        dialect = db.session.get_bind().dialect.name
+
+        if force_update and dialect in ('mysql', 'sqlite'):
+            # 真正的upsert：一条语句同时处理新增与覆盖
+            all_rows = new_rows + existing_rows
+            for chunk in self._chunks(all_rows):
+                db.session.execute(self._build_upsert(dialect), [self._strip_id(r) for r in chunk])
+        else:
+            for chunk in self._chunks(new_rows):
+                db.session.execute(insert(self.table), chunk)
+
+            if existing_rows:
+                update_columns = VALUE_COLUMNS + ['data_source_id']
+                stmt = update(self.table)\
+                    .where(self.table.c.id == bindparam('b_id'))\
+                    .values({col: bindparam(f'b_{col}') for col in update_columns})
+                for chunk in self._chunks(existing_rows):
+                    params = [
+                        dict({f'b_{col}': row[col] for col in update_columns}, b_id=row['b_id'])
+                        for row in chunk
+                    ]
+                    db.session.execute(stmt, params)
+
+        stats['inserted'] = len(new_rows)
+        stats['updated'] = len(existing_rows)
+
+        # 最新K线与行情在同一事务内提交，读取方不会看到两者不一致
+        self.latest.upsert(new_rows + existing_rows)
+
+        db.session.commit()
+        return stats, new_rows + existing_rows
+
+    def _notify(self, rows: List[Dict]) -> None:
+        """按周期与标的分组通知监听器（监听器异常不影响已提交的写入）"""
+        written = {}
+        for row in rows:
+            written.setdefault(row['interval_type'], {}).setdefault(row['symbol_id'], []).append(row['timestamp'])
+
+        for interval_type, by_symbol in written.items():
+            for listener in self.listeners:
+                try:
+                    listener(interval_type, by_symbol)
+                except Exception as e:
+                    logger.error(f"写入监听器处理{interval_type}数据失败: {e}")
+                    db.session.rollback()
+
+    def _to_row(self, record: Dict) -> Dict:
+        """将格式化后的数据点转换为表行"""
+        row = {
+            'symbol_id': record['symbol_id'],
+            'data_source_id': record.get('data_source_id', self.data_source_id),
+            'timestamp': self._normalize_timestamp(record['timestamp']),
+            'interval_type': record.get('interval_type', '1d'),
+            'created_at': datetime.utcnow()
+        }
+        for col in VALUE_COLUMNS:
+            row[col] = float(record[col])
+        return row
+
+    @staticmethod
+    def _normalize_timestamp(value) -> datetime:
+        """统一时间戳为datetime，保证与数据库返回值可比较"""
+        if isinstance(value, pd.Timestamp):
+            return value.to_pydatetime()
+        if isinstance(value, datetime):
+            return value
+        return pd.to_datetime(value).to_pydatetime()
+
+    @staticmethod
+    def _strip_id(row: Dict) -> Dict:
+        """upsert语句不需要主键绑定参数"""
+        return {k: v for k, v in row.items() if k != 'b_id'}
+
+    def _chunks(self, rows: List[Dict]) -> Iterable[List[Dict]]:
+        """按块切分"""
+        for i in range(0, len(rows), self.chunk_size):
+            yield rows[i:i + self.chunk_size]
+
+    def _archived_keys(self, keys: Iterable[Tuple]) -> List[Tuple]:
+        """早于标的归档截止时间的(symbol_id, timestamp, interval_type)键"""
+        cutoffs = {}
+        archived = []
+        for key in keys:
+            symbol_id, timestamp, interval_type = key
+            if (interval_type, symbol_id) not in cutoffs:
+                cutoffs[(interval_type, symbol_id)] = self.archive.cutoff(interval_type, symbol_id)
+            cutoff = cutoffs[(interval_type, symbol_id)]
+            if cutoff is not None and timestamp < cutoff:
+                archived.append(key)
+        return archived
+
+    def _load_existing_keys(self, keys: Iterable[Tuple]) -> Dict[Tuple, int]:
+        """
+        一次查询加载已存在的(symbol_id, timestamp, interval_type)键
+
+        按symbol_id分块构造IN条件，并以时间范围限定扫描区间
+        """
+        keys = list(keys)
+        if not keys:
+            return {}
+
+        symbol_ids = sorted({k[0] for k in keys})
+        interval_types = sorted({k[2] for k in keys})
+        min_ts = min(k[1] for k in keys)
+        max_ts = max(k[1] for k in keys)
+
+        existing = {}
+        t = self.table
+        for i in range(0, len(symbol_ids), self.chunk_size):
+            id_chunk = symbol_ids[i:i + self.chunk_size]
+            stmt = select(t.c.id, t.c.symbol_id, t.c.timestamp, t.c.interval_type).where(
+                t.c.symbol_id.in_(id_chunk),
+                t.c.interval_type.in_(interval_types),
+                t.c.timestamp >= min_ts,
+                t.c.timestamp <= max_ts
+            )
+            for row_id, symbol_id, timestamp, interval_type in db.session.execute(stmt):
+                existing[(symbol_id, timestamp, interval_type)] = row_id
+
+        return existing
+
+    def _build_upsert(self, dialect: str):
+        """构造方言相关的upsert语句（依赖uk_symbol_timestamp_interval唯一键）"""
+        update_columns = VALUE_COLUMNS + ['data_source_id']
+
+        if dialect == 'mysql':
+            from sqlalchemy.dialects.mysql import insert as mysql_insert
+            stmt = mysql_insert(self.table)
+            return stmt.on_duplicate_key_update(
+                {col: stmt.inserted[col] for col in update_columns}
+            )
+
+        from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+        stmt = sqlite_insert(self.table)
+        return stmt.on_conflict_do_update(
+            index_elements=['symbol_id', 'timestamp', 'interval_type'],
+            set_={col: stmt.excluded[col] for col in update_columns}
+        )
@@ -0,0 +1,404 @@
+"""
+数据源与入库管道的性能指标
+在内存中按 (数据源, 操作) 累计请求耗时直方图、行数、字节数、重试次数与限流等待时间，
+定期把每个时间窗口的增量写入data_source_metrics表
+"""
+
+import json
+import time
+import threading
+import logging
+from bisect import bisect_left
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import List, Dict, Optional, Tuple
+
+from sqlalchemy import insert, select
+
+from models import db, DataSourceMetric
+
+logger = logging.getLogger(__name__)
+
+# 直方图桶上界（毫秒），最后一个桶收集超过30秒的请求
+BUCKET_BOUNDS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000)
+
+
+class Histogram:
+    """固定桶的耗时直方图（毫秒），可合并，分位数按桶内线性插值估算"""
+
+    def __init__(self, counts: Optional[List[int]] = None):
+        self.counts = list(counts) if counts else [0] * (len(BUCKET_BOUNDS_MS) + 1)
+        self.count = sum(self.counts)
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value_ms: float) -> None:
+        self.counts[bisect_left(BUCKET_BOUNDS_MS, value_ms)] += 1
+        self.count += 1
+        self.total += value_ms
+        self.max = max(self.max, value_ms)
+
+    def merge(self, other: 'Histogram') -> None:
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """
+        估算分位数
+
+        Args:
+            p: 百分位（0-100）
+
+        Returns:
+            Optional[float]: 分位数（毫秒），没有样本时返回None
+        """
+        if not self.count:
+            return None
+
+        rank = p / 100.0 * self.count
+        cumulative = 0
+        for i, bucket_count in enumerate(self.counts):
+            if bucket_count and cumulative + bucket_count >= rank:
+                lower = BUCKET_BOUNDS_MS[i - 1] if i > 0 else 0.0
+                upper = BUCKET_BOUNDS_MS[i] if i < len(BUCKET_BOUNDS_MS) else self.max
+                value = lower + (upper - lower) * (rank - cumulative) / bucket_count
+                return round(min(value, self.max), 3)
+            cumulative += bucket_count
+        return round(self.max, 3)
+
+    def to_dict(self) -> Dict:
+        return {
+            'count': self.count,
+            'avg_ms': round(self.total / self.count, 3) if self.count else None,
+            'p50_ms': self.percentile(50),
+            'p95_ms': self.percentile(95),
+            'p99_ms': self.percentile(99),
+            'max_ms': round(self.max, 3) if self.count else None
+        }
+
+
+class OperationMetrics:
+    """一个 (数据源, 操作) 的累计指标"""
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.rows = 0
+        self.bytes = 0
+        self.throttled = 0
+        self.latency = Histogram()
+        self.limiter_wait = Histogram()
+
+    def observe(self, seconds: float, rows: int, size: int, error: bool, retries: int, limiter_wait: float) -> None:
+        self.requests += 1
+        self.errors += int(error)
+        self.retries += retries
+        self.rows += rows
+        self.bytes += size
+        self.latency.observe(seconds * 1000)
+        self.limiter_wait.observe(limiter_wait * 1000)
+        # 等待超过1毫秒视为被限流
+        self.throttled += int(limiter_wait > 0.001)
+
+    def merge(self, other: 'OperationMetrics') -> None:
+        for field in ('requests', 'errors', 'retries', 'rows', 'bytes', 'throttled'):
+            setattr(self, field, getattr(self, field) + getattr(other, field))
+        self.latency.merge(other.latency)
+        self.limiter_wait.merge(other.limiter_wait)
+
+    def to_dict(self) -> Dict:
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'error_rate': round(self.errors / self.requests, 4) if self.requests else 0.0,
+            'retries': self.retries,
+            'rows': self.rows,
+            'bytes': self.bytes,
+            'throttled': self.throttled,
+            'latency': self.latency.to_dict(),
+            'limiter_wait_total_ms': round(self.limiter_wait.total, 3),
+            'limiter_wait': self.limiter_wait.to_dict(),
+            'total_time_ms': round(self.latency.total, 3)
+        }
+
+
+class _Timer:
+    """timer()返回的计时对象，调用方可在块内设置rows/bytes"""
+
+    def __init__(self):
+        self.rows = 0
+        self.bytes = 0
+
+
+class MetricsRegistry:
+    """
+    进程级指标注册表（线程安全）
+
+    同时维护进程启动以来的累计值与当前时间窗口的增量；flush()把窗口增量写入数据库并开始新窗口。
+    通过init_app绑定Flask应用后在后台线程中按间隔刷新。
+    """
+
+    def __init__(self, flush_interval: int = 60):
+        """
+        初始化指标注册表
+
+        Args:
+            flush_interval: 刷新到数据库的间隔（秒），0表示不自动刷新
+        """
+        self.app = None
+        self.flush_interval = flush_interval
+        self.started_at = datetime.utcnow()
+        self._totals: Dict[Tuple[str, str], OperationMetrics] = {}
+        self._window: Dict[Tuple[str, str], OperationMetrics] = {}
+        self._window_start = datetime.utcnow()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def init_app(self, app) -> None:
+        """
+        绑定Flask应用并启动后台刷新线程
+
+        Args:
+            app: Flask应用
+        """
+        self.app = app
+        self.flush_interval = app.config.get('METRICS_FLUSH_INTERVAL', self.flush_interval)
+
+        if self.flush_interval and not app.config.get('TESTING') and self._thread is None:
+            self._thread = threading.Thread(target=self._flush_loop, name='metrics-flush', daemon=True)
+            self._thread.start()
+
+    # ============================================
+    # 记录
+    # ============================================
+
+    def record(
+        self,
+        source: str,
+        operation: str,
+        seconds: float,
+        rows: int = 0,
+        size: int = 0,
+        error: bool = False,
+        retries: int = 0,
+        limiter_wait: float = 0.0
+    ) -> None:
+        """
+        记录一次请求
+
+        Args:
+            source: 数据源名称（入库管道阶段为'pipeline'）
+            operation: 操作名称
+            seconds: 耗时（秒，不含限流等待）
+            rows: 返回或写入的行数
+            size: 数据大小（字节）
+            error: 是否最终失败
+            retries: 重试次数
+            limiter_wait: 限流器等待时间（秒）
+        """
+        key = (source, operation)
+        with self._lock:
+            for metrics in (self._totals, self._window):
+                if key not in metrics:
+                    metrics[key] = OperationMetrics()
+                metrics[key].observe(seconds, rows, size, error, retries, limiter_wait)
+
+    @contextmanager
+    def timer(self, source: str, operation: str):
+        """
+        计时上下文：块结束时记录耗时，块内抛出异常时记为失败
+
+        Args:
+            source: 数据源名称
+            operation: 操作名称
+        """
+        timer = _Timer()
+        started = time.perf_counter()
+        error = False
+        try:
+            yield timer
+        except Exception:
+            error = True
+            raise
+        finally:
+            self.record(source, operation, time.perf_counter() - started, timer.rows, timer.bytes, error)
+
+    # ============================================
+    # 查询
+    # ============================================
+
+    def snapshot(self, source: Optional[str] = None) -> Dict[str, Dict[str, Dict]]:
+        """
+        进程启动以来的累计指标
+
+        Args:
+            source: 只返回该数据源，默认全部
+
+        Returns:
+            Dict[str, Dict[str, Dict]]: 数据源 -> 操作 -> 指标
+        """
+        with self._lock:
+            items = [(key, metrics.to_dict()) for key, metrics in self._totals.items()
+                     if source is None or key[0] == source]
+
+        result = {}
+        for (source_name, operation), metrics in sorted(items):
+            result.setdefault(source_name, {})[operation] = metrics
+        return result
+
+    def get_history(self, source: Optional[str] = None, hours: int = 24) -> Dict[str, Dict[str, Dict]]:
+        """
+        从数据库汇总最近若干小时已刷新的窗口（直方图按桶合并后估算分位数）
+
+        Args:
+            source: 只返回该数据源，默认全部
+            hours: 回看小时数
+
+        Returns:
+            Dict[str, Dict[str, Dict]]: 数据源 -> 操作 -> 指标（附windows窗口数）
+        """
+        t = DataSourceMetric.__table__
+        query = select(t).where(t.c.window_end >= datetime.utcnow() - timedelta(hours=hours))
+        if source is not None:
+            query = query.where(t.c.data_source == source)
+
+        merged, windows = {}, {}
+        for row in db.session.execute(query).mappings():
+            key = (row['data_source'], row['operation'])
+            metrics = merged.setdefault(key, OperationMetrics())
+            metrics.merge(self._from_row(row))
+            windows[key] = windows.get(key, 0) + 1
+
+        result = {}
+        for key in sorted(merged):
+            entry = merged[key].to_dict()
+            entry['windows'] = windows[key]
+            result.setdefault(key[0], {})[key[1]] = entry
+        return result
+
+    # ============================================
+    # 刷新
+    # ============================================
+
+    def flush(self) -> int:
+        """
+        把当前窗口的增量写入数据库并开始新窗口（需要应用上下文）
+
+        Returns:
+            int: 写入的行数
+        """
+        with self._flush_lock:
+            with self._lock:
+                window, self._window = self._window, {}
+                window_start, self._window_start = self._window_start, datetime.utcnow()
+                window_end = self._window_start
+
+            if not window:
+                return 0
+
+            rows = [
+                {
+                    'data_source': source,
+                    'operation': operation,
+                    'window_start': window_start,
+                    'window_end': window_end,
+                    'requests': metrics.requests,
+                    'errors': metrics.errors,
+                    'retries': metrics.retries,
+                    'rows': metrics.rows,
+                    'bytes': metrics.bytes,
+                    'throttled': metrics.throttled,
+                    'latency_sum_ms': metrics.latency.total,
+                    'latency_max_ms': metrics.latency.max,
+                    'latency_p50_ms': metrics.latency.percentile(50),
+                    'latency_p95_ms': metrics.latency.percentile(95),
+                    'latency_p99_ms': metrics.latency.percentile(99),
+                    'latency_buckets': json.dumps(metrics.latency.counts),
+                    'limiter_wait_sum_ms': metrics.limiter_wait.total,
+                    'limiter_wait_buckets': json.dumps(metrics.limiter_wait.counts),
+                    'created_at': window_end
+                }
+                for (source, operation), metrics in window.items()
+            ]
+
+            try:
+                db.session.execute(insert(DataSourceMetric.__table__), rows)
+                db.session.commit()
+            except Exception as e:
+                logger.error(f"写入性能指标失败: {e}")
+                db.session.rollback()
+                # 写入失败时把增量并回当前窗口，下次刷新重试
+                with self._lock:
+                    for key, metrics in window.items():
+                        window_metrics = self._window.setdefault(key, OperationMetrics())
+                        window_metrics.merge(metrics)
+                    self._window_start = window_start
+                return 0
+
+            return len(rows)
+
+    def _flush_loop(self) -> None:
+        """后台刷新线程"""
+        while not self._stop.wait(self.flush_interval):
+            try:
+                with self.app.app_context():
+                    try:
+                        self.flush()
+                    finally:
+                        db.session.remove()
+            except Exception as e:
+                logger.error(f"性能指标刷新失败: {e}")
+
+    def stop(self) -> None:
+        """停止后台刷新线程"""
+        self._stop.set()
+
+    def reset(self) -> None:
+        """清空内存中的指标（不影响已写入数据库的窗口）"""
+        with self._lock:
+            self._totals.clear()
+            self._window.clear()
+            self._window_start = datetime.utcnow()
+            self.started_at = self._window_start
+
+    @staticmethod
+    def _from_row(row) -> OperationMetrics:
+        """由数据库中的窗口行还原指标（用于跨窗口合并）"""
+        metrics = OperationMetrics()
+        for field in ('requests', 'errors', 'retries', 'rows', 'bytes', 'throttled'):
+            setattr(metrics, field, row[field] or 0)
+
+        metrics.latency = Histogram(json.loads(row['latency_buckets']) if row['latency_buckets'] else None)
+        metrics.latency.total = row['latency_sum_ms'] or 0.0
+        metrics.latency.max = row['latency_max_ms'] or 0.0
+        metrics.limiter_wait = Histogram(json.loads(row['limiter_wait_buckets']) if row['limiter_wait_buckets'] else None)
+        metrics.limiter_wait.total = row['limiter_wait_sum_ms'] or 0.0
+        return metrics
+
+
+def result_size(result) -> Tuple[int, int]:
+    """
+    估算请求结果的行数与字节数（DataFrame按内存占用，列表与字典只计行数）
+
+    Args:
+        result: 数据源返回值
+
+    Returns:
+        Tuple[int, int]: (行数, 字节数)
+    """
+    if result is None:
+        return 0, 0
+    if hasattr(result, 'memory_usage') and hasattr(result, 'index'):
+        return len(result), int(result.memory_usage(index=True, deep=False).sum())
+    if isinstance(result, (list, dict, tuple)):
+        return len(result), 0
+    return 0, 0
+
+
+# 进程级单例
+metrics_registry = MetricsRegistry()
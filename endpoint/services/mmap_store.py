@@ -0,0 +1,379 @@
+"""
+内存映射行情存储
+每个周期一个定长记录文件（时间戳int64 + 价格/成交量float64），标的的K线在文件中连续存放，
+索引文件记录 股票代码 -> 偏移/长度。多个工作进程映射同一文件，共享一份页缓存，按窗口切片不产生拷贝
+"""
+
+import os
+import json
+import threading
+import logging
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import List, Dict, Optional, Iterable
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+
+from models import db, Symbol
+from services.columnar_store import load_bar_frames, PRICE_COLUMNS
+from services.metrics import metrics_registry
+
+try:
+    import fcntl
+except ImportError:  # Windows下只做进程内互斥
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# 定长记录：时间戳为datetime64[ns]的int64表示
+RECORD_DTYPE = np.dtype([('timestamp', '<i8')] + [(column, '<f8') for column in PRICE_COLUMNS])
+
+INDEX_FILE = 'index.json'
+LOCK_FILE = '.lock'
+
+# 重建热数据窗口时查询的时间上界
+_MAX_TIMESTAMP = datetime(9999, 12, 31)
+
+
+class MmapBarStore:
+    """
+    内存映射行情存储
+
+    目录结构为 <root>/<周期>/index.json 与 <root>/<周期>/bars.<代>.bin。索引格式：
+    {"data_file", "records", "since", "symbols": {代码: [偏移, 长度, 容量]}}，偏移/长度/容量均以记录数计。
+
+    每个标的的区段预留空闲容量：新K线晚于区段末尾且容量足够时直接写在区段尾部，否则把合并后的区段
+    整体追加到文件末尾（旧区段成为空洞，重建时回收）。数据先落盘、索引再原子替换，读取方只会看到完整的区段。
+    写入通过文件锁在进程间互斥；读取方在索引文件变化时重新加载索引并重新映射数据文件。
+    """
+
+    def __init__(self, root: str, slack_ratio: float = 0.25, min_slack: int = 64):
+        """
+        初始化内存映射存储
+
+        Args:
+            root: 存储根目录
+            slack_ratio: 区段预留空闲容量占长度的比例
+            min_slack: 每个区段最少预留的记录数
+        """
+        self.root = Path(root)
+        self.slack_ratio = slack_ratio
+        self.min_slack = min_slack
+        self._views: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    # ============================================
+    # 读取
+    # ============================================
+
+    def is_ready(self, interval_type: str) -> bool:
+        """该周期是否已生成（可以提供读取并接收追加）"""
+        return (self.root / interval_type / INDEX_FILE).exists()
+
+    def get_window(
+        self,
+        symbol: str,
+        start=None,
+        end=None,
+        interval_type: str = '1d',
+        count: Optional[int] = None
+    ) -> Optional[np.ndarray]:
+        """
+        获取一个标的的K线窗口（映射文件上的切片，不拷贝数据）
+
+        Args:
+            symbol: 股票代码
+            start: 开始时间（包含）
+            end: 结束时间；为日期时包含当日全部K线，为时间时包含该时刻
+            interval_type: 数据周期
+            count: 只取区间内最近的count条
+
+        Returns:
+            Optional[np.ndarray]: RECORD_DTYPE结构化数组（只读，按时间升序），
+                window['close_price']等字段同样是零拷贝视图；标的不在存储中时返回None
+        """
+        view = self._view(interval_type)
+        if view is None:
+            return None
+
+        index, data = view
+        segment = index['symbols'].get(symbol)
+        if segment is None:
+            return None
+
+        offset, length, _ = segment
+        records = data[offset:offset + length]
+        timestamps = records['timestamp']
+
+        lo, hi = 0, length
+        if start is not None:
+            lo = int(np.searchsorted(timestamps, _to_ns(start), side='left'))
+        if end is not None:
+            if isinstance(end, datetime):
+                hi = int(np.searchsorted(timestamps, _to_ns(end), side='right'))
+            else:
+                hi = int(np.searchsorted(timestamps, _to_ns(end + timedelta(days=1)), side='left'))
+        if count is not None:
+            lo = max(lo, hi - count)
+        return records[lo:max(lo, hi)]
+
+    def symbols(self, interval_type: str = '1d') -> List[str]:
+        """存储中的股票代码"""
+        view = self._view(interval_type)
+        return sorted(view[0]['symbols']) if view else []
+
+    def _view(self, interval_type: str) -> Optional[tuple]:
+        """返回(索引, 映射数组)，索引文件变化后重新加载"""
+        directory = self.root / interval_type
+        try:
+            stat = (directory / INDEX_FILE).stat()
+        except FileNotFoundError:
+            return None
+
+        key = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        cached = self._views.get(interval_type)
+        if cached is not None and cached[0] == key:
+            return cached[1], cached[2]
+
+        with self._lock:
+            index = self._read_index(directory)
+            path = directory / index['data_file']
+            size = path.stat().st_size // RECORD_DTYPE.itemsize if path.exists() else 0
+            if size:
+                data = np.memmap(path, dtype=RECORD_DTYPE, mode='r', shape=(size,))
+            else:
+                data = np.empty(0, dtype=RECORD_DTYPE)
+            self._views[interval_type] = (key, index, data)
+            return index, data
+
+    # ============================================
+    # 写入
+    # ============================================
+
+    def on_write(self, interval_type: str, written: Dict[int, List[datetime]]) -> None:
+        """写入监听器：从数据库读回受影响区间的已提交行，合并进对应标的的区段"""
+        if not self.is_ready(interval_type):
+            return
+
+        with metrics_registry.timer('mmap_store', 'append') as timer:
+            codes = dict(db.session.execute(
+                select(Symbol.id, Symbol.symbol).where(Symbol.id.in_(list(written)))
+            ).all())
+            ranges = {
+                symbol_id: (min(timestamps), max(timestamps))
+                for symbol_id, timestamps in written.items() if timestamps and symbol_id in codes
+            }
+            frames = {codes[symbol_id]: frame for symbol_id, frame in load_bar_frames(interval_type, ranges)}
+            timer.rows = self.write(interval_type, frames)
+
+    def write(self, interval_type: str, frames: Dict[str, pd.DataFrame]) -> int:
+        """
+        把行情合并进标的的区段（同一时间戳以新数据为准）
+
+        Args:
+            interval_type: 数据周期
+            frames: 股票代码 -> 列为timestamp与PRICE_COLUMNS的数据
+
+        Returns:
+            int: 写入的记录数
+        """
+        frames = {symbol: frame for symbol, frame in frames.items() if not frame.empty}
+        if not frames:
+            return 0
+
+        directory = self.root / interval_type
+        written = 0
+        with self._writer_lock(directory):
+            index = self._read_index(directory)
+            path = directory / index['data_file']
+            with open(path, 'r+b') as f:
+                for symbol, frame in frames.items():
+                    records = _to_records(frame)
+                    since = index.get('since')
+                    if since is not None:
+                        records = records[records['timestamp'] >= np.datetime64(since, 'ns').astype(np.int64)]
+                    if len(records):
+                        written += self._write_segment(f, index, symbol, records)
+                f.flush()
+                os.fsync(f.fileno())
+            self._write_index(directory, index)
+        return written
+
+    def _write_segment(self, f, index: Dict, symbol: str, records: np.ndarray) -> int:
+        """写入一个标的的新记录：追加到区段尾部的空闲容量，或合并后把区段整体追加到文件末尾"""
+        segment = index['symbols'].get(symbol)
+        if segment is not None:
+            offset, length, capacity = segment
+            f.seek(offset * RECORD_DTYPE.itemsize)
+            existing = np.frombuffer(f.read(length * RECORD_DTYPE.itemsize), dtype=RECORD_DTYPE)
+
+            if length and records['timestamp'][0] > existing['timestamp'][-1] and length + len(records) <= capacity:
+                f.seek((offset + length) * RECORD_DTYPE.itemsize)
+                f.write(records.tobytes())
+                index['symbols'][symbol] = [offset, length + len(records), capacity]
+                return len(records)
+
+            records = _merge(existing, records)
+
+        capacity = len(records) + max(self.min_slack, int(len(records) * self.slack_ratio))
+        offset = index['records']
+        f.seek(offset * RECORD_DTYPE.itemsize)
+        f.write(records.tobytes())
+        f.write(b'\0' * ((capacity - len(records)) * RECORD_DTYPE.itemsize))
+        index['symbols'][symbol] = [offset, len(records), capacity]
+        index['records'] = offset + capacity
+        return len(records)
+
+    # ============================================
+    # 重建
+    # ============================================
+
+    def rebuild(
+        self,
+        interval_types: Iterable[str] = ('1d',),
+        since: Optional[date] = None,
+        batch_size: int = 200
+    ) -> Dict[str, Dict[str, int]]:
+        """
+        从数据库重新生成周期的数据文件与索引（同时回收区段迁移留下的空洞）
+
+        新数据写入下一代数据文件，完成后替换索引；已映射旧文件的读取方在下次读取时切换到新文件。
+
+        Args:
+            interval_types: 要重建的周期
+            since: 只保存该日期之后的K线（热数据窗口），默认全部
+            batch_size: 每次查询的标的数
+
+        Returns:
+            Dict[str, Dict[str, int]]: 周期 -> {'symbols', 'rows', 'bytes'}
+        """
+        since_dt = datetime.combine(since, datetime.min.time()) if since else None
+        results = {}
+        for interval_type in interval_types:
+            directory = self.root / interval_type
+            directory.mkdir(parents=True, exist_ok=True)
+
+            with self._writer_lock(directory):
+                previous = self._read_index(directory) if self.is_ready(interval_type) else None
+                generation = int(previous['data_file'].split('.')[1]) + 1 if previous else 1
+                index = {
+                    'data_file': f'bars.{generation}.bin',
+                    'records': 0,
+                    'since': since_dt.isoformat() if since_dt else None,
+                    'symbols': {}
+                }
+
+                ids = list(db.session.execute(select(Symbol.id, Symbol.symbol).order_by(Symbol.id)).all())
+                rows = 0
+                with open(directory / index['data_file'], 'w+b') as f:
+                    for i in range(0, len(ids), batch_size):
+                        codes = dict(ids[i:i + batch_size])
+                        ranges = {symbol_id: (since_dt, _MAX_TIMESTAMP) if since_dt else (None, None) for symbol_id in codes}
+                        for symbol_id, frame in load_bar_frames(interval_type, ranges):
+                            rows += self._write_segment(f, index, codes[symbol_id], _to_records(frame))
+                    f.flush()
+                    os.fsync(f.fileno())
+
+                self._write_index(directory, index)
+                if previous:
+                    # 已映射旧文件的进程在POSIX下继续持有文件内容，直到重新映射
+                    (directory / previous['data_file']).unlink(missing_ok=True)
+
+            stats = {'symbols': len(index['symbols']), 'rows': rows, 'bytes': index['records'] * RECORD_DTYPE.itemsize}
+            logger.info(f"内存映射存储{interval_type}重建完成: {stats}")
+            results[interval_type] = stats
+        return results
+
+    # ============================================
+    # 索引与锁
+    # ============================================
+
+    @staticmethod
+    def _read_index(directory: Path) -> Dict:
+        return json.loads((directory / INDEX_FILE).read_text())
+
+    @staticmethod
+    def _write_index(directory: Path, index: Dict) -> None:
+        """写临时文件后原子替换"""
+        tmp_path = directory / f'{INDEX_FILE}.tmp'
+        tmp_path.write_text(json.dumps(index, ensure_ascii=False))
+        os.replace(tmp_path, directory / INDEX_FILE)
+
+    def _writer_lock(self, directory: Path):
+        return _FileLock(directory / LOCK_FILE, self._lock)
+
+
+class _FileLock:
+    """进程内线程锁 + 进程间文件锁"""
+
+    def __init__(self, path: Path, thread_lock: threading.Lock):
+        self.path = path
+        self.thread_lock = thread_lock
+        self.handle = None
+
+    def __enter__(self):
+        self.thread_lock.acquire()
+        if fcntl is not None:
+            self.handle = open(self.path, 'a+')
+            fcntl.flock(self.handle, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if self.handle is not None:
+            fcntl.flock(self.handle, fcntl.LOCK_UN)
+            self.handle.close()
+            self.handle = None
+        self.thread_lock.release()
+
+
+def _to_ns(value) -> np.int64:
+    """日期/时间转换为datetime64[ns]的int64表示"""
+    return np.datetime64(pd.Timestamp(value), 'ns').astype(np.int64)
+
+
+def _to_records(frame: pd.DataFrame) -> np.ndarray:
+    """DataFrame转换为按时间升序的定长记录数组"""
+    records = np.empty(len(frame), dtype=RECORD_DTYPE)
+    records['timestamp'] = frame['timestamp'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+    for column in PRICE_COLUMNS:
+        records[column] = frame[column].to_numpy(dtype=float)
+    return records[np.argsort(records['timestamp'], kind='stable')]
+
+
+def _merge(existing: np.ndarray, incoming: np.ndarray) -> np.ndarray:
+    """合并两段记录，同一时间戳以新记录为准"""
+    combined = np.concatenate([incoming, existing])
+    _, first = np.unique(combined['timestamp'], return_index=True)
+    return combined[first]
+
+
+def window_to_frame(window: np.ndarray) -> pd.DataFrame:
+    """把get_window的结果转换为DataFrame（会拷贝数据）"""
+    frame = pd.DataFrame({column: window[column] for column in PRICE_COLUMNS})
+    frame.insert(0, 'timestamp', window['timestamp'].view('datetime64[ns]'))
+    return frame
+
+
+_mmap_store: Optional[MmapBarStore] = None
+_store_lock = threading.Lock()
+
+
+def get_mmap_store() -> Optional[MmapBarStore]:
+    """
+    获取共享的内存映射存储，根目录由环境变量MMAP_STORE_DIR指定
+
+    Returns:
+        Optional[MmapBarStore]: 未配置时返回None
+    """
+    global _mmap_store
+
+    root = os.environ.get('MMAP_STORE_DIR')
+    if not root:
+        return None
+
+    with _store_lock:
+        if _mmap_store is None or _mmap_store.root != Path(root):
+            _mmap_store = MmapBarStore(root)
+        return _mmap_store
@@ -0,0 +1,146 @@
+"""
+令牌桶限流器
+为每个数据源提供进程级共享的请求速率与并发数限制
+"""
+
+import threading
+import time
+import logging
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucketRateLimiter:
+    """令牌桶限流器（线程安全）"""
+
+    def __init__(self, requests_per_second: float = 5.0, burst: int = 5, max_in_flight: int = 4):
+        """
+        初始化限流器
+
+        Args:
+            requests_per_second: 令牌补充速率（每秒请求数）
+            burst: 桶容量，允许的突发请求数
+            max_in_flight: 同时进行中的最大请求数
+        """
+        self.requests_per_second = float(requests_per_second)
+        self.burst = max(1, int(burst))
+        self.max_in_flight = max(1, int(max_in_flight))
+
+        self._tokens = float(self.burst)
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+        self._in_flight = threading.BoundedSemaphore(self.max_in_flight)
+
+    def acquire(self) -> float:
+        """
+        获取一个请求许可，必要时阻塞等待
+
+        Returns:
+            float: 本次等待的秒数
+        """
+        started = time.monotonic()
+        self._in_flight.acquire()
+
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return time.monotonic() - started
+                wait = (1 - self._tokens) / self.requests_per_second if self.requests_per_second > 0 else 0.1
+            time.sleep(wait)
+
+    def release(self) -> None:
+        """释放并发许可"""
+        self._in_flight.release()
+
+    def _refill(self) -> None:
+        """按流逝时间补充令牌（调用方需持有锁）"""
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.requests_per_second)
+        self._last_refill = now
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+        return False
+
+    def to_dict(self) -> Dict:
+        """转换为字典"""
+        return {
+            'requests_per_second': self.requests_per_second,
+            'burst': self.burst,
+            'max_in_flight': self.max_in_flight
+        }
+
+    def matches(self, config: Optional[Dict]) -> bool:
+        """按构造时的取值规则比较限流配置（未指定的项取默认值）"""
+        config = config or {}
+        return self.to_dict() == {
+            'requests_per_second': float(config.get('requests_per_second', 5.0)),
+            'burst': max(1, int(config.get('burst', 5))),
+            'max_in_flight': max(1, int(config.get('max_in_flight', 4)))
+        }
+
+    def __repr__(self):
+        return (f'<TokenBucketRateLimiter rps={self.requests_per_second} '
+                f'burst={self.burst} max_in_flight={self.max_in_flight}>')
+
+
+# 进程级限流器注册表，同名数据源的所有实例共享同一个限流器
+_rate_limiters: Dict[str, TokenBucketRateLimiter] = {}
+_registry_lock = threading.Lock()
+
+# 已提示过的不一致配置，(数据源名称, 配置)，每种配置只警告一次
+_mismatch_warned = set()
+
+
+def get_rate_limiter(source_name: str, config: Optional[Dict] = None) -> TokenBucketRateLimiter:
+    """
+    获取数据源的共享限流器，首次调用时按配置创建
+
+    之后的调用共享已创建的限流器：配置与之不同时记录警告并忽略该配置（同名数据源共用一个额度），
+    需要调整限流时调用configure_rate_limiter
+
+    Args:
+        source_name: 数据源名称
+        config: 限流配置，可包含 requests_per_second / burst / max_in_flight
+
+    Returns:
+        TokenBucketRateLimiter: 限流器实例
+    """
+    with _registry_lock:
+        limiter = _rate_limiters.get(source_name)
+        if limiter is None:
+            limiter = TokenBucketRateLimiter(**(config or {}))
+            _rate_limiters[source_name] = limiter
+            logger.info(f"创建数据源{source_name}的限流器: {limiter}")
+        elif not limiter.matches(config):
+            key = (source_name, tuple(sorted((config or {}).items())))
+            if key not in _mismatch_warned:
+                _mismatch_warned.add(key)
+                logger.warning(f"数据源{source_name}已有限流器{limiter}，忽略不同的限流配置{config}；"
+                               f"需要调整时使用configure_rate_limiter")
+        return limiter
+
+
+def configure_rate_limiter(source_name: str, config: Dict) -> TokenBucketRateLimiter:
+    """
+    重新配置数据源的共享限流器
+
+    Args:
+        source_name: 数据源名称
+        config: 限流配置
+
+    Returns:
+        TokenBucketRateLimiter: 新的限流器实例
+    """
+    with _registry_lock:
+        limiter = TokenBucketRateLimiter(**config)
+        _rate_limiters[source_name] = limiter
+        logger.info(f"重新配置数据源{source_name}的限流器: {limiter}")
+        return limiter
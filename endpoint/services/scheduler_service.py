@@ -3,6 +3,7 @@
 负责管理定时获取市场数据的任务
 """
 
+import os
 import logging
 from datetime import datetime, time, timedelta
 from apscheduler.schedulers.background import BackgroundScheduler
@@ -11,8 +12,13 @@ from apscheduler.triggers.interval import IntervalTrigger
 from apscheduler.events import EVENT_JOB_EXECUTED, EVENT_JOB_ERROR
 from typing import List, Dict, Optional
 
+from sqlalchemy import text
+
 from services.market_data_service import MarketDataService
-from models import Symbol
+from services.market_data_partitions import MarketDataPartitionManager
+from services.market_data_archive import get_market_data_archive, archive_horizon_cutoff
+from services.trading_calendar import get_trading_calendar
+from models import db, Symbol
 
 logger = logging.getLogger(__name__)
 
@@ -22,7 +28,8 @@ class SchedulerService:
     def __init__(self):
         """初始化定时任务服务"""
         self.scheduler = BackgroundScheduler()
-        self.market_service = MarketDataService()
+        # 定时任务使用的数据源，设为composite时按优先级在多个数据源之间故障转移
+        self.market_service = MarketDataService(os.environ.get('MARKET_DATA_SOURCE', 'akshare'))
         
         # 添加事件监听器
         self.scheduler.add_listener(self._job_listener, EVENT_JOB_EXECUTED | EVENT_JOB_ERROR)
@@ -83,6 +90,19 @@ class SchedulerService:
             # 每周日凌晨2:00同步股票列表
             self.add_weekly_symbol_sync_job()
             
+            # 每周日凌晨1:30刷新交易日历
+            self.add_trading_calendar_refresh_job()
+            
+            # 每周六凌晨3:00与数据源核对复权因子（每日除权除息由收盘快照增量记录）
+            self.add_adjustment_factor_sync_job()
+            
+            # 每月1日凌晨4:00预建market_data未来的按月分区
+            self.add_partition_maintenance_job()
+            
+            # 每周日凌晨4:30把早于归档期限的日线移入归档文件（配置MARKET_DATA_ARCHIVE_DIR时）
+            if get_market_data_archive() is not None:
+                self.add_market_data_archive_job()
+            
             logger.info("默认定时任务添加完成")
             
         except Exception as e:
@@ -148,6 +168,86 @@ class SchedulerService:
         
         logger.info(f"已添加任务: {job_id}")
     
+    def add_trading_calendar_refresh_job(self):
+        """添加交易日历刷新任务"""
+        job_id = 'trading_calendar_refresh'
+        
+        # 每周日凌晨1:30执行
+        self.scheduler.add_job(
+            func=self._refresh_trading_calendar,
+            trigger=CronTrigger(
+                day_of_week='sun',  # 周日
+                hour=1,
+                minute=30
+            ),
+            id=job_id,
+            name='交易日历刷新',
+            replace_existing=True,
+            max_instances=1
+        )
+        
+        logger.info(f"已添加任务: {job_id}")
+    
+    def add_adjustment_factor_sync_job(self):
+        """添加复权因子同步任务"""
+        job_id = 'adjustment_factor_sync'
+        
+        # 每周六凌晨3:00执行
+        self.scheduler.add_job(
+            func=self._sync_adjustment_factors,
+            trigger=CronTrigger(
+                day_of_week='sat',  # 周六
+                hour=3,
+                minute=0
+            ),
+            id=job_id,
+            name='复权因子同步',
+            replace_existing=True,
+            max_instances=1
+        )
+        
+        logger.info(f"已添加任务: {job_id}")
+    
+    def add_partition_maintenance_job(self):
+        """添加market_data分区维护任务"""
+        job_id = 'market_data_partition_maintenance'
+        
+        # 每月1日凌晨4:00执行
+        self.scheduler.add_job(
+            func=self._maintain_partitions,
+            trigger=CronTrigger(
+                day=1,
+                hour=4,
+                minute=0
+            ),
+            id=job_id,
+            name='行情表分区维护',
+            replace_existing=True,
+            max_instances=1
+        )
+        
+        logger.info(f"已添加任务: {job_id}")
+    
+    def add_market_data_archive_job(self):
+        """添加行情冷数据归档任务"""
+        job_id = 'market_data_archive'
+        
+        # 每周日凌晨4:30执行
+        self.scheduler.add_job(
+            func=self._archive_market_data,
+            trigger=CronTrigger(
+                day_of_week='sun',
+                hour=4,
+                minute=30
+            ),
+            id=job_id,
+            name='行情冷数据归档',
+            replace_existing=True,
+            max_instances=1
+        )
+        
+        logger.info(f"已添加任务: {job_id}")
+    
     def add_custom_job(
         self, 
         job_id: str, 
@@ -248,6 +348,10 @@ class SchedulerService:
         try:
             logger.info("开始执行每日市场数据获取任务...")
             
+            if not get_trading_calendar().is_trading_day(datetime.now().date()):
+                logger.info("今天不是交易日，跳过每日市场数据获取任务")
+                return
+            
             # 初始化数据源
             if not self.market_service.initialize_data_source():
                 raise Exception("数据源初始化失败")
@@ -277,10 +381,20 @@ class SchedulerService:
         try:
             logger.info("开始执行收盘后数据获取任务...")
             
-            # 与每日任务类似，但可能包含更多数据
-            self._fetch_daily_market_data()
+            if not get_trading_calendar().is_trading_day(datetime.now().date()):
+                logger.info("今天不是交易日，跳过收盘后数据获取任务")
+                return
+            
+            # 初始化数据源
+            if not self.market_service.initialize_data_source():
+                raise Exception("数据源初始化失败")
+            
+            # 一次全市场快照生成当日日线，存在缺口的股票由后台入库任务补齐
+            stats = self.market_service.ingest_daily_snapshot()
             
-            logger.info("收盘后数据获取任务完成")
+            logger.info(f"收盘后数据获取任务完成: 快照写入{stats.get('snapshot_symbols', 0)}只股票，"
+                        f"{stats.get('fallback_symbols', 0)}只缺口股票转入入库任务{stats.get('job_id')}，"
+                        f"除权除息{stats.get('ex_dividend_symbols', 0)}只")
             
         except Exception as e:
             logger.error(f"收盘后数据获取任务失败: {e}")
@@ -296,17 +410,63 @@ class SchedulerService:
                 raise Exception("数据源初始化失败")
             
             # 同步A股列表
-            synced_count = self.market_service.sync_symbols('A股')
+            symbol_stats = self.market_service.sync_symbols('A股')
             
             # 同步上证500成分股
-            index_count = self.market_service.sync_index_components('上证500')
+            index_stats = self.market_service.sync_index_components('上证500')
             
-            logger.info(f"每周股票列表同步完成: 同步股票{synced_count}只，指数成分股{index_count}只")
+            logger.info(f"每周股票列表同步完成: 同步股票{symbol_stats['total']}只"
+                        f"（新增{symbol_stats['inserted']}，更新{symbol_stats['updated']}，停用{symbol_stats['deactivated']}），"
+                        f"指数成分股{index_stats['total']}只")
             
         except Exception as e:
             logger.error(f"每周股票列表同步任务失败: {e}")
             raise
     
+    def _refresh_trading_calendar(self):
+        """交易日历刷新任务"""
+        logger.info("开始执行交易日历刷新任务...")
+        
+        if not get_trading_calendar(self.market_service.data_source).refresh():
+            raise Exception("交易日历刷新失败")
+    
+    def _sync_adjustment_factors(self):
+        """复权因子同步任务"""
+        try:
+            logger.info("开始执行复权因子同步任务...")
+            
+            # 逐只同步在后台入库任务中执行，失败的股票记录在任务工作项上
+            stats = self.market_service.update_adjustment_factors()
+            
+            logger.info(f"复权因子同步任务已创建: {stats['symbols']}只股票，任务{stats['job_id']}")
+            
+        except Exception as e:
+            logger.error(f"复权因子同步任务失败: {e}")
+            raise
+    
+    def _maintain_partitions(self):
+        """market_data分区维护任务（只对MySQL分区表生效）"""
+        if db.engine.dialect.name != 'mysql':
+            return
+        
+        def execute(sql):
+            result = db.session.execute(text(sql))
+            rows = result.fetchall() if result.returns_rows else []
+            db.session.commit()
+            return rows
+        
+        created = MarketDataPartitionManager(execute).ensure_future_partitions()
+        logger.info(f"行情表分区维护完成，新增{len(created)}个分区")
+    
+    def _archive_market_data(self):
+        """行情冷数据归档任务（归档期限由MARKET_DATA_ARCHIVE_HORIZON_DAYS指定）"""
+        archive = get_market_data_archive()
+        if archive is None:
+            return
+        
+        results = archive.archive(archive_horizon_cutoff(), pause=0.1)
+        logger.info(f"行情冷数据归档完成: {results}")
+    
     def _fetch_specific_symbols(self, symbols: List[str]):
         """获取指定股票的数据"""
         try:
@@ -344,7 +504,8 @@ class SchedulerService:
         return {
             'running': self.scheduler.running,
             'job_count': len(self.scheduler.get_jobs()),
-            'jobs': self.list_jobs()
+            'jobs': self.list_jobs(),
+            'trading_calendar': get_trading_calendar().get_status()
         }
 
 # 全局调度器实例
@@ -0,0 +1,276 @@
+"""
+交易日历服务
+交易日历加载一次后保存在内存中的有序日期数组里，所有查询均为二分查找，不产生网络请求
+"""
+
+import json
+import os
+import threading
+import logging
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import List, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class TradingCalendar:
+    """
+    交易日历（线程安全）
+
+    日历依次从本地文件、数据源加载，从数据源加载成功后写回本地文件；
+    查询日期超出日历覆盖范围（或日历尚未加载成功）时按工作日近似判断。
+    """
+
+    def __init__(self, data_source=None, cache_path: Optional[str] = None):
+        """
+        初始化交易日历
+
+        Args:
+            data_source: 提供 fetch_trading_calendar() 的数据源
+            cache_path: 本地持久化文件路径
+        """
+        self.data_source = data_source
+        self.cache_path = Path(cache_path or os.environ.get('TRADING_CALENDAR_PATH', 'cache/trading_calendar.json'))
+
+        self._dates: List[date] = []
+        self._updated_at: Optional[datetime] = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    # ============================================
+    # 加载与刷新
+    # ============================================
+
+    def load(self) -> bool:
+        """
+        加载交易日历：优先读取本地文件，不存在时从数据源获取
+
+        Returns:
+            bool: 是否加载到日历数据
+        """
+        with self._lock:
+            if self._loaded:
+                return bool(self._dates)
+            self._loaded = True
+
+            if self._load_local():
+                return True
+
+        return self.refresh()
+
+    def refresh(self) -> bool:
+        """
+        从数据源重新获取交易日历并持久化，失败时保留当前日历
+
+        Returns:
+            bool: 是否刷新成功
+        """
+        if self.data_source is None:
+            logger.warning("交易日历未配置数据源，无法刷新")
+            return False
+
+        try:
+            dates = self.data_source.fetch_trading_calendar()
+        except Exception as e:
+            logger.error(f"获取交易日历失败: {e}")
+            return False
+
+        if not dates:
+            logger.warning("数据源返回的交易日历为空，保留当前日历")
+            return False
+
+        with self._lock:
+            self._dates = sorted(set(dates))
+            self._updated_at = datetime.now()
+            self._loaded = True
+            self._save_local()
+
+        logger.info(f"交易日历已刷新: {len(self._dates)}个交易日 ({self._dates[0]} ~ {self._dates[-1]})")
+        return True
+
+    def _load_local(self) -> bool:
+        """读取本地日历文件（调用方需持有锁）"""
+        if not self.cache_path.exists():
+            return False
+
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                payload = json.load(f)
+            self._dates = [date.fromisoformat(d) for d in payload['dates']]
+            self._updated_at = datetime.fromisoformat(payload['updated_at']) if payload.get('updated_at') else None
+            logger.info(f"从本地文件加载交易日历: {len(self._dates)}个交易日")
+            return bool(self._dates)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"本地交易日历文件无效: {e}")
+            return False
+
+    def _save_local(self) -> None:
+        """原子写入本地日历文件（调用方需持有锁）"""
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.cache_path.with_suffix('.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({
+                    'updated_at': self._updated_at.isoformat() if self._updated_at else None,
+                    'dates': [d.isoformat() for d in self._dates]
+                }, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            logger.warning(f"保存交易日历失败: {e}")
+
+    def _ensure_loaded(self) -> List[date]:
+        if not self._loaded:
+            self.load()
+        return self._dates
+
+    def _covers(self, dates: List[date], day: date) -> bool:
+        return bool(dates) and dates[0] <= day <= dates[-1]
+
+    # ============================================
+    # 查询
+    # ============================================
+
+    def is_trading_day(self, day: date) -> bool:
+        """
+        检查是否为交易日
+
+        Args:
+            day: 要检查的日期
+
+        Returns:
+            bool: 是否为交易日
+        """
+        dates = self._ensure_loaded()
+        if not self._covers(dates, day):
+            return day.weekday() < 5
+
+        index = bisect_left(dates, day)
+        return index < len(dates) and dates[index] == day
+
+    def next_trading_day(self, day: date) -> date:
+        """
+        获取指定日期之后的第一个交易日（不含当天）
+
+        Args:
+            day: 基准日期
+
+        Returns:
+            date: 下一交易日
+        """
+        dates = self._ensure_loaded()
+        index = bisect_right(dates, day)
+        if index < len(dates) and dates[0] <= day:
+            return dates[index]
+
+        following = day + timedelta(days=1)
+        while following.weekday() >= 5:
+            following += timedelta(days=1)
+        return following
+
+    def prev_trading_day(self, day: date) -> date:
+        """
+        获取指定日期之前的最后一个交易日（不含当天）
+
+        Args:
+            day: 基准日期
+
+        Returns:
+            date: 上一交易日
+        """
+        dates = self._ensure_loaded()
+        index = bisect_left(dates, day)
+        if index > 0 and day <= dates[-1] + timedelta(days=1):
+            return dates[index - 1]
+
+        previous = day - timedelta(days=1)
+        while previous.weekday() >= 5:
+            previous -= timedelta(days=1)
+        return previous
+
+    def trading_days_between(self, start_date: date, end_date: date) -> List[date]:
+        """
+        获取区间内的全部交易日（含首尾）
+
+        Args:
+            start_date: 开始日期
+            end_date: 结束日期
+
+        Returns:
+            List[date]: 交易日列表
+        """
+        if start_date > end_date:
+            return []
+
+        dates = self._ensure_loaded()
+        if self._covers(dates, start_date) and self._covers(dates, end_date):
+            return dates[bisect_left(dates, start_date):bisect_right(dates, end_date)]
+
+        days = []
+        current = start_date
+        while current <= end_date:
+            if self.is_trading_day(current):
+                days.append(current)
+            current += timedelta(days=1)
+        return days
+
+    def count_trading_days(self, start_date: date, end_date: date) -> int:
+        """
+        统计区间内的交易日数量（含首尾）
+
+        Args:
+            start_date: 开始日期
+            end_date: 结束日期
+
+        Returns:
+            int: 交易日数量
+        """
+        if start_date > end_date:
+            return 0
+
+        dates = self._ensure_loaded()
+        if self._covers(dates, start_date) and self._covers(dates, end_date):
+            return bisect_right(dates, end_date) - bisect_left(dates, start_date)
+        return len(self.trading_days_between(start_date, end_date))
+
+    def has_trading_days(self, start_date: date, end_date: date) -> bool:
+        """区间内是否存在交易日（含首尾）"""
+        return self.count_trading_days(start_date, end_date) > 0
+
+    def get_status(self) -> Dict:
+        """获取日历状态"""
+        dates = self._dates
+        return {
+            'loaded': bool(dates),
+            'trading_days': len(dates),
+            'start_date': dates[0].isoformat() if dates else None,
+            'end_date': dates[-1].isoformat() if dates else None,
+            'updated_at': self._updated_at.isoformat() if self._updated_at else None,
+            'cache_path': str(self.cache_path)
+        }
+
+
+# 进程级交易日历实例，所有服务共享同一份内存日历
+_trading_calendar: Optional[TradingCalendar] = None
+_calendar_lock = threading.Lock()
+
+
+def get_trading_calendar(data_source=None) -> TradingCalendar:
+    """
+    获取共享的交易日历，首次调用时创建
+
+    Args:
+        data_source: 提供 fetch_trading_calendar() 的数据源，日历尚未绑定数据源时使用
+
+    Returns:
+        TradingCalendar: 交易日历实例
+    """
+    global _trading_calendar
+
+    with _calendar_lock:
+        if _trading_calendar is None:
+            _trading_calendar = TradingCalendar(data_source)
+        elif _trading_calendar.data_source is None and data_source is not None:
+            _trading_calendar.data_source = data_source
+        return _trading_calendar
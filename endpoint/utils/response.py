@@ -25,6 +25,7 @@ class ResponseCode:
     UNAUTHORIZED = 10013
     DATA_SOURCE_EXISTS = 10014
     DATA_SOURCE_IN_USE = 10015
+    JOB_RUNNING = 10016
 
     # 系统异常 (50xxx)
     INTERNAL_ERROR = 50001
@@ -62,6 +63,7 @@ class ResponseMessage:
     UNAUTHORIZED = "未授权访问"
     DATA_SOURCE_EXISTS = "数据来源名称已存在"
     DATA_SOURCE_IN_USE = "数据来源正在使用中"
+    JOB_RUNNING = "任务正在运行"
 
     # 系统异常消息
     INTERNAL_ERROR = "内部服务器错误"
@@ -79,6 +81,12 @@ class ResponseMessage:
     TEST_ERROR = "测试失败"
 
 
+# 使用更具体HTTP状态码的错误码（其余业务异常为400，系统异常为500）
+HTTP_STATUS_OVERRIDES = {
+    ResponseCode.JOB_RUNNING: 409,  # 资源状态冲突
+}
+
+
 class ApiResponse:
     """统一API响应格式"""
 
@@ -121,7 +129,9 @@ class ApiResponse:
         }
 
         # 根据错误码确定HTTP状态码
-        if 10000 <= code < 20000:
+        if code in HTTP_STATUS_OVERRIDES:
+            http_status = HTTP_STATUS_OVERRIDES[code]
+        elif 10000 <= code < 20000:
             http_status = 400  # 业务异常
         elif 50000 <= code < 60000:
             http_status = 500  # 系统异常
@@ -183,6 +193,7 @@ class ApiResponse:
             ResponseCode.UNAUTHORIZED: ResponseMessage.UNAUTHORIZED,
             ResponseCode.DATA_SOURCE_EXISTS: ResponseMessage.DATA_SOURCE_EXISTS,
             ResponseCode.DATA_SOURCE_IN_USE: ResponseMessage.DATA_SOURCE_IN_USE,
+            ResponseCode.JOB_RUNNING: ResponseMessage.JOB_RUNNING,
             ResponseCode.INTERNAL_ERROR: ResponseMessage.INTERNAL_ERROR,
             ResponseCode.DATA_SOURCE_ERROR: ResponseMessage.DATA_SOURCE_ERROR,
             ResponseCode.DATA_SOURCE_INIT_ERROR: ResponseMessage.DATA_SOURCE_INIT_ERROR,
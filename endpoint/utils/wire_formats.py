@@ -0,0 +1,106 @@
+"""
+二进制响应格式工具
+按请求的Accept头在JSON、Arrow IPC流与MessagePack之间协商返回格式；
+二进制格式直接由列数组（NumPy数组/DataFrame列）编码，不逐行构造字典
+"""
+import json
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+import msgpack
+import numpy as np
+import pyarrow as pa
+from flask import Response, request
+
+JSON_MIMETYPE = 'application/json'
+ARROW_STREAM_MIMETYPE = 'application/vnd.apache.arrow.stream'
+MSGPACK_MIMETYPE = 'application/msgpack'
+
+# 可协商的返回格式，Accept中质量相同时按此顺序优先（未指定或*/*时为JSON）
+WIRE_MIMETYPES = (JSON_MIMETYPE, ARROW_STREAM_MIMETYPE, MSGPACK_MIMETYPE, 'application/x-msgpack')
+
+# Arrow schema元数据中保存响应元数据（JSON）的键
+ARROW_METADATA_KEY = b'meta'
+
+
+def negotiate_wire_format() -> str:
+    """
+    按Accept头选择返回格式
+
+    Returns:
+        str: JSON_MIMETYPE、ARROW_STREAM_MIMETYPE或MSGPACK_MIMETYPE
+    """
+    best = request.accept_mimetypes.best_match(WIRE_MIMETYPES, default=JSON_MIMETYPE)
+    return MSGPACK_MIMETYPE if best == 'application/x-msgpack' else best
+
+
+def wants_binary() -> bool:
+    """请求是否协商为二进制格式"""
+    return negotiate_wire_format() != JSON_MIMETYPE
+
+
+def binary_response(columns: Dict[str, Any], metadata: Optional[Dict] = None, mimetype: Optional[str] = None) -> Response:
+    """
+    以二进制格式返回列数据
+
+    Arrow IPC流：一个RecordBatch，列类型由数组推断（时间为timestamp[ns]），metadata以JSON保存在schema元数据的meta键；
+    MessagePack：{'meta': metadata, 'columns': {列名: 列}}，数值/时间列为 {'dtype': NumPy类型字符串, 'data': 小端原始字节}，
+    可用 numpy.frombuffer(data, dtype) 零拷贝还原，字符串等其他列为数组
+
+    Args:
+        columns: 列名 -> 等长的NumPy数组、pandas Series或列表
+        metadata: 响应元数据（可JSON序列化）
+        mimetype: 返回格式，默认按Accept头协商
+
+    Returns:
+        Response: 二进制响应
+    """
+    mimetype = mimetype or negotiate_wire_format()
+    metadata = metadata or {}
+    arrays = {name: _to_numpy(values) for name, values in columns.items()}
+
+    if mimetype == ARROW_STREAM_MIMETYPE:
+        body = encode_arrow(arrays, metadata)
+    elif mimetype == MSGPACK_MIMETYPE:
+        body = encode_msgpack(arrays, metadata)
+    else:
+        raise ValueError(f"不支持的二进制格式: {mimetype}")
+
+    response = Response(body, mimetype=mimetype)
+    response.headers['Vary'] = 'Accept'
+    return response
+
+
+def encode_arrow(arrays: Dict[str, np.ndarray], metadata: Dict) -> bytes:
+    """编码为Arrow IPC流（数值列由NumPy缓冲区直接构造）"""
+    table = pa.table({name: pa.array(values) for name, values in arrays.items()})
+    table = table.replace_schema_metadata({
+        ARROW_METADATA_KEY: json.dumps(metadata, ensure_ascii=False, default=str).encode('utf-8')
+    })
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def encode_msgpack(arrays: Dict[str, np.ndarray], metadata: Dict) -> bytes:
+    """编码为MessagePack（数值/时间列为原始字节）"""
+    packed = {}
+    for name, values in arrays.items():
+        if values.dtype.kind in 'biufM':
+            values = np.ascontiguousarray(values, dtype=values.dtype.newbyteorder('<'))
+            packed[name] = {'dtype': values.dtype.str, 'data': values.tobytes()}
+        else:
+            packed[name] = values.tolist()
+    return msgpack.packb({'meta': metadata, 'columns': packed}, use_bin_type=True, default=str)
+
+
+def _to_numpy(values) -> np.ndarray:
+    """列转换为NumPy数组：时间统一为datetime64[ns]，布尔/数值保持原类型，其余为object数组"""
+    array = values.to_numpy() if hasattr(values, 'to_numpy') else np.asarray(values)
+    if array.dtype.kind == 'M':
+        return array.astype('datetime64[ns]')
+    if array.dtype.kind == 'O' and len(array) and isinstance(array[0], datetime):
+        return array.astype('datetime64[ns]')
+    return array